@@ -10,7 +10,7 @@ with lib; let
   port = 6767;
   nixarr = config.nixarr;
 in {
-  imports = [./settings-sync];
+  imports = [./settings-sync ./subtitle-scheduler];
 
   options.nixarr.bazarr = {
     enable = mkOption {
@@ -193,7 +193,9 @@ in {
             // lib.optionalAttrs cfg.sonarr.enable {sonarr = cfg.sonarr.config;}
             // lib.optionalAttrs cfg.radarr.enable {radarr = cfg.radarr.config;});
         in ''
-          ${getExe sync-settings} --config-file ${config-file}
+          ${getExe sync-settings} \
+            --config-file ${config-file} \
+            --fingerprint-file '${nixarr.bazarr.stateDir}/settings-sync.fingerprint'
         '';
       };
     };
@@ -8,6 +8,8 @@ import urllib.error
 
 import pydantic
 
+from nixarr_py.utils import fingerprint_matches, sync_fingerprint, write_fingerprint
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -78,6 +80,12 @@ def get_current_settings(base_url: str, api_key: str) -> dict[str, Any]:
     return make_request(base_url, api_key, "/system/settings")
 
 
+def get_bazarr_version(base_url: str, api_key: str) -> str:
+    """Get the running Bazarr version."""
+    status = make_request(base_url, api_key, "/system/status")
+    return status.get("data", {}).get("bazarr_version", "")
+
+
 def save_settings(base_url: str, api_key: str, settings: dict[str, Any]) -> None:
     """Save settings to Bazarr."""
     make_request(base_url, api_key, "/system/settings", method="POST", data=settings)
@@ -162,8 +170,38 @@ if __name__ == "__main__":
         required=True,
         help="Path to a config file containing the settings to sync. Must be a JSON file matching the SettingsSyncConfig schema.",
     )
+    parser.add_argument(
+        "--fingerprint-file",
+        type=pathlib.Path,
+        help="Path to a file recording the fingerprint of the last successful sync. If the config, referenced secrets and Bazarr version are unchanged since then, skip syncing.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Sync even if the fingerprint is unchanged since the last successful sync.",
+    )
     args = parser.parse_args()
     with open(args.config_file) as f:
         config_json = f.read()
     config = SettingsSyncConfig.model_validate_json(config_json)
-    main(config)
+
+    with open(config.bazarr_api_key_file, "r", encoding="utf-8") as f:
+        bazarr_api_key = f.read().strip()
+    version = get_bazarr_version(config.bazarr_base_url, bazarr_api_key)
+    api_key_files = [pathlib.Path(config.bazarr_api_key_file)] + [
+        pathlib.Path(arr.apiKeyFile)
+        for arr in (config.sonarr, config.radarr)
+        if arr is not None and arr.apiKeyFile
+    ]
+    fingerprint = sync_fingerprint(args.config_file, version, api_key_files)
+    unchanged = args.fingerprint_file is not None and fingerprint_matches(
+        args.fingerprint_file, fingerprint
+    )
+    if unchanged and not args.force:
+        logger.info(
+            "Config, secrets and Bazarr version unchanged since the last successful sync; skipping. Use --force to sync anyway."
+        )
+    else:
+        main(config)
+        if args.fingerprint_file is not None:
+            write_fingerprint(args.fingerprint_file, fingerprint)
@@ -0,0 +1,145 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    concatStringsSep
+    getExe
+    mapAttrsToList
+    mkIf
+    mkOption
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.bazarr.subtitleScheduler;
+
+  subtitle-scheduler = writePython3Bin "nixarr-subtitle-scheduler" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./subtitle_scheduler.py);
+in {
+  options.nixarr.bazarr.subtitleScheduler = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to search for missing subtitles in small batches during an
+        off-peak window every night, instead of with Bazarr's "Search All".
+
+        Each search queries every provider that isn't throttled, so the
+        number of searches stays within
+        [`queriesPerProvider`](#nixarr.bazarr.subtitleScheduler.queriesPerProvider)
+        (or a per-provider budget) per
+        [`budgetWindowSecs`](#nixarr.bazarr.subtitleScheduler.budgetWindowSecs),
+        and the run stops once every provider is throttled. Subtitles that
+        weren't found are only searched again after
+        [`retryAfterDays`](#nixarr.bazarr.subtitleScheduler.retryAfterDays).
+        Progress is kept between runs.
+      '';
+    };
+
+    queriesPerProvider = mkOption {
+      type = types.ints.positive;
+      default = 50;
+      description = ''
+        Maximum number of queries per provider per budget window. Each
+        searched subtitle counts as one query to every provider.
+      '';
+    };
+
+    providerBudgets = mkOption {
+      type = types.attrsOf types.ints.positive;
+      default = {};
+      example = {opensubtitlescom = 20;};
+      description = ''
+        Budgets for individual providers, by Bazarr's provider name,
+        overriding [`queriesPerProvider`](#nixarr.bazarr.subtitleScheduler.queriesPerProvider).
+      '';
+    };
+
+    budgetWindowSecs = mkOption {
+      type = types.ints.positive;
+      default = 3600;
+      description = "Length of the sliding query budget window, in seconds.";
+    };
+
+    batchSize = mkOption {
+      type = types.ints.positive;
+      default = 10;
+      description = "Number of searches between pauses and provider status checks.";
+    };
+
+    pauseSecs = mkOption {
+      type = types.ints.unsigned;
+      default = 60;
+      description = "Pause between batches, in seconds.";
+    };
+
+    retryAfterDays = mkOption {
+      type = types.ints.positive;
+      default = 3;
+      description = ''
+        Search a subtitle that wasn't found again only after this many days.
+      '';
+    };
+
+    offPeakStart = mkOption {
+      type = types.strMatching "[0-2][0-9]:[0-5][0-9]";
+      default = "02:00";
+      description = "Local time at which the nightly search run starts.";
+    };
+
+    offPeakEnd = mkOption {
+      type = types.strMatching "[0-2][0-9]:[0-5][0-9]";
+      default = "06:00";
+      description = ''
+        Local time at which the nightly search run stops, leaving the rest
+        for the next night.
+      '';
+    };
+  };
+
+  config = mkIf (nixarr.enable && nixarr.bazarr.enable && cfg.enable) {
+    systemd.services.nixarr-subtitle-scheduler = {
+      description = "Search for missing Bazarr subtitles within provider query budgets";
+      after = ["bazarr-api.service"];
+      wants = ["bazarr-api.service"];
+      serviceConfig = {
+        Type = "oneshot";
+        DynamicUser = true;
+        StateDirectory = "nixarr-subtitle-scheduler";
+        SupplementaryGroups = ["bazarr-api"];
+        ExecStart = concatStringsSep " " (
+          [
+            (getExe subtitle-scheduler)
+            "--state-file /var/lib/nixarr-subtitle-scheduler/state.json"
+            "--queries-per-provider ${toString cfg.queriesPerProvider}"
+            "--budget-window-secs ${toString cfg.budgetWindowSecs}"
+            "--batch-size ${toString cfg.batchSize}"
+            "--pause-secs ${toString cfg.pauseSecs}"
+            "--retry-after-secs ${toString (cfg.retryAfterDays * 24 * 3600)}"
+            "--off-peak ${cfg.offPeakStart}-${cfg.offPeakEnd}"
+          ]
+          ++ mapAttrsToList (provider: budget: "--provider-budget ${provider}=${toString budget}") cfg.providerBudgets
+        );
+      };
+    };
+
+    systemd.timers.nixarr-subtitle-scheduler = {
+      wantedBy = ["timers.target"];
+      timerConfig.OnCalendar = "*-*-* ${cfg.offPeakStart}:00";
+    };
+  };
+}
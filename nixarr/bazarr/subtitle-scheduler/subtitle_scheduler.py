@@ -0,0 +1,83 @@
+from pathlib import Path
+import argparse
+import logging
+
+from nixarr_py.subtitle_scheduler import SubtitleScheduler
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_budget(value: str) -> tuple[str, int]:
+    provider, sep, budget = value.partition("=")
+    if not sep or not budget.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"Expected <provider>=<queries>, got '{value}'"
+        )
+    return provider, int(budget)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Search for missing Bazarr subtitles in batches, within per-provider query budgets"
+    )
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        required=True,
+        help="Path to the file recording search progress between runs.",
+    )
+    parser.add_argument(
+        "--queries-per-provider",
+        type=int,
+        required=True,
+        help="Maximum number of queries per provider per budget window.",
+    )
+    parser.add_argument(
+        "--provider-budget",
+        type=parse_budget,
+        action="append",
+        default=[],
+        metavar="PROVIDER=QUERIES",
+        help="Budget for one provider, overriding --queries-per-provider; repeatable.",
+    )
+    parser.add_argument(
+        "--budget-window-secs",
+        type=float,
+        default=3600,
+        help="Length of the sliding budget window, in seconds.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10,
+        help="Number of searches between pauses and provider status checks.",
+    )
+    parser.add_argument(
+        "--pause-secs",
+        type=float,
+        default=60,
+        help="Pause between batches, in seconds.",
+    )
+    parser.add_argument(
+        "--retry-after-secs",
+        type=float,
+        default=3 * 24 * 3600,
+        help="Search a subtitle that wasn't found again only after this long.",
+    )
+    parser.add_argument(
+        "--off-peak",
+        help='Only search inside this daily window (local time), e.g. "01:00-06:00".',
+    )
+    args = parser.parse_args()
+    SubtitleScheduler(
+        state_file=args.state_file,
+        queries_per_provider=args.queries_per_provider,
+        provider_budgets=dict(args.provider_budget),
+        budget_window_secs=args.budget_window_secs,
+        batch_size=args.batch_size,
+        pause_secs=args.pause_secs,
+        retry_after_secs=args.retry_after_secs,
+        off_peak=args.off_peak,
+    ).run()
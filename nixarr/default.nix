@@ -20,6 +20,8 @@ in {
     ./lib
     ./komga
     ./lidarr
+    ./log-analyzer
+    ./maintenance-scheduler
     ./nixarr-command
     ./openssh
     ./plex
@@ -29,6 +31,7 @@ in {
     ./shelfmark
     ./recyclarr
     ./sabnzbd
+    ./search-scheduler
     ./sonarr
     ./transmission
     ./whisparr
@@ -10,6 +10,8 @@ with lib; let
   defaultPort = 8096;
   nixarr = config.nixarr;
 in {
+  imports = [./playback-probe ./refresh-webhook ./settings-sync ./transcode-planner ./transcode-telemetry];
+
   options.nixarr.jellyfin = {
     enable = mkOption {
       type = types.bool;
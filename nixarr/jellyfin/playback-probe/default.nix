@@ -0,0 +1,234 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    concatStringsSep
+    getExe
+    mapAttrs
+    mkIf
+    mkOption
+    optional
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writeJSON
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.jellyfin.playbackProbe;
+
+  playback-probe = writePython3Bin "nixarr-jellyfin-playback-probe" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./playback_probe.py);
+
+  profileModule = {
+    options = {
+      mode = mkOption {
+        type = types.enum ["direct" "hls"];
+        default = "hls";
+        description = ''
+          `direct` reads the file as-is (direct play); `hls` requests an HLS
+          stream with the limits below.
+        '';
+      };
+      videoCodec = mkOption {
+        type = types.str;
+        default = "h264";
+        description = "Video codec to transcode to.";
+      };
+      audioCodec = mkOption {
+        type = types.str;
+        default = "aac";
+        description = "Audio codec to transcode to.";
+      };
+      maxWidth = mkOption {
+        type = types.nullOr types.ints.positive;
+        default = null;
+        description = "Maximum video width.";
+      };
+      maxHeight = mkOption {
+        type = types.nullOr types.ints.positive;
+        default = null;
+        description = "Maximum video height.";
+      };
+      videoBitrate = mkOption {
+        type = types.nullOr types.ints.positive;
+        default = null;
+        example = 8000000;
+        description = "Maximum video bitrate, in bits per second.";
+      };
+      audioBitrate = mkOption {
+        type = types.ints.positive;
+        default = 192000;
+        description = "Audio bitrate, in bits per second.";
+      };
+      allowStreamCopy = mkOption {
+        type = types.bool;
+        default = false;
+        description = ''
+          Whether Jellyfin may copy streams that already fit instead of
+          transcoding them.
+        '';
+      };
+    };
+  };
+in {
+  options.nixarr.jellyfin.playbackProbe = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to periodically measure how long playback of test items
+        takes to start: the `PlaybackInfo` request, the time to the first
+        byte of the stream, the time until the first segment is downloaded,
+        and whether the following segments are transcoded faster than
+        realtime.
+
+        Results are kept with the Jellyfin version and hardware acceleration
+        type; run `nixarr-jellyfin-playback-probe report` as root to compare
+        them. With [`nixarr.exporters.enable`](#nixarr.exporters.enable), the
+        latest results are exported as Prometheus metrics too.
+
+        Requires [`nixarr.jellyfin.api.enable`](#nixarr.jellyfin.api.enable).
+      '';
+    };
+
+    items = mkOption {
+      type = types.listOf (types.submodule {
+        options = {
+          item = mkOption {
+            type = types.str;
+            example = "Big Buck Bunny";
+            description = "The test item's name or ID.";
+          };
+          profiles = mkOption {
+            type = types.listOf types.str;
+            default = ["direct" "1080p-transcode"];
+            description = ''
+              Profiles to probe the item with: `direct`, `1080p-transcode`,
+              `4k-hdr-tonemap` (for 4K HDR items; tone-mapped to 1080p SDR),
+              or names from
+              [`profiles`](#nixarr.jellyfin.playbackProbe.profiles).
+            '';
+          };
+        };
+      });
+      default = [];
+      example = [
+        {item = "Big Buck Bunny";}
+        {
+          item = "Cosmos Laundromat (4K HDR)";
+          profiles = ["4k-hdr-tonemap"];
+        }
+      ];
+      description = "The test items to play.";
+    };
+
+    profiles = mkOption {
+      type = types.attrsOf (types.submodule profileModule);
+      default = {};
+      example = {
+        "720p-hevc" = {
+          videoCodec = "hevc";
+          maxHeight = 720;
+          videoBitrate = 3000000;
+        };
+      };
+      description = "Further profiles, added to (or replacing) the built-in ones.";
+    };
+
+    segments = mkOption {
+      type = types.ints.positive;
+      default = 5;
+      description = ''
+        Number of segments (or segment-sized chunks for direct play) to
+        download per probe.
+      '';
+    };
+
+    interval = mkOption {
+      type = types.str;
+      default = "hourly";
+      description = "How often to probe, as a systemd calendar expression.";
+    };
+
+    retentionDays = mkOption {
+      type = types.ints.positive;
+      default = 90;
+      description = "How long to keep probe results.";
+    };
+  };
+
+  config = mkIf (nixarr.enable && nixarr.jellyfin.enable && cfg.enable) {
+    assertions = [
+      {
+        assertion = nixarr.jellyfin.api.enable;
+        message = "nixarr.jellyfin.playbackProbe.enable requires nixarr.jellyfin.api.enable to be true";
+      }
+      {
+        assertion = cfg.items != [];
+        message = "nixarr.jellyfin.playbackProbe.enable requires at least one test item in nixarr.jellyfin.playbackProbe.items";
+      }
+    ];
+
+    environment.systemPackages = [playback-probe];
+
+    systemd.services.nixarr-jellyfin-playback-probe = {
+      description = "Measure Jellyfin playback start latency";
+      after = ["jellyfin-api.service"];
+      wants = ["jellyfin-api.service"];
+      serviceConfig = {
+        Type = "oneshot";
+        DynamicUser = true;
+        StateDirectory = "nixarr-jellyfin-playback-probe";
+        SupplementaryGroups =
+          ["jellyfin-api"]
+          ++ optional nixarr.exporters.enable "nixarr-metrics";
+        ExecStart = let
+          config-file = writeJSON "jellyfin-playback-probe.json" {
+            inherit (cfg) items segments;
+            profiles =
+              mapAttrs (_: profile: {
+                inherit (profile) mode;
+                video_codec = profile.videoCodec;
+                audio_codec = profile.audioCodec;
+                max_width = profile.maxWidth;
+                max_height = profile.maxHeight;
+                video_bitrate = profile.videoBitrate;
+                audio_bitrate = profile.audioBitrate;
+                allow_stream_copy = profile.allowStreamCopy;
+              })
+              cfg.profiles;
+          };
+        in
+          concatStringsSep " " (
+            [
+              (getExe playback-probe)
+              "--store /var/lib/nixarr-jellyfin-playback-probe/results.jsonl"
+              "run"
+              "--config-file ${config-file}"
+              "--retention-days ${toString cfg.retentionDays}"
+            ]
+            ++ optional nixarr.exporters.enable
+            "--metrics-file ${nixarr.exporters.textfileDir}/jellyfin-playback-probe.prom"
+          );
+      };
+    };
+
+    systemd.timers.nixarr-jellyfin-playback-probe = {
+      wantedBy = ["timers.target"];
+      timerConfig.OnCalendar = cfg.interval;
+    };
+  };
+}
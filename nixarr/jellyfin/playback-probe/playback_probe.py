@@ -0,0 +1,144 @@
+from pathlib import Path
+from typing import Literal
+import argparse
+import logging
+import sys
+
+import pydantic
+
+from nixarr_py.jellyfin_playback_probe import (
+    PROFILES,
+    PlaybackProbe,
+    ProbeProfile,
+    ResultStore,
+    format_comparison,
+    format_prometheus,
+)
+from nixarr_py.utils import write_prometheus
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+class ProfileConfig(pydantic.BaseModel):
+    mode: Literal["direct", "hls"] = "hls"
+    video_codec: str = "h264"
+    audio_codec: str = "aac"
+    max_width: int | None = None
+    max_height: int | None = None
+    video_bitrate: int | None = None
+    audio_bitrate: int = 192_000
+    allow_stream_copy: bool = False
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+
+class TestItem(pydantic.BaseModel):
+    item: str
+    profiles: list[str]
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+
+class ProbeConfig(pydantic.BaseModel):
+    items: list[TestItem]
+    # Added to (or replacing) the built-in profiles.
+    profiles: dict[str, ProfileConfig] = {}
+    segments: int = 5
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+
+def run(store: ResultStore, args: argparse.Namespace) -> int:
+    config = ProbeConfig.model_validate_json(args.config_file.read_text())
+    profiles = dict(PROFILES)
+    for name, profile in config.profiles.items():
+        profiles[name] = ProbeProfile(name=name, **profile.model_dump())
+    unknown = {
+        name for item in config.items for name in item.profiles if name not in profiles
+    }
+    if unknown:
+        logger.error(f"Unknown profiles: {', '.join(sorted(unknown))}")
+        return 1
+
+    results = []
+    with PlaybackProbe(segments=config.segments) as probe:
+        for item in config.items:
+            for name in item.profiles:
+                result = probe.run(item.item, profiles[name])
+                store.append(result)
+                results.append(result)
+                if result.error is None:
+                    logger.info(
+                        f"{result.item_name} ({name}): first segment after "
+                        f"{result.first_segment_secs or 0:.2f}s, "
+                        f"{result.realtime_ratio or 0:.1f}x realtime"
+                    )
+    pruned = store.prune(args.retention_days)
+    if pruned:
+        logger.info(f"Pruned {pruned} results older than {args.retention_days} days")
+    if args.metrics_file is not None:
+        # Every configured item and profile was just probed, so this run's
+        # results are the latest ones.
+        write_prometheus(format_prometheus(results), args.metrics_file)
+    return 1 if any(result.error is not None for result in results) else 0
+
+
+def report(store: ResultStore, args: argparse.Namespace) -> int:
+    results = store.load()
+    first = max(len(results) - args.last, 0)
+    results = results[first:]
+    if not results:
+        logger.info(f"No probe results in {store.path}")
+        return 0
+    print(format_comparison(results))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure how long Jellyfin playback takes to start, and compare across settings and versions"
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=Path("/var/lib/nixarr-jellyfin-playback-probe/results.jsonl"),
+        help="JSON lines file to record probe results in.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Probe the configured test items.")
+    run_parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to a JSON file matching the ProbeConfig schema.",
+    )
+    run_parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Write the latest results in the Prometheus text format to this file.",
+    )
+    run_parser.add_argument(
+        "--retention-days",
+        type=float,
+        default=90,
+        help="Delete results older than this many days.",
+    )
+    run_parser.set_defaults(func=run)
+
+    report_parser = subparsers.add_parser(
+        "report",
+        help="Show median results per item, profile, Jellyfin version and hardware acceleration.",
+    )
+    report_parser.add_argument(
+        "--last",
+        type=int,
+        default=1000,
+        help="Only include this many of the most recent results.",
+    )
+    report_parser.set_defaults(func=report)
+
+    args = parser.parse_args()
+    sys.exit(args.func(ResultStore(args.store), args))
@@ -0,0 +1,102 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    getExe
+    mkIf
+    mkOption
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.jellyfin.refreshWebhook;
+
+  refresh-webhook = writePython3Bin "nixarr-jellyfin-refresh-webhook" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./refresh_webhook.py);
+in {
+  options.nixarr.jellyfin.refreshWebhook = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to run a webhook receiver that refreshes only the affected
+        folders in Jellyfin when Sonarr, Radarr or Lidarr import or rename
+        files. Events are coalesced over a short window, so a burst of imports
+        results in a single, deduplicated refresh.
+
+        To use it, add a "Webhook" connection in each *Arr with the "On File
+        Import", "On File Upgrade" and "On Rename" triggers, pointing at
+        `http://127.0.0.1:<port>/`. Counters, including how many refreshes
+        were saved by deduplication, are served in Prometheus format at
+        `http://127.0.0.1:<port>/metrics`.
+
+        Requires [`nixarr.jellyfin.api.enable`](#nixarr.jellyfin.api.enable).
+      '';
+    };
+
+    port = mkOption {
+      type = types.port;
+      default = 9097;
+      description = "Port for the webhook receiver to listen on, on localhost.";
+    };
+
+    debounceSecs = mkOption {
+      type = types.ints.positive;
+      default = 30;
+      description = ''
+        Refresh once no new events have arrived for this many seconds.
+      '';
+    };
+
+    maxDelaySecs = mkOption {
+      type = types.ints.positive;
+      default = 300;
+      description = ''
+        Refresh at most this many seconds after the first event of a burst,
+        even if events keep arriving.
+      '';
+    };
+  };
+
+  config = mkIf (nixarr.enable && nixarr.jellyfin.enable && cfg.enable) {
+    assertions = [
+      {
+        assertion = nixarr.jellyfin.api.enable;
+        message = "nixarr.jellyfin.refreshWebhook.enable requires nixarr.jellyfin.api.enable to be true";
+      }
+    ];
+
+    systemd.services.jellyfin-refresh-webhook = {
+      description = "Refresh Jellyfin folders on *Arr import webhooks";
+      after = ["jellyfin-api.service"];
+      wants = ["jellyfin-api.service"];
+      wantedBy = ["multi-user.target"];
+      serviceConfig = {
+        Type = "simple";
+        DynamicUser = true;
+        SupplementaryGroups = ["jellyfin-api"];
+        Restart = "on-failure";
+        ExecStart = ''
+          ${getExe refresh-webhook} \
+            --port ${toString cfg.port} \
+            --debounce-secs ${toString cfg.debounceSecs} \
+            --max-delay-secs ${toString cfg.maxDelaySecs}
+        '';
+      };
+    };
+  };
+}
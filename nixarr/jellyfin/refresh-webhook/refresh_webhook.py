@@ -0,0 +1,46 @@
+import argparse
+import logging
+
+from nixarr_py.arr_webhooks import RefreshCoalescer, make_server
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Receive *arr webhooks and refresh only the affected folders in Jellyfin"
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        required=True,
+        help="Port to listen on.",
+    )
+    parser.add_argument(
+        "--debounce-secs",
+        type=float,
+        default=30,
+        help="Refresh once no new events have arrived for this many seconds.",
+    )
+    parser.add_argument(
+        "--max-delay-secs",
+        type=float,
+        default=300,
+        help="Refresh at most this many seconds after the first event of a burst, even if events keep arriving.",
+    )
+    args = parser.parse_args()
+
+    coalescer = RefreshCoalescer(
+        debounce_secs=args.debounce_secs, max_delay_secs=args.max_delay_secs
+    )
+    coalescer.start()
+    server = make_server(args.host, args.port, coalescer)
+    logger.info(f"Listening for *arr webhooks on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,238 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    filterAttrs
+    getExe
+    mkIf
+    mkOption
+    recursiveUpdate
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writeJSON
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.jellyfin.settings-sync;
+
+  sync-settings = writePython3Bin "nixarr-sync-jellyfin-settings" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./sync_settings.py);
+
+  # Unset (null) options are left as they are in Jellyfin.
+  setOnly = filterAttrs (_: value: value != null && value != {});
+
+  nullOrOption = type: description:
+    mkOption {
+      type = types.nullOr type;
+      default = null;
+      inherit description;
+    };
+
+  freeformOption = description:
+    mkOption {
+      type = types.attrsOf types.anything;
+      default = {};
+      inherit description;
+    };
+
+  encoding = recursiveUpdate (setOnly {
+    HardwareAccelerationType = cfg.hardwareAcceleration;
+    VaapiDevice = cfg.vaapiDevice;
+    EncodingThreadCount = cfg.encoderThreads;
+    EnableThrottling = cfg.throttling.enable;
+    ThrottleDelaySeconds = cfg.throttling.delaySecs;
+    EnableSegmentDeletion = cfg.segmentDeletion.enable;
+    SegmentKeepSeconds = cfg.segmentDeletion.keepSecs;
+  }) cfg.extraEncodingOptions;
+
+  server = recursiveUpdate (setOnly {
+    LibraryScanFanoutConcurrency = cfg.parallelScanTasks;
+    TrickplayOptions = setOnly {
+      EnableHwAcceleration = cfg.trickplay.hardwareAcceleration;
+      ProcessThreads = cfg.trickplay.threads;
+    };
+  }) cfg.extraServerConfiguration;
+
+  library-options = recursiveUpdate (setOnly {
+    EnableRealtimeMonitor = cfg.realtimeMonitoring;
+    EnableTrickplayImageExtraction = cfg.trickplay.extract;
+    ExtractTrickplayImagesDuringLibraryScan = cfg.trickplay.duringScan;
+    EnableChapterImageExtraction = cfg.chapterImages.extract;
+    ExtractChapterImagesDuringLibraryScan = cfg.chapterImages.duringScan;
+  }) cfg.extraLibraryOptions;
+in {
+  options.nixarr.jellyfin.settings-sync = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to apply the settings below to Jellyfin's encoding, server
+        and library options.
+
+        Settings left unset (`null`) are left as they are, so they can still
+        be changed in Jellyfin's dashboard. The sync reads each configuration
+        object once and only writes those where a set value differs.
+
+        Requires [`nixarr.jellyfin.api.enable`](#nixarr.jellyfin.api.enable).
+      '';
+    };
+
+    hardwareAcceleration =
+      nullOrOption
+      (types.enum ["none" "amf" "qsv" "nvenc" "v4l2m2m" "vaapi" "videotoolbox" "rkmpp"])
+      ''
+        Hardware acceleration used for transcoding. The device has to be
+        accessible to the `jellyfin` user, e.g. through the `render` and
+        `video` groups.
+      '';
+
+    vaapiDevice = nullOrOption types.str ''
+      The VA-API device, e.g. `/dev/dri/renderD128`. Also used for QSV.
+    '';
+
+    encoderThreads = nullOrOption types.int ''
+      Number of ffmpeg threads per transcode: `-1` for automatic, `0` for
+      as many as there are cores. Lower values leave room for other
+      services while software transcoding.
+    '';
+
+    throttling = {
+      enable = nullOrOption types.bool ''
+        Whether to pause transcodes that are far enough ahead of playback,
+        saving CPU and GPU time.
+      '';
+      delaySecs = nullOrOption types.ints.positive ''
+        How far ahead of playback, in seconds, a transcode is throttled.
+      '';
+    };
+
+    segmentDeletion = {
+      enable = nullOrOption types.bool ''
+        Whether to delete transcoded segments once the client has downloaded
+        them, keeping the transcode directory small.
+      '';
+      keepSecs = nullOrOption types.ints.positive ''
+        How long, in seconds, to keep segments after the client downloaded
+        them.
+      '';
+    };
+
+    trickplay = {
+      extract = nullOrOption types.bool ''
+        Whether to generate trickplay (seek preview) images, in every library.
+      '';
+      duringScan = nullOrOption types.bool ''
+        Whether to generate trickplay images while scanning libraries, rather
+        than only in the scheduled task. Makes scans of new media much slower.
+      '';
+      hardwareAcceleration = nullOrOption types.bool ''
+        Whether to decode with hardware acceleration while generating
+        trickplay images.
+      '';
+      threads = nullOrOption types.ints.unsigned ''
+        Number of ffmpeg threads used to generate trickplay images; `0` for
+        automatic.
+      '';
+    };
+
+    chapterImages = {
+      extract = nullOrOption types.bool ''
+        Whether to extract chapter images, in every library.
+      '';
+      duringScan = nullOrOption types.bool ''
+        Whether to extract chapter images while scanning libraries, rather
+        than only in the scheduled task. Makes scans of new media much slower.
+      '';
+    };
+
+    realtimeMonitoring = nullOrOption types.bool ''
+      Whether to watch every library's folders for changes. Not needed when
+      [`nixarr.jellyfin.refreshWebhook`](#nixarr.jellyfin.refreshWebhook.enable)
+      refreshes folders on imports, and costly on large or network mounts.
+    '';
+
+    parallelScanTasks = nullOrOption types.ints.unsigned ''
+      Maximum number of parallel tasks during library scans; `0` for
+      automatic (the number of cores).
+    '';
+
+    extraEncodingOptions = freeformOption ''
+      Further encoding options, by the property names of Jellyfin's
+      `/System/Configuration/encoding` object, e.g. `{ EnableTonemapping =
+      true; }`. Take precedence over the options above.
+    '';
+
+    extraServerConfiguration = freeformOption ''
+      Further server options, by the property names of Jellyfin's
+      `/System/Configuration` object, e.g. `{ LibraryMonitorDelay = 120; }`.
+      Take precedence over the options above.
+    '';
+
+    extraLibraryOptions = freeformOption ''
+      Further options applied to every library, by the property names of
+      Jellyfin's `LibraryOptions`, e.g. `{ SaveTrickplayWithMedia = true; }`.
+      Take precedence over the options above.
+    '';
+
+    libraries = mkOption {
+      type = types.attrsOf (types.attrsOf types.anything);
+      default = {};
+      example = lib.literalExpression ''
+        {
+          "Home Videos" = { EnableTrickplayImageExtraction = false; };
+        }
+      '';
+      description = ''
+        Per-library overrides of `LibraryOptions` properties, by library
+        name. Take precedence over the options for every library.
+      '';
+    };
+  };
+
+  config = mkIf (nixarr.enable && nixarr.jellyfin.enable && cfg.enable) {
+    assertions = [
+      {
+        assertion = nixarr.jellyfin.api.enable;
+        message = "nixarr.jellyfin.settings-sync.enable requires nixarr.jellyfin.api.enable to be true";
+      }
+    ];
+
+    systemd.services.jellyfin-sync-config = {
+      description = ''
+        Sync Jellyfin configuration (encoding, server and library options)
+      '';
+      after = ["jellyfin-api.service"];
+      wants = ["jellyfin-api.service"];
+      wantedBy = ["jellyfin.service"];
+      serviceConfig = {
+        Type = "oneshot";
+        DynamicUser = true;
+        SupplementaryGroups = ["jellyfin-api"];
+        RemainAfterExit = true;
+        ExecStart = let
+          config-file = writeJSON "jellyfin-sync-config.json" {
+            inherit encoding server;
+            library_options = library-options;
+            libraries = cfg.libraries;
+          };
+        in ''
+          ${getExe sync-settings} \
+            --config-file ${config-file}
+        '';
+      };
+    };
+  };
+}
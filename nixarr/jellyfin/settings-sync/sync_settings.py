@@ -0,0 +1,165 @@
+from typing import Any
+import argparse
+import pydantic
+import pathlib
+import logging
+import jellyfin
+from nixarr_py.jellyfin_helpers import api_key_client
+from nixarr_py.utils import api_request
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SettingsSyncConfig(pydantic.BaseModel):
+    # Each section maps Jellyfin's (PascalCase) property names to the values
+    # to set; properties that aren't listed are left as they are.
+    encoding: dict[str, Any] = {}
+    server: dict[str, Any] = {}
+    # Library options applied to every library, and per-library overrides by
+    # library name.
+    library_options: dict[str, Any] = {}
+    libraries: dict[str, dict[str, Any]] = {}
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+
+def changed_settings(
+    current: dict[str, Any], desired: dict[str, Any], section: str, prefix: str = ""
+) -> dict[str, tuple[Any, Any]]:
+    """
+    Returns the properties whose desired value differs from the current one,
+    as a map from their (dotted) path to the current and desired values.
+    Nested objects like `TrickplayOptions` are compared property by property.
+
+    Raises:
+        ValueError: If a desired property doesn't exist in Jellyfin, which
+            usually means it's misspelled.
+    """
+    changes: dict[str, tuple[Any, Any]] = {}
+    for key, value in desired.items():
+        path = f"{prefix}{key}"
+        if key not in current:
+            raise ValueError(
+                f"Unknown {section} property '{path}', expected one of: {', '.join(sorted(current))}"
+            )
+        if isinstance(value, dict) and isinstance(current[key], dict):
+            changes |= changed_settings(current[key], value, section, f"{path}.")
+        elif current[key] != value:
+            changes[path] = (current[key], value)
+    return changes
+
+
+def merge_settings(current: dict[str, Any], desired: dict[str, Any]) -> dict[str, Any]:
+    """Returns `current` with the desired properties applied."""
+    merged = dict(current)
+    for key, value in desired.items():
+        if isinstance(value, dict) and isinstance(current.get(key), dict):
+            merged[key] = merge_settings(current[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def log_changes(what: str, changes: dict[str, tuple[Any, Any]]) -> None:
+    for path, (old, new) in sorted(changes.items()):
+        logger.info(f"{what}: {path}: {old!r} -> {new!r}")
+
+
+def sync_section(
+    api_client: jellyfin.ApiClient, what: str, path: str, desired: dict[str, Any]
+) -> bool:
+    """
+    Syncs a configuration object that Jellyfin reads and writes as a whole at
+    `path`. Writes it back only if a desired property changed.
+
+    Returns:
+        bool: Whether the section was written.
+    """
+    if not desired:
+        return False
+    current = api_request(api_client, "GET", path)
+    changes = changed_settings(current, desired, what)
+    if not changes:
+        logger.info(f"{what}: up to date")
+        return False
+    log_changes(what, changes)
+    api_request(api_client, "POST", path, merge_settings(current, desired))
+    return True
+
+
+def sync_libraries(
+    api_client: jellyfin.ApiClient,
+    library_options: dict[str, Any],
+    libraries: dict[str, dict[str, Any]],
+) -> int:
+    """
+    Syncs the options of every library. Returns the number of libraries
+    written.
+    """
+    if not library_options and not libraries:
+        return 0
+    # One request returns every library with its options.
+    folders = api_request(api_client, "GET", "/Library/VirtualFolders") or []
+    names = {folder["Name"] for folder in folders}
+    unknown = sorted(set(libraries) - names)
+    if unknown:
+        raise ValueError(
+            f"Unknown libraries: {', '.join(unknown)}, expected one of: {', '.join(sorted(names))}"
+        )
+    written = 0
+    for folder in folders:
+        name = folder["Name"]
+        desired = merge_settings(library_options, libraries.get(name, {}))
+        if not desired:
+            continue
+        current = folder.get("LibraryOptions") or {}
+        changes = changed_settings(current, desired, f"library '{name}'")
+        if not changes:
+            logger.info(f"library '{name}': up to date")
+            continue
+        log_changes(f"library '{name}'", changes)
+        api_request(
+            api_client,
+            "POST",
+            "/Library/VirtualFolders/LibraryOptions",
+            {
+                "Id": folder["ItemId"],
+                "LibraryOptions": merge_settings(current, desired),
+            },
+        )
+        written += 1
+    return written
+
+
+def main(config: SettingsSyncConfig, api_client: jellyfin.ApiClient) -> None:
+    # The configuration objects go through raw JSON rather than the generated
+    # models, so properties the models don't know about survive the write.
+    written = [
+        sync_section(
+            api_client, "encoding", "/System/Configuration/encoding", config.encoding
+        ),
+        sync_section(api_client, "server", "/System/Configuration", config.server),
+    ].count(True)
+    written += sync_libraries(api_client, config.library_options, config.libraries)
+    logger.info(f"Wrote {written} Jellyfin configuration object(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sync user-provided Nixarr settings to Jellyfin"
+    )
+    parser.add_argument(
+        "--config-file",
+        type=pathlib.Path,
+        required=True,
+        help="Path to a config file containing the settings to sync. Must be a JSON file matching the SettingsSyncConfig schema.",
+    )
+    args = parser.parse_args()
+    with open(args.config_file) as f:
+        config_json = f.read()
+    config = SettingsSyncConfig.model_validate_json(config_json)
+    # Every run compares the live settings with the desired ones and only
+    # writes what differs, so changes made in the dashboard are reverted too.
+    main(config, api_key_client())
@@ -0,0 +1,126 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    mapAttrsToList
+    mkOption
+    types
+    ;
+
+  cfg = config.nixarr.jellyfin.transcodePlanner;
+
+  clientProfileModule = {
+    options = {
+      clients = mkOption {
+        type = types.listOf types.str;
+        default = [];
+        example = ["Jellyfin Android TV" "Jellyfin Roku"];
+        description = ''
+          The client names Jellyfin reports for these clients' sessions, as
+          shown on the dashboard. Used to rank items by how often these
+          clients played them.
+        '';
+      };
+      containers = mkOption {
+        type = types.listOf types.str;
+        default = [];
+        example = ["mp4" "mkv"];
+        description = "Containers the clients can direct play; empty allows any.";
+      };
+      videoCodecs = mkOption {
+        type = types.listOf types.str;
+        default = [];
+        example = ["h264" "hevc"];
+        description = "Video codecs the clients can direct play; empty allows any.";
+      };
+      audioCodecs = mkOption {
+        type = types.listOf types.str;
+        default = [];
+        example = ["aac" "ac3" "eac3"];
+        description = "Audio codecs the clients can direct play; empty allows any.";
+      };
+      videoRangeTypes = mkOption {
+        type = types.listOf types.str;
+        default = [];
+        example = ["SDR" "HDR10"];
+        description = ''
+          Video range types (as Jellyfin names them, e.g. `SDR`, `HDR10`,
+          `DOVI`) the clients can direct play; empty allows any.
+        '';
+      };
+      maxHeight = mkOption {
+        type = types.nullOr types.ints.positive;
+        default = null;
+        example = 1080;
+        description = "The highest video resolution, in lines, the clients can direct play.";
+      };
+      maxBitrateMbps = mkOption {
+        type = types.nullOr (types.either types.ints.positive types.float);
+        default = null;
+        example = 40;
+        description = "The highest bitrate, in Mb/s, the clients can direct play.";
+      };
+    };
+  };
+in {
+  options.nixarr.jellyfin.transcodePlanner = {
+    clientProfiles = mkOption {
+      type = types.attrsOf (types.submodule clientProfileModule);
+      default = {};
+      example = {
+        living-room-tv = {
+          clients = ["Jellyfin Android TV"];
+          videoCodecs = ["h264" "hevc"];
+          audioCodecs = ["aac" "ac3" "eac3"];
+          videoRangeTypes = ["SDR" "HDR10"];
+          maxHeight = 2160;
+        };
+        browsers = {
+          clients = ["Jellyfin Web"];
+          containers = ["mp4" "webm"];
+          videoCodecs = ["h264"];
+          audioCodecs = ["aac" "opus"];
+          videoRangeTypes = ["SDR"];
+        };
+      };
+      description = ''
+        What your clients can direct play, by groups of clients.
+
+        Run `nixarr plan-transcodes` as root to list the items some group
+        can't direct play, and would therefore be transcoded for it, most
+        played first. With
+        [`nixarr.jellyfin.transcodeTelemetry.enable`](#nixarr.jellyfin.transcodetelemetry.enable),
+        items are ranked by their plays on affected clients. See
+        `nixarr plan-transcodes --help` for writing the queue to a file or
+        tagging the movies and series in Radarr and Sonarr.
+
+        Requires [`nixarr.jellyfin.api.enable`](#nixarr.jellyfin.api.enable).
+      '';
+    };
+
+    profilesFile = mkOption {
+      type = types.path;
+      default = pkgs.writers.writeJSON "jellyfin-client-profiles.json" (
+        mapAttrsToList (name: profile: {
+          inherit name;
+          inherit (profile) clients containers;
+          video_codecs = profile.videoCodecs;
+          audio_codecs = profile.audioCodecs;
+          video_range_types = profile.videoRangeTypes;
+          max_height = profile.maxHeight;
+          max_bitrate_mbps = profile.maxBitrateMbps;
+        })
+        cfg.clientProfiles
+      );
+      readOnly = true;
+      description = ''
+        The client profiles as passed to `nixarr plan-transcodes`. Derived
+        from other options.
+      '';
+    };
+  };
+}
@@ -0,0 +1,105 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    getExe
+    mkIf
+    mkOption
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.jellyfin.transcodeTelemetry;
+
+  transcode-telemetry = writePython3Bin "nixarr-jellyfin-transcode-telemetry" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./transcode_telemetry.py);
+in {
+  options.nixarr.jellyfin.transcodeTelemetry = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to record how Jellyfin plays back media: the play method,
+        transcode reasons, source and target codecs, bitrates, hardware
+        acceleration and transcode speed of every playback, by client,
+        user and library.
+
+        Run `nixarr transcode-report` as root to see how often playback is
+        transcoded, why, and whether transcoding keeps up.
+
+        Requires [`nixarr.jellyfin.api.enable`](#nixarr.jellyfin.api.enable).
+      '';
+    };
+
+    intervalSecs = mkOption {
+      type = types.ints.positive;
+      default = 10;
+      description = ''
+        Time between polls of Jellyfin's active sessions. Playbacks shorter
+        than this may be missed.
+      '';
+    };
+
+    retentionDays = mkOption {
+      type = types.ints.positive;
+      default = 90;
+      description = ''
+        How long to keep the transcode speed and bitrate samples taken during
+        playback. The per-playback records are kept.
+      '';
+    };
+
+    dbPath = mkOption {
+      type = types.path;
+      default = "/var/lib/jellyfin-transcode-telemetry/telemetry.db";
+      readOnly = true;
+      description = ''
+        The SQLite database the telemetry is recorded in, as passed to
+        `nixarr transcode-report` and `nixarr plan-transcodes`.
+      '';
+    };
+  };
+
+  config = mkIf (nixarr.enable && nixarr.jellyfin.enable && cfg.enable) {
+    assertions = [
+      {
+        assertion = nixarr.jellyfin.api.enable;
+        message = "nixarr.jellyfin.transcodeTelemetry.enable requires nixarr.jellyfin.api.enable to be true";
+      }
+    ];
+
+    systemd.services.jellyfin-transcode-telemetry = {
+      description = "Record Jellyfin playback and transcode telemetry";
+      after = ["jellyfin-api.service"];
+      wants = ["jellyfin-api.service"];
+      wantedBy = ["multi-user.target"];
+      serviceConfig = {
+        Type = "simple";
+        DynamicUser = true;
+        StateDirectory = "jellyfin-transcode-telemetry";
+        SupplementaryGroups = ["jellyfin-api"];
+        Restart = "on-failure";
+        ExecStart = ''
+          ${getExe transcode-telemetry} \
+            --db ${cfg.dbPath} \
+            --interval-secs ${toString cfg.intervalSecs} \
+            --retention-days ${toString cfg.retentionDays}
+        '';
+      };
+    };
+  };
+}
@@ -0,0 +1,42 @@
+from pathlib import Path
+import argparse
+import logging
+
+from nixarr_py.jellyfin_transcode_telemetry import TelemetryStore, TranscodeCollector
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Record how Jellyfin plays back media: play method, transcode reasons, codecs, bitrates, hardware acceleration and transcode speed"
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        required=True,
+        help="Path to the SQLite database to record playbacks in.",
+    )
+    parser.add_argument(
+        "--interval-secs",
+        type=float,
+        default=10,
+        help="Time between polls of Jellyfin's sessions.",
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        default=90,
+        help="How long to keep per-poll samples. Playbacks themselves are kept.",
+    )
+    args = parser.parse_args()
+
+    store = TelemetryStore(args.db)
+    logger.info(f"Recording Jellyfin playbacks every {args.interval_secs:g}s")
+    TranscodeCollector(
+        store,
+        interval_secs=args.interval_secs,
+        retention_days=args.retention_days,
+    ).run()
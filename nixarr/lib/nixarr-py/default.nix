@@ -4,7 +4,7 @@
   ...
 }: let
   nixarr-py = let
-    inherit (pkgs.python3Packages) buildPythonPackage setuptools;
+    inherit (pkgs.python3Packages) buildPythonPackage pytestCheckHook setuptools;
   in
     buildPythonPackage {
       pname = "nixarr";
@@ -14,6 +14,7 @@
       src = ./.;
       build-system = [setuptools];
       dependencies = pkgs.callPackage ./python-deps.nix {inherit jellyfin;};
+      nativeCheckInputs = [pytestCheckHook];
     };
 in
   nixarr-py
@@ -6,10 +6,11 @@
 }: let
   inherit
     (lib)
+    concatStringsSep
     getExe
     mkIf
     mkOption
-    optionalString
+    optional
     types
     ;
 
@@ -26,34 +27,40 @@
   cfg = jellyfin.api;
   nixarr-py = nixarr.nixarr-py.package;
 
+  set-up-steps = concatStringsSep ", " (
+    optional cfg.autoCreateAdminPasswordFile "ensure_admin_password_file"
+    ++ optional cfg.autoCreateDeviceUuidFile "ensure_device_uuid_file"
+    ++ optional cfg.autoCreateAdminUserAndCompleteWizard "ensure_admin_user_created_and_wizard_completed"
+    ++ optional cfg.autoCreateApiKeyAndFile "ensure_api_key_and_file"
+  );
+
   set-up-api = getExe (writePython3Bin "nixarr-set-up-jellyfin-api" {
       libraries = [nixarr-py];
       flakeIgnore = [
         "E501" # Line too long
         "F401" # Imported but unused
-        "W391" # Blank line at end of file
       ];
     } ''
+      import argparse
       from nixarr_py.jellyfin_helpers import (
           ensure_admin_password_file,
           ensure_device_uuid_file,
           ensure_admin_user_created_and_wizard_completed,
           ensure_api_key_and_file,
       )
+      from nixarr_py.tracing import add_tracing_arguments, span, traced_run
+
 
+      parser = argparse.ArgumentParser(
+          description="Set up the Jellyfin admin user and API key used by nixarr-py"
+      )
+      add_tracing_arguments(parser)
+      args = parser.parse_args()
 
-      ${optionalString cfg.autoCreateAdminPasswordFile ''
-        ensure_admin_password_file()
-      ''}
-      ${optionalString cfg.autoCreateDeviceUuidFile ''
-        ensure_device_uuid_file()
-      ''}
-      ${optionalString cfg.autoCreateAdminUserAndCompleteWizard ''
-        ensure_admin_user_created_and_wizard_completed()
-      ''}
-      ${optionalString cfg.autoCreateApiKeyAndFile ''
-        ensure_api_key_and_file()
-      ''}
+      with traced_run(args, name="set up Jellyfin API"):
+          for step in [${set-up-steps}]:
+              with span(step.__name__, category="setup"):
+                  step()
     '');
 in {
   options = {
@@ -36,8 +36,23 @@
     jellyfin = optionalAttrs (cfg.jellyfin.enable && cfg.jellyfin.api.enable) {
       jellyfin = cfg.jellyfin.api.nixarr-py-config;
     };
+    bazarr = optionalAttrs cfg.bazarr.enable {
+      bazarr = {
+        base_url = "http://127.0.0.1:${toString cfg.bazarr.port}";
+        api_key_file = "${cfg.stateDir}/secrets/bazarr.api-key";
+      };
+    };
+    transmission = optionalAttrs cfg.transmission.enable {
+      transmission = {
+        # nginx proxies the RPC port to localhost when Transmission is in the
+        # VPN.
+        rpc_url = "http://localhost:${toString cfg.transmission.uiPort}/transmission/rpc";
+        settings_file = "${cfg.transmission.stateDir}/.config/transmission-daemon/settings.json";
+        credentials_file = cfg.transmission.credentialsFile;
+      };
+    };
   in
-    arrs // jellyfin;
+    arrs // bazarr // jellyfin // transmission;
 
   nixarr-py-json = writeJSON "nixarr-py.json" nixarr-py-config;
 
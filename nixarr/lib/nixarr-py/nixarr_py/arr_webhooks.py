@@ -0,0 +1,296 @@
+"""
+Webhook receiver that turns Sonarr, Radarr and Lidarr import events into
+targeted Jellyfin library refreshes.
+
+Instead of relying on Jellyfin's realtime monitor or a full library scan, the
+*arrs are configured with a "Webhook" connection pointing at this receiver.
+Download, Upgrade and Rename events are mapped to the folders they touched,
+coalesced over a short debounce window, deduplicated, and reported to
+Jellyfin's `/Library/Media/Updated` endpoint so it only rescans those folders.
+
+Example usage:
+    >>> from nixarr_py.arr_webhooks import RefreshCoalescer, make_server
+    >>>
+    >>> coalescer = RefreshCoalescer(debounce_secs=30, max_delay_secs=300)
+    >>> coalescer.start()
+    >>> make_server("127.0.0.1", 9097, coalescer).serve_forever()
+"""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import PurePosixPath
+from typing import Any, Callable, Iterable
+import json
+import logging
+import threading
+import time
+
+import jellyfin
+
+from nixarr_py.clients import jellyfin_client
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound of the backoff between retries of a failed refresh.
+MAX_RETRY_DELAY_SECS = 600
+
+
+def affected_folders(payload: dict[str, Any]) -> set[str]:
+    """Get the library folders touched by an *arr webhook event.
+
+    Download events (including upgrades, which Sonarr and Radarr send as
+    Download events with `isUpgrade` set) map to the folders of the imported
+    files. Rename events map to the series, movie or artist folder, since
+    renames can move files between subfolders. Other events map to nothing.
+
+    Args:
+        payload: The decoded JSON body of a Sonarr, Radarr or Lidarr webhook.
+
+    Returns:
+        set[str]: Absolute folder paths to refresh in Jellyfin.
+    """
+    event_type = payload.get("eventType")
+    media = payload.get("series") or payload.get("movie") or payload.get("artist")
+    if media is None:
+        return set()
+    media_folder = media.get("path") or media.get("folderPath")
+
+    if event_type == "Rename":
+        return {media_folder} if media_folder else set()
+    if event_type != "Download":
+        return set()
+
+    files = [payload.get("episodeFile"), payload.get("movieFile")]
+    files += payload.get("trackFiles") or []
+    folders: set[str] = set()
+    for file in files:
+        if not file:
+            continue
+        if file.get("path"):
+            folders.add(str(PurePosixPath(file["path"]).parent))
+        elif media_folder and file.get("relativePath"):
+            relative_parent = PurePosixPath(file["relativePath"]).parent
+            folders.add(str(PurePosixPath(media_folder) / relative_parent))
+    if not folders and media_folder:
+        folders.add(media_folder)
+    return folders
+
+
+def collapse_folders(folders: Iterable[str]) -> list[str]:
+    """Drop folders whose ancestor is also in `folders`, since refreshing the
+    ancestor already covers them.
+
+    Returns:
+        list[str]: The remaining folders, sorted.
+    """
+    kept: list[str] = []
+    for folder in sorted(set(folders), key=lambda f: PurePosixPath(f).parts):
+        path = PurePosixPath(folder)
+        if not any(path.is_relative_to(ancestor) for ancestor in kept):
+            kept.append(folder)
+    return sorted(kept)
+
+
+def refresh_jellyfin_folders(folders: list[str]) -> None:
+    """Tell Jellyfin that the given folders changed, so it rescans only them.
+
+    Args:
+        folders: Absolute folder paths, as seen by Jellyfin.
+    """
+    with jellyfin_client() as client:
+        jellyfin.LibraryApi(client).post_updated_media(
+            media_update_info_dto=jellyfin.MediaUpdateInfoDto(
+                updates=[
+                    jellyfin.MediaUpdateInfoPathDto(path=folder, update_type="Modified")
+                    for folder in folders
+                ]
+            )
+        )
+
+
+class RefreshCoalescer:
+    """Collects folders from webhook events and refreshes them in batches.
+
+    A batch is flushed once no new folders have arrived for `debounce_secs`,
+    or `max_delay_secs` after its first folder arrived, whichever is first.
+    If refreshing a batch fails (e.g. while Jellyfin restarts), its folders
+    are queued again and retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        debounce_secs: float,
+        max_delay_secs: float,
+        refresh: Callable[[list[str]], None] = refresh_jellyfin_folders,
+    ) -> None:
+        self.debounce_secs = debounce_secs
+        self.max_delay_secs = max_delay_secs
+        self._refresh = refresh
+        self._cond = threading.Condition()
+        self._pending: set[str] = set()
+        self._first_added = 0.0
+        self._last_added = 0.0
+        self._retry_at = 0.0
+        self._consecutive_failures = 0
+
+        self.events: Counter[str] = Counter()
+        self.folders_received = 0
+        self.folders_refreshed = 0
+        self.refreshes_saved = 0
+        self.flushes = 0
+        self.refresh_failures = 0
+
+    def add_event(self, payload: dict[str, Any]) -> set[str]:
+        """Queue the folders affected by a webhook event for refreshing.
+
+        Returns:
+            set[str]: The folders the event affected.
+        """
+        event_type = str(payload.get("eventType"))
+        if event_type == "Download" and payload.get("isUpgrade"):
+            event_type = "Upgrade"
+        folders = affected_folders(payload)
+        with self._cond:
+            self.events[event_type] += 1
+            self.folders_received += len(folders)
+            if not folders:
+                return folders
+            now = time.monotonic()
+            if not self._pending:
+                self._first_added = now
+            self._last_added = now
+            self.refreshes_saved += len(folders & self._pending)
+            self._pending |= folders
+            self._cond.notify()
+        return folders
+
+    def start(self) -> threading.Thread:
+        """Start flushing batches on a background daemon thread."""
+        thread = threading.Thread(target=self._run, name="refresh-coalescer")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while True:
+                    deadline = max(
+                        min(
+                            self._last_added + self.debounce_secs,
+                            self._first_added + self.max_delay_secs,
+                        ),
+                        self._retry_at,
+                    )
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                pending, self._pending = self._pending, set()
+            self.flush(pending)
+
+    def flush(self, folders: set[str]) -> None:
+        """Refresh a batch of folders in Jellyfin right away."""
+        collapsed = collapse_folders(folders)
+        with self._cond:
+            self.refreshes_saved += len(folders) - len(collapsed)
+        try:
+            self._refresh(collapsed)
+        except Exception:
+            with self._cond:
+                self.refresh_failures += 1
+                self._consecutive_failures += 1
+                delay = min(
+                    max(self.debounce_secs, 1) * 2**self._consecutive_failures,
+                    MAX_RETRY_DELAY_SECS,
+                )
+                now = time.monotonic()
+                self._retry_at = now + delay
+                if not self._pending:
+                    self._first_added = now
+                    self._last_added = now
+                self._pending.update(collapsed)
+                self._cond.notify()
+            logger.exception(
+                f"Failed to refresh {len(collapsed)} folder(s); retrying in {delay:.0f}s"
+            )
+            return
+        with self._cond:
+            self._consecutive_failures = 0
+            self.flushes += 1
+            self.folders_refreshed += len(collapsed)
+            saved = self.refreshes_saved
+        logger.info(
+            f"Refreshed {len(collapsed)} folder(s) in Jellyfin "
+            f"({saved} refreshes saved so far): {', '.join(collapsed)}"
+        )
+
+    def metrics(self) -> str:
+        """Render the receiver's counters in Prometheus text format."""
+        prefix = "nixarr_jellyfin_refresh_webhook"
+        with self._cond:
+            lines = [
+                f"# TYPE {prefix}_events_total counter",
+                *(
+                    f'{prefix}_events_total{{event_type="{event_type}"}} {count}'
+                    for event_type, count in sorted(self.events.items())
+                ),
+                f"# TYPE {prefix}_folders_received_total counter",
+                f"{prefix}_folders_received_total {self.folders_received}",
+                f"# TYPE {prefix}_folders_refreshed_total counter",
+                f"{prefix}_folders_refreshed_total {self.folders_refreshed}",
+                f"# TYPE {prefix}_refreshes_saved_total counter",
+                f"{prefix}_refreshes_saved_total {self.refreshes_saved}",
+                f"# TYPE {prefix}_flushes_total counter",
+                f"{prefix}_flushes_total {self.flushes}",
+                f"# TYPE {prefix}_refresh_failures_total counter",
+                f"{prefix}_refresh_failures_total {self.refresh_failures}",
+                f"# TYPE {prefix}_pending_folders gauge",
+                f"{prefix}_pending_folders {len(self._pending)}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def make_server(
+    host: str, port: int, coalescer: RefreshCoalescer
+) -> ThreadingHTTPServer:
+    """Create an HTTP server that feeds *arr webhooks into `coalescer`.
+
+    Webhooks can be POSTed to any path. `GET /metrics` returns the
+    coalescer's counters in Prometheus text format.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length))
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                self.send_error(400, "Expected a JSON object")
+                return
+            folders = coalescer.add_event(payload)
+            logger.debug(f"{payload.get('eventType')} event affects {sorted(folders)}")
+            self.send_response(204)
+            self.end_headers()
+
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = coalescer.metrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format % args)
+
+    return ThreadingHTTPServer((host, port), Handler)
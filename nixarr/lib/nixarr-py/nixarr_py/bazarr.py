@@ -0,0 +1,143 @@
+"""
+Minimal Bazarr API client.
+
+Bazarr isn't covered by the devopsarr clients, so this implements the parts
+of its REST API that Nixarr scripts need: the wanted (missing subtitles)
+lists, provider status and per-language subtitle searches. The client keeps
+one HTTP connection pool for its lifetime.
+
+Example usage:
+    >>> from nixarr_py.clients import bazarr_client
+    >>>
+    >>> with bazarr_client() as client:
+    ...     for episode in client.iter_wanted("episodes"):
+    ...         print(episode["seriesTitle"], episode["missing_subtitles"])
+"""
+
+from typing import Any, Iterator, Literal
+import json
+import urllib.parse
+
+import urllib3
+
+
+class BazarrError(Exception):
+    """Raised when Bazarr answers a request with an error status, or can't be
+    reached or doesn't answer in time."""
+
+
+class BazarrClient:
+    """A Bazarr API client.
+
+    Args:
+        base_url: Bazarr's URL, e.g. `http://127.0.0.1:6767`.
+        api_key: Bazarr's API key.
+        timeout: Timeout in seconds for each request. Subtitle searches query
+            every provider before Bazarr answers, so this should be generous.
+    """
+
+    def __init__(self, base_url: str, api_key: str, timeout: float = 300) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._pool = urllib3.PoolManager(maxsize=4)
+        self._headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+
+    def __enter__(self) -> "BazarrClient":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the client's pooled HTTP connections."""
+        self._pool.clear()
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        body: Any = None,
+    ) -> Any:
+        """Send a request to an API endpoint like `/movies/wanted`.
+
+        Returns:
+            The decoded JSON response, or None for an empty response.
+
+        Raises:
+            BazarrError: If Bazarr answers with a non-2xx status, or the
+                request fails, e.g. because it timed out.
+        """
+        url = f"{self.base_url}/api{endpoint}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        try:
+            response = self._pool.request(
+                method,
+                url,
+                body=json.dumps(body) if body is not None else None,
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise BazarrError(f"{method} {endpoint} failed: {e}") from e
+        if not 200 <= response.status < 300:
+            raise BazarrError(
+                f"HTTP {response.status} for {method} {endpoint}: {response.data.decode(errors='replace')}"
+            )
+        return json.loads(response.data) if response.data else None
+
+    def iter_wanted(
+        self, kind: Literal["episodes", "movies"], page_size: int = 500
+    ) -> Iterator[dict[str, Any]]:
+        """Stream the episodes or movies with missing subtitles, page by page."""
+        start = 0
+        while True:
+            page = self.request(
+                "GET", f"/{kind}/wanted", {"start": start, "length": page_size}
+            )
+            records = page.get("data") or []
+            yield from records
+            start += len(records)
+            if not records or start >= page.get("total", 0):
+                break
+
+    def providers(self) -> list[dict[str, Any]]:
+        """The enabled subtitle providers, with their throttling status."""
+        return self.request("GET", "/providers").get("data") or []
+
+    def search_episode(
+        self,
+        series_id: int,
+        episode_id: int,
+        language: str,
+        forced: bool = False,
+        hi: bool = False,
+    ) -> None:
+        """Search all providers for an episode's subtitle, and download the best."""
+        self.request(
+            "PATCH",
+            "/episodes/subtitles",
+            {
+                "seriesid": series_id,
+                "episodeid": episode_id,
+                "language": language,
+                "forced": str(forced),
+                "hi": str(hi),
+            },
+        )
+
+    def search_movie(
+        self, movie_id: int, language: str, forced: bool = False, hi: bool = False
+    ) -> None:
+        """Search all providers for a movie's subtitle, and download the best."""
+        self.request(
+            "PATCH",
+            "/movies/subtitles",
+            {
+                "radarrid": movie_id,
+                "language": language,
+                "forced": str(forced),
+                "hi": str(hi),
+            },
+        )
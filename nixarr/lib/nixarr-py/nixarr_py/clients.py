@@ -9,6 +9,8 @@ Example usage:
     ...     api_info = radarr.ApiInfoApi(client).get_api()
 """
 
+import json
+
 import jellyfin
 import lidarr
 import prowlarr
@@ -17,8 +19,11 @@ import readarr
 import sonarr
 import whisparr
 
+from nixarr_py.bazarr import BazarrClient
 from nixarr_py.config import get_simple_service_config as _get_simple_service_config
+from nixarr_py.config import get_transmission_config as _get_transmission_config
 from nixarr_py.jellyfin_helpers import api_key_client as _jellyfin_api_key_client
+from nixarr_py.transmission import TransmissionClient
 
 
 def jellyfin_client() -> jellyfin.ApiClient:
@@ -184,3 +189,63 @@ def whisparr_client() -> whisparr.ApiClient:
         ...     api_info = api_info_client.get_api()
     """
     return _make_arr_client("whisparr", whisparr)
+
+
+def bazarr_client() -> BazarrClient:
+    """Create a Bazarr API client configured for use with Nixarr.
+
+    Uses the same API key file as Bazarr's settings sync.
+
+    Returns:
+        BazarrClient: API client instance configured to connect to the local
+        Nixarr Bazarr service.
+
+    Example:
+        >>> from nixarr_py.clients import bazarr_client
+        >>>
+        >>> with bazarr_client() as client:
+        ...     providers = client.providers()
+    """
+    cfg = _get_simple_service_config("bazarr")
+    with open(cfg.api_key_file, "r", encoding="utf-8") as f:
+        api_key = f.read().strip()
+    return BazarrClient(cfg.base_url, api_key)
+
+
+def transmission_client() -> TransmissionClient:
+    """Create a Transmission RPC client configured for use with Nixarr.
+
+    Reads Transmission's `settings.json` to find out whether RPC
+    authentication is required. If it is, the plaintext `rpc-password` is
+    taken from the credentials file (`nixarr.transmission.credentialsFile`),
+    since Transmission replaces the password in `settings.json` with a salted
+    hash on startup.
+
+    Returns:
+        TransmissionClient: RPC client instance configured to connect to the
+        local Nixarr Transmission service.
+
+    Example:
+        >>> from nixarr_py.clients import transmission_client
+        >>>
+        >>> with transmission_client() as client:
+        ...     torrents = client.get_torrents(["id", "name"])
+    """
+    cfg = _get_transmission_config()
+
+    def read_json(path) -> dict:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        return json.loads(content) if content else {}
+
+    settings = read_json(cfg.settings_file)
+    if cfg.credentials_file is not None:
+        settings |= read_json(cfg.credentials_file)
+
+    if not settings.get("rpc-authentication-required", False):
+        return TransmissionClient(cfg.rpc_url)
+    return TransmissionClient(
+        cfg.rpc_url,
+        username=settings.get("rpc-username", ""),
+        password=settings.get("rpc-password", ""),
+    )
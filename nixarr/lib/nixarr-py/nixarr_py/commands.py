@@ -0,0 +1,207 @@
+"""
+Batched sending and completion tracking of *arr commands.
+
+Scripts often need a service to run follow-up commands: Prowlarr an
+`ApplicationIndexerSync` after its indexers change, Sonarr a `RefreshSeries`
+or Radarr a `RefreshMovie` for each imported item. Sending them one by one
+and polling each command individually costs a request per command per poll
+(or a blind sleep). `CommandBatch` instead:
+
+- coalesces commands queued within a run: exact duplicates are sent once,
+  and commands that take a list of IDs (like `RefreshMovie` with `movieIds`)
+  are merged into one command per name,
+- sends the coalesced commands, and
+- tracks all of them through one polling loop on the `/command` list
+  endpoint, which returns every queued, running and recently finished
+  command at once. The poll interval starts short, backs off while nothing
+  finishes and tightens again when something does.
+
+Example usage:
+    >>> from nixarr_py.clients import radarr_client
+    >>> from nixarr_py.commands import CommandBatch
+    >>>
+    >>> with radarr_client() as client:
+    ...     batch = CommandBatch(client, "/api/v3")
+    ...     for movie_id in [1, 2, 3]:
+    ...         batch.add("RefreshMovie", movieIds=[movie_id])
+    ...     statuses = batch.run(timeout_secs=600)
+"""
+
+from dataclasses import dataclass
+from typing import Any
+import json
+import logging
+import time
+
+from nixarr_py.utils import api_request
+
+
+logger = logging.getLogger(__name__)
+
+
+# Commands whose ID list property can be merged across commands. Commands not
+# listed here are only deduplicated.
+MULTI_ID_PROPERTIES = {
+    "AlbumSearch": "albumIds",
+    "BookSearch": "bookIds",
+    "EpisodeSearch": "episodeIds",
+    "MoviesSearch": "movieIds",
+    "RefreshArtist": "artistIds",
+    "RefreshMovie": "movieIds",
+    "RefreshSeries": "seriesIds",
+}
+
+# "unknown" is ours: the command finished and was pruned from the service's
+# history before we saw how it ended.
+FINISHED_STATUSES = {
+    "completed",
+    "failed",
+    "aborted",
+    "cancelled",
+    "orphaned",
+    "unknown",
+}
+
+
+@dataclass
+class CommandResult:
+    """The last known state of a sent command."""
+
+    id: int
+    name: str
+    status: str
+    message: str | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+class CommandBatch:
+    """Commands to send to one *arr service, coalesced; see the module docs.
+
+    Args:
+        client: A generated *arr API client.
+        api_prefix: The service's API prefix, e.g. "/api/v3" for Sonarr and
+            Radarr or "/api/v1" for Prowlarr, Lidarr and Readarr.
+    """
+
+    def __init__(self, client: Any, api_prefix: str) -> None:
+        self.client = client
+        self.api_prefix = api_prefix
+        self._pending: dict[str, dict[str, Any]] = {}
+        self.results: dict[int, CommandResult] = {}
+
+    def add(self, name: str, **body: Any) -> None:
+        """Queue a command, merging it into an already queued one if possible."""
+        ids_property = MULTI_ID_PROPERTIES.get(name)
+        if ids_property is not None and ids_property in body:
+            rest = {k: v for k, v in body.items() if k != ids_property}
+            key = json.dumps([name, rest], sort_keys=True)
+            pending = self._pending.setdefault(
+                key, {"name": name, **rest, ids_property: []}
+            )
+            ids = pending[ids_property]
+            ids += [item_id for item_id in body[ids_property] if item_id not in ids]
+            return
+        key = json.dumps([name, body], sort_keys=True)
+        self._pending.setdefault(key, {"name": name, **body})
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def send(self) -> list[int]:
+        """Send all queued commands.
+
+        Returns:
+            list: The IDs of the sent commands.
+        """
+        ids = []
+        for body in self._pending.values():
+            command = api_request(
+                self.client, "POST", f"{self.api_prefix}/command", body
+            )
+            result = CommandResult(command["id"], body["name"], command["status"])
+            self.results[result.id] = result
+            ids.append(result.id)
+            logger.debug(f"Sent command {body['name']} as {result.id}")
+        self._pending.clear()
+        return ids
+
+    def _poll(self, ids: set[int]) -> None:
+        listed = {
+            command["id"]: command
+            for command in api_request(self.client, "GET", f"{self.api_prefix}/command")
+        }
+        for command_id in ids:
+            result = self.results[command_id]
+            # Finished commands eventually drop out of the list; look those
+            # up individually.
+            command = listed.get(command_id)
+            if command is None:
+                try:
+                    command = api_request(
+                        self.client, "GET", f"{self.api_prefix}/command/{command_id}"
+                    )
+                except Exception as e:
+                    # Pruned from the history too, so it finished at some
+                    # point.
+                    if getattr(e, "status", None) != 404:
+                        raise
+                    result.status = "unknown"
+                    result.message = "No longer in the command history"
+                    continue
+            result.status = command.get("status", result.status)
+            result.message = command.get("message")
+
+    def wait(
+        self,
+        timeout_secs: float = 600,
+        min_interval_secs: float = 0.5,
+        max_interval_secs: float = 10,
+    ) -> dict[int, CommandResult]:
+        """Wait until all sent commands finished, or the timeout passed.
+
+        Returns:
+            dict: Command ID to result; unfinished commands keep their last
+            status.
+        """
+        deadline = time.monotonic() + timeout_secs
+        interval = min_interval_secs
+        unfinished = {
+            command_id
+            for command_id, result in self.results.items()
+            if not result.finished
+        }
+        waited = set(unfinished)
+        while unfinished and time.monotonic() < deadline:
+            time.sleep(min(interval, max(0, deadline - time.monotonic())))
+            self._poll(unfinished)
+            still_unfinished = {
+                command_id
+                for command_id in unfinished
+                if not self.results[command_id].finished
+            }
+            if len(still_unfinished) < len(unfinished):
+                interval = min_interval_secs
+            else:
+                interval = min(interval * 1.5, max_interval_secs)
+            unfinished = still_unfinished
+        for command_id in unfinished:
+            result = self.results[command_id]
+            logger.warning(
+                f"Timed out waiting for command {result.name} ({command_id}); last status '{result.status}'"
+            )
+        for command_id in waited - unfinished:
+            result = self.results[command_id]
+            if result.status != "completed":
+                details = f": {result.message}" if result.message else ""
+                logger.warning(
+                    f"Command {result.name} ({command_id}) finished with status '{result.status}'{details}"
+                )
+        return self.results
+
+    def run(self, timeout_secs: float = 600) -> dict[int, CommandResult]:
+        """Send all queued commands and wait for them to finish."""
+        self.send()
+        return self.wait(timeout_secs)
@@ -30,9 +30,17 @@ class Jellyfin(BaseModel):
     device_uuid_file: Path
 
 
+class Transmission(BaseModel):
+    rpc_url: str
+    settings_file: Path
+    credentials_file: Path | None = None
+
+
 class NixarrPyConfig(BaseModel):
     jellyfin: Jellyfin | None = None
+    transmission: Transmission | None = None
 
+    bazarr: SimpleService | None = None
     lidarr: SimpleService | None = None
     prowlarr: SimpleService | None = None
     radarr: SimpleService | None = None
@@ -60,6 +68,14 @@ def get_jellyfin_config() -> Jellyfin:
     return config.jellyfin
 
 
+def get_transmission_config() -> Transmission:
+    config = load_config()
+    assert config.transmission is not None, (
+        f"Transmission configuration not found in {CONFIG_PATH}"
+    )
+    return config.transmission
+
+
 def get_simple_service_config(service: str) -> SimpleService:
     """Get the SimpleService config for a given service.
 
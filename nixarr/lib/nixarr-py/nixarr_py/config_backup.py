@@ -0,0 +1,436 @@
+"""
+Incremental, content-addressed backups of service configuration.
+
+Exports the declarative-relevant configuration of the *arrs (tags, indexers,
+download clients, profiles, notifications, ...) and Jellyfin through their
+APIs, and stores it in a snapshot store:
+
+- `objects/ab/abcdef...`: one zlib-compressed JSON object per exported item,
+  named by the SHA-256 of its canonical JSON. Items that didn't change since
+  an earlier snapshot are already stored and aren't written again.
+- `snapshots/<timestamp>.json.gz`: one manifest per snapshot, mapping each
+  service, resource and item to its object.
+
+A snapshot of an unchanged setup therefore writes only its manifest, and two
+snapshots can be diffed by comparing object hashes, without reading objects.
+
+Example usage:
+    >>> from nixarr_py.config_backup import SnapshotStore, export_services
+    >>>
+    >>> store = SnapshotStore("/var/lib/nixarr/config-backups")
+    >>> exports, errors = export_services(["radarr", "sonarr"])
+    >>> name, stats = store.create_snapshot(exports, errors)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+import gzip
+import hashlib
+import json
+import logging
+import zlib
+
+from nixarr_py import clients
+from nixarr_py.utils import api_request, atomic_write
+
+
+logger = logging.getLogger(__name__)
+
+
+# API prefix and exported resources of each *arr. Host config is left out on
+# purpose: it contains the API key and the UI password.
+ARR_RESOURCES: dict[str, tuple[str, list[str]]] = {
+    "lidarr": (
+        "/api/v1",
+        [
+            "tag",
+            "indexer",
+            "downloadclient",
+            "importlist",
+            "importlistexclusion",
+            "notification",
+            "qualityprofile",
+            "qualitydefinition",
+            "metadataprofile",
+            "customformat",
+            "delayprofile",
+            "releaseprofile",
+            "remotepathmapping",
+            "rootfolder",
+            "metadata",
+            "config/ui",
+            "config/naming",
+            "config/mediamanagement",
+            "config/metadataprovider",
+            "config/indexer",
+            "config/downloadclient",
+        ],
+    ),
+    "prowlarr": (
+        "/api/v1",
+        [
+            "tag",
+            "applications",
+            "appprofile",
+            "indexer",
+            "indexerproxy",
+            "downloadclient",
+            "notification",
+            "config/ui",
+            "config/downloadclient",
+        ],
+    ),
+    "radarr": (
+        "/api/v3",
+        [
+            "tag",
+            "indexer",
+            "downloadclient",
+            "importlist",
+            "exclusions",
+            "notification",
+            "qualityprofile",
+            "qualitydefinition",
+            "customformat",
+            "delayprofile",
+            "releaseprofile",
+            "autotagging",
+            "remotepathmapping",
+            "rootfolder",
+            "metadata",
+            "config/ui",
+            "config/naming",
+            "config/mediamanagement",
+            "config/importlist",
+            "config/indexer",
+            "config/downloadclient",
+        ],
+    ),
+    "sonarr": (
+        "/api/v3",
+        [
+            "tag",
+            "indexer",
+            "downloadclient",
+            "importlist",
+            "importlistexclusion",
+            "notification",
+            "qualityprofile",
+            "qualitydefinition",
+            "customformat",
+            "delayprofile",
+            "releaseprofile",
+            "autotagging",
+            "remotepathmapping",
+            "rootfolder",
+            "metadata",
+            "config/ui",
+            "config/naming",
+            "config/mediamanagement",
+            "config/indexer",
+            "config/downloadclient",
+        ],
+    ),
+    "whisparr": (
+        "/api/v3",
+        [
+            "tag",
+            "indexer",
+            "downloadclient",
+            "importlist",
+            "exclusions",
+            "notification",
+            "qualityprofile",
+            "qualitydefinition",
+            "customformat",
+            "delayprofile",
+            "releaseprofile",
+            "autotagging",
+            "remotepathmapping",
+            "rootfolder",
+            "metadata",
+            "config/ui",
+            "config/naming",
+            "config/mediamanagement",
+            "config/indexer",
+            "config/downloadclient",
+        ],
+    ),
+}
+
+JELLYFIN_RESOURCES = [
+    "System/Configuration",
+    "System/Configuration/encoding",
+    "Library/VirtualFolders",
+]
+
+SERVICES = sorted([*ARR_RESOURCES, "jellyfin"])
+
+
+def _service_resources(service: str) -> tuple[Callable[[], Any], dict[str, str]]:
+    """The client factory of a service, and the API path of each resource."""
+    if service == "jellyfin":
+        paths = {resource: f"/{resource}" for resource in JELLYFIN_RESOURCES}
+        return clients.jellyfin_client, paths
+    prefix, resources = ARR_RESOURCES[service]
+    paths = {resource: f"{prefix}/{resource}" for resource in resources}
+    return getattr(clients, f"{service}_client"), paths
+
+
+def export_services(
+    services: list[str], max_workers: int = 8
+) -> tuple[dict[str, dict[str, Any]], dict[str, str]]:
+    """Fetch the configuration of the given services concurrently.
+
+    Args:
+        services: Service names, from `SERVICES`.
+        max_workers: Maximum number of API requests in flight at once.
+
+    Returns:
+        tuple: `{service: {resource: data}}` for each resource that could be
+        fetched, and `{"service/resource": error}` for each that couldn't
+        (including every resource of a service whose client couldn't be
+        created).
+    """
+    exports: dict[str, dict[str, Any]] = {service: {} for service in services}
+    errors: dict[str, str] = {}
+    # The clients are closed once the executor has finished all requests.
+    with ExitStack() as stack, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for service in services:
+            make_client, paths = _service_resources(service)
+            try:
+                client = stack.enter_context(make_client())
+            except Exception as e:
+                logger.warning(f"Failed to create a {service} client: {e}")
+                errors.update({f"{service}/{resource}": str(e) for resource in paths})
+                continue
+            for resource, path in paths.items():
+                futures[(service, resource)] = executor.submit(
+                    api_request, client, "GET", path
+                )
+        for (service, resource), future in futures.items():
+            try:
+                exports[service][resource] = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to export {service} {resource}: {e}")
+                errors[f"{service}/{resource}"] = str(e)
+    return exports, errors
+
+
+def _canonical_json(data: Any) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+
+def _item_key(item: Any, index: int) -> str:
+    if isinstance(item, dict):
+        for key in ["id", "Id", "ItemId", "name", "Name", "label"]:
+            if item.get(key) is not None:
+                return str(item[key])
+    return f"#{index}"
+
+
+def _item_label(item: Any) -> str | None:
+    if isinstance(item, dict):
+        for key in ["name", "Name", "label"]:
+            if isinstance(item.get(key), str):
+                return item[key]
+    return None
+
+
+@dataclass
+class SnapshotStats:
+    """What a call to `SnapshotStore.create_snapshot` did."""
+
+    items: int = 0
+    objects_written: int = 0
+    bytes_written: int = 0
+
+
+@dataclass
+class Change:
+    """A difference between two snapshots."""
+
+    service: str
+    resource: str
+    key: str
+    label: str | None
+    # "added", "removed" or "changed".
+    kind: str
+    old_object: str | None
+    new_object: str | None
+
+
+class SnapshotStore:
+    """A directory of content-addressed configuration snapshots.
+
+    Args:
+        root: The store directory. Created (readable only by its owner) if it
+            doesn't exist, since exported settings can include credentials.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.snapshots_dir = self.root / "snapshots"
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        atomic_write(path, data, mode=0o600)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def put_object(self, data: Any) -> tuple[str, int]:
+        """Store `data` if it isn't stored yet.
+
+        Returns:
+            tuple: The object's hash, and the number of bytes written (0 if
+            the object already existed).
+        """
+        encoded = _canonical_json(data)
+        digest = hashlib.sha256(encoded).hexdigest()
+        path = self._object_path(digest)
+        if path.exists():
+            return digest, 0
+        compressed = zlib.compress(encoded, 9)
+        self._write_atomic(path, compressed)
+        return digest, len(compressed)
+
+    def get_object(self, digest: str) -> Any:
+        with open(self._object_path(digest), "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def list_snapshots(self) -> list[str]:
+        """Names of all snapshots, oldest first."""
+        if not self.snapshots_dir.is_dir():
+            return []
+        return sorted(
+            path.name.removesuffix(".json.gz")
+            for path in self.snapshots_dir.glob("*.json.gz")
+        )
+
+    def resolve(self, name: str) -> str:
+        """Resolve a snapshot name, "latest" or "previous" to a snapshot name.
+
+        Raises:
+            ValueError: If there's no such snapshot.
+        """
+        snapshots = self.list_snapshots()
+        if name in ["latest", "previous"]:
+            index = -1 if name == "latest" else -2
+            if len(snapshots) < -index:
+                raise ValueError(f"No {name} snapshot in {self.root}")
+            return snapshots[index]
+        if name not in snapshots:
+            raise ValueError(f"No snapshot named '{name}' in {self.root}")
+        return name
+
+    def load_manifest(self, name: str) -> dict[str, Any]:
+        path = self.snapshots_dir / f"{self.resolve(name)}.json.gz"
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def create_snapshot(
+        self, exports: dict[str, dict[str, Any]], errors: dict[str, str] = {}
+    ) -> tuple[str | None, SnapshotStats]:
+        """Store a snapshot of `exports`, as returned by `export_services`.
+
+        Returns:
+            tuple: The new snapshot's name, or None if nothing changed since
+            the latest snapshot (in which case no manifest is written), and
+            what was written.
+        """
+        stats = SnapshotStats()
+        services: dict[str, Any] = {}
+        for service, resources in sorted(exports.items()):
+            services[service] = {}
+            for resource, data in sorted(resources.items()):
+                items: dict[str, Any] = {}
+                is_list = isinstance(data, list)
+                for index, item in enumerate(data if is_list else [data]):
+                    digest, written = self.put_object(item)
+                    key = _item_key(item, index) if is_list else ""
+                    items[key] = {"object": digest, "label": _item_label(item)}
+                    stats.items += 1
+                    stats.objects_written += written > 0
+                    stats.bytes_written += written
+                services[service][resource] = {
+                    "type": "list" if is_list else "object",
+                    "items": items,
+                }
+
+        snapshots = self.list_snapshots()
+        if snapshots and not errors:
+            latest = self.load_manifest(snapshots[-1])
+            if latest["services"] == services and not latest["errors"]:
+                return None, stats
+
+        now = datetime.now(timezone.utc)
+        name = now.strftime("%Y%m%dT%H%M%SZ")
+        suffix = 1
+        while name in snapshots:
+            suffix += 1
+            name = f"{now.strftime('%Y%m%dT%H%M%SZ')}-{suffix}"
+        manifest = {
+            "version": 1,
+            "created": now.isoformat(),
+            "services": services,
+            "errors": errors,
+        }
+        encoded = gzip.compress(_canonical_json(manifest), mtime=0)
+        self._write_atomic(self.snapshots_dir / f"{name}.json.gz", encoded)
+        stats.bytes_written += len(encoded)
+        return name, stats
+
+    def materialize(self, name: str) -> dict[str, dict[str, Any]]:
+        """Rebuild the exported data of a snapshot, in the shape returned by
+        `export_services`."""
+        exports: dict[str, dict[str, Any]] = {}
+        for service, resources in self.load_manifest(name)["services"].items():
+            exports[service] = {}
+            for resource, entry in resources.items():
+                data = [self.get_object(i["object"]) for i in entry["items"].values()]
+                exports[service][resource] = (
+                    data if entry["type"] == "list" else data[0]
+                )
+        return exports
+
+
+def diff_manifests(old: dict[str, Any], new: dict[str, Any]) -> list[Change]:
+    """List the items that were added, removed or changed between two
+    snapshot manifests."""
+    changes: list[Change] = []
+    old_services, new_services = old["services"], new["services"]
+    for service in sorted(old_services.keys() | new_services.keys()):
+        old_resources = old_services.get(service, {})
+        new_resources = new_services.get(service, {})
+        for resource in sorted(old_resources.keys() | new_resources.keys()):
+            old_items = old_resources.get(resource, {}).get("items", {})
+            new_items = new_resources.get(resource, {}).get("items", {})
+            for key in sorted(old_items.keys() | new_items.keys()):
+                old_item, new_item = old_items.get(key), new_items.get(key)
+                if old_item is None:
+                    kind = "added"
+                elif new_item is None:
+                    kind = "removed"
+                elif old_item["object"] != new_item["object"]:
+                    kind = "changed"
+                else:
+                    continue
+                changes.append(
+                    Change(
+                        service=service,
+                        resource=resource,
+                        key=key,
+                        label=(new_item or old_item)["label"],
+                        kind=kind,
+                        old_object=old_item and old_item["object"],
+                        new_object=new_item and new_item["object"],
+                    )
+                )
+    return changes
@@ -0,0 +1,298 @@
+"""
+Offline maintenance of the services' SQLite databases.
+
+The *arrs, Prowlarr, Bazarr and Jellyfin keep their state in SQLite
+databases, and their history, log and activity tables grow without bound.
+After a while the databases take gigabytes, are mostly free pages and stale
+statistics, and every UI query slows down. For each service, the maintenance
+here:
+
+- stops the service's unit (and restarts it, and the units that depend on
+  it and were running, afterwards),
+- checkpoints the write-ahead log and runs `PRAGMA integrity_check`,
+  leaving a database that fails it untouched,
+- optionally deletes history, log and activity rows older than a retention,
+- `VACUUM`s (if there's enough free disk space for the copy SQLite makes)
+  and `ANALYZE`s each database,
+
+and reports the size of each database and how long it took. Services are
+independent of each other, so they're processed in parallel, except that
+VACUUMs of databases on the same filesystem take turns: each needs free space
+for its copy, which a concurrent one would take.
+
+Example usage:
+    >>> from nixarr_py.db_maintenance import format_reports, maintain_services
+    >>>
+    >>> reports = maintain_services(
+    ...     {"sonarr": "/data/.state/nixarr/sonarr"}, retention_days=365
+    ... )
+    >>> print(format_reports(reports))
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+
+from nixarr_py.utils import format_size, format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+ARR_SERVICES = ["lidarr", "prowlarr", "radarr", "sonarr", "whisparr"]
+
+# Where each service keeps its databases, relative to its state directory.
+DATABASE_DIRS = {
+    **{service: "." for service in ARR_SERVICES},
+    "bazarr": "db",
+    "jellyfin": "data/data",
+}
+
+# (table, date column) of the rows pruned beyond the retention. Rules only
+# apply to the databases that have the table.
+ARR_PRUNE_RULES = [("History", "Date"), ("DownloadHistory", "Date"), ("Logs", "Time")]
+PRUNE_RULES = {
+    **{service: ARR_PRUNE_RULES for service in ARR_SERVICES},
+    "bazarr": [("table_history", "timestamp"), ("table_history_movie", "timestamp")],
+    "jellyfin": [("ActivityLogs", "DateCreated")],
+}
+
+SIDECAR_SUFFIXES = ["-wal", "-shm", "-journal"]
+
+# Filesystem (device number) to the lock VACUUMs on it hold.
+_VACUUM_LOCKS: dict[int, threading.Lock] = {}
+
+
+@dataclass
+class DatabaseReport:
+    path: Path
+    size_before: int = 0
+    size_after: int = 0
+    secs: float = 0
+    integrity: str | None = None
+    pruned: dict[str, int] = field(default_factory=dict)
+    vacuumed: bool = False
+    error: str | None = None
+
+
+@dataclass
+class ServiceReport:
+    service: str
+    databases: list[DatabaseReport] = field(default_factory=list)
+    downtime_secs: float = 0
+    error: str | None = None
+
+
+def _size(path: Path) -> int:
+    """The size of a database including its write-ahead log."""
+    size = 0
+    for candidate in [path, Path(f"{path}-wal")]:
+        try:
+            size += candidate.stat().st_size
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def _vacuum_lock(path: Path) -> threading.Lock:
+    return _VACUUM_LOCKS.setdefault(path.stat().st_dev, threading.Lock())
+
+
+def _fix_sidecar_owners(path: Path) -> None:
+    """Give the journal files SQLite may have created as root to the
+    database's owner, so the service can open the database again."""
+    stat = path.stat()
+    for suffix in SIDECAR_SUFFIXES:
+        sidecar = Path(f"{path}{suffix}")
+        if sidecar.exists():
+            os.chown(sidecar, stat.st_uid, stat.st_gid)
+
+
+def _prune(
+    db: sqlite3.Connection, rules: list[tuple[str, str]], retention_days: int
+) -> dict[str, int]:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    # Dates are stored as text ("2024-01-31 12:00:00.000" or with a "T") by
+    # some services and versions, and as Unix timestamps by others.
+    cutoff_text = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    pruned = {}
+    for table, column in rules:
+        columns = {row[1] for row in db.execute(f'PRAGMA table_info("{table}")')}
+        if column not in columns:
+            continue
+        cursor = db.execute(
+            f'DELETE FROM "{table}" WHERE '
+            f'(typeof("{column}") = \'text\' AND "{column}" < ?) OR '
+            f"(typeof(\"{column}\") IN ('integer', 'real') AND \"{column}\" < ?)",
+            (cutoff_text, cutoff.timestamp()),
+        )
+        pruned[table] = cursor.rowcount
+    return pruned
+
+
+def maintain_database(
+    path: Path, prune_rules: list[tuple[str, str]], retention_days: int | None
+) -> DatabaseReport:
+    """Check, prune, vacuum and analyze one database. The service using it
+    must be stopped."""
+    report = DatabaseReport(path=path, size_before=_size(path))
+    start = time.monotonic()
+    db = sqlite3.connect(path, isolation_level=None)
+    try:
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        problems = [row[0] for row in db.execute("PRAGMA integrity_check")]
+        report.integrity = "ok" if problems == ["ok"] else "; ".join(problems[:5])
+        if report.integrity != "ok":
+            report.error = "integrity check failed; left untouched"
+            return report
+        if retention_days is not None:
+            db.execute("BEGIN")
+            report.pruned = _prune(db, prune_rules, retention_days)
+            db.execute("COMMIT")
+        # VACUUM writes a copy of the database before replacing it.
+        with _vacuum_lock(path):
+            free = shutil.disk_usage(path.parent).free
+            if free > _size(path) * 1.1:
+                db.execute("VACUUM")
+                report.vacuumed = True
+            else:
+                logger.warning(
+                    f"Not vacuuming {path}: only {format_size(free)} free for a {format_size(_size(path))} database"
+                )
+        db.execute("ANALYZE")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except sqlite3.Error as e:
+        report.error = str(e)
+    finally:
+        db.close()
+        _fix_sidecar_owners(path)
+        report.secs = time.monotonic() - start
+        report.size_after = _size(path)
+    return report
+
+
+def _systemctl(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["systemctl", *args], capture_output=True, text=True, check=False
+    )
+
+
+def _active_dependents(unit: str) -> list[str]:
+    """The running services that depend on `unit`, which stopping it stops
+    too."""
+    listed = _systemctl(
+        "list-dependencies", "--reverse", "--plain", "--no-legend", unit
+    )
+    dependents = [
+        line.strip()
+        for line in listed.stdout.splitlines()[1:]
+        if line.strip().endswith(".service")
+    ]
+    dependents = list(dict.fromkeys(dependents))
+    if not dependents:
+        return []
+    states = _systemctl("is-active", *dependents).stdout.split()
+    return [unit for unit, state in zip(dependents, states) if state == "active"]
+
+
+def maintain_service(
+    service: str, state_dir: str | Path, retention_days: int | None
+) -> ServiceReport:
+    """Stop a service, maintain its databases and start it again."""
+    report = ServiceReport(service=service)
+    db_dir = Path(state_dir) / DATABASE_DIRS[service]
+    paths = sorted(db_dir.glob("*.db"))
+    if not paths:
+        report.error = f"no databases in {db_dir}"
+        return report
+    unit = f"{service}.service"
+    was_active = _systemctl("is-active", unit).stdout.strip() == "active"
+    dependents = _active_dependents(unit) if was_active else []
+    stopped = time.monotonic()
+    if was_active:
+        logger.info(f"{service}: stopping {unit}")
+        result = _systemctl("stop", unit)
+        if result.returncode != 0:
+            report.error = f"failed to stop {unit}: {result.stderr.strip()}"
+            return report
+    try:
+        for path in paths:
+            logger.info(f"{service}: maintaining {path.name}")
+            report.databases.append(
+                maintain_database(path, PRUNE_RULES[service], retention_days)
+            )
+    finally:
+        if was_active:
+            logger.info(f"{service}: starting {unit}")
+            result = _systemctl("start", unit, *dependents)
+            if result.returncode != 0:
+                report.error = f"failed to start {unit}: {result.stderr.strip()}"
+            report.downtime_secs = time.monotonic() - stopped
+    return report
+
+
+def maintain_services(
+    state_dirs: dict[str, str | Path],
+    retention_days: int | None = None,
+    max_workers: int = 4,
+) -> list[ServiceReport]:
+    """Maintain the databases of several services in parallel.
+
+    Args:
+        state_dirs: Service name (from `DATABASE_DIRS`) to its state directory.
+        retention_days: Delete history, log and activity rows older than this
+            many days; don't delete anything if None.
+        max_workers: Maximum number of services processed at once.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                lambda item: maintain_service(item[0], item[1], retention_days),
+                state_dirs.items(),
+            )
+        )
+
+
+def format_reports(reports: list[ServiceReport]) -> str:
+    """Format the maintenance reports as a table."""
+    rows = [["service", "database", "before", "after", "time", "pruned rows", "result"]]
+    total_before = total_after = 0
+    for report in reports:
+        if not report.databases:
+            rows.append([report.service, "-", "-", "-", "-", "-", report.error or ""])
+        for db in report.databases:
+            total_before += db.size_before
+            total_after += db.size_after
+            result = db.error or ("ok" if db.vacuumed else "ok, not vacuumed")
+            rows.append(
+                [
+                    report.service,
+                    db.path.name,
+                    format_size(db.size_before),
+                    format_size(db.size_after),
+                    f"{db.secs:.1f}s",
+                    str(sum(db.pruned.values())),
+                    result,
+                ]
+            )
+        if report.databases and report.error:
+            rows.append([report.service, "-", "-", "-", "-", "-", report.error])
+    lines = [format_table(rows), ""]
+    lines.append(
+        f"Total: {format_size(total_before)} -> {format_size(total_after)} "
+        f"({format_size(max(total_before - total_after, 0))} freed)"
+    )
+    for report in reports:
+        if report.downtime_secs:
+            lines.append(
+                f"{report.service} was stopped for {report.downtime_secs:.1f}s"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,322 @@
+"""
+Persistent, incrementally refreshed index of a directory tree.
+
+Walking a large media directory with `find` and `du` stats every file, which
+is slow on spinning disks. This index stores one row per file (path, device,
+inode, size, link count, mtime) and one row per directory (with its mtime) in
+SQLite. A refresh stats every *directory*, but only lists and stats the files
+of directories whose mtime changed since the last refresh, since adding,
+removing or renaming an entry always updates its parent directory's mtime.
+
+Some changes don't touch the entries of the file's own directory, so a
+refresh follows up on them separately:
+
+- a file gaining or losing a hardlink in another directory: the link count
+  a rescan finds is copied to the other indexed paths of the inode, and when
+  a rescan finds a path gone, the remaining paths of its inode are
+  re-stat'ed, and
+- a file growing in place: files modified recently (within `HOT_SECS`) when
+  last stat'ed, e.g. downloads in progress, are re-stat'ed.
+
+Links added or removed outside the refreshed tree, and files that grow after
+a long time unmodified, are only picked up by `FsIndex.refresh(full=True)`,
+which rescans everything. Queries answer from the index as it is.
+
+Example usage:
+    >>> from nixarr_py.fs_index import FsIndex
+    >>>
+    >>> with FsIndex("/tmp/fs-index.sqlite") as index:
+    ...     index.refresh("/data/media")
+    ...     for path, size in index.unlinked("/data/media/torrents"):
+    ...         print(path, size)
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+import os
+import sqlite3
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    nlink INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_nlink ON files (nlink);
+CREATE INDEX IF NOT EXISTS files_inode ON files (dev, ino);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime_ns);
+"""
+
+# Files modified this recently when last stat'ed are re-stat'ed by every
+# refresh, as they may still be growing.
+HOT_SECS = 24 * 3600
+
+
+@dataclass
+class RefreshStats:
+    """What a call to `FsIndex.refresh` did."""
+
+    dirs_checked: int = 0
+    dirs_rescanned: int = 0
+    files_indexed: int = 0
+    dirs_removed: int = 0
+    files_restated: int = 0
+
+
+def _subtree_bounds(root: str) -> tuple[str, str]:
+    # Paths strictly inside `root` sort between "root/" and "root0", since "0"
+    # is the character after "/". This lets SQLite use the primary key index
+    # instead of a LIKE pattern (which would also need escaping).
+    root = root.rstrip("/")
+    return root + "/", root + "0"
+
+
+class FsIndex:
+    """A SQLite-backed index of files below one or more directory trees.
+
+    Args:
+        db_path: Path of the SQLite database. Created if it doesn't exist.
+    """
+
+    def __init__(self, db_path: str | Path) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self) -> "FsIndex":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def refresh(self, root: str | Path, full: bool = False) -> RefreshStats:
+        """Bring the index of `root` up to date.
+
+        Args:
+            root: The directory tree to index.
+            full: Rescan every directory, even if its mtime is unchanged.
+
+        Returns:
+            RefreshStats: Counts of the work done.
+        """
+        root = os.path.abspath(root)
+        stats = RefreshStats()
+        stack = [root]
+        # Inodes that lost an indexed link, whose other links' counts are
+        # therefore stale.
+        dirty: set[tuple[int, int]] = set()
+        with self._db:
+            while stack:
+                path = stack.pop()
+                try:
+                    st = os.lstat(path)
+                except FileNotFoundError:
+                    stats.dirs_removed += self._remove_subtree(path, dirty)
+                    continue
+                stats.dirs_checked += 1
+                row = self._db.execute(
+                    "SELECT mtime_ns FROM dirs WHERE path = ?", (path,)
+                ).fetchone()
+                if not full and row is not None and row[0] == st.st_mtime_ns:
+                    stack.extend(
+                        child
+                        for (child,) in self._db.execute(
+                            "SELECT path FROM dirs WHERE parent = ?", (path,)
+                        )
+                    )
+                    continue
+                stats.dirs_rescanned += 1
+                subdirs, indexed = self._rescan_dir(path, st.st_mtime_ns, dirty)
+                stats.files_indexed += indexed
+                stale = self._db.execute(
+                    "SELECT path FROM dirs WHERE parent = ?", (path,)
+                ).fetchall()
+                for (child,) in stale:
+                    if child not in subdirs:
+                        stats.dirs_removed += self._remove_subtree(child, dirty)
+                stack.extend(subdirs)
+            stats.files_restated += self._restat_inodes(dirty)
+            stats.files_restated += self._restat_hot(root)
+        return stats
+
+    def _rescan_dir(
+        self, path: str, mtime_ns: int, dirty: set[tuple[int, int]]
+    ) -> tuple[set[str], int]:
+        subdirs: set[str] = set()
+        rows = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        rows.append(
+                            (
+                                entry.path,
+                                path,
+                                st.st_dev,
+                                st.st_ino,
+                                st.st_size,
+                                st.st_nlink,
+                                st.st_mtime_ns,
+                            )
+                        )
+                except FileNotFoundError:
+                    continue
+        old = set(self._db.execute("SELECT dev, ino FROM files WHERE dir = ?", (path,)))
+        self._db.execute("DELETE FROM files WHERE dir = ?", (path,))
+        self._db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        dirty |= old - {(row[2], row[3]) for row in rows}
+        # A link added or removed here changes the link count of the inode's
+        # other paths too.
+        self._db.executemany(
+            "UPDATE files SET nlink = ? WHERE dev = ? AND ino = ? AND nlink != ?",
+            [(row[5], row[2], row[3], row[5]) for row in rows],
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+            (path, os.path.dirname(path), mtime_ns),
+        )
+        return subdirs, len(rows)
+
+    def _remove_subtree(self, path: str, dirty: set[tuple[int, int]]) -> int:
+        lo, hi = _subtree_bounds(path)
+        dirty.update(
+            self._db.execute(
+                "SELECT dev, ino FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)",
+                (path, lo, hi),
+            )
+        )
+        self._db.execute(
+            "DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)", (path, lo, hi)
+        )
+        return self._db.execute(
+            "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (path, lo, hi),
+        ).rowcount
+
+    def _restat(self, paths: Iterable[str]) -> int:
+        """Re-stat indexed files, correcting their rows and those of their
+        inode's other paths, and dropping the ones that are gone. Returns the
+        number of files stat'ed."""
+        stated = []
+        removed = []
+        for path in paths:
+            try:
+                st = os.lstat(path)
+            except FileNotFoundError:
+                removed.append((path,))
+                continue
+            stated.append(
+                (st.st_size, st.st_nlink, st.st_mtime_ns, st.st_dev, st.st_ino)
+            )
+        # Every path of an inode shares its size, link count and mtime.
+        self._db.executemany(
+            "UPDATE files SET size = ?, nlink = ?, mtime_ns = ? WHERE dev = ? AND ino = ?",
+            stated,
+        )
+        self._db.executemany("DELETE FROM files WHERE path = ?", removed)
+        return len(stated) + len(removed)
+
+    def _restat_inodes(self, inodes: set[tuple[int, int]]) -> int:
+        """Re-stat the remaining paths of the inodes that lost a link."""
+        paths = [
+            path
+            for dev, ino in inodes
+            for (path,) in self._db.execute(
+                "SELECT path FROM files WHERE dev = ? AND ino = ?", (dev, ino)
+            )
+        ]
+        return self._restat(paths)
+
+    def _restat_hot(self, root: str) -> int:
+        """Re-stat the recently modified files below `root`."""
+        lo, hi = _subtree_bounds(root)
+        since = time.time_ns() - HOT_SECS * 10**9
+        paths = [
+            path
+            for (path,) in self._db.execute(
+                "SELECT path FROM files WHERE mtime_ns > ? AND path >= ? AND path < ?",
+                (since, lo, hi),
+            )
+        ]
+        return self._restat(paths)
+
+    def unlinked(
+        self, root: str | Path, min_size: int = 0
+    ) -> Iterator[tuple[str, int]]:
+        """Yield `(path, size)` for files below `root` with a single link,
+        smallest first. Like `find -links 1`.
+        """
+        lo, hi = _subtree_bounds(os.path.abspath(root))
+        yield from self._db.execute(
+            """
+            SELECT path, size FROM files
+            WHERE path >= ? AND path < ? AND nlink = 1 AND size >= ?
+            ORDER BY size, path
+            """,
+            (lo, hi, min_size),
+        ).fetchall()
+
+    def du(self, root: str | Path, min_size: int = 0) -> list[tuple[str, int]]:
+        """Apparent size of `root` and of each of its subdirectories, like
+        `du --apparent-size --max-depth=1`, smallest first. Files directly in
+        `root` only count towards its total.
+
+        Files with several hardlinks below `root` are counted once, towards
+        the first of their paths.
+        """
+        root = os.path.abspath(root).rstrip("/")
+        lo, hi = _subtree_bounds(root)
+        rows = self._db.execute(
+            """
+            SELECT child, SUM(size) FROM (
+                SELECT
+                    CASE WHEN instr(rest, '/') = 0 THEN NULL
+                    ELSE substr(rest, 1, instr(rest, '/') - 1) END AS child,
+                    size
+                FROM (
+                    SELECT substr(MIN(path), ?) AS rest, size FROM files
+                    WHERE path >= ? AND path < ?
+                    GROUP BY dev, ino
+                )
+            )
+            GROUP BY child
+            """,
+            (len(lo) + 1, lo, hi),
+        ).fetchall()
+        sizes = [(f"{lo}{child}", size) for child, size in rows if child is not None]
+        sizes.append((root, sum(size for _, size in rows)))
+        return sorted(
+            ((path, size) for path, size in sizes if size >= min_size),
+            key=lambda item: (item[1], item[0]),
+        )
+
+
+def parse_size(size: str) -> int:
+    """Parse a size like `500M` or `2G` (powers of 1024) into bytes."""
+    units = {"K": 1, "M": 2, "G": 3, "T": 4}
+    size = size.strip().upper().removesuffix("B")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * 1024 ** units[size[-1]])
+    return int(size)
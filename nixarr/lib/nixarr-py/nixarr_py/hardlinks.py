@@ -0,0 +1,295 @@
+"""
+Verification that *arr imports are hardlinks of their downloads.
+
+Nixarr keeps downloads and the library on one filesystem below `mediaDir`, so
+Sonarr, Radarr and Lidarr can import a seeding torrent's files as hardlinks:
+the file exists twice but is stored once. If permissions or a filesystem
+boundary get in the way, the *arrs silently fall back to copying, which
+doubles the disk space and I/O of every import.
+
+This lists the library files the *arrs know about through their APIs (in
+batches of items, or concurrently per item where an API only takes one), and
+the files of the download client's torrents (or of a downloads directory),
+stats every path once, and joins the two on (device, inode):
+
+- library files sharing an inode with a download are hardlinked,
+- library files with the same size and file name as a download file on a
+  different inode are copies (if the two are on different devices, they
+  can't be hardlinked at all, which points at a filesystem boundary),
+- library files that only share their size with download files are possible
+  copies, as the *arrs usually rename files on import; their contents
+  aren't read unless they're relinked, and
+- other library files have no download left to link to, and are ignored.
+
+Copies and possible copies on the same device can be relinked in place: the
+library file is compared with each download of its size, and once one has
+identical contents, it is atomically replaced with a hardlink to it.
+
+Example usage:
+    >>> from nixarr_py.hardlinks import find_copies, library_files, torrent_files
+    >>>
+    >>> copies = find_copies(library_files(["sonarr", "radarr"]), torrent_files())
+    >>> for copy in copies:
+    ...     print(copy.library_path, copy.download_path)
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+import filecmp
+import logging
+import os
+
+from nixarr_py import clients
+
+
+logger = logging.getLogger(__name__)
+
+
+SERVICES = ["lidarr", "radarr", "sonarr"]
+
+
+@dataclass(frozen=True)
+class LibraryFile:
+    service: str
+    path: str
+
+
+@dataclass
+class Copy:
+    """A library file that is a copy of a download rather than a hardlink."""
+
+    service: str
+    library_path: str
+    # The most likely download it was copied from: one with the same file
+    # name if there is one.
+    download_path: str
+    size: int
+    same_device: bool
+    # Whether a download has the same file name, rather than only the same
+    # size.
+    confirmed: bool = True
+    # Every download of the same size, `download_path` first.
+    candidates: list[str] = field(default_factory=list)
+
+
+@dataclass
+class VerifyStats:
+    library_files: int = 0
+    download_files: int = 0
+    hardlinked: int = 0
+    copied: int = 0
+    copied_bytes: int = 0
+    possibly_copied: int = 0
+    possibly_copied_bytes: int = 0
+    missing: int = 0
+
+
+def _chunks(ids: list[int], size: int) -> Iterator[list[int]]:
+    for start in range(0, len(ids), size):
+        end = start + size
+        yield ids[start:end]
+
+
+def _radarr_paths(batch_size: int, max_workers: int) -> list[str]:
+    import radarr
+
+    with clients.radarr_client() as client:
+        movie_ids = [movie.id for movie in radarr.MovieApi(client).list_movie()]
+        file_api = radarr.MovieFileApi(client)
+        return [
+            f.path
+            for chunk in _chunks(movie_ids, batch_size)
+            for f in file_api.list_movie_file(movie_id=chunk)
+            if f.path
+        ]
+
+
+def _lidarr_paths(batch_size: int, max_workers: int) -> list[str]:
+    import lidarr
+
+    with clients.lidarr_client() as client:
+        album_ids = [album.id for album in lidarr.AlbumApi(client).list_album()]
+        file_api = lidarr.TrackFileApi(client)
+        return [
+            f.path
+            for chunk in _chunks(album_ids, batch_size)
+            for f in file_api.list_track_file(album_id=chunk)
+            if f.path
+        ]
+
+
+def _sonarr_paths(batch_size: int, max_workers: int) -> list[str]:
+    import sonarr
+
+    # Sonarr only lists the episode files of one series per request.
+    with clients.sonarr_client() as client:
+        series_ids = [series.id for series in sonarr.SeriesApi(client).list_series()]
+        file_api = sonarr.EpisodeFileApi(client)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda series_id: file_api.list_episode_file(series_id=series_id),
+                series_ids,
+            )
+            return [f.path for files in results for f in files if f.path]
+
+
+LIBRARY_LISTERS = {
+    "lidarr": _lidarr_paths,
+    "radarr": _radarr_paths,
+    "sonarr": _sonarr_paths,
+}
+
+
+def library_files(
+    services: list[str], batch_size: int = 200, max_workers: int = 8
+) -> list[LibraryFile]:
+    """The paths of the files the given *arrs have imported."""
+    files = []
+    for service in services:
+        paths = LIBRARY_LISTERS[service](batch_size, max_workers)
+        logger.info(f"{service}: {len(paths)} library files")
+        files += [LibraryFile(service, path) for path in paths]
+    return files
+
+
+def torrent_files() -> list[str]:
+    """The paths of the files of all of Transmission's torrents."""
+    with clients.transmission_client() as client:
+        return [
+            os.path.join(torrent["downloadDir"], f["name"])
+            for torrent in client.iter_torrents(["downloadDir", "files"])
+            for f in torrent["files"]
+        ]
+
+
+def directory_files(root: str | Path) -> list[str]:
+    """The paths of all regular files below `root`."""
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths += [os.path.join(dirpath, name) for name in filenames]
+    return paths
+
+
+def _stat_all(
+    paths: Iterable[str], max_workers: int
+) -> dict[str, os.stat_result | None]:
+    def stat(path: str) -> os.stat_result | None:
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    unique = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(unique, executor.map(stat, unique)))
+
+
+def find_copies(
+    library: list[LibraryFile],
+    downloads: list[str],
+    max_workers: int = 16,
+    stats: VerifyStats | None = None,
+) -> list[Copy]:
+    """Library files that are copies of download files; see the module docs.
+
+    Every path is stat'ed once (concurrently, which helps on spinning disks
+    and network filesystems).
+    """
+    stats = stats if stats is not None else VerifyStats()
+    st = _stat_all([f.path for f in library] + downloads, max_workers)
+    download_inodes = set()
+    downloads_by_size: dict[int, list[str]] = defaultdict(list)
+    for path in dict.fromkeys(downloads):
+        s = st[path]
+        if s is None:
+            continue
+        stats.download_files += 1
+        download_inodes.add((s.st_dev, s.st_ino))
+        downloads_by_size[s.st_size].append(path)
+
+    copies = []
+    for f in library:
+        s = st[f.path]
+        stats.library_files += 1
+        if s is None:
+            stats.missing += 1
+            continue
+        if (s.st_dev, s.st_ino) in download_inodes:
+            stats.hardlinked += 1
+            continue
+        candidates = downloads_by_size.get(s.st_size, [])
+        if not candidates or s.st_size == 0:
+            continue
+        # A download with the same file name confirms the copy; the *arrs
+        # usually rename on import though, so a download of the same size only
+        # makes it a possible copy.
+        name = os.path.basename(f.path)
+        same_name = [c for c in candidates if os.path.basename(c) == name]
+        ordered = same_name + [c for c in candidates if c not in same_name]
+        download_st = st[ordered[0]]
+        assert download_st is not None
+        if same_name:
+            stats.copied += 1
+            stats.copied_bytes += s.st_size
+        else:
+            stats.possibly_copied += 1
+            stats.possibly_copied_bytes += s.st_size
+        copies.append(
+            Copy(
+                service=f.service,
+                library_path=f.path,
+                download_path=ordered[0],
+                size=s.st_size,
+                same_device=s.st_dev == download_st.st_dev,
+                confirmed=bool(same_name),
+                candidates=ordered,
+            )
+        )
+    return copies
+
+
+def relink(copy: Copy) -> bool:
+    """Replace a copied library file with a hardlink to its download.
+
+    Each download of the same size on the same device is compared with the
+    library file, and the first with identical contents is linked to. The
+    replacement is atomic: the hardlink is created next to the library file
+    and renamed over it. Updates `copy.download_path` to the download linked
+    to.
+
+    Returns:
+        bool: Whether the file was relinked.
+    """
+    device = os.stat(copy.library_path).st_dev
+    candidates = [
+        c
+        for c in copy.candidates or [copy.download_path]
+        if os.stat(c).st_dev == device
+    ]
+    if not candidates:
+        logger.warning(
+            f"Not relinking {copy.library_path}: on a different filesystem than {copy.download_path}"
+        )
+        return False
+    download = next(
+        (c for c in candidates if filecmp.cmp(copy.library_path, c, shallow=False)),
+        None,
+    )
+    if download is None:
+        logger.warning(
+            f"Not relinking {copy.library_path}: contents differ from all {len(candidates)} downloads of its size"
+        )
+        return False
+    library_path = Path(copy.library_path)
+    tmp_path = library_path.with_name(f".{library_path.name}.nixarr-relink")
+    os.link(download, tmp_path)
+    try:
+        os.replace(tmp_path, library_path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    copy.download_path = download
+    return True
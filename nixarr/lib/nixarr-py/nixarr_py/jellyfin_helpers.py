@@ -1,10 +1,10 @@
 from typing import TextIO
-import time
 import jellyfin
 import uuid
 
 
 from nixarr_py.config import get_jellyfin_config
+from nixarr_py.tracing import sleep, span
 
 
 def unauthenticated_client() -> jellyfin.ApiClient:
@@ -44,15 +44,16 @@ def admin_user_client() -> jellyfin.ApiClient:
         device_uuid = f.read().strip()
     uuid.UUID(device_uuid)  # Validate it's a proper UUID
     auth_header = f'MediaBrowser Client="nixarr-py", Device="nixarr-py", DeviceId="{device_uuid}", Version="1"'
-    auth = jellyfin.UserApi(client).authenticate_user_by_name(
-        jellyfin.AuthenticateUserByName(
-            username=cfg.admin_username,
-            pw=password,
-        ),
-        # The OpenAPI spec incorrectly says this endpoint doesn't require an
-        # auth header, but Jellyfin will reject the request without one.
-        _headers={"Authorization": auth_header},
-    )
+    with span("authenticate admin user", category="auth"):
+        auth = jellyfin.UserApi(client).authenticate_user_by_name(
+            jellyfin.AuthenticateUserByName(
+                username=cfg.admin_username,
+                pw=password,
+            ),
+            # The OpenAPI spec incorrectly says this endpoint doesn't require an
+            # auth header, but Jellyfin will reject the request without one.
+            _headers={"Authorization": auth_header},
+        )
     auth_header += f', Token="{auth.access_token}"'
     assert isinstance(client.configuration, jellyfin.Configuration)
     client.configuration.api_key["CustomAuthentication"] = auth_header
@@ -92,7 +93,8 @@ def ensure_api_key_and_file() -> None:
     """
     cfg = get_jellyfin_config()
     client = admin_user_client()
-    api_keys = jellyfin.ApiKeyApi(client).get_keys()
+    with span("fetch API keys", category="fetch"):
+        api_keys = jellyfin.ApiKeyApi(client).get_keys()
     existing_api_key: str | None = None
     if cfg.api_key_file.is_file():
         with open(cfg.api_key_file, "r", encoding="utf-8") as f:
@@ -102,18 +104,22 @@ def ensure_api_key_and_file() -> None:
             if item.app_name == "nixarr-py" and item.access_token is not None:
                 # API key already exists
                 if existing_api_key != item.access_token:
-                    with open(cfg.api_key_file, "w", encoding="utf-8") as f:
-                        f.write(item.access_token)
+                    with span("write API key file", category="write"):
+                        with open(cfg.api_key_file, "w", encoding="utf-8") as f:
+                            f.write(item.access_token)
                     return
 
     # No existing API key found; create a new one
-    jellyfin.ApiKeyApi(client).create_key("nixarr-py")
-    api_keys = jellyfin.ApiKeyApi(client).get_keys()
+    with span("create API key", category="write"):
+        jellyfin.ApiKeyApi(client).create_key("nixarr-py")
+    with span("fetch API keys", category="fetch"):
+        api_keys = jellyfin.ApiKeyApi(client).get_keys()
     assert api_keys.items is not None
     for item in api_keys.items:
         if item.app_name == "nixarr-py" and item.access_token is not None:
-            with open(cfg.api_key_file, "w", encoding="utf-8") as f:
-                f.write(item.access_token)
+            with span("write API key file", category="write"):
+                with open(cfg.api_key_file, "w", encoding="utf-8") as f:
+                    f.write(item.access_token)
             return
 
 
@@ -179,7 +185,8 @@ def ensure_admin_user_created_and_wizard_completed() -> None:
     client = unauthenticated_client()
     wait_until_ready(client)
 
-    startup_info = jellyfin.SystemApi(client).get_public_system_info()
+    with span("fetch system info", category="fetch"):
+        startup_info = jellyfin.SystemApi(client).get_public_system_info()
 
     if startup_info.startup_wizard_completed is False:
         cfg = get_jellyfin_config()
@@ -187,15 +194,16 @@ def ensure_admin_user_created_and_wizard_completed() -> None:
             password = f.read().strip()
 
         startup_api = jellyfin.StartupApi(client)
-        # `get_first_user` creates the first user if it doesn't exist yet.
-        startup_api.get_first_user()
-        startup_api.update_startup_user(
-            jellyfin.StartupUserDto(name=cfg.admin_username, password=password)
-        )
-        startup_api.complete_wizard()
+        with span("complete startup wizard", category="write"):
+            # `get_first_user` creates the first user if it doesn't exist yet.
+            startup_api.get_first_user()
+            startup_api.update_startup_user(
+                jellyfin.StartupUserDto(name=cfg.admin_username, password=password)
+            )
+            startup_api.complete_wizard()
         # Waiting *immediately* after completing the wizard seems to incorrectly
         # report that the server is ready, so we wait a bit before... waiting.
-        time.sleep(5)
+        sleep(5)
         wait_until_ready(client)
 
     admin_user_client()  # Ensure admin user client works
@@ -213,17 +221,18 @@ def wait_until_ready(client: jellyfin.ApiClient) -> None:
     """
     from jellyfin.exceptions import ServiceException
 
-    while True:
-        try:
-            jellyfin.SystemApi(client).get_public_system_info()
-            break
-        except ServiceException as e:
-            # Jellyfin returns 503 to indicate that the server is still starting
-            # up
-            if e.status == 503:
-                wait_secs = 5
-                if e.headers and "Retry-After" in e.headers:
-                    wait_secs = int(e.headers["Retry-After"])
-                time.sleep(wait_secs)
-            else:
-                raise
+    with span("wait until ready", category="wait"):
+        while True:
+            try:
+                jellyfin.SystemApi(client).get_public_system_info()
+                break
+            except ServiceException as e:
+                # Jellyfin returns 503 to indicate that the server is still
+                # starting up
+                if e.status == 503:
+                    wait_secs = 5
+                    if e.headers and "Retry-After" in e.headers:
+                        wait_secs = int(e.headers["Retry-After"])
+                    sleep(wait_secs)
+                else:
+                    raise
@@ -0,0 +1,251 @@
+"""
+Warm Jellyfin's image cache ahead of users.
+
+Jellyfin resizes posters, backdrops and thumbnails on demand and caches the
+result per requested size. After a restore, a migration or an image cache
+wipe, the first visit to each library page is therefore slow. This walks all
+library items through the Jellyfin API and requests their images at the
+sizes clients ask for, so the resized images are cached before anyone browses.
+
+Items are walked in pages, oldest first, and the offset of the last finished
+page is recorded in a state file, so an interrupted run resumes where it
+stopped (items added in the meantime sort last and are picked up too).
+
+Example usage:
+    >>> from nixarr_py.jellyfin_image_prewarm import ImagePrewarmer, parse_image_size
+    >>>
+    >>> prewarmer = ImagePrewarmer(
+    ...     sizes=[parse_image_size("Primary:300x450")],
+    ...     state_file="/tmp/prewarm.json",
+    ...     concurrency=4,
+    ... )
+    >>> stats = prewarmer.run()
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+import threading
+import time
+
+import jellyfin
+
+from nixarr_py.clients import jellyfin_client
+from nixarr_py.utils import atomic_write_json
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_ITEM_TYPES = [
+    "Movie",
+    "Series",
+    "Season",
+    "Episode",
+    "BoxSet",
+    "MusicAlbum",
+    "MusicArtist",
+]
+
+
+@dataclass(frozen=True)
+class ImageSize:
+    """An image type and the size clients request it at."""
+
+    image_type: str
+    fill_width: int
+    fill_height: int
+
+
+# Sizes requested by Jellyfin Web's poster, backdrop and thumb cards and by
+# its item details backdrop.
+DEFAULT_SIZES = [
+    ImageSize("Primary", 300, 450),
+    ImageSize("Backdrop", 480, 270),
+    ImageSize("Backdrop", 1920, 1080),
+    ImageSize("Thumb", 480, 270),
+]
+
+
+def parse_image_size(spec: str) -> ImageSize:
+    """Parse an image size like `Primary:300x450`."""
+    image_type, _, dimensions = spec.partition(":")
+    width, _, height = dimensions.partition("x")
+    if image_type not in ["Primary", "Backdrop", "Thumb"] or not height:
+        raise ValueError(f"Invalid image size '{spec}', expected e.g. Primary:300x450")
+    return ImageSize(image_type, int(width), int(height))
+
+
+@dataclass
+class PrewarmStats:
+    """Progress of an `ImagePrewarmer.run`."""
+
+    items: int = 0
+    images: int = 0
+    bytes: int = 0
+    failures: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.items} items, {self.images} images "
+            f"({self.images / elapsed:.1f}/s, {self.bytes / elapsed / 1e6:.1f} MB/s), "
+            f"{self.failures} failures in {elapsed:.0f}s"
+        )
+
+
+class ImagePrewarmer:
+    """Requests the images of all library items at the given sizes.
+
+    Args:
+        sizes: Image types and sizes to request.
+        state_file: Where to record progress, for resuming.
+        concurrency: Maximum number of image requests in flight at once.
+        max_load: Pause while the 1-minute load average is above this, so
+            resizing doesn't starve Jellyfin's other work (like transcoding).
+        item_types: Jellyfin item kinds to walk.
+        page_size: Number of items fetched (and recorded as done) at a time.
+        quality: JPEG quality to request; clients use 96 by default.
+    """
+
+    def __init__(
+        self,
+        sizes: list[ImageSize],
+        state_file: str | Path,
+        concurrency: int = 4,
+        max_load: float | None = None,
+        item_types: list[str] = DEFAULT_ITEM_TYPES,
+        page_size: int = 100,
+        quality: int = 96,
+    ) -> None:
+        self.sizes = sizes
+        self.state_file = Path(state_file)
+        self.concurrency = concurrency
+        self.max_load = max_load
+        self.item_types = item_types
+        self.page_size = page_size
+        self.quality = quality
+        self._lock = threading.Lock()
+
+    def _load_offset(self) -> int:
+        try:
+            return int(json.loads(self.state_file.read_text())["next_start_index"])
+        except FileNotFoundError:
+            return 0
+        except (KeyError, TypeError, ValueError) as e:
+            # ValueError includes json.JSONDecodeError, e.g. from a truncated
+            # file.
+            logger.warning(
+                f"Ignoring unreadable state file {self.state_file} ({e!r}); starting from the first item"
+            )
+            return 0
+
+    def _save_offset(self, offset: int) -> None:
+        atomic_write_json(self.state_file, {"next_start_index": offset})
+
+    def _wait_for_load(self) -> None:
+        if self.max_load is None:
+            return
+        while os.getloadavg()[0] > self.max_load:
+            time.sleep(5)
+
+    def _requests(self, item: Any) -> list[tuple[str, ImageSize, str]]:
+        tags = item.image_tags or {}
+        backdrops = item.backdrop_image_tags or []
+        requests = []
+        for size in self.sizes:
+            if size.image_type == "Backdrop":
+                tag = backdrops[0] if backdrops else None
+            else:
+                tag = tags.get(size.image_type)
+            if tag is not None:
+                requests.append((item.id, size, tag))
+        return requests
+
+    def _fetch(
+        self,
+        image_api: jellyfin.ImageApi,
+        item_id: str,
+        size: ImageSize,
+        tag: str,
+        stats: PrewarmStats,
+    ) -> None:
+        self._wait_for_load()
+        try:
+            response = image_api.get_item_image_without_preload_content(
+                item_id=item_id,
+                image_type=size.image_type,
+                fill_width=size.fill_width,
+                fill_height=size.fill_height,
+                quality=self.quality,
+                tag=tag,
+            )
+            try:
+                size_bytes = len(response.read())
+                ok = 200 <= response.status < 300
+            finally:
+                response.release_conn()
+        except Exception as e:
+            logger.debug(f"Failed to fetch {size} of item {item_id}: {e}")
+            ok = False
+        with self._lock:
+            if ok:
+                stats.images += 1
+                stats.bytes += size_bytes
+            else:
+                stats.failures += 1
+
+    def run(self, report_every_secs: float = 30) -> PrewarmStats:
+        """Warm the images of all items, resuming from the last run.
+
+        Returns:
+            PrewarmStats: What this run did.
+        """
+        stats = PrewarmStats()
+        offset = self._load_offset()
+        if offset:
+            logger.info(f"Resuming at item {offset}")
+        last_report = time.monotonic()
+        with (
+            jellyfin_client() as client,
+            ThreadPoolExecutor(max_workers=self.concurrency) as executor,
+        ):
+            items_api = jellyfin.ItemsApi(client)
+            image_api = jellyfin.ImageApi(client)
+            while True:
+                result = items_api.get_items(
+                    recursive=True,
+                    include_item_types=self.item_types,
+                    sort_by=["DateCreated", "SortName"],
+                    sort_order=["Ascending"],
+                    start_index=offset,
+                    limit=self.page_size,
+                    enable_images=True,
+                    enable_user_data=False,
+                )
+                items = result.items or []
+                futures = [
+                    executor.submit(self._fetch, image_api, *request, stats)
+                    for item in items
+                    for request in self._requests(item)
+                ]
+                for future in futures:
+                    future.result()
+                stats.items += len(items)
+                offset += len(items)
+                total = result.total_record_count or 0
+                if not items or offset >= total:
+                    break
+                self._save_offset(offset)
+                if time.monotonic() - last_report >= report_every_secs:
+                    logger.info(f"{offset}/{total} items: {stats.summary()}")
+                    last_report = time.monotonic()
+        # Done; the next run starts from the beginning again.
+        self._save_offset(0)
+        logger.info(f"Finished: {stats.summary()}")
+        return stats
@@ -0,0 +1,538 @@
+"""
+Synthetic playback latency probing of Jellyfin.
+
+How long playback takes to start depends on the client, the item, Jellyfin's
+hardware acceleration and version, and is otherwise only ever felt, not
+measured. The probe here plays test items the way a client does and times
+each step:
+
+- the `PlaybackInfo` request, which picks the media source and play method,
+- for transcoding profiles, the HLS master playlist (time to first byte), the
+  variant playlist and the first few segments, one after another: the time
+  until the first segment is downloaded is what a viewer waits for, and the
+  media seconds per wall-clock second of the following segments show whether
+  the transcode keeps up (a ratio below 1 means buffering),
+- for direct play, the static stream, read in chunks the size of a segment.
+
+Transcodes are stopped after each probe. Results record the Jellyfin version
+and hardware acceleration type, so results from before and after a settings
+change or upgrade can be compared; they're stored one JSON object per line
+and pruned after a retention period, and the results of a run can be written
+in the Prometheus text format for the node exporter's textfile collector.
+
+Example usage:
+    >>> from nixarr_py.jellyfin_playback_probe import (
+    ...     PROFILES,
+    ...     PlaybackProbe,
+    ...     ResultStore,
+    ... )
+    >>>
+    >>> with PlaybackProbe(segments=5) as probe:
+    ...     result = probe.run("Big Buck Bunny", PROFILES["1080p-transcode"])
+    >>> print(result.first_segment_secs, result.realtime_ratio)
+    >>> ResultStore("/tmp/playback-probe.jsonl").append(result)
+"""
+
+from collections import defaultdict
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Literal
+import json
+import logging
+import re
+import statistics
+import time
+import urllib.parse
+import uuid
+
+import urllib3
+
+from nixarr_py.jellyfin_helpers import api_key_client
+from nixarr_py.utils import atomic_write, escape_label, format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+DEVICE_ID = "nixarr-playback-probe"
+
+ITEM_ID_PATTERN = re.compile(r"[0-9a-f]{32}|[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}")
+
+
+@dataclass(frozen=True)
+class ProbeProfile:
+    """How the probe asks Jellyfin to play an item.
+
+    "direct" reads the file as-is (direct play); "hls" requests an HLS stream
+    with the given limits, transcoding unless `allow_stream_copy` is set and
+    the source already fits.
+    """
+
+    name: str
+    mode: Literal["direct", "hls"] = "hls"
+    video_codec: str = "h264"
+    audio_codec: str = "aac"
+    max_width: int | None = None
+    max_height: int | None = None
+    video_bitrate: int | None = None
+    audio_bitrate: int = 192_000
+    allow_stream_copy: bool = False
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in [
+        ProbeProfile(name="direct", mode="direct"),
+        ProbeProfile(
+            name="1080p-transcode",
+            max_width=1920,
+            max_height=1080,
+            video_bitrate=8_000_000,
+        ),
+        # Meant for a 4K HDR test item: Jellyfin tone-maps when transcoding
+        # HDR to SDR H.264, if tone mapping is enabled.
+        ProbeProfile(
+            name="4k-hdr-tonemap",
+            max_width=1920,
+            max_height=1080,
+            video_bitrate=10_000_000,
+        ),
+    ]
+}
+
+
+@dataclass
+class ProbeResult:
+    timestamp: float
+    item: str
+    item_name: str
+    profile: str
+    server_version: str
+    hardware_acceleration: str
+    playback_info_secs: float | None = None
+    # The master playlist for HLS, or the stream for direct play.
+    ttfb_secs: float | None = None
+    # From requesting the stream until the first segment (or chunk) is
+    # downloaded.
+    first_segment_secs: float | None = None
+    segments: int = 0
+    segment_bytes: int = 0
+    # Over the segments after the first one.
+    throughput_bytes_per_sec: float | None = None
+    realtime_ratio: float | None = None
+    error: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ProbeResult":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+class JellyfinHttp:
+    """Raw HTTP access to Jellyfin with the Nixarr API key, for timing
+    streams byte by byte, which the generated client doesn't allow."""
+
+    def __init__(self, timeout: float = 120) -> None:
+        # Only for its configuration; requests go through our own pool.
+        with api_key_client() as client:
+            configuration = client.configuration
+        self.base_url = configuration.host.rstrip("/")
+        self.timeout = timeout
+        self._headers = {
+            "Authorization": configuration.api_key["CustomAuthentication"],
+            "Content-Type": "application/json",
+        }
+        self._pool = urllib3.PoolManager(maxsize=2)
+
+    def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        self._pool.clear()
+
+    def url(self, path: str, params: dict[str, Any] | None = None) -> str:
+        url = self.base_url + path
+        if params:
+            query = {k: v for k, v in params.items() if v is not None}
+            url += "?" + urllib.parse.urlencode(query)
+        return url
+
+    def open(self, method: str, url: str, body: Any = None) -> urllib3.BaseHTTPResponse:
+        """Send a request without reading the response body yet."""
+        response = self._pool.request(
+            method,
+            url,
+            body=json.dumps(body) if body is not None else None,
+            headers=self._headers,
+            timeout=self.timeout,
+            preload_content=False,
+        )
+        if not 200 <= response.status < 300:
+            data = response.read().decode(errors="replace")
+            raise RuntimeError(f"HTTP {response.status} for {method} {url}: {data}")
+        return response
+
+    def read(self, method: str, url: str, body: Any = None) -> tuple[float, bytes]:
+        """Send a request and read the response, returning the time to its
+        first byte (from sending the request) and its body."""
+        start = time.monotonic()
+        response = self.open(method, url, body)
+        try:
+            first = response.read(1)
+            ttfb = time.monotonic() - start
+            return ttfb, first + response.read()
+        finally:
+            response.release_conn()
+
+    def json(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        body: Any = None,
+    ) -> Any:
+        _, data = self.read(method, self.url(path, params), body)
+        return json.loads(data) if data else None
+
+
+def _playlist_uris(base_url: str, playlist: str) -> list[tuple[str, float | None]]:
+    """The URIs in an m3u8 playlist, with their `#EXTINF` durations."""
+    uris = []
+    duration = None
+    for line in playlist.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line.removeprefix("#EXTINF:").split(",")[0])
+        elif line and not line.startswith("#"):
+            uris.append((urllib.parse.urljoin(base_url, line), duration))
+            duration = None
+    return uris
+
+
+class PlaybackProbe:
+    """Plays test items and times the start of playback; see the module docs.
+
+    Args:
+        segments: Number of segments (or segment-sized chunks for direct
+            play) to download per probe.
+        chunk_bytes: Chunk size for direct play.
+        timeout: Timeout in seconds for each request. Segment requests wait
+            for the transcode to produce the segment.
+    """
+
+    def __init__(
+        self, segments: int = 5, chunk_bytes: int = 4 * 2**20, timeout: float = 120
+    ) -> None:
+        self.segments = segments
+        self.chunk_bytes = chunk_bytes
+        self.http = JellyfinHttp(timeout)
+        info = self.http.json("GET", "/System/Info")
+        self.server_version = info.get("Version") or ""
+        encoding = self.http.json("GET", "/System/Configuration/encoding")
+        self.hardware_acceleration = encoding.get("HardwareAccelerationType") or "none"
+
+    def __enter__(self) -> "PlaybackProbe":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the probe's HTTP connections."""
+        self.http.close()
+
+    def resolve(self, item: str) -> tuple[str, str]:
+        """The ID and name of a test item, given by ID or by name."""
+        if ITEM_ID_PATTERN.fullmatch(item):
+            found = self.http.json("GET", "/Items", {"Ids": item})
+        else:
+            found = self.http.json(
+                "GET",
+                "/Items",
+                {
+                    "SearchTerm": item,
+                    "Recursive": "true",
+                    "IncludeItemTypes": "Movie,Episode,Video",
+                    "Limit": 1,
+                },
+            )
+        items = found.get("Items") or []
+        if not items:
+            raise ValueError(f"No Jellyfin item '{item}'")
+        return items[0]["Id"], items[0].get("Name") or item
+
+    def _direct(
+        self, result: ProbeResult, item_id: str, source: dict[str, Any]
+    ) -> None:
+        url = self.http.url(
+            f"/Videos/{item_id}/stream",
+            {"Static": "true", "MediaSourceId": source["Id"], "DeviceId": DEVICE_ID},
+        )
+        start = time.monotonic()
+        response = self.http.open("GET", url)
+        steady_bytes = 0
+        try:
+            first = response.read(1)
+            result.ttfb_secs = time.monotonic() - start
+            first += response.read(self.chunk_bytes - 1)
+            result.first_segment_secs = time.monotonic() - start
+            result.segments, result.segment_bytes = 1, len(first)
+            steady_start = time.monotonic()
+            for _ in range(self.segments - 1):
+                chunk = response.read(self.chunk_bytes)
+                if not chunk:
+                    break
+                result.segments += 1
+                result.segment_bytes += len(chunk)
+                steady_bytes += len(chunk)
+            elapsed = max(time.monotonic() - steady_start, 1e-6)
+        finally:
+            # The rest of the file isn't read, so the connection can't be
+            # reused.
+            response.close()
+        if steady_bytes:
+            result.throughput_bytes_per_sec = steady_bytes / elapsed
+            bitrate = source.get("Bitrate")
+            if bitrate:
+                result.realtime_ratio = result.throughput_bytes_per_sec * 8 / bitrate
+
+    def _hls(
+        self,
+        result: ProbeResult,
+        item_id: str,
+        source: dict[str, Any],
+        play_session_id: str,
+        profile: ProbeProfile,
+    ) -> None:
+        master_url = self.http.url(
+            f"/Videos/{item_id}/master.m3u8",
+            {
+                "MediaSourceId": source["Id"],
+                "DeviceId": DEVICE_ID,
+                "PlaySessionId": play_session_id,
+                "VideoCodec": profile.video_codec,
+                "AudioCodec": profile.audio_codec,
+                "MaxWidth": profile.max_width,
+                "MaxHeight": profile.max_height,
+                "VideoBitrate": profile.video_bitrate,
+                "AudioBitrate": profile.audio_bitrate,
+                "TranscodingMaxAudioChannels": 2,
+                "SegmentContainer": "ts",
+                "AllowVideoStreamCopy": str(profile.allow_stream_copy).lower(),
+                "AllowAudioStreamCopy": str(profile.allow_stream_copy).lower(),
+            },
+        )
+        start = time.monotonic()
+        result.ttfb_secs, master = self.http.read("GET", master_url)
+        variants = _playlist_uris(master_url, master.decode())
+        if not variants:
+            raise ValueError("Master playlist lists no variant")
+        variant_url = variants[0][0]
+        _, variant = self.http.read("GET", variant_url)
+        segments = _playlist_uris(variant_url, variant.decode())[: self.segments]
+        steady_start = None
+        steady_bytes = 0
+        steady_media_secs = 0.0
+        for i, (segment_url, duration) in enumerate(segments):
+            _, data = self.http.read("GET", segment_url)
+            result.segments += 1
+            result.segment_bytes += len(data)
+            if i == 0:
+                result.first_segment_secs = time.monotonic() - start
+                steady_start = time.monotonic()
+            else:
+                steady_bytes += len(data)
+                steady_media_secs += duration or 0
+        if result.segments > 1 and steady_start is not None:
+            elapsed = max(time.monotonic() - steady_start, 1e-6)
+            result.throughput_bytes_per_sec = steady_bytes / elapsed
+            if steady_media_secs:
+                result.realtime_ratio = steady_media_secs / elapsed
+
+    def _stop_transcode(self, play_session_id: str) -> None:
+        try:
+            self.http.json(
+                "DELETE",
+                "/Videos/ActiveEncodings",
+                {"DeviceId": DEVICE_ID, "PlaySessionId": play_session_id},
+            )
+        except Exception as e:
+            logger.warning(f"Failed to stop the probe's transcode: {e}")
+
+    def run(self, item: str, profile: ProbeProfile) -> ProbeResult:
+        """Probe one item with one profile. Failures are recorded in the
+        result's `error` rather than raised."""
+        result = ProbeResult(
+            timestamp=time.time(),
+            item=item,
+            item_name=item,
+            profile=profile.name,
+            server_version=self.server_version,
+            hardware_acceleration=self.hardware_acceleration,
+        )
+        play_session_id = uuid.uuid4().hex
+        try:
+            item_id, result.item_name = self.resolve(item)
+            start = time.monotonic()
+            info = self.http.json(
+                "POST",
+                f"/Items/{item_id}/PlaybackInfo",
+                body={"DeviceId": DEVICE_ID},
+            )
+            result.playback_info_secs = time.monotonic() - start
+            sources = info.get("MediaSources") or []
+            if not sources:
+                raise ValueError("Item has no media source")
+            play_session_id = info.get("PlaySessionId") or play_session_id
+            if profile.mode == "direct":
+                self._direct(result, item_id, sources[0])
+            else:
+                self._hls(result, item_id, sources[0], play_session_id, profile)
+        except Exception as e:
+            result.error = str(e)
+            logger.warning(f"Probe of '{item}' with {profile.name} failed: {e}")
+        finally:
+            if profile.mode == "hls":
+                self._stop_transcode(play_session_id)
+        return result
+
+
+class ResultStore:
+    """Probe results, one JSON object per line."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def append(self, result: ProbeResult) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(result)) + "\n")
+
+    def load(self) -> list[ProbeResult]:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [
+                ProbeResult.from_dict(json.loads(line)) for line in f if line.strip()
+            ]
+
+    def prune(self, retention_days: float) -> int:
+        """Delete results older than `retention_days`.
+
+        Returns:
+            int: The number of results deleted.
+        """
+        cutoff = time.time() - retention_days * 86400
+        results = self.load()
+        kept = [result for result in results if result.timestamp >= cutoff]
+        if len(kept) < len(results):
+            atomic_write(
+                self.path,
+                "".join(json.dumps(asdict(result)) + "\n" for result in kept),
+            )
+        return len(results) - len(kept)
+
+
+def _format_secs(secs: float | None) -> str:
+    return "-" if secs is None else f"{secs:.2f}s"
+
+
+def format_comparison(results: list[ProbeResult]) -> str:
+    """Median results per item, profile, Jellyfin version and hardware
+    acceleration, so settings and versions can be compared."""
+    groups: dict[tuple[str, str, str, str], list[ProbeResult]] = defaultdict(list)
+    for result in results:
+        key = (
+            result.item_name,
+            result.profile,
+            result.server_version,
+            result.hardware_acceleration,
+        )
+        groups[key].append(result)
+
+    def median(values: list[float | None]) -> float | None:
+        known = [v for v in values if v is not None]
+        return statistics.median(known) if known else None
+
+    header = [
+        "item",
+        "profile",
+        "version",
+        "hwaccel",
+        "runs",
+        "fail",
+        "info",
+        "ttfb",
+        "1st seg",
+        "Mb/s",
+        "x realtime",
+    ]
+    rows = [header]
+    for (item, profile, version, hwaccel), group in sorted(groups.items()):
+        ok = [r for r in group if r.error is None]
+        throughput = median([r.throughput_bytes_per_sec for r in ok])
+        ratio = median([r.realtime_ratio for r in ok])
+        rows.append(
+            [
+                item,
+                profile,
+                version,
+                hwaccel,
+                str(len(group)),
+                str(len(group) - len(ok)),
+                _format_secs(median([r.playback_info_secs for r in ok])),
+                _format_secs(median([r.ttfb_secs for r in ok])),
+                _format_secs(median([r.first_segment_secs for r in ok])),
+                "-" if throughput is None else f"{throughput * 8 / 1e6:.1f}",
+                "-" if ratio is None else f"{ratio:.1f}",
+            ]
+        )
+    return format_table(rows)
+
+
+METRICS = [
+    ("playback_info_seconds", "Duration of the PlaybackInfo request."),
+    ("ttfb_seconds", "Time to the first byte of the master playlist or stream."),
+    ("first_segment_seconds", "Time until the first segment was downloaded."),
+    ("throughput_bytes_per_second", "Download throughput of the following segments."),
+    (
+        "realtime_ratio",
+        "Media seconds per wall-clock second of the following segments.",
+    ),
+    ("success", "Whether the probe succeeded."),
+    ("timestamp_seconds", "When the probe ran."),
+]
+
+
+def format_prometheus(
+    results: list[ProbeResult], prefix: str = "nixarr_jellyfin_playback_probe_"
+) -> str:
+    """The latest of the given results per item and profile in the
+    Prometheus text exposition format."""
+    latest: dict[tuple[str, str], ProbeResult] = {}
+    for result in sorted(results, key=lambda r: r.timestamp):
+        latest[(result.item, result.profile)] = result
+    samples: dict[str, list[str]] = defaultdict(list)
+    for result in latest.values():
+        labels = (
+            f'item="{escape_label(result.item_name)}",profile="{escape_label(result.profile)}",'
+            f'version="{escape_label(result.server_version)}",hwaccel="{escape_label(result.hardware_acceleration)}"'
+        )
+        values = {
+            "playback_info_seconds": result.playback_info_secs,
+            "ttfb_seconds": result.ttfb_secs,
+            "first_segment_seconds": result.first_segment_secs,
+            "throughput_bytes_per_second": result.throughput_bytes_per_sec,
+            "realtime_ratio": result.realtime_ratio,
+            "success": int(result.error is None),
+            "timestamp_seconds": result.timestamp,
+        }
+        for name, value in values.items():
+            if value is not None:
+                samples[name].append(f"{prefix}{name}{{{labels}}} {value:.15g}")
+
+    lines = []
+    for name, help in METRICS:
+        if not samples[name]:
+            continue
+        lines += [f"# HELP {prefix}{name} {help}", f"# TYPE {prefix}{name} gauge"]
+        lines += samples[name]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,460 @@
+"""
+Throughput profiling of Jellyfin library scans.
+
+When a library scan suddenly takes hours, say after a Jellyfin upgrade, it's
+hard to tell whether the disks, ffprobe or plugins are to blame. The profiler
+here triggers a scan, either of the whole library (Jellyfin's "Scan Media
+Library" task) or of a single library (virtual folder), and follows it until
+it finishes, sampling every few seconds:
+
+- the scan's progress, from the scheduled task or the library's refresh
+  status,
+- the number of items in the scanned libraries, and
+- if it runs on the Jellyfin host, the CPU time of the Jellyfin process and
+  of its finished child processes (ffprobe and ffmpeg), and the bytes it read
+  from disk.
+
+From the samples it derives the total duration, the time spent in each
+phase of the scan, the library items per second, and how the time splits between
+Jellyfin itself, its children and waiting (mostly on disk). A scan where
+child CPU time dominates is bound by ffprobe, one where little CPU is used
+but much is read waits on disk, and plugins' post-scan tasks show up in the
+post-scan phase.
+
+Scans of small libraries can finish before the first sample. The duration of
+such a scan of all libraries is then taken from the scan task's last
+execution; that of a single library's is unknown.
+
+Each run is appended to a JSON lines file along with the Jellyfin version,
+the host and an optional label, so runs can be compared across versions,
+hardware and settings.
+
+Example usage:
+    >>> from nixarr_py.jellyfin_scan_profiler import ProfileStore, ScanProfiler
+    >>>
+    >>> profile = ScanProfiler(folder="Movies").run(label="10.10.7, hdd")
+    >>> ProfileStore("/tmp/scan-profiles.jsonl").append(profile)
+"""
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+import platform
+import time
+
+import jellyfin
+
+from nixarr_py.clients import jellyfin_client
+from nixarr_py.utils import format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+SCAN_TASK_KEY = "RefreshLibrary"
+
+# Phases of the Scan Media Library task, by the progress range Jellyfin
+# reports for them: validating the root folders, walking and refreshing the
+# libraries' items (reported as 96% of their progress), and the post-scan
+# tasks (people, genres, studios, collections, and plugins' post-scan tasks,
+# the last 4%).
+PHASES = [
+    ("prepare", 0.0, 1.0),
+    ("validate", 1.0, 96.0),
+    ("post-scan", 96.0, 100.0),
+]
+
+# How long to wait for a scan to show up as running (or, for a scan of all
+# libraries, as the scan task's last execution) before assuming it already
+# finished.
+START_GRACE_SECS = 30
+
+
+@dataclass
+class ScanSample:
+    elapsed_secs: float
+    progress: float | None
+    items: int
+    jellyfin_cpu_secs: float | None = None
+    children_cpu_secs: float | None = None
+    read_bytes: int | None = None
+
+
+@dataclass
+class ScanProfile:
+    started: float
+    label: str | None
+    server_version: str | None
+    host: dict[str, Any]
+    # The scanned library, or None for a scan of all libraries.
+    folder: str | None
+    # None if the scan finished before it was seen running, and Jellyfin
+    # doesn't record how long it took.
+    duration_secs: float | None = 0.0
+    queued_secs: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)
+    items_before: int = 0
+    items_after: int = 0
+    # The number of items in the scanned libraries after the scan, per second
+    # of it. A scan validates every item, so this compares runs over similar
+    # libraries; it isn't the rate at which new items were added.
+    library_items_per_sec: float | None = 0.0
+    jellyfin_cpu_secs: float | None = None
+    children_cpu_secs: float | None = None
+    read_bytes: int | None = None
+    finished: bool = False
+    # Whether the samples cover the scan, rather than only its aftermath.
+    seen_running: bool = True
+    samples: list[ScanSample] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ScanProfile":
+        data = dict(data)
+        samples = [ScanSample(**sample) for sample in data.pop("samples", [])]
+        # Renamed from `items_per_sec`.
+        if "items_per_sec" in data:
+            data["library_items_per_sec"] = data.pop("items_per_sec")
+        return cls(**data, samples=samples)
+
+
+def _find_jellyfin_pid() -> int | None:
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            comm = Path(entry.path, "comm").read_text().strip()
+        except OSError:
+            continue
+        if comm == "jellyfin":
+            return int(entry.name)
+    return None
+
+
+def _process_stats(pid: int) -> tuple[float, float, int | None] | None:
+    """CPU seconds of a process and of its waited-for children, and its reads."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    # The command name may contain spaces; the fields after it don't.
+    after_comm = stat.rindex(")") + 2
+    fields = stat[after_comm:].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    own = (int(fields[11]) + int(fields[12])) / ticks
+    children = (int(fields[13]) + int(fields[14])) / ticks
+    read_bytes = None
+    try:
+        for line in Path(f"/proc/{pid}/io").read_text().splitlines():
+            if line.startswith("read_bytes:"):
+                read_bytes = int(line.split()[1])
+    except OSError:
+        pass
+    return own, children, read_bytes
+
+
+def _timestamp(value: Any) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.timestamp()
+
+
+def _host_info() -> dict[str, Any]:
+    return {
+        "name": platform.node(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "kernel": platform.release(),
+    }
+
+
+class ScanProfiler:
+    """Trigger a library scan and profile it; see the module docs.
+
+    Args:
+        folder: The name of the library to scan, or None to scan all.
+        interval_secs: Time between samples.
+        timeout_secs: Give up following the scan after this long.
+    """
+
+    def __init__(
+        self,
+        folder: str | None = None,
+        interval_secs: float = 2,
+        timeout_secs: float | None = None,
+    ) -> None:
+        self.folder = folder
+        self.interval_secs = interval_secs
+        self.timeout_secs = timeout_secs
+
+    def _folder_id(self, client: jellyfin.ApiClient) -> str | None:
+        if self.folder is None:
+            return None
+        folders = jellyfin.LibraryStructureApi(client).get_virtual_folders()
+        for folder in folders:
+            if folder.name == self.folder:
+                return folder.item_id
+        names = ", ".join(f"'{folder.name}'" for folder in folders)
+        raise ValueError(f"No library named '{self.folder}'; libraries: {names}")
+
+    def _scan_task(self, tasks_api: jellyfin.ScheduledTasksApi) -> Any:
+        for task in tasks_api.get_tasks():
+            if task.key == SCAN_TASK_KEY:
+                return task
+        raise ValueError(f"Jellyfin has no '{SCAN_TASK_KEY}' scheduled task")
+
+    def _last_run(self, client: jellyfin.ApiClient) -> tuple[float, float] | None:
+        """The start and end of the scan task's last execution."""
+        task = self._scan_task(jellyfin.ScheduledTasksApi(client))
+        result = task.last_execution_result
+        if result is None:
+            return None
+        start, end = _timestamp(result.start_time_utc), _timestamp(result.end_time_utc)
+        if start is None or end is None:
+            return None
+        return start, end
+
+    def _folder_progress(self, client: jellyfin.ApiClient) -> tuple[bool, float | None]:
+        for folder in jellyfin.LibraryStructureApi(client).get_virtual_folders():
+            if folder.name == self.folder:
+                active = getattr(folder.refresh_status, "value", folder.refresh_status)
+                return active == "Active", folder.refresh_progress
+        return False, None
+
+    def _progress(self, client: jellyfin.ApiClient) -> tuple[bool, float | None]:
+        """Whether the scan is running, and its progress in percent."""
+        if self.folder is not None:
+            return self._folder_progress(client)
+        task = self._scan_task(jellyfin.ScheduledTasksApi(client))
+        state = getattr(task.state, "value", task.state)
+        return state != "Idle", task.current_progress_percentage
+
+    def _item_count(self, items_api: jellyfin.ItemsApi, folder_id: str | None) -> int:
+        result = items_api.get_items(
+            recursive=True,
+            parent_id=folder_id,
+            limit=0,
+            enable_total_record_count=True,
+            enable_images=False,
+            enable_user_data=False,
+        )
+        return result.total_record_count or 0
+
+    def _trigger(self, client: jellyfin.ApiClient, folder_id: str | None) -> None:
+        if folder_id is None:
+            task = self._scan_task(jellyfin.ScheduledTasksApi(client))
+            if getattr(task.state, "value", task.state) != "Idle":
+                raise ValueError("A library scan is already running")
+            jellyfin.LibraryApi(client).refresh_library()
+        else:
+            running, _ = self._folder_progress(client)
+            if running:
+                raise ValueError(f"Library '{self.folder}' is already being scanned")
+            # A default refresh of a library scans it for new, changed and
+            # removed files, like a library scan does.
+            jellyfin.ItemRefreshApi(client).refresh_item(
+                item_id=folder_id,
+                metadata_refresh_mode="Default",
+                image_refresh_mode="Default",
+                replace_all_metadata=False,
+                replace_all_images=False,
+            )
+
+    def run(self, label: str | None = None) -> ScanProfile:
+        """Trigger a scan and follow it until it finishes or times out."""
+        pid = _find_jellyfin_pid()
+        if pid is None:
+            logger.info("Jellyfin isn't running on this host; not sampling CPU and I/O")
+        with jellyfin_client() as client:
+            items_api = jellyfin.ItemsApi(client)
+            folder_id = self._folder_id(client)
+            server_version = jellyfin.SystemApi(client).get_system_info().version
+            profile = ScanProfile(
+                started=time.time(),
+                label=label,
+                server_version=server_version,
+                host=_host_info(),
+                folder=self.folder,
+            )
+            profile.items_before = self._item_count(items_api, folder_id)
+            base = _process_stats(pid) if pid is not None else None
+            last_run = self._last_run(client) if folder_id is None else None
+
+            self._trigger(client, folder_id)
+            start = time.monotonic()
+            seen_running = False
+            while True:
+                elapsed = time.monotonic() - start
+                running, progress = self._progress(client)
+                sample = ScanSample(
+                    elapsed_secs=round(elapsed, 3),
+                    progress=progress,
+                    items=self._item_count(items_api, folder_id),
+                )
+                stats = _process_stats(pid) if pid is not None else None
+                if base is not None and stats is not None:
+                    sample.jellyfin_cpu_secs = round(stats[0] - base[0], 2)
+                    sample.children_cpu_secs = round(stats[1] - base[1], 2)
+                    if stats[2] is not None and base[2] is not None:
+                        sample.read_bytes = stats[2] - base[2]
+                profile.samples.append(sample)
+                if running and not seen_running:
+                    seen_running = True
+                    profile.queued_secs = elapsed
+                    logger.info(f"Scan started after {elapsed:.1f}s")
+                if seen_running and not running:
+                    profile.finished = True
+                    break
+                # Scans of small libraries can finish between samples. The
+                # scan task records when it ran; a library refresh doesn't.
+                if not seen_running and folder_id is None:
+                    run = self._last_run(client)
+                    if run is not None and run != last_run:
+                        logger.info("Scan finished before it was seen running")
+                        profile.finished = True
+                        profile.seen_running = False
+                        profile.duration_secs = round(run[1] - run[0], 3)
+                        break
+                if not seen_running and elapsed > START_GRACE_SECS:
+                    logger.info("Scan wasn't seen running; its duration is unknown")
+                    profile.finished = True
+                    profile.seen_running = False
+                    profile.duration_secs = None
+                    break
+                if self.timeout_secs is not None and elapsed > self.timeout_secs:
+                    logger.warning(f"Timed out after {elapsed:.0f}s")
+                    break
+                if len(profile.samples) % 30 == 0 and progress is not None:
+                    logger.info(
+                        f"{progress:.1f}% after {elapsed:.0f}s, {sample.items} items"
+                    )
+                time.sleep(self.interval_secs)
+        summarize(profile)
+        return profile
+
+
+def summarize(profile: ScanProfile) -> None:
+    """Derive a profile's totals and phase durations from its samples."""
+    samples = profile.samples
+    if not samples:
+        return
+    last = samples[-1]
+    if profile.seen_running:
+        profile.duration_secs = last.elapsed_secs - profile.queued_secs
+    profile.items_after = last.items
+    profile.jellyfin_cpu_secs = last.jellyfin_cpu_secs
+    profile.children_cpu_secs = last.children_cpu_secs
+    profile.read_bytes = last.read_bytes
+    if profile.duration_secs is None:
+        profile.library_items_per_sec = None
+    elif profile.duration_secs > 0:
+        profile.library_items_per_sec = profile.items_after / profile.duration_secs
+    if not profile.seen_running:
+        # The samples were all taken after the scan.
+        profile.phases = {}
+        return
+    if profile.folder is not None:
+        profile.phases = {"refresh": profile.duration_secs}
+        return
+    # A phase spans from the first sample at or past its start to the first
+    # sample past its end (or the end of the scan).
+    phases = {}
+    for name, low, high in PHASES:
+        times = [
+            s.elapsed_secs
+            for s in samples
+            if s.progress is not None and low <= s.progress < high
+        ]
+        if not times:
+            continue
+        later = [s.elapsed_secs for s in samples if s.elapsed_secs > times[-1]]
+        end = later[0] if later else last.elapsed_secs
+        phases[name] = round(end - times[0], 3)
+    profile.phases = phases
+
+
+class ProfileStore:
+    """Scan profiles, one JSON object per line."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def append(self, profile: ScanProfile) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(profile)) + "\n")
+
+    def load(self) -> list[ScanProfile]:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [
+                ScanProfile.from_dict(json.loads(line)) for line in f if line.strip()
+            ]
+
+
+def format_profile(profile: ScanProfile) -> str:
+    """Format a single scan profile."""
+    scope = f"library '{profile.folder}'" if profile.folder else "all libraries"
+    status = "" if profile.finished else " (unfinished)"
+    if profile.duration_secs is None:
+        duration = "unknown, finished before it was seen running"
+    elif not profile.seen_running:
+        duration = f"{profile.duration_secs:.1f}s (finished before it was seen running)"
+    else:
+        duration = f"{profile.duration_secs:.1f}s (queued {profile.queued_secs:.1f}s)"
+    rate = (
+        ""
+        if profile.library_items_per_sec is None
+        else f", {profile.library_items_per_sec:.1f} library items/s"
+    )
+    rows = [
+        ["duration:", duration],
+        ["items:", f"{profile.items_before} -> {profile.items_after}{rate}"],
+    ]
+    for name, secs in profile.phases.items():
+        rows.append([f"{name}:", f"{secs:.1f}s"])
+    if profile.jellyfin_cpu_secs is not None and profile.duration_secs:
+        jellyfin_cpu = profile.jellyfin_cpu_secs
+        children_cpu = profile.children_cpu_secs or 0
+        rows.append(
+            [
+                "cpu:",
+                f"jellyfin {jellyfin_cpu:.1f}s, ffprobe/ffmpeg {children_cpu:.1f}s "
+                f"({(jellyfin_cpu + children_cpu) / profile.duration_secs:.0%} of one core)",
+            ]
+        )
+    if profile.read_bytes is not None:
+        rows.append(["read:", f"{profile.read_bytes / 2**20:.0f} MiB"])
+    lines = [f"Scan of {scope} on Jellyfin {profile.server_version}{status}"]
+    lines += ["  " + line for line in format_table(rows).splitlines()]
+    return "\n".join(lines)
+
+
+def _format_number(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def format_comparison(profiles: list[ScanProfile]) -> str:
+    """Format scan profiles as a table, one run per row."""
+    phase_names = [name for name, _, _ in PHASES]
+    header = ["started", "label", "version", "library", "secs", "lib items/s"]
+    header += phase_names
+    rows = [
+        [
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(p.started)),
+            (p.label or "-")[:20],
+            (p.server_version or "-")[:10],
+            (p.folder or "all")[:12],
+            _format_number(p.duration_secs),
+            _format_number(p.library_items_per_sec),
+            *(_format_number(p.phases.get(name)) for name in phase_names),
+        ]
+        for p in profiles
+    ]
+    return format_table([header, *rows], right=range(4, len(header)))
@@ -0,0 +1,394 @@
+"""
+Planning which Jellyfin items to pre-transcode or re-grab.
+
+Most live transcodes come from a few codec, container and HDR combinations
+that some clients can't direct play. Instead of waiting for them to show up
+in `nixarr transcode-report`, this predicts them:
+
+1. The media info (container, bitrate and video and audio streams) of every
+   movie and episode is read from Jellyfin, in pages.
+2. Each item is matched against declared client profiles: what a group of
+   clients can direct play. An item a profile can't direct play would be
+   transcoded for it, for the same reasons Jellyfin reports (e.g.
+   `VideoCodecNotSupported`).
+3. Items are ranked by how often they were played by clients they would be
+   transcoded for, from the transcode telemetry database if there is one.
+   Episodes also count the plays of their series' other episodes, since the
+   next episode of a watched series is the likeliest next transcode.
+
+The resulting queue can be written as JSON for a pre-transcoding tool, or
+mirrored to a tag in Radarr and Sonarr (on the movie or series), so that
+custom formats or manual searches can re-grab those items in a direct-play
+friendly format.
+
+Example usage:
+    >>> from nixarr_py.jellyfin_transcode_planner import (
+    ...     ClientProfile,
+    ...     fetch_media,
+    ...     plan,
+    ...     read_play_counts,
+    ... )
+    >>>
+    >>> profiles = [ClientProfile(name="tv", video_codecs=["h264"], max_height=1080)]
+    >>> media, series = fetch_media()
+    >>> plays = read_play_counts("/var/lib/jellyfin-transcode-telemetry/telemetry.db")
+    >>> for planned in plan(media, profiles, plays)[:10]:
+    ...     print(planned.media.name, planned.reasons)
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+import logging
+import sqlite3
+import time
+
+import jellyfin
+
+from nixarr_py import clients
+from nixarr_py.utils import format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClientProfile:
+    """What a group of clients can direct play.
+
+    Empty lists allow anything; `clients` are the client names Jellyfin
+    reports for sessions (e.g. "Jellyfin Web"), used to attribute plays.
+    """
+
+    name: str
+    clients: list[str] = field(default_factory=list)
+    containers: list[str] = field(default_factory=list)
+    video_codecs: list[str] = field(default_factory=list)
+    audio_codecs: list[str] = field(default_factory=list)
+    video_range_types: list[str] = field(default_factory=list)
+    max_height: int | None = None
+    max_bitrate_mbps: float | None = None
+
+
+@dataclass
+class MediaInfo:
+    item_id: str
+    name: str
+    item_type: str
+    series_id: str | None
+    provider_ids: dict[str, str]
+    container: str | None
+    bitrate: int | None
+    video_codec: str | None
+    video_height: int | None
+    video_range_type: str | None
+    audio_codec: str | None
+
+
+@dataclass
+class PlannedItem:
+    media: MediaInfo
+    # Profile name to the reasons items would be transcoded for it.
+    reasons: dict[str, list[str]]
+    transcode_plays: int = 0
+    series_transcode_plays: int = 0
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def _media_info(item: Any) -> MediaInfo:
+    source = (item.media_sources or [None])[0]
+    streams = (source.media_streams if source else None) or []
+    video = next((s for s in streams if _enum_value(s.type) == "Video"), None)
+    audio_streams = [s for s in streams if _enum_value(s.type) == "Audio"]
+    audio = next((s for s in audio_streams if s.is_default), None) or next(
+        iter(audio_streams), None
+    )
+    return MediaInfo(
+        item_id=item.id,
+        name=item.name,
+        item_type=_enum_value(item.type),
+        series_id=item.series_id,
+        provider_ids=dict(item.provider_ids or {}),
+        container=source.container if source else None,
+        bitrate=source.bitrate if source else None,
+        video_codec=video.codec if video else None,
+        video_height=video.height if video else None,
+        video_range_type=_enum_value(video.video_range_type) if video else None,
+        audio_codec=audio.codec if audio else None,
+    )
+
+
+def fetch_media(
+    page_size: int = 500,
+) -> tuple[list[MediaInfo], dict[str, dict[str, str]]]:
+    """Read the media info of all movies and episodes from Jellyfin.
+
+    Returns:
+        tuple: The media info, and the provider IDs of each series by ID.
+    """
+    media, series = [], {}
+    with clients.jellyfin_client() as client:
+        items_api = jellyfin.ItemsApi(client)
+        for item_types in (["Movie", "Episode"], ["Series"]):
+            offset = 0
+            while True:
+                result = items_api.get_items(
+                    recursive=True,
+                    include_item_types=item_types,
+                    fields=["MediaSources", "ProviderIds"],
+                    sort_by=["DateCreated", "SortName"],
+                    sort_order=["Ascending"],
+                    start_index=offset,
+                    limit=page_size,
+                    enable_images=False,
+                    enable_user_data=False,
+                )
+                items = result.items or []
+                for item in items:
+                    if _enum_value(item.type) == "Series":
+                        series[item.id] = dict(item.provider_ids or {})
+                    else:
+                        media.append(_media_info(item))
+                offset += len(items)
+                if not items or offset >= (result.total_record_count or 0):
+                    break
+    logger.info(f"Read the media info of {len(media)} items")
+    return media, series
+
+
+def _matches(value: str | None, allowed: list[str]) -> bool:
+    if not allowed or value is None:
+        return True
+    allowed_lower = {a.lower() for a in allowed}
+    # Jellyfin reports some containers as a list, like "mov,mp4,m4a".
+    return any(part.lower() in allowed_lower for part in value.split(","))
+
+
+def transcode_reasons(media: MediaInfo, profile: ClientProfile) -> list[str]:
+    """Why a profile's clients couldn't direct play an item; empty if they can."""
+    reasons = []
+    if not _matches(media.container, profile.containers):
+        reasons.append("ContainerNotSupported")
+    if not _matches(media.video_codec, profile.video_codecs):
+        reasons.append("VideoCodecNotSupported")
+    if not _matches(media.video_range_type, profile.video_range_types):
+        reasons.append("VideoRangeTypeNotSupported")
+    if not _matches(media.audio_codec, profile.audio_codecs):
+        reasons.append("AudioCodecNotSupported")
+    max_height, height = profile.max_height, media.video_height
+    if max_height is not None and height is not None and height > max_height:
+        reasons.append("VideoResolutionNotSupported")
+    max_mbps, bitrate = profile.max_bitrate_mbps, media.bitrate
+    if max_mbps is not None and bitrate is not None and bitrate > max_mbps * 1e6:
+        reasons.append("ContainerBitrateExceedsLimit")
+    return reasons
+
+
+def read_play_counts(
+    db_path: str | Path, since_days: float | None = None
+) -> dict[tuple[str, str], int]:
+    """Count playbacks per (item ID, client) in a transcode telemetry database."""
+    since = time.time() - since_days * 86400 if since_days else 0
+    uri = f"{Path(db_path).absolute().as_uri()}?mode=ro"
+    with sqlite3.connect(uri, uri=True) as conn:
+        rows = conn.execute(
+            "SELECT item_id, client, COUNT(*) FROM playbacks WHERE started >= ? GROUP BY item_id, client",
+            (since,),
+        ).fetchall()
+    return {(item_id, client or ""): count for item_id, client, count in rows}
+
+
+def plan(
+    media: list[MediaInfo],
+    profiles: list[ClientProfile],
+    plays: dict[tuple[str, str], int] | None = None,
+) -> list[PlannedItem]:
+    """Items at least one profile can't direct play, likeliest transcodes first."""
+    profile_by_client = {
+        client: profile for profile in profiles for client in profile.clients
+    }
+    plays_by_item: dict[str, dict[str, int]] = defaultdict(dict)
+    for (item_id, client), count in (plays or {}).items():
+        profile = profile_by_client.get(client)
+        if profile is not None:
+            by_profile = plays_by_item[item_id]
+            by_profile[profile.name] = by_profile.get(profile.name, 0) + count
+
+    planned = []
+    for m in media:
+        reasons = {}
+        for profile in profiles:
+            profile_reasons = transcode_reasons(m, profile)
+            if profile_reasons:
+                reasons[profile.name] = profile_reasons
+        if not reasons:
+            continue
+        item_plays = plays_by_item.get(m.item_id, {})
+        transcode_plays = sum(item_plays.get(name, 0) for name in reasons)
+        planned.append(PlannedItem(m, reasons, transcode_plays))
+
+    series_plays: dict[str, int] = defaultdict(int)
+    for item in planned:
+        if item.media.series_id:
+            series_plays[item.media.series_id] += item.transcode_plays
+    for item in planned:
+        if item.media.series_id:
+            item.series_transcode_plays = series_plays[item.media.series_id]
+
+    return sorted(
+        planned,
+        key=lambda item: (
+            item.transcode_plays,
+            item.series_transcode_plays,
+            len(item.reasons),
+            item.media.bitrate or 0,
+        ),
+        reverse=True,
+    )
+
+
+def format_plan(planned: list[PlannedItem]) -> str:
+    """Format a plan as a table."""
+    rows = [["plays", "series", "name", "reasons"]]
+    for item in planned:
+        reasons = "; ".join(
+            f"{name}: {', '.join(profile_reasons)}"
+            for name, profile_reasons in item.reasons.items()
+        )
+        rows.append(
+            [
+                str(item.transcode_plays),
+                str(item.series_transcode_plays),
+                item.media.name[:40],
+                reasons,
+            ]
+        )
+    return format_table(rows, right=(0, 1))
+
+
+def plan_to_json(planned: list[PlannedItem]) -> list[dict[str, Any]]:
+    """A plan as JSON-serializable dicts, e.g. for a pre-transcoding tool."""
+    return [
+        {
+            "item_id": item.media.item_id,
+            "name": item.media.name,
+            "type": item.media.item_type,
+            "series_id": item.media.series_id,
+            "provider_ids": item.media.provider_ids,
+            "reasons": item.reasons,
+            "transcode_plays": item.transcode_plays,
+            "series_transcode_plays": item.series_transcode_plays,
+        }
+        for item in planned
+    ]
+
+
+def _provider_id(provider_ids: dict[str, str], name: str) -> int | None:
+    value = {k.lower(): v for k, v in provider_ids.items()}.get(name)
+    return int(value) if value and value.isdigit() else None
+
+
+def _get_or_create_tag(
+    tag_api: Any, resource_type: Any, label: str, dry_run: bool
+) -> int | None:
+    for tag in tag_api.list_tag():
+        if tag.label == label:
+            return tag.id
+    logger.info(f"Creating tag '{label}'")
+    if dry_run:
+        return None
+    return tag_api.create_tag(resource_type(label=label)).id
+
+
+def _sync_tag(
+    module: Any,
+    items: list[Any],
+    wanted_ids: set[int],
+    tag_id: int | None,
+    put_editor: Any,
+    editor_type: Any,
+    ids_property: str,
+    dry_run: bool,
+) -> tuple[int, int]:
+    tagged_ids = {item.id for item in items if tag_id in (item.tags or [])}
+    to_add = sorted(wanted_ids - tagged_ids)
+    to_remove = sorted(tagged_ids - wanted_ids)
+    if not dry_run and tag_id is not None:
+        for ids, apply_tags in ((to_add, "ADD"), (to_remove, "REMOVE")):
+            if ids:
+                put_editor(
+                    editor_type(
+                        **{ids_property: ids},
+                        tags=[tag_id],
+                        apply_tags=getattr(module.ApplyTags, apply_tags),
+                    )
+                )
+    return len(to_add), len(to_remove)
+
+
+def tag_planned(
+    planned: list[PlannedItem],
+    series_provider_ids: dict[str, dict[str, str]],
+    services: list[str],
+    label: str,
+    dry_run: bool = False,
+) -> None:
+    """Make a Radarr and Sonarr tag mark exactly the planned movies and series.
+
+    Movies are matched on their TMDB ID, and episodes on their series' TVDB
+    ID.
+    """
+    tmdb_ids = {
+        _provider_id(item.media.provider_ids, "tmdb")
+        for item in planned
+        if item.media.item_type == "Movie"
+    }
+    tvdb_ids = {
+        _provider_id(series_provider_ids.get(item.media.series_id, {}), "tvdb")
+        for item in planned
+        if item.media.series_id
+    }
+    if "radarr" in services:
+        import radarr
+
+        with clients.radarr_client() as client:
+            tag_id = _get_or_create_tag(
+                radarr.TagApi(client), radarr.TagResource, label, dry_run
+            )
+            movies = radarr.MovieApi(client).list_movie()
+            wanted = {movie.id for movie in movies if movie.tmdb_id in tmdb_ids}
+            added, removed = _sync_tag(
+                radarr,
+                movies,
+                wanted,
+                tag_id,
+                radarr.MovieEditorApi(client).put_movie_editor,
+                radarr.MovieEditorResource,
+                "movie_ids",
+                dry_run,
+            )
+            logger.info(f"radarr: tagging {added} movies, untagging {removed}")
+    if "sonarr" in services:
+        import sonarr
+
+        with clients.sonarr_client() as client:
+            tag_id = _get_or_create_tag(
+                sonarr.TagApi(client), sonarr.TagResource, label, dry_run
+            )
+            series_list = sonarr.SeriesApi(client).list_series()
+            wanted = {series.id for series in series_list if series.tvdb_id in tvdb_ids}
+            added, removed = _sync_tag(
+                sonarr,
+                series_list,
+                wanted,
+                tag_id,
+                sonarr.SeriesEditorApi(client).put_series_editor,
+                sonarr.SeriesEditorResource,
+                "series_ids",
+                dry_run,
+            )
+            logger.info(f"sonarr: tagging {added} series, untagging {removed}")
@@ -0,0 +1,443 @@
+"""
+Transcode telemetry for Jellyfin playback.
+
+Jellyfin only shows how a stream is played (and why it is transcoded) while
+it is playing, so sizing the CPU or deciding whether hardware acceleration is
+worth it comes down to guesswork. The collector here polls Jellyfin's active
+sessions and records, for each playback:
+
+- who played what, on which client and device, from which library,
+- the play method (direct play, direct stream or transcode) and Jellyfin's
+  transcode reasons,
+- the source and target codecs, container, resolution and bitrates,
+- the hardware acceleration used, and
+- the transcode speed in frames per second, sampled over time.
+
+Polling costs one sessions request per interval, plus one request the first
+time an item is seen, to find its library. Playbacks are stored once, with
+their attributes, in a local SQLite database; only the values that change
+during playback (FPS, bitrate, progress) are stored per poll, in a compact
+table keyed by playback and time, and are pruned after a retention period.
+
+Example usage:
+    >>> from nixarr_py.jellyfin_transcode_telemetry import (
+    ...     TelemetryStore,
+    ...     TranscodeCollector,
+    ...     format_summary,
+    ... )
+    >>>
+    >>> store = TelemetryStore("/var/lib/jellyfin-transcode-telemetry/telemetry.db")
+    >>> TranscodeCollector(store, interval_secs=10).run()
+    >>> print(format_summary(store.summary("client", since_days=30), "client"))
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+import logging
+import sqlite3
+import time
+
+import jellyfin
+
+from nixarr_py.clients import jellyfin_client
+from nixarr_py.utils import format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playbacks (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    started REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    user TEXT,
+    client TEXT,
+    device TEXT,
+    library TEXT,
+    item_type TEXT,
+    item_name TEXT,
+    play_method TEXT,
+    transcode_reasons TEXT,
+    source_container TEXT,
+    source_video_codec TEXT,
+    source_audio_codec TEXT,
+    source_bitrate INTEGER,
+    target_container TEXT,
+    target_video_codec TEXT,
+    target_audio_codec TEXT,
+    target_bitrate INTEGER,
+    target_width INTEGER,
+    target_height INTEGER,
+    hardware_acceleration TEXT,
+    video_direct INTEGER,
+    audio_direct INTEGER
+);
+CREATE INDEX IF NOT EXISTS playbacks_started ON playbacks (started);
+CREATE TABLE IF NOT EXISTS samples (
+    playback_id INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    fps REAL,
+    bitrate INTEGER,
+    completion REAL,
+    PRIMARY KEY (playback_id, time)
+) WITHOUT ROWID;
+"""
+
+# Attributes that identify a playback's configuration. A change in any of
+# them (e.g. switching audio tracks forces a new transcode) starts a new
+# playback record.
+PLAYBACK_KEY = [
+    "play_method",
+    "target_video_codec",
+    "target_audio_codec",
+    "target_container",
+    "hardware_acceleration",
+]
+
+GroupBy = Literal["client", "codec", "library", "user", "reason"]
+
+GROUP_COLUMNS = {
+    "client": "client",
+    "codec": "source_video_codec",
+    "library": "library",
+    "user": "user",
+}
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def _stream_codec(item: Any, stream_type: str) -> str | None:
+    for stream in getattr(item, "media_streams", None) or []:
+        if _enum_value(stream.type) == stream_type:
+            return stream.codec
+    return None
+
+
+def _source_bitrate(item: Any) -> int | None:
+    rates = [
+        s.bit_rate for s in getattr(item, "media_streams", None) or [] if s.bit_rate
+    ]
+    return sum(rates) if rates else None
+
+
+@dataclass
+class Observation:
+    """One active playback, as seen in one poll."""
+
+    session_id: str
+    item_id: str
+    attributes: dict[str, Any]
+    fps: float | None
+    bitrate: int | None
+    completion: float | None
+
+
+def observe(session: Any) -> Observation | None:
+    """The playback of a session, or None if it isn't playing anything."""
+    item = session.now_playing_item
+    if item is None or item.id is None:
+        return None
+    play_state = session.play_state
+    transcoding = session.transcoding_info
+    play_method = _enum_value(play_state.play_method) if play_state else None
+    attributes = {
+        "user": session.user_name,
+        "client": session.client,
+        "device": session.device_name,
+        "item_type": _enum_value(item.type),
+        "item_name": item.name,
+        "play_method": play_method,
+        "transcode_reasons": None,
+        "source_container": item.container,
+        "source_video_codec": _stream_codec(item, "Video"),
+        "source_audio_codec": _stream_codec(item, "Audio"),
+        "source_bitrate": _source_bitrate(item),
+        "target_container": None,
+        "target_video_codec": None,
+        "target_audio_codec": None,
+        "target_bitrate": None,
+        "target_width": None,
+        "target_height": None,
+        "hardware_acceleration": None,
+        "video_direct": None,
+        "audio_direct": None,
+    }
+    fps = bitrate = completion = None
+    if transcoding is not None:
+        reasons = [_enum_value(r) for r in transcoding.transcode_reasons or []]
+        attributes |= {
+            "transcode_reasons": ",".join(sorted(reasons)) or None,
+            "target_container": transcoding.container,
+            "target_video_codec": transcoding.video_codec,
+            "target_audio_codec": transcoding.audio_codec,
+            "target_bitrate": transcoding.bitrate,
+            "target_width": transcoding.width,
+            "target_height": transcoding.height,
+            "hardware_acceleration": _enum_value(
+                transcoding.hardware_acceleration_type
+            ),
+            "video_direct": transcoding.is_video_direct,
+            "audio_direct": transcoding.is_audio_direct,
+        }
+        fps = transcoding.framerate
+        bitrate = transcoding.bitrate
+        completion = transcoding.completion_percentage
+    return Observation(
+        session_id=session.id,
+        item_id=item.id,
+        attributes=attributes,
+        fps=fps,
+        bitrate=bitrate,
+        completion=completion,
+    )
+
+
+class TelemetryStore:
+    """The SQLite database playbacks and samples are recorded in.
+
+    Args:
+        path: The database file; created if missing, unless `read_only`.
+        read_only: Open an existing database for reports only, without
+            creating or migrating anything.
+    """
+
+    def __init__(self, path: str | Path, read_only: bool = False) -> None:
+        self.path = Path(path)
+        if read_only:
+            self.db = sqlite3.connect(
+                f"{self.path.absolute().as_uri()}?mode=ro", uri=True
+            )
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(self.path)
+            self.db.executescript(SCHEMA)
+        self.db.row_factory = sqlite3.Row
+
+    def start_playback(
+        self, observation: Observation, library: str | None, now: float
+    ) -> int:
+        columns = ["session_id", "item_id", "started", "last_seen", "library"]
+        columns += list(observation.attributes)
+        values = [observation.session_id, observation.item_id, now, now, library]
+        values += list(observation.attributes.values())
+        placeholders = ", ".join("?" for _ in columns)
+        cursor = self.db.execute(
+            f"INSERT INTO playbacks ({', '.join(columns)}) VALUES ({placeholders})",
+            values,
+        )
+        return cursor.lastrowid or 0
+
+    def record_sample(
+        self, playback_id: int, observation: Observation, now: float
+    ) -> None:
+        self.db.execute(
+            "UPDATE playbacks SET last_seen = ? WHERE id = ?", (now, playback_id)
+        )
+        if observation.fps is None and observation.bitrate is None:
+            return
+        self.db.execute(
+            "INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)",
+            (
+                playback_id,
+                int(now),
+                observation.fps,
+                observation.bitrate,
+                observation.completion,
+            ),
+        )
+
+    def prune(self, retention_days: float) -> int:
+        """Delete samples older than `retention_days`; playbacks are kept."""
+        cutoff = time.time() - retention_days * 86400
+        cursor = self.db.execute("DELETE FROM samples WHERE time < ?", (cutoff,))
+        return cursor.rowcount
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def summary(
+        self, group_by: GroupBy, since_days: float = 30
+    ) -> list[dict[str, Any]]:
+        """Per-group totals of playbacks since `since_days` ago.
+
+        Returns:
+            list: One dict per group, most played first, with `playbacks`,
+            `hours`, `transcodes`, `hardware` (hardware-accelerated
+            transcodes), `avg_fps` and `min_fps` (averaged per playback).
+        """
+        since = time.time() - since_days * 86400
+        per_playback = """
+            SELECT p.*, p.last_seen - p.started AS secs,
+                (SELECT avg(fps) FROM samples WHERE playback_id = p.id) AS avg_fps
+            FROM playbacks p WHERE p.started >= ?
+        """
+        if group_by == "reason":
+            # One row per (playback, reason) of transcoded playbacks.
+            group = "reason"
+            source = f"""
+                WITH RECURSIVE pb AS ({per_playback}),
+                split(id, reason, rest) AS (
+                    SELECT id, NULL, transcode_reasons || ',' FROM pb
+                    WHERE transcode_reasons IS NOT NULL
+                    UNION ALL
+                    SELECT id, substr(rest, 1, instr(rest, ',') - 1),
+                        substr(rest, instr(rest, ',') + 1)
+                    FROM split WHERE rest != ''
+                )
+                SELECT pb.*, split.reason FROM split JOIN pb USING (id)
+                WHERE split.reason IS NOT NULL
+            """
+        else:
+            group = GROUP_COLUMNS[group_by]
+            source = per_playback
+        rows = self.db.execute(
+            f"""
+            SELECT coalesce({group}, '(unknown)') AS grp,
+                count(*) AS playbacks,
+                sum(secs) / 3600.0 AS hours,
+                sum(play_method = 'Transcode') AS transcodes,
+                sum(play_method = 'Transcode' AND coalesce(hardware_acceleration, 'none') != 'none') AS hardware,
+                avg(avg_fps) AS avg_fps,
+                min(avg_fps) AS min_fps
+            FROM ({source})
+            GROUP BY grp ORDER BY playbacks DESC
+            """,
+            (since,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def format_summary(rows: list[dict[str, Any]], group_by: str) -> str:
+    """A table of `TelemetryStore.summary` rows."""
+    header = [
+        group_by,
+        "playbacks",
+        "hours",
+        "transcoded",
+        "hw accel",
+        "avg fps",
+        "min fps",
+    ]
+    table = [
+        [
+            str(row["grp"]),
+            str(row["playbacks"]),
+            f"{row['hours'] or 0:.1f}",
+            f"{(row['transcodes'] or 0) / row['playbacks']:.0%}",
+            f"{(row['hardware'] or 0) / row['transcodes']:.0%}"
+            if row["transcodes"]
+            else "-",
+            "-" if row["avg_fps"] is None else f"{row['avg_fps']:.1f}",
+            "-" if row["min_fps"] is None else f"{row['min_fps']:.1f}",
+        ]
+        for row in rows
+    ]
+    return format_table([header, *table])
+
+
+class TranscodeCollector:
+    """Polls Jellyfin's sessions and records playbacks in a `TelemetryStore`.
+
+    Args:
+        store: Where to record playbacks.
+        interval_secs: Time between polls.
+        retention_days: How long to keep per-poll samples.
+    """
+
+    def __init__(
+        self,
+        store: TelemetryStore,
+        interval_secs: float = 10,
+        retention_days: float = 90,
+    ) -> None:
+        self.store = store
+        self.interval_secs = interval_secs
+        self.retention_days = retention_days
+        # Session ID to (playback key, playback ID) of ongoing playbacks.
+        self._active: dict[str, tuple[tuple[Any, ...], int]] = {}
+        # Item ID to the name of its library, for the items of ongoing
+        # playbacks.
+        self._libraries: dict[str, str | None] = {}
+
+    def _library(self, library_api: jellyfin.LibraryApi, item_id: str) -> str | None:
+        if item_id not in self._libraries:
+            try:
+                ancestors = library_api.get_ancestors(item_id=item_id)
+                self._libraries[item_id] = next(
+                    (
+                        a.name
+                        for a in ancestors
+                        if _enum_value(a.type) == "CollectionFolder"
+                    ),
+                    None,
+                )
+            except Exception as e:
+                logger.debug(f"Failed to get the library of item {item_id}: {e}")
+                self._libraries[item_id] = None
+        return self._libraries[item_id]
+
+    def poll(
+        self, session_api: jellyfin.SessionApi, library_api: jellyfin.LibraryApi
+    ) -> None:
+        """Record the playbacks active right now."""
+        now = time.time()
+        sessions = session_api.get_sessions(
+            active_within_seconds=int(self.interval_secs * 3)
+        )
+        seen = set()
+        for session in sessions:
+            observation = observe(session)
+            if observation is None:
+                continue
+            seen.add(observation.session_id)
+            key = (observation.item_id,) + tuple(
+                observation.attributes[name] for name in PLAYBACK_KEY
+            )
+            active = self._active.get(observation.session_id)
+            if active is None or active[0] != key:
+                library = self._library(library_api, observation.item_id)
+                playback_id = self.store.start_playback(observation, library, now)
+                self._active[observation.session_id] = (key, playback_id)
+                attributes = observation.attributes
+                reasons = attributes["transcode_reasons"]
+                logger.info(
+                    f"{attributes['client']} started {attributes['play_method']} of "
+                    f"'{attributes['item_name']}'{f' ({reasons})' if reasons else ''}"
+                )
+            self.store.record_sample(
+                self._active[observation.session_id][1], observation, now
+            )
+        for session_id in self._active.keys() - seen:
+            del self._active[session_id]
+        playing = {key[0] for key, _ in self._active.values()}
+        self._libraries = {
+            item_id: library
+            for item_id, library in self._libraries.items()
+            if item_id in playing
+        }
+        self.store.commit()
+
+    def run(self) -> None:
+        """Poll until interrupted, pruning old samples once a day."""
+        last_prune = 0.0
+        with jellyfin_client() as client:
+            session_api = jellyfin.SessionApi(client)
+            library_api = jellyfin.LibraryApi(client)
+            while True:
+                started = time.monotonic()
+                try:
+                    self.poll(session_api, library_api)
+                except Exception as e:
+                    logger.warning(f"Failed to poll Jellyfin sessions: {e}")
+                if time.time() - last_prune > 86400:
+                    pruned = self.store.prune(self.retention_days)
+                    self.store.commit()
+                    logger.debug(f"Pruned {pruned} old samples")
+                    last_prune = time.time()
+                time.sleep(max(0, self.interval_secs - (time.monotonic() - started)))
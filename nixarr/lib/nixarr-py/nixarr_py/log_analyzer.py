@@ -0,0 +1,532 @@
+"""
+Extraction of slow operations from the services' log files.
+
+The *arrs log slow database queries, the duration of every API request (at
+debug level) and of every command they execute (at trace level), and
+Jellyfin logs slow HTTP responses, slow database commands and the duration
+of its scheduled tasks. All of this ends up in rotating log files in the
+services' state directories, where nobody reads it. The analyzer here:
+
+- tails the log files incrementally, remembering how far it read each file
+  (by inode, so it follows files across rotations) in its state file, and
+  only ever holds one line in memory,
+- matches each line against precompiled patterns, skipping lines that don't
+  contain a pattern's literal hint before running its regex,
+- normalizes what was slow (SQL with literals replaced by `?`, URL paths with
+  IDs replaced by `{id}`, task names), and
+- aggregates count, total and maximum time per service, kind of operation
+  ("query", "endpoint" or "task") and name, across runs.
+
+The aggregates are formatted as a report and as Prometheus counters.
+
+Example usage:
+    >>> from nixarr_py.log_analyzer import (
+    ...     LogAnalyzer,
+    ...     LogAnalyzerConfig,
+    ...     LogSource,
+    ...     format_report,
+    ... )
+    >>>
+    >>> config = LogAnalyzerConfig(
+    ...     sources=[
+    ...         LogSource(
+    ...             service="sonarr",
+    ...             format="servarr",
+    ...             log_dir="/data/.state/nixarr/sonarr/logs",
+    ...         ),
+    ...         LogSource(
+    ...             service="jellyfin",
+    ...             format="jellyfin",
+    ...             log_dir="/data/.state/nixarr/jellyfin/log",
+    ...         ),
+    ...     ],
+    ... )
+    >>> analyzer = LogAnalyzer(config, "/var/lib/nixarr-log-analyzer/state.json")
+    >>> analyzer.run()
+    >>> print(format_report(analyzer.state))
+"""
+
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+from urllib.parse import urlsplit
+import logging
+import os
+import re
+import time
+
+import pydantic
+
+from nixarr_py.utils import atomic_write_json, escape_label, format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+Kind = Literal["query", "endpoint", "task"]
+
+# Name that operations beyond `max_names` per service and kind are counted
+# under, to bound the number of metrics.
+OTHER = "(other)"
+
+MAX_NAME_LENGTH = 200
+
+# Bytes at the start of a file remembered with its offset, to notice when an
+# inode was reused for a different file.
+HEAD_BYTES = 64
+
+
+class LogSource(pydantic.BaseModel):
+    service: str
+    format: Literal["servarr", "jellyfin"]
+    log_dir: str
+
+
+class LogAnalyzerConfig(pydantic.BaseModel):
+    sources: list[LogSource]
+    # Queries and API requests faster than this aren't counted. Jellyfin only
+    # logs responses slower than its own threshold (500ms by default).
+    slow_ms: int = 500
+    # Distinct names per service and kind; the rest is counted as OTHER.
+    max_names: int = 50
+
+
+class FilePosition(pydantic.BaseModel):
+    offset: int
+    # Hex of the file's first bytes (up to HEAD_BYTES) when it was last read.
+    head: str
+
+
+class OperationStats(pydantic.BaseModel):
+    count: int = 0
+    total_secs: float = 0
+    max_secs: float = 0
+
+
+class AnalyzerState(pydantic.BaseModel):
+    # Service to "device:inode" to how far the file was read.
+    positions: dict[str, dict[str, FilePosition]] = {}
+    # Service to kind to name to statistics.
+    stats: dict[str, dict[str, dict[str, OperationStats]]] = {}
+    # Service to the number of log lines read.
+    lines: dict[str, int] = {}
+    last_run: float | None = None
+
+
+@dataclass(frozen=True)
+class LogPattern:
+    """A slow-operation message.
+
+    The regex is matched against the message part of a log line; its named
+    groups give the duration (`ms`, a .NET TimeSpan `span`, or `min` and
+    `sec`) and the name (`sql`, `path` with an optional `method`, or
+    `name`). A query pattern whose `sql` group is empty takes the SQL from
+    the lines that follow.
+    """
+
+    kind: Kind
+    hint: str
+    regex: re.Pattern[str]
+    # Whether the duration is compared to `slow_ms` before counting.
+    thresholded: bool = True
+
+
+# 2024-01-31 12:00:00.1|Warn|Database|message
+SERVARR_LINE = re.compile(
+    r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?\|(?P<level>\w+)\|(?P<logger>[^|]*)\|(?P<message>.*)$"
+)
+
+SERVARR_PATTERNS = [
+    LogPattern(
+        kind="query",
+        hint="Slow query",
+        regex=re.compile(
+            r"Slow query\D*(?P<ms>\d[\d,]*(?:\.\d+)?)\s*ms\)?:?\s*(?P<sql>.*)$"
+        ),
+    ),
+    # [GET] /api/v3/series?includeSeasonImages=false: 200.OK (1234 ms)
+    LogPattern(
+        kind="endpoint",
+        hint=" ms)",
+        regex=re.compile(
+            r"^\[(?P<method>[A-Z]+)\] (?P<path>\S+): \d{3}\.\w+ \((?P<ms>\d+) ms\)$"
+        ),
+    ),
+    # RefreshSeriesCommand <- RefreshSeriesService [00:00:12.3456789]
+    LogPattern(
+        kind="task",
+        hint="Command <- ",
+        regex=re.compile(r"^(?P<name>\w+?)Command <- \w+ \[(?P<span>[\d.:]+)\]$"),
+        thresholded=False,
+    ),
+]
+
+# [2024-01-31 12:00:00.123 +00:00] [WRN] [42] Category: message
+JELLYFIN_LINE = re.compile(
+    r"^\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)? [+-]\d\d:\d\d\] \[(?P<level>\w+)\] \[\d+\] (?P<logger>[^:]+): (?P<message>.*)$"
+)
+
+JELLYFIN_PATTERNS = [
+    # Executed DbCommand (1,234ms) [Parameters=[...], CommandType='Text', CommandTimeout='30']
+    LogPattern(
+        kind="query",
+        hint="Executed DbCommand",
+        regex=re.compile(
+            r"^Executed DbCommand \((?P<ms>\d[\d,]*)ms\).*?CommandTimeout='\d+'\]\s*(?P<sql>.*)$"
+        ),
+    ),
+    # Slow HTTP Response from "http://host/Items?..." to "1.2.3.4" in 0:00:01.2345678 with Status Code 200
+    LogPattern(
+        kind="endpoint",
+        hint="Slow HTTP Response",
+        regex=re.compile(
+            r'^Slow HTTP Response from "?(?P<path>[^" ]+)"? to \S+ in (?P<span>[\d.:]+) with Status Code \d+'
+        ),
+    ),
+    # "Scan Media Library" Completed after 2 minute(s) and 3 seconds
+    LogPattern(
+        kind="task",
+        hint=" after ",
+        regex=re.compile(
+            r'^"?(?P<name>.+?)"? (?:Completed|Failed|Cancelled|Aborted) after (?P<min>\d+) minute\(s\) and (?P<sec>\d+) seconds'
+        ),
+        thresholded=False,
+    ),
+]
+
+LINE_FORMATS = {
+    "servarr": (SERVARR_LINE, SERVARR_PATTERNS),
+    "jellyfin": (JELLYFIN_LINE, JELLYFIN_PATTERNS),
+}
+
+# The *arrs write each message to their `<app>.txt` files, and also to
+# `<app>.debug.txt` and `<app>.trace.txt` if the log level allows, so only one
+# family may be read. Most verbose first.
+SERVARR_FAMILIES = [
+    re.compile(r"^[a-z]+\.trace(?:\.\d+)?\.txt$"),
+    re.compile(r"^[a-z]+\.debug(?:\.\d+)?\.txt$"),
+    re.compile(r"^[a-z]+(?:\.\d+)?\.txt$"),
+]
+
+# A family is only read if it was written to within this long of the newest
+# log file, so a log level that was lowered again doesn't freeze the results.
+FAMILY_STALE_SECS = 3600
+
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_ID_SEGMENT = re.compile(
+    r"^(?:\d+|[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$"
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """Replace the literals in a query with `?`, so repetitions of the same
+    query are counted together."""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _SQL_LITERALS.sub("?", sql)
+    sql = _SQL_LISTS.sub("(?)", sql)
+    return sql[:MAX_NAME_LENGTH] or "(unknown)"
+
+
+def normalize_path(url: str) -> str:
+    """The path of a URL, lowercased, with numeric and GUID segments
+    replaced by `{id}`."""
+    path = urlsplit(url).path.lower() or "/"
+    segments = ["{id}" if _ID_SEGMENT.match(s) else s for s in path.split("/")]
+    return "/".join(segments)[:MAX_NAME_LENGTH]
+
+
+def _timespan_secs(span: str) -> float:
+    """Seconds in a .NET TimeSpan like "00:00:12.3456789" or "1.02:03:04"."""
+    days = "0"
+    if "." in span.split(":")[0]:
+        days, span = span.split(".", 1)
+    hours, minutes, secs = span.split(":")
+    return int(days) * 86400 + int(hours) * 3600 + int(minutes) * 60 + float(secs)
+
+
+def _duration_secs(groups: dict[str, str | None]) -> float:
+    if groups.get("ms") is not None:
+        return float(groups["ms"].replace(",", "")) / 1000
+    if groups.get("span") is not None:
+        return _timespan_secs(groups["span"])
+    return int(groups["min"]) * 60 + int(groups["sec"])
+
+
+def servarr_log_files(log_dir: Path) -> list[Path]:
+    """The *arr log files of the most verbose family that's still written."""
+    try:
+        entries = list(os.scandir(log_dir))
+    except FileNotFoundError:
+        return []
+    families = []
+    for family in SERVARR_FAMILIES:
+        files = [e for e in entries if e.is_file() and family.match(e.name)]
+        if files:
+            families.append(files)
+    if not families:
+        return []
+    newest = max(e.stat().st_mtime for files in families for e in files)
+    for files in families:
+        if max(e.stat().st_mtime for e in files) >= newest - FAMILY_STALE_SECS:
+            return [Path(e.path) for e in files]
+    return []
+
+
+def jellyfin_log_files(log_dir: Path) -> list[Path]:
+    """Jellyfin's daily server logs (not the FFmpeg logs next to them)."""
+    return [path for path in log_dir.glob("log_*.log") if path.is_file()]
+
+
+@dataclass
+class _PendingQuery:
+    """A query whose SQL is on the lines following its log line."""
+
+    secs: float
+    sql: str = ""
+
+
+class LogAnalyzer:
+    """Incremental extraction of slow operations from log files.
+
+    Args:
+        config: The log sources and thresholds.
+        state_file: Where to keep the read positions and aggregates.
+    """
+
+    def __init__(self, config: LogAnalyzerConfig, state_file: str | Path) -> None:
+        self.config = config
+        self.state_file = Path(state_file)
+        self.state = self._load_state()
+
+    def _load_state(self) -> AnalyzerState:
+        try:
+            return AnalyzerState.model_validate_json(self.state_file.read_text())
+        except FileNotFoundError:
+            return AnalyzerState()
+
+    def _save_state(self) -> None:
+        atomic_write_json(self.state_file, self.state)
+
+    def _record(self, service: str, kind: Kind, name: str, secs: float) -> None:
+        names = self.state.stats.setdefault(service, {}).setdefault(kind, {})
+        if name not in names and len(names) >= self.config.max_names:
+            name = OTHER
+        stats = names.setdefault(name, OperationStats())
+        stats.count += 1
+        stats.total_secs += secs
+        stats.max_secs = max(stats.max_secs, secs)
+
+    def _tail(
+        self,
+        path: Path,
+        old: dict[str, FilePosition],
+        new: dict[str, FilePosition],
+    ) -> Iterator[str]:
+        """The complete lines of a file after the position it was last read
+        to. Records the new position once the lines have been consumed."""
+        try:
+            f = path.open("rb")
+        except FileNotFoundError:
+            # Rotated away since it was listed; its inode is read under its
+            # new name.
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            key = f"{stat.st_dev}:{stat.st_ino}"
+            head = f.read(HEAD_BYTES).hex()
+            known = old.get(key)
+            offset = 0
+            if (
+                known is not None
+                and head.startswith(known.head)
+                and known.offset <= stat.st_size
+            ):
+                offset = known.offset
+            f.seek(offset)
+            for raw_line in f:
+                # A partial line is still being written; read it next time.
+                if not raw_line.endswith(b"\n"):
+                    break
+                offset += len(raw_line)
+                yield raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+            new[key] = FilePosition(offset=offset, head=head)
+
+    def _analyze_source(self, source: LogSource) -> int:
+        """Read the new lines of a source's logs; returns their number."""
+        log_dir = Path(source.log_dir)
+        line_regex, patterns = LINE_FORMATS[source.format]
+        if source.format == "servarr":
+            files = servarr_log_files(log_dir)
+        else:
+            files = jellyfin_log_files(log_dir)
+        if not files:
+            logger.warning(f"{source.service}: no log files in {log_dir}")
+
+        def mtime(path: Path) -> float:
+            try:
+                return path.stat().st_mtime
+            except FileNotFoundError:
+                return 0
+
+        old = self.state.positions.get(source.service, {})
+        new: dict[str, FilePosition] = {}
+        slow_secs = self.config.slow_ms / 1000
+        read = 0
+        # Oldest first, so rotated files are finished before the current one.
+        for path in sorted(files, key=mtime):
+            pending: _PendingQuery | None = None
+            for line in self._tail(path, old, new):
+                read += 1
+                header = line_regex.match(line)
+                if header is None:
+                    # A continuation line: the SQL of a pending query, or an
+                    # exception's stack trace.
+                    if pending is not None and len(pending.sql) < MAX_NAME_LENGTH:
+                        pending.sql += " " + line
+                    continue
+                if pending is not None:
+                    self._record(
+                        source.service,
+                        "query",
+                        normalize_sql(pending.sql),
+                        pending.secs,
+                    )
+                    pending = None
+                message = header["message"]
+                for pattern in patterns:
+                    if pattern.hint not in message:
+                        continue
+                    match = pattern.regex.search(message)
+                    if match is None:
+                        continue
+                    groups = match.groupdict()
+                    secs = _duration_secs(groups)
+                    if pattern.thresholded and secs < slow_secs:
+                        break
+                    if pattern.kind == "query":
+                        if groups["sql"]:
+                            name = normalize_sql(groups["sql"])
+                        else:
+                            pending = _PendingQuery(secs=secs)
+                            break
+                    elif pattern.kind == "endpoint":
+                        name = normalize_path(groups["path"])
+                        if groups.get("method"):
+                            name = f"{groups['method']} {name}"
+                    else:
+                        name = groups["name"][:MAX_NAME_LENGTH]
+                    self._record(source.service, pattern.kind, name, secs)
+                    break
+            if pending is not None:
+                self._record(
+                    source.service, "query", normalize_sql(pending.sql), pending.secs
+                )
+        self.state.positions[source.service] = new
+        return read
+
+    def run(self) -> None:
+        """Read the new log lines of all sources and save the state."""
+        for source in self.config.sources:
+            start = time.monotonic()
+            read = self._analyze_source(source)
+            self.state.lines[source.service] = (
+                self.state.lines.get(source.service, 0) + read
+            )
+            logger.info(
+                f"{source.service}: read {read} new lines in {time.monotonic() - start:.1f}s"
+            )
+        self.state.last_run = time.time()
+        self._save_state()
+
+
+def format_report(
+    state: AnalyzerState,
+    top: int = 20,
+    service: str | None = None,
+    kind: Kind | None = None,
+) -> str:
+    """The operations with the most total time, per kind."""
+    by_kind: dict[str, list[tuple[str, str, OperationStats]]] = defaultdict(list)
+    for service_name, kinds in sorted(state.stats.items()):
+        if service is not None and service_name != service:
+            continue
+        for kind_name, names in kinds.items():
+            if kind is not None and kind_name != kind:
+                continue
+            for name, stats in names.items():
+                by_kind[kind_name].append((service_name, name, stats))
+    if not by_kind:
+        return "No slow operations found."
+
+    sections = []
+    for kind_name in ["query", "endpoint", "task"]:
+        if kind_name not in by_kind:
+            continue
+        entries = sorted(by_kind[kind_name], key=lambda e: -e[2].total_secs)[:top]
+        rows = [["service", "count", "total", "mean", "max", kind_name]]
+        for service_name, name, stats in entries:
+            rows.append(
+                [
+                    service_name,
+                    str(stats.count),
+                    f"{stats.total_secs:.1f}s",
+                    f"{stats.total_secs / stats.count:.2f}s",
+                    f"{stats.max_secs:.2f}s",
+                    name,
+                ]
+            )
+        sections.append(format_table(rows))
+    return "\n\n".join(sections)
+
+
+METRICS = [
+    ("slow_operations_total", "counter", "Slow operations found in the logs."),
+    (
+        "slow_operation_seconds_total",
+        "counter",
+        "Total duration of the slow operations found in the logs.",
+    ),
+    (
+        "slow_operation_max_seconds",
+        "gauge",
+        "Longest slow operation found in the logs.",
+    ),
+    ("lines_total", "counter", "Log lines read."),
+    ("last_run_timestamp_seconds", "gauge", "When the logs were last read."),
+]
+
+
+def format_prometheus(state: AnalyzerState, prefix: str = "nixarr_log_") -> str:
+    """The aggregates in the Prometheus text exposition format."""
+    samples: dict[str, list[str]] = defaultdict(list)
+    for service, kinds in sorted(state.stats.items()):
+        for kind, names in sorted(kinds.items()):
+            for name, stats in sorted(names.items()):
+                labels = f'service="{escape_label(service)}",kind="{kind}",name="{escape_label(name)}"'
+                values = {
+                    "slow_operations_total": stats.count,
+                    "slow_operation_seconds_total": stats.total_secs,
+                    "slow_operation_max_seconds": stats.max_secs,
+                }
+                for metric, value in values.items():
+                    samples[metric].append(f"{prefix}{metric}{{{labels}}} {value:.15g}")
+    for service, lines in sorted(state.lines.items()):
+        samples["lines_total"].append(
+            f'{prefix}lines_total{{service="{escape_label(service)}"}} {lines}'
+        )
+    if state.last_run is not None:
+        samples["last_run_timestamp_seconds"].append(
+            f"{prefix}last_run_timestamp_seconds {state.last_run:.15g}"
+        )
+
+    lines = []
+    for name, kind, help in METRICS:
+        if not samples[name]:
+            continue
+        lines += [f"# HELP {prefix}{name} {help}", f"# TYPE {prefix}{name} {kind}"]
+        lines += samples[name]
+    return "\n".join(lines) + "\n"
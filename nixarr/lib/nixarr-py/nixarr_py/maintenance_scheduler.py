@@ -0,0 +1,490 @@
+"""
+Coordination of heavy maintenance jobs into declared time windows.
+
+Jellyfin's library scans, trickplay and chapter image extraction, and the
+*arrs' refresh tasks each run on their own schedule. When they collide with
+each other, with Nixarr's search schedulers or with playback, playback
+stutters and imports back up. The scheduler here takes over their timing:
+
+- it reads the scheduled-task definitions of Jellyfin and the *arrs through
+  their clients: when each task last ran, how often the *arrs run it, and
+  whether it's running right now,
+- it removes the triggers of the managed Jellyfin tasks (recording the
+  original ones in its state file, and giving them back once the tasks are no
+  longer managed or the scheduler stops) and instead starts each task inside
+  the declared windows, once per its interval. The *arrs' task intervals can't be
+  changed through their APIs, so their tasks are run inside a window whenever
+  they'd otherwise come due before the next window opens, which moves their
+  next run along with them,
+- it runs I/O-heavy jobs one at a time, waiting for each to finish, and
+  doesn't start one while another heavy task (e.g. a scan started from the
+  dashboard) or a conflicting systemd unit is active, and
+- it defers all jobs while more than a threshold of Jellyfin sessions are
+  playing something. Jobs that are already running aren't interrupted.
+
+Example usage:
+    >>> from nixarr_py.maintenance_scheduler import (
+    ...     MaintenanceConfig,
+    ...     MaintenanceJob,
+    ...     MaintenanceScheduler,
+    ... )
+    >>>
+    >>> config = MaintenanceConfig(
+    ...     windows=["02:00-06:00"],
+    ...     max_active_sessions=0,
+    ...     jobs=[
+    ...         MaintenanceJob(
+    ...             name="library-scan",
+    ...             service="jellyfin",
+    ...             task="RefreshLibrary",
+    ...             interval_secs=24 * 3600,
+    ...         ),
+    ...         MaintenanceJob(name="series-refresh", service="sonarr", task="RefreshSeries"),
+    ...     ],
+    ... )
+    >>> MaintenanceScheduler(config, "/var/lib/nixarr-maintenance/state.json").run()
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterable, Literal
+import logging
+import subprocess
+import time
+
+import jellyfin
+import pydantic
+
+from nixarr_py import clients
+from nixarr_py.commands import CommandBatch
+from nixarr_py.search_scheduler import OffPeakWindow
+from nixarr_py.utils import api_request, atomic_write_json
+
+
+logger = logging.getLogger(__name__)
+
+
+ARR_API_PREFIXES = {
+    "lidarr": "/api/v1",
+    "prowlarr": "/api/v1",
+    "radarr": "/api/v3",
+    "readarr": "/api/v1",
+    "sonarr": "/api/v3",
+}
+
+ACTIVE_COMMAND_STATUSES = {"queued", "started"}
+
+
+class MaintenanceJob(pydantic.BaseModel):
+    name: str
+    # "jellyfin", or one of `ARR_API_PREFIXES`.
+    service: Literal["jellyfin", "lidarr", "prowlarr", "radarr", "readarr", "sonarr"]
+    # The Jellyfin task key (e.g. "RefreshLibrary") or *arr task name (e.g.
+    # "RefreshSeries").
+    task: str
+    # How often to run the job. Defaults to the *arr's own task interval;
+    # required for Jellyfin tasks, whose triggers are removed.
+    interval_secs: float | None = None
+    io_heavy: bool = True
+    timeout_secs: float = 4 * 3600
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    @pydantic.model_validator(mode="after")
+    def _check_interval(self) -> "MaintenanceJob":
+        if self.service == "jellyfin" and self.interval_secs is None:
+            raise ValueError(f"Jellyfin job '{self.name}' needs an interval")
+        return self
+
+
+class MaintenanceConfig(pydantic.BaseModel):
+    jobs: list[MaintenanceJob]
+    # Daily windows like "02:00-06:00" (local time).
+    windows: list[str]
+    # Defer jobs while more Jellyfin sessions than this play something; don't
+    # check sessions if None.
+    max_active_sessions: int | None = None
+    # No heavy job is started while one of these systemd units (e.g. Nixarr's
+    # search schedulers) is active.
+    conflicting_units: list[str] = []
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+
+class SchedulerState(pydantic.BaseModel):
+    # Job name to when the scheduler last ran it.
+    last_run: dict[str, float] = {}
+    # Jellyfin task key to the triggers the scheduler removed from it.
+    jellyfin_triggers: dict[str, list[dict[str, Any]]] = {}
+
+
+@dataclass
+class TaskStatus:
+    """What a service reports about the task of a job."""
+
+    job: MaintenanceJob
+    task_id: str | None
+    last_run: float | None
+    interval_secs: float | None
+    running: bool
+
+    def due_in(self, last_run: float, now: float) -> float | None:
+        """Seconds until the job is due (negative if overdue), or None if it
+        has no interval."""
+        interval = self.job.interval_secs or self.interval_secs
+        if interval is None:
+            return None
+        return last_run + interval - now
+
+
+class Windows:
+    """Daily time windows like "02:00-06:00", possibly wrapping midnight."""
+
+    def __init__(self, specs: list[str]) -> None:
+        self.windows = [OffPeakWindow(spec) for spec in specs]
+
+    def seconds_left(self, now: datetime) -> float:
+        """Seconds until the current window closes, or 0 outside windows."""
+        return max((window.seconds_left(now) for window in self.windows), default=0)
+
+    def seconds_until_open(self, now: datetime) -> float:
+        """Seconds until a window opens, or 0 inside one."""
+        if self.seconds_left(now) > 0:
+            return 0
+        opens = []
+        for window in self.windows:
+            start = datetime.combine(now.date(), window.start, now.tzinfo)
+            if start <= now:
+                start += timedelta(days=1)
+            opens.append((start - now).total_seconds())
+        return min(opens, default=float("inf"))
+
+    def seconds_open(self, now: datetime) -> float:
+        """Seconds since the current window opened, or 0 outside windows."""
+        opened = []
+        for window in self.windows:
+            if window.seconds_left(now) <= 0:
+                continue
+            start = datetime.combine(now.date(), window.start, now.tzinfo)
+            if start > now:
+                start -= timedelta(days=1)
+            opened.append((now - start).total_seconds())
+        return max(opened, default=0)
+
+    def horizon(self, now: datetime) -> float:
+        """Seconds until the window after the current one opens."""
+        left = self.seconds_left(now)
+        closed = now + timedelta(seconds=left + 1)
+        return left + 1 + self.seconds_until_open(closed)
+
+
+def _timestamp(value: Any) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.year < 2000:
+        # Tasks that never ran report "0001-01-01".
+        return None
+    return value.timestamp()
+
+
+def _state(task: Any) -> str:
+    return getattr(task.state, "value", task.state)
+
+
+class MaintenanceScheduler:
+    """Runs maintenance jobs inside windows, one heavy job at a time; see the
+    module docs.
+
+    Args:
+        config: The jobs, windows and deferral settings.
+        state_file: Where to keep the last runs and removed triggers.
+        poll_secs: Time between checks for due jobs.
+    """
+
+    def __init__(
+        self, config: MaintenanceConfig, state_file: str | Path, poll_secs: float = 60
+    ) -> None:
+        self.config = config
+        self.windows = Windows(config.windows)
+        self.state_file = Path(state_file)
+        self.poll_secs = poll_secs
+        self.state = self._load_state()
+        self._last_reason: str | None = None
+
+    def _load_state(self) -> SchedulerState:
+        try:
+            return SchedulerState.model_validate_json(self.state_file.read_text())
+        except FileNotFoundError:
+            return SchedulerState()
+
+    def _save_state(self) -> None:
+        atomic_write_json(self.state_file, self.state)
+
+    def _log_reason(self, reason: str | None) -> None:
+        """Log why jobs wait, once per change of reason."""
+        if reason is not None and reason != self._last_reason:
+            logger.info(reason)
+        self._last_reason = reason
+
+    def _jobs(self, service: str) -> list[MaintenanceJob]:
+        return [job for job in self.config.jobs if job.service == service]
+
+    def take_over_jellyfin_triggers(self) -> None:
+        """Remove the triggers of the managed Jellyfin tasks, recording the
+        original ones the first time."""
+        keys = {job.task for job in self._jobs("jellyfin")}
+        if not keys:
+            return
+        with clients.jellyfin_client() as client:
+            for task in jellyfin.ScheduledTasksApi(client).get_tasks():
+                if task.key not in keys or not task.triggers:
+                    continue
+                triggers = [trigger.to_dict() for trigger in task.triggers]
+                self.state.jellyfin_triggers.setdefault(task.key, triggers)
+                self._save_state()
+                logger.info(f"Removing Jellyfin's own triggers of '{task.name}'")
+                api_request(client, "POST", f"/ScheduledTasks/{task.id}/Triggers", [])
+
+    def restore_jellyfin_triggers(self, keep: Iterable[str] = ()) -> None:
+        """Give Jellyfin's tasks back the triggers removed from them, except
+        for the tasks in `keep`."""
+        keep = set(keep)
+        keys = [key for key in self.state.jellyfin_triggers if key not in keep]
+        if not keys:
+            return
+        with clients.jellyfin_client() as client:
+            tasks = {
+                task.key: task
+                for task in jellyfin.ScheduledTasksApi(client).get_tasks()
+            }
+            for key in keys:
+                task = tasks.get(key)
+                if task is None:
+                    logger.warning(
+                        f"Jellyfin has no task '{key}' to restore triggers of"
+                    )
+                else:
+                    logger.info(f"Restoring Jellyfin's own triggers of '{task.name}'")
+                    api_request(
+                        client,
+                        "POST",
+                        f"/ScheduledTasks/{task.id}/Triggers",
+                        self.state.jellyfin_triggers[key],
+                    )
+                del self.state.jellyfin_triggers[key]
+                self._save_state()
+
+    def _jellyfin_statuses(self) -> list[TaskStatus]:
+        jobs = self._jobs("jellyfin")
+        if not jobs:
+            return []
+        with clients.jellyfin_client() as client:
+            tasks = {
+                task.key: task
+                for task in jellyfin.ScheduledTasksApi(client).get_tasks()
+            }
+        statuses = []
+        for job in jobs:
+            task = tasks.get(job.task)
+            if task is None:
+                logger.warning(
+                    f"Jellyfin has no task '{job.task}' for job '{job.name}'"
+                )
+                continue
+            result = task.last_execution_result
+            statuses.append(
+                TaskStatus(
+                    job=job,
+                    task_id=task.id,
+                    last_run=_timestamp(result.end_time_utc) if result else None,
+                    interval_secs=None,
+                    running=_state(task) != "Idle",
+                )
+            )
+        return statuses
+
+    def _arr_statuses(self, service: str) -> list[TaskStatus]:
+        jobs = self._jobs(service)
+        if not jobs:
+            return []
+        prefix = ARR_API_PREFIXES[service]
+        with getattr(clients, f"{service}_client")() as client:
+            tasks = {
+                task["taskName"]: task
+                for task in api_request(client, "GET", f"{prefix}/system/task")
+            }
+            active = {
+                command["name"]
+                for command in api_request(client, "GET", f"{prefix}/command")
+                if command.get("status") in ACTIVE_COMMAND_STATUSES
+            }
+        statuses = []
+        for job in jobs:
+            task = tasks.get(job.task)
+            if task is None and job.interval_secs is None:
+                logger.warning(
+                    f"{service} has no scheduled task '{job.task}' for job '{job.name}'"
+                )
+                continue
+            task = task or {}
+            interval_mins = task.get("interval")
+            statuses.append(
+                TaskStatus(
+                    job=job,
+                    task_id=None,
+                    last_run=_timestamp(task.get("lastExecution")),
+                    interval_secs=interval_mins * 60 if interval_mins else None,
+                    running=job.task in active,
+                )
+            )
+        return statuses
+
+    def task_statuses(self) -> list[TaskStatus]:
+        """Read every job's task definition, once per service."""
+        statuses = self._jellyfin_statuses()
+        for service in ARR_API_PREFIXES:
+            statuses += self._arr_statuses(service)
+        return statuses
+
+    def active_sessions(self) -> int:
+        """The number of Jellyfin sessions playing something."""
+        with clients.jellyfin_client() as client:
+            sessions = jellyfin.SessionApi(client).get_sessions(
+                active_within_seconds=int(self.poll_secs * 2)
+            )
+        return sum(session.now_playing_item is not None for session in sessions)
+
+    def _active_units(self) -> list[str]:
+        return [
+            unit
+            for unit in self.config.conflicting_units
+            if subprocess.run(["systemctl", "is-active", "--quiet", unit]).returncode
+            == 0
+        ]
+
+    def _start(self, status: TaskStatus) -> None:
+        job = status.job
+        if job.service == "jellyfin":
+            with clients.jellyfin_client() as client:
+                jellyfin.ScheduledTasksApi(client).start_task(task_id=status.task_id)
+            return
+        with getattr(clients, f"{job.service}_client")() as client:
+            batch = CommandBatch(client, ARR_API_PREFIXES[job.service])
+            batch.add(job.task)
+            batch.send()
+
+    def _wait(self, status: TaskStatus) -> None:
+        """Wait until the job's task stops running, or its timeout passes."""
+        job = status.job
+        deadline = time.monotonic() + job.timeout_secs
+        # Give the service a moment to pick the task up.
+        time.sleep(5)
+        while time.monotonic() < deadline:
+            running = [s for s in self.task_statuses() if s.job == job and s.running]
+            if not running:
+                return
+            time.sleep(min(self.poll_secs, max(0, deadline - time.monotonic())))
+        logger.warning(f"Job '{job.name}' still running after its timeout; moving on")
+
+    def run_job(self, status: TaskStatus) -> None:
+        """Start a job's task; for heavy jobs, also wait for it to finish."""
+        job = status.job
+        logger.info(f"Starting job '{job.name}' ({job.service} {job.task})")
+        started = time.monotonic()
+        self._start(status)
+        if job.io_heavy:
+            self._wait(status)
+            logger.info(
+                f"Job '{job.name}' finished after {time.monotonic() - started:.0f}s"
+            )
+        self.state.last_run[job.name] = time.time()
+        self._save_state()
+
+    def step(self) -> float:
+        """Run the due jobs that may run now.
+
+        Returns:
+            float: Seconds to wait before the next step.
+        """
+        now_dt = datetime.now().astimezone()
+        if self.windows.seconds_left(now_dt) <= 0:
+            until_open = self.windows.seconds_until_open(now_dt)
+            self._log_reason(
+                f"Outside the maintenance windows; next opens in {until_open:.0f}s"
+            )
+            return min(until_open, 3600)
+
+        now = now_dt.timestamp()
+        left = self.windows.seconds_left(now_dt)
+        horizon = self.windows.horizon(now_dt)
+        opened = now - self.windows.seconds_open(now_dt)
+        statuses = self.task_statuses()
+        due = []
+        for status in statuses:
+            last_run = max(
+                self.state.last_run.get(status.job.name, 0), status.last_run or 0
+            )
+            due_in = status.due_in(last_run, now)
+            if due_in is None:
+                continue
+            # Jobs that would come due between this window and the next run
+            # now instead, unless they already ran in this window (their
+            # interval is then shorter than the gap between windows).
+            pull_forward = left < due_in <= horizon and last_run < opened
+            if due_in <= 0 or pull_forward:
+                due.append((due_in, status))
+        if not due:
+            self._log_reason("No jobs due before the next window")
+            return self.poll_secs
+        due.sort(key=lambda item: item[0])
+
+        max_sessions = self.config.max_active_sessions
+        if max_sessions is not None:
+            sessions = self.active_sessions()
+            if sessions > max_sessions:
+                self._log_reason(
+                    f"Deferring {len(due)} due jobs while {sessions} sessions are playing"
+                )
+                return self.poll_secs
+
+        for _, status in due:
+            if not status.job.io_heavy and not status.running:
+                self.run_job(status)
+        heavy = [status for _, status in due if status.job.io_heavy]
+        if not heavy:
+            return self.poll_secs
+        running = [
+            status.job.name
+            for status in statuses
+            if status.job.io_heavy and status.running
+        ]
+        if running:
+            self._log_reason(f"Waiting for running heavy tasks: {', '.join(running)}")
+            return self.poll_secs
+        units = self._active_units()
+        if units:
+            self._log_reason(f"Waiting for conflicting units: {', '.join(units)}")
+            return self.poll_secs
+        self._log_reason(None)
+        self.run_job(heavy[0])
+        # Re-check right away, as the next heavy job may be due too.
+        return 0
+
+    def run(self) -> None:
+        """Coordinate the jobs until interrupted."""
+        self.restore_jellyfin_triggers(
+            keep={job.task for job in self._jobs("jellyfin")}
+        )
+        self.take_over_jellyfin_triggers()
+        while True:
+            try:
+                delay = self.step()
+            except Exception:
+                # E.g. a service restarting; the due jobs are still due at
+                # the next step.
+                logger.exception("Failed to run the due jobs; retrying")
+                delay = self.poll_secs
+            time.sleep(delay)
@@ -0,0 +1,142 @@
+"""
+Streaming iteration over paged *arr API endpoints.
+
+Sonarr, Radarr, Lidarr, Readarr and Whisparr (and Prowlarr) expose history,
+the queue, wanted/missing, cutoff unmet, the blocklist and logs as paged
+endpoints: they take `page`, `pageSize`, `sortKey` and `sortDirection`
+parameters plus endpoint-specific filters, and return a paging resource with
+`totalRecords` and one page of `records`. The generated clients map these to
+methods like `radarr.HistoryApi.get_history`, which all share that shape, so
+the helpers here work with any of them.
+
+Only one page is processed at a time, while at most one more is being fetched
+in the background, so memory use is bounded by the page size rather than by
+the size of the library.
+
+Example usage:
+    >>> import sonarr
+    >>> from nixarr_py.clients import sonarr_client
+    >>> from nixarr_py.paging import iter_records
+    >>>
+    >>> with sonarr_client() as client:
+    ...     missing = sonarr.MissingApi(client).get_wanted_missing
+    ...     for episode in iter_records(
+    ...         missing, sort_key="airDateUtc", sort_direction="descending", monitored=True
+    ...     ):
+    ...         print(episode.title)
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Literal
+
+
+SortDirection = Literal["default", "ascending", "descending"]
+
+
+def iter_pages(
+    get_page: Callable[..., Any],
+    page_size: int = 250,
+    sort_key: str | None = None,
+    sort_direction: SortDirection | None = None,
+    prefetch: bool = True,
+    **filters: Any,
+) -> Iterator[Any]:
+    """Iterate over the pages of a paged *arr endpoint.
+
+    Args:
+        get_page: A paged method of a generated *arr client, e.g.
+            `radarr.HistoryApi(client).get_history`.
+        page_size: Number of records to request per page.
+        sort_key: Server-side sort key, e.g. "date" or "airDateUtc".
+        sort_direction: Server-side sort direction.
+        prefetch: Fetch the next page in the background while the caller
+            processes the current one.
+        **filters: Endpoint-specific filters passed to `get_page` unchanged,
+            e.g. `monitored=True` or `event_type=[1]`. Filtering happens on
+            the server, so records that don't match are never transferred.
+
+    Returns:
+        Iterator: The endpoint's paging resources, in page order. Iteration
+        stops after the last page reported by `total_records`, or at the
+        first empty page.
+    """
+    if sort_key is not None:
+        filters["sort_key"] = sort_key
+    if sort_direction is not None:
+        filters["sort_direction"] = sort_direction
+
+    def fetch(page: int) -> Any:
+        return get_page(page=page, page_size=page_size, **filters)
+
+    if not prefetch:
+        page = 1
+        while True:
+            result = fetch(page)
+            yield result
+            if _is_last_page(result, page, page_size):
+                return
+            page += 1
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arr-prefetch")
+    try:
+        page = 1
+        next_result: Future = executor.submit(fetch, page)
+        while True:
+            result = next_result.result()
+            last = _is_last_page(result, page, page_size)
+            if not last:
+                next_result = executor.submit(fetch, page + 1)
+            yield result
+            if last:
+                return
+            page += 1
+    finally:
+        # If the caller stops early, don't wait for a page nobody will read.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_records(
+    get_page: Callable[..., Any],
+    page_size: int = 250,
+    sort_key: str | None = None,
+    sort_direction: SortDirection | None = None,
+    prefetch: bool = True,
+    **filters: Any,
+) -> Iterator[Any]:
+    """Iterate over the records of a paged *arr endpoint, one at a time.
+
+    Takes the same arguments as `iter_pages`.
+
+    Records added or removed while iterating shift later pages, which can make
+    a record appear twice or not at all. For endpoints that grow while being
+    read (like history), sort by a key that puts new records last, e.g.
+    `sort_key="date", sort_direction="ascending"`.
+    """
+    for result in iter_pages(
+        get_page,
+        page_size=page_size,
+        sort_key=sort_key,
+        sort_direction=sort_direction,
+        prefetch=prefetch,
+        **filters,
+    ):
+        yield from result.records or []
+
+
+def count_records(get_page: Callable[..., Any], **filters: Any) -> int:
+    """Get the number of records a paged *arr endpoint would return, without
+    fetching them.
+
+    Args:
+        get_page: A paged method of a generated *arr client.
+        **filters: Endpoint-specific filters passed to `get_page` unchanged.
+    """
+    return get_page(page=1, page_size=1, **filters).total_records or 0
+
+
+def _is_last_page(result: Any, page: int, page_size: int) -> bool:
+    if not result.records:
+        return True
+    if result.total_records is None:
+        return len(result.records) < page_size
+    return page * page_size >= result.total_records
@@ -0,0 +1,478 @@
+"""
+Prowlarr indexer latency analytics and slow-indexer gating.
+
+Prowlarr shows an average response time per indexer, but an average hides
+the indexers that are usually fine and sometimes take half a minute, which is
+what makes searches from the *arrs slow. This computes, per indexer and over
+sliding windows (e.g. the last hour and the last day):
+
+- p50 and p95 response times, from the `elapsedTime` of the queries in
+  Prowlarr's history (answers served from Prowlarr's cache are left out),
+- the failure rate of queries (searches and RSS), and
+- the grab yield (grabs per search query), from Prowlarr's indexer statistics,
+
+and renders them as a report or in the Prometheus text format.
+
+Optionally, indexers that stay slow or failing are gated: either their
+priority is lowered (so the *arrs prefer other indexers' releases) or they are
+disabled. Gating uses hysteresis so an indexer doesn't flap: it is gated only
+after being slow in several consecutive runs, and ungated only after being
+clearly fast (below a lower threshold) in several consecutive runs. Disabled
+indexers can't be measured, so they are re-enabled on probation after a
+cooldown instead. The counters and the original priorities are kept in a
+state file between runs.
+
+Example usage:
+    >>> from nixarr_py.prowlarr_indexer_health import (
+    ...     GatePolicy,
+    ...     IndexerGate,
+    ...     collect_indexer_health,
+    ...     format_report,
+    ... )
+    >>>
+    >>> health = collect_indexer_health(windows_secs=[3600, 86400])
+    >>> print(format_report(health))
+    >>> IndexerGate(GatePolicy(mode="deprioritize"), "/tmp/gate.json").apply(
+    ...     health, window_secs=3600
+    ... )
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Literal
+import logging
+import math
+import time
+
+import prowlarr
+import pydantic
+
+from nixarr_py.clients import prowlarr_client
+from nixarr_py.paging import iter_records
+from nixarr_py.utils import atomic_write_json, escape_label, format_table
+
+
+logger = logging.getLogger(__name__)
+
+
+# Prowlarr's `HistoryEventType` values, as the history endpoint's
+# `eventType` filter takes them.
+INDEXER_QUERY = 2
+INDEXER_RSS = 3
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """The nearest-rank `q`th percentile of `values`, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class IndexerWindowHealth:
+    """How one indexer did over one window."""
+
+    indexer_id: int
+    name: str
+    window_secs: int
+    queries: int = 0
+    failed_queries: int = 0
+    rss_queries: int = 0
+    grabs: int = 0
+    latencies_ms: list[float] = field(default_factory=list, repr=False)
+
+    @property
+    def samples(self) -> int:
+        return len(self.latencies_ms)
+
+    @property
+    def p50_ms(self) -> float | None:
+        return percentile(self.latencies_ms, 50)
+
+    @property
+    def p95_ms(self) -> float | None:
+        return percentile(self.latencies_ms, 95)
+
+    @property
+    def failure_rate(self) -> float | None:
+        total = self.queries + self.rss_queries
+        return self.failed_queries / total if total else None
+
+    @property
+    def grab_yield(self) -> float | None:
+        return self.grabs / self.queries if self.queries else None
+
+
+@dataclass
+class IndexerHealth:
+    """Per-window health of all indexers, keyed by window and indexer ID."""
+
+    windows: dict[int, dict[int, IndexerWindowHealth]]
+    # Indexer ID to (enabled, priority) at collection time.
+    indexers: dict[int, tuple[bool, int]]
+
+
+def _elapsed_ms(record: Any) -> float | None:
+    data = record.data or {}
+    if data.get("cached", data.get("Cached")) == "1":
+        return None
+    elapsed = data.get("elapsedTime", data.get("ElapsedTime"))
+    try:
+        return float(elapsed)
+    except (TypeError, ValueError):
+        return None
+
+
+def collect_indexer_health(
+    windows_secs: list[int], page_size: int = 500
+) -> IndexerHealth:
+    """Collect per-indexer health over each of the windows ending now.
+
+    Query, failure and grab counts come from Prowlarr's indexer statistics
+    for each window. Latencies come from the query history, which is read
+    newest first and only as far back as the longest window.
+    """
+    now = datetime.now(timezone.utc)
+    with prowlarr_client() as client:
+        indexers = prowlarr.IndexerApi(client).list_indexer()
+        names = {indexer.id: indexer.name or str(indexer.id) for indexer in indexers}
+        windows: dict[int, dict[int, IndexerWindowHealth]] = {}
+        stats_api = prowlarr.IndexerStatsApi(client)
+        for window_secs in windows_secs:
+            stats = stats_api.get_indexer_stats(
+                start_date=now - timedelta(seconds=window_secs), end_date=now
+            )
+            windows[window_secs] = {
+                indexer_id: IndexerWindowHealth(indexer_id, name, window_secs)
+                for indexer_id, name in names.items()
+            }
+            for s in stats.indexers or []:
+                health = windows[window_secs].get(s.indexer_id)
+                if health is None:
+                    continue
+                health.queries = s.number_of_queries or 0
+                health.rss_queries = s.number_of_rss_queries or 0
+                health.failed_queries = (s.number_of_failed_queries or 0) + (
+                    s.number_of_failed_rss_queries or 0
+                )
+                health.grabs = s.number_of_grabs or 0
+
+        oldest = now - timedelta(seconds=max(windows_secs))
+        for record in iter_records(
+            prowlarr.HistoryApi(client).get_history,
+            page_size=page_size,
+            sort_key="date",
+            sort_direction="descending",
+            event_type=[INDEXER_QUERY, INDEXER_RSS],
+        ):
+            date = record.var_date
+            if date is not None and date.tzinfo is None:
+                date = date.replace(tzinfo=timezone.utc)
+            if date is None or date < oldest:
+                break
+            elapsed = _elapsed_ms(record)
+            if elapsed is None or not record.successful:
+                continue
+            age = (now - date).total_seconds()
+            for window_secs, window in windows.items():
+                health = window.get(record.indexer_id)
+                if health is not None and age <= window_secs:
+                    health.latencies_ms.append(elapsed)
+
+    return IndexerHealth(
+        windows=windows,
+        indexers={
+            indexer.id: (bool(indexer.enable), indexer.priority or 25)
+            for indexer in indexers
+        },
+    )
+
+
+def _format_ms(value: float | None) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def _format_ratio(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+
+def _format_window(secs: int) -> str:
+    if secs % 86400 == 0:
+        return f"{secs // 86400}d"
+    if secs % 3600 == 0:
+        return f"{secs // 3600}h"
+    return f"{secs}s"
+
+
+def format_report(health: IndexerHealth) -> str:
+    """A table of each indexer's health per window, slowest p95 first."""
+    header = [
+        "window",
+        "indexer",
+        "p50 ms",
+        "p95 ms",
+        "samples",
+        "queries",
+        "failed",
+        "grabs/query",
+    ]
+    rows = []
+    for window_secs, window in health.windows.items():
+        for h in sorted(window.values(), key=lambda h: -(h.p95_ms or 0)):
+            enabled, _ = health.indexers.get(h.indexer_id, (True, 0))
+            rows.append(
+                [
+                    _format_window(window_secs),
+                    h.name if enabled else f"{h.name} (disabled)",
+                    _format_ms(h.p50_ms),
+                    _format_ms(h.p95_ms),
+                    str(h.samples),
+                    str(h.queries + h.rss_queries),
+                    _format_ratio(h.failure_rate),
+                    _format_ratio(h.grab_yield),
+                ]
+            )
+    return format_table([header, *rows])
+
+
+METRICS = [
+    ("response_time_p50_seconds", "gauge", "Median query response time."),
+    ("response_time_p95_seconds", "gauge", "95th percentile query response time."),
+    (
+        "response_time_samples",
+        "gauge",
+        "Uncached queries the percentiles are based on.",
+    ),
+    ("queries", "gauge", "Search and RSS queries in the window."),
+    ("failure_ratio", "gauge", "Fraction of queries in the window that failed."),
+    ("grab_yield_ratio", "gauge", "Grabs per search query in the window."),
+    ("enabled", "gauge", "Whether the indexer is enabled."),
+    ("priority", "gauge", "The indexer's priority (lower is preferred)."),
+]
+
+
+def format_prometheus(
+    health: IndexerHealth, prefix: str = "nixarr_prowlarr_indexer_"
+) -> str:
+    """The health metrics in the Prometheus text exposition format."""
+    samples: dict[str, list[str]] = defaultdict(list)
+    for window_secs, window in health.windows.items():
+        for h in window.values():
+            labels = f'indexer="{escape_label(h.name)}",indexer_id="{h.indexer_id}",window="{_format_window(window_secs)}"'
+            values = {
+                "response_time_p50_seconds": None
+                if h.p50_ms is None
+                else h.p50_ms / 1000,
+                "response_time_p95_seconds": None
+                if h.p95_ms is None
+                else h.p95_ms / 1000,
+                "response_time_samples": h.samples,
+                "queries": h.queries + h.rss_queries,
+                "failure_ratio": h.failure_rate,
+                "grab_yield_ratio": h.grab_yield,
+            }
+            for name, value in values.items():
+                if value is not None:
+                    samples[name].append(f"{prefix}{name}{{{labels}}} {value:g}")
+    names = {
+        h.indexer_id: h.name
+        for window in health.windows.values()
+        for h in window.values()
+    }
+    for indexer_id, (enabled, priority) in health.indexers.items():
+        labels = f'indexer="{escape_label(names.get(indexer_id, str(indexer_id)))}",indexer_id="{indexer_id}"'
+        samples["enabled"].append(f"{prefix}enabled{{{labels}}} {int(enabled)}")
+        samples["priority"].append(f"{prefix}priority{{{labels}}} {priority}")
+
+    lines = []
+    for name, kind, help in METRICS:
+        if not samples[name]:
+            continue
+        lines += [f"# HELP {prefix}{name} {help}", f"# TYPE {prefix}{name} {kind}"]
+        lines += samples[name]
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class GatePolicy:
+    """When to gate indexers, and how.
+
+    Args:
+        mode: "deprioritize" lowers a gated indexer's priority to
+            `gated_priority`; "disable" disables it.
+        slow_p95_ms: An indexer is slow if its p95 is above this...
+        max_failure_rate: ...or if more than this fraction of its queries
+            failed.
+        recover_p95_ms: An indexer has recovered if its p95 is below this and
+            at most half of `max_failure_rate` of its queries failed. Keep
+            this well below `slow_p95_ms`.
+        slow_runs: Consecutive slow runs before an indexer is gated.
+        recover_runs: Consecutive recovered runs before it is ungated.
+        min_samples: Runs with fewer uncached queries than this in the window
+            neither count as slow nor as recovered.
+        gated_priority: Priority of deprioritized indexers (lower is
+            preferred; 50 is the lowest Prowlarr allows).
+        disable_cooldown_secs: How long disabled indexers stay disabled
+            before they are re-enabled and measured again.
+    """
+
+    mode: Literal["deprioritize", "disable"] = "deprioritize"
+    slow_p95_ms: float = 10000
+    max_failure_rate: float = 0.2
+    recover_p95_ms: float = 5000
+    slow_runs: int = 3
+    recover_runs: int = 3
+    min_samples: int = 10
+    gated_priority: int = 50
+    disable_cooldown_secs: float = 6 * 3600
+
+
+class IndexerGateState(pydantic.BaseModel):
+    slow_runs: int = 0
+    recovered_runs: int = 0
+    gated_since: float | None = None
+    original_priority: int | None = None
+
+
+class GateState(pydantic.BaseModel):
+    indexers: dict[int, IndexerGateState] = {}
+
+
+Verdict = Literal["slow", "recovered", "unknown", "ok"]
+
+
+class IndexerGate:
+    """Gates and ungates indexers according to a `GatePolicy`; see the
+    module docs."""
+
+    def __init__(
+        self, policy: GatePolicy, state_file: str | Path, dry_run: bool = False
+    ) -> None:
+        self.policy = policy
+        self.state_file = Path(state_file)
+        self.dry_run = dry_run
+        self.state = self._load_state()
+
+    def _load_state(self) -> GateState:
+        try:
+            return GateState.model_validate_json(self.state_file.read_text())
+        except FileNotFoundError:
+            return GateState()
+
+    def _save_state(self) -> None:
+        atomic_write_json(self.state_file, self.state)
+
+    def verdict(self, health: IndexerWindowHealth) -> Verdict:
+        """Whether an indexer was slow, has recovered, or neither."""
+        p95, failure_rate = health.p95_ms, health.failure_rate or 0
+        if health.samples < self.policy.min_samples or p95 is None:
+            return "unknown"
+        if p95 > self.policy.slow_p95_ms or failure_rate > self.policy.max_failure_rate:
+            return "slow"
+        fast = p95 < self.policy.recover_p95_ms
+        if fast and failure_rate <= self.policy.max_failure_rate / 2:
+            return "recovered"
+        return "ok"
+
+    def apply(self, health: IndexerHealth, window_secs: int) -> dict[int, str]:
+        """Update the counters from `health` over `window_secs`, and gate or
+        ungate indexers that crossed a threshold.
+
+        Returns:
+            dict: Indexer ID to the action taken ("gated" or "ungated").
+        """
+        window = health.windows[window_secs]
+        now = time.time()
+        to_gate, to_ungate = [], []
+        for indexer_id in list(self.state.indexers):
+            if indexer_id not in health.indexers:
+                del self.state.indexers[indexer_id]
+        for indexer_id, (enabled, _) in health.indexers.items():
+            state = self.state.indexers.setdefault(indexer_id, IndexerGateState())
+            gated = state.gated_since is not None
+            if not enabled and not gated:
+                # Disabled by someone else; don't measure or touch it.
+                state.slow_runs = state.recovered_runs = 0
+                continue
+            verdict = self.verdict(window[indexer_id])
+            if verdict != "unknown":
+                state.slow_runs = state.slow_runs + 1 if verdict == "slow" else 0
+                state.recovered_runs = (
+                    state.recovered_runs + 1 if verdict == "recovered" else 0
+                )
+            if not gated and state.slow_runs >= self.policy.slow_runs:
+                to_gate.append(indexer_id)
+            elif gated and self.policy.mode == "disable":
+                gated_secs = now - (state.gated_since or now)
+                if gated_secs >= self.policy.disable_cooldown_secs:
+                    to_ungate.append(indexer_id)
+            elif gated and state.recovered_runs >= self.policy.recover_runs:
+                to_ungate.append(indexer_id)
+
+        # Never gate every usable indexer; searches would find nothing.
+        usable = [
+            indexer_id
+            for indexer_id, (enabled, _) in health.indexers.items()
+            if enabled and self.state.indexers[indexer_id].gated_since is None
+        ]
+        if to_gate and len(to_gate) >= len(usable):
+            logger.warning(
+                f"Not gating {len(to_gate)} slow indexers: no other indexers would be left"
+            )
+            to_gate = []
+
+        actions = {}
+        names = {h.indexer_id: h.name for h in window.values()}
+        for indexer_id in to_gate:
+            state = self.state.indexers[indexer_id]
+            state.original_priority = health.indexers[indexer_id][1]
+            h = window[indexer_id]
+            logger.info(
+                f"Gating indexer '{names[indexer_id]}' ({self.policy.mode}): "
+                f"p95 {_format_ms(h.p95_ms)}ms, {_format_ratio(h.failure_rate)} failed "
+                f"over the last {_format_window(window_secs)}"
+            )
+            state.gated_since = now
+            state.slow_runs = state.recovered_runs = 0
+            actions[indexer_id] = "gated"
+        for indexer_id in to_ungate:
+            state = self.state.indexers[indexer_id]
+            logger.info(f"Ungating indexer '{names[indexer_id]}'")
+            actions[indexer_id] = "ungated"
+
+        if not self.dry_run:
+            self._apply_actions(actions, health)
+            for indexer_id, action in actions.items():
+                if action == "ungated":
+                    state = self.state.indexers[indexer_id]
+                    state.gated_since = state.original_priority = None
+                    state.slow_runs = state.recovered_runs = 0
+            self._save_state()
+        return actions
+
+    def _apply_actions(self, actions: dict[int, str], health: IndexerHealth) -> None:
+        # One bulk edit per distinct change, rather than one per indexer.
+        changes: dict[tuple[str, Any], list[int]] = defaultdict(list)
+        for indexer_id, action in actions.items():
+            enabled, priority = health.indexers[indexer_id]
+            state = self.state.indexers[indexer_id]
+            if self.policy.mode == "disable":
+                changes[("enable", action == "ungated")].append(indexer_id)
+            elif action == "gated":
+                changes[("priority", self.policy.gated_priority)].append(indexer_id)
+            elif priority == self.policy.gated_priority:
+                # Only restore the priority if nobody changed it meanwhile.
+                original = state.original_priority or 25
+                changes[("priority", original)].append(indexer_id)
+        if not changes:
+            return
+        with prowlarr_client() as client:
+            indexer_api = prowlarr.IndexerApi(client)
+            for (prop, value), ids in changes.items():
+                indexer_api.put_indexer_bulk(
+                    prowlarr.IndexerBulkResource(ids=ids, **{prop: value})
+                )
@@ -0,0 +1,171 @@
+"""
+Validation of settings-sync configs against schema snapshots.
+
+The settings-sync services only find typos in `fields`, unknown
+implementations and unknown `sort_name`s when they run on the live machine,
+after the service has booted, and systemd then retries the failing sync. With
+a snapshot of the service's schemas (from `nixarr show-<service>-schemas
+snapshot`), the same checks run while building the system instead: a bad
+config fails the build in seconds, with suggestions for what was probably
+meant.
+
+A snapshot only keeps what validation needs from each schema: its key
+(implementation or sort name), its top-level property names and its field
+names. This keeps it small and readable enough to check into a repository.
+It also records the version of the service it was taken from: the sync
+service only skips its own runtime validation if the running service has that
+version, because an upgrade can add, rename or remove implementations and
+fields.
+
+Example usage:
+    >>> import json
+    >>> from nixarr_py.schema_validation import validate_sync_config
+    >>>
+    >>> errors = validate_sync_config(
+    ...     "prowlarr",
+    ...     json.load(open("prowlarr-sync-config.json")),
+    ...     json.load(open("prowlarr-schemas.json")),
+    ... )
+"""
+
+from dataclasses import dataclass
+from typing import Any
+import difflib
+import logging
+
+from nixarr_py.utils import unexpected_properties
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SyncedKind:
+    """A list of items in a settings-sync config, and the schemas they use."""
+
+    config_key: str
+    schema_kind: str
+    schema_key: str
+    label: str
+    # Config properties the sync script consumes itself, rather than passing
+    # them to `apply_config`.
+    unchecked_properties: tuple[str, ...] = ()
+
+
+SYNCED_KINDS = {
+    "prowlarr": [
+        SyncedKind("app_configs", "application", "implementation", "app"),
+        SyncedKind(
+            "indexer_configs",
+            "indexer",
+            "sort_name",
+            "indexer",
+            unchecked_properties=("app_profile_name",),
+        ),
+    ],
+    "radarr": [
+        SyncedKind(
+            "download_clients", "download_client", "implementation", "download client"
+        ),
+    ],
+    "sonarr": [
+        SyncedKind(
+            "download_clients", "download_client", "implementation", "download client"
+        ),
+    ],
+}
+
+
+def snapshot_schemas(
+    service: str,
+    schemas: dict[str, list[dict[str, Any]]],
+    version: str | None = None,
+) -> dict:
+    """Reduce full schemas, keyed by schema kind, to a snapshot.
+
+    Args:
+        version: The version of the service the schemas were fetched from.
+    """
+    snapshot: dict[str, Any] = {"version": version}
+    for kind in SYNCED_KINDS[service]:
+        snapshot[kind.schema_kind] = sorted(
+            (
+                {
+                    "key": schema[kind.schema_key],
+                    "properties": sorted(schema),
+                    "fields": sorted(field["name"] for field in schema["fields"]),
+                }
+                for schema in schemas[kind.schema_kind]
+            ),
+            key=lambda entry: entry["key"],
+        )
+    return snapshot
+
+
+def needs_runtime_validation(snapshot: dict[str, Any], version: str | None) -> bool:
+    """Whether a config validated against `snapshot` at build time must still
+    be validated at runtime, against a service running `version`.
+
+    That is the case unless the snapshot was taken from the same version, e.g.
+    because the service was upgraded without updating the snapshot.
+    """
+    snapshot_version = snapshot.get("version")
+    if snapshot_version is None:
+        logger.warning(
+            "The schema snapshot doesn't record the version it was taken from; validating the config against the live schemas. Update the snapshot to skip this."
+        )
+        return True
+    if snapshot_version != version:
+        logger.warning(
+            f"The schema snapshot was taken from version {snapshot_version}, but version {version} is running; validating the config against the live schemas. Update the snapshot to skip this."
+        )
+        return True
+    return False
+
+
+def _did_you_mean(value: str, candidates: list[str]) -> str:
+    matches = difflib.get_close_matches(value, candidates, n=3)
+    return f" Did you mean {' or '.join(repr(m) for m in matches)}?" if matches else ""
+
+
+def validate_sync_config(
+    service: str, config: dict[str, Any], snapshot: dict[str, Any]
+) -> list[str]:
+    """Check a settings-sync config against a schema snapshot.
+
+    Returns:
+        list: A description of each problem found; empty if the config is
+        valid.
+    """
+    errors = []
+    for kind in SYNCED_KINDS[service]:
+        if kind.schema_kind not in snapshot:
+            errors.append(f"The schema snapshot has no '{kind.schema_kind}' schemas")
+            continue
+        schemas = {entry["key"]: entry for entry in snapshot[kind.schema_kind]}
+        for item in config.get(kind.config_key, []):
+            key = item.get(kind.schema_key)
+            description = f"{kind.label} '{item.get('name') or key}'"
+            if key not in schemas:
+                hint = _did_you_mean(str(key), list(schemas))
+                errors.append(
+                    f"{description}: unknown {kind.schema_key} '{key}'.{hint}"
+                )
+                continue
+            schema = schemas[key]
+            arr_dst = {
+                **{name: None for name in schema["properties"]},
+                "fields": [{"name": name} for name in schema["fields"]],
+            }
+            unexpected = unexpected_properties(
+                item, arr_dst, list(kind.unchecked_properties)
+            )
+            for path in unexpected:
+                name = path.split('"')[1]
+                candidates = (
+                    schema["fields"]
+                    if path.startswith(".fields.")
+                    else schema["properties"]
+                )
+                hint = _did_you_mean(name, candidates)
+                errors.append(f"{description}: unknown property {path}.{hint}")
+    return errors
@@ -0,0 +1,295 @@
+"""
+Rate-limited, resumable searching for wanted items in the *arrs.
+
+"Search all missing" in Sonarr or Radarr queues one search per item, and every
+search queries every enabled indexer, so a large backlog hammers the
+indexers (and gets us rate-limited or banned) and saturates the machine. The
+scheduler here instead:
+
+- streams the wanted/missing (and optionally cutoff-unmet) items of each
+  service through the paged API,
+- sends them in small batches as one multi-ID search command per batch
+  (`EpisodeSearch`, `MoviesSearch`, `AlbumSearch`), waiting for each command
+  to finish before sending the next,
+- keeps the number of queries per indexer within a budget per time window,
+  counting both its own searches and, if Prowlarr is available, every query
+  Prowlarr made in the window (RSS, interactive searches, other apps),
+- only runs inside an off-peak window, and
+- records which items were searched in a local state file, so an interrupted
+  or out-of-window run continues where it stopped. Once every wanted item was
+  searched, a new cycle starts after a configurable interval.
+
+Example usage:
+    >>> from nixarr_py.search_scheduler import SearchScheduler
+    >>>
+    >>> SearchScheduler(
+    ...     services=["sonarr", "radarr"],
+    ...     state_file="/var/lib/nixarr-search-scheduler/state.json",
+    ...     queries_per_indexer=100,
+    ...     budget_window_secs=3600,
+    ... ).run()
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import importlib
+import logging
+import time
+
+import pydantic
+
+from nixarr_py import clients
+from nixarr_py.commands import CommandBatch
+from nixarr_py.paging import iter_records
+from nixarr_py.utils import atomic_write_json
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SearchCommand:
+    """How to search for a batch of wanted items of one service."""
+
+    api_prefix: str
+    command: str
+    ids_property: str
+
+
+SEARCH_COMMANDS = {
+    "lidarr": SearchCommand("/api/v1", "AlbumSearch", "albumIds"),
+    "radarr": SearchCommand("/api/v3", "MoviesSearch", "movieIds"),
+    "sonarr": SearchCommand("/api/v3", "EpisodeSearch", "episodeIds"),
+}
+
+
+class ServiceProgress(pydantic.BaseModel):
+    cycle_started: float | None = None
+    searched: list[int] = []
+
+
+class SchedulerState(pydantic.BaseModel):
+    services: dict[str, ServiceProgress] = {}
+    # (time, number of items) of each batch sent within the budget window.
+    dispatched: list[tuple[float, int]] = []
+
+
+class OffPeakWindow:
+    """A daily time window like "01:00-06:00", possibly wrapping midnight."""
+
+    def __init__(self, spec: str) -> None:
+        start, end = spec.split("-")
+        self.start = datetime.strptime(start.strip(), "%H:%M").time()
+        self.end = datetime.strptime(end.strip(), "%H:%M").time()
+        self.spec = spec
+
+    def seconds_left(self, now: datetime) -> float:
+        """Seconds until the window closes, or 0 if `now` is outside it."""
+        t = now.time()
+        if self.start <= self.end:
+            inside = self.start <= t < self.end
+        else:
+            inside = t >= self.start or t < self.end
+        if not inside:
+            return 0
+        end = datetime.combine(now.date(), self.end, now.tzinfo)
+        if end <= now:
+            end += timedelta(days=1)
+        return (end - now).total_seconds()
+
+
+def prowlarr_queries_in_window(window_secs: float) -> int:
+    """The largest number of queries any Prowlarr indexer made in the last
+    `window_secs`, from Prowlarr's indexer statistics."""
+    import prowlarr
+
+    end = datetime.now(timezone.utc)
+    with clients.prowlarr_client() as client:
+        stats = prowlarr.IndexerStatsApi(client).get_indexer_stats(
+            start_date=end - timedelta(seconds=window_secs), end_date=end
+        )
+    return max(
+        ((s.number_of_queries or 0) for s in stats.indexers or []),
+        default=0,
+    )
+
+
+def wanted_ids(service: str, include_cutoff_unmet: bool) -> list[int]:
+    """IDs of the monitored wanted items of a service, streamed page by page."""
+    module = importlib.import_module(service)
+    with getattr(clients, f"{service}_client")() as client:
+        ids = [
+            record.id
+            for record in iter_records(
+                module.MissingApi(client).get_wanted_missing,
+                page_size=1000,
+                monitored=True,
+            )
+        ]
+        if include_cutoff_unmet:
+            ids += [
+                record.id
+                for record in iter_records(
+                    module.CutoffApi(client).get_wanted_cutoff,
+                    page_size=1000,
+                    monitored=True,
+                )
+            ]
+    return list(dict.fromkeys(ids))
+
+
+class SearchScheduler:
+    """Searches for wanted items within a query budget; see the module docs.
+
+    Args:
+        services: Services to search, from `SEARCH_COMMANDS`.
+        state_file: Where to keep progress between runs.
+        queries_per_indexer: Maximum queries per indexer per budget window.
+            Each searched item counts as one query to every indexer.
+        budget_window_secs: Length of the sliding budget window.
+        batch_size: Maximum items per search command.
+        off_peak: Only search inside this daily window, e.g. "01:00-06:00"
+            (local time). Searches at any time if None.
+        research_after_secs: Once all wanted items of a service were searched,
+            start searching them again after this long.
+        include_cutoff_unmet: Also search items whose quality cutoff isn't met.
+        use_prowlarr_stats: Count queries Prowlarr made for other reasons
+            against the budget too.
+        command_timeout_secs: Stop waiting for a search command after this
+            long and move on.
+        pause_secs: Pause between search commands.
+    """
+
+    def __init__(
+        self,
+        services: list[str],
+        state_file: str | Path,
+        queries_per_indexer: int,
+        budget_window_secs: float = 3600,
+        batch_size: int = 10,
+        off_peak: str | None = None,
+        research_after_secs: float = 7 * 24 * 3600,
+        include_cutoff_unmet: bool = False,
+        use_prowlarr_stats: bool = False,
+        command_timeout_secs: float = 1800,
+        pause_secs: float = 10,
+    ) -> None:
+        self.services = services
+        self.state_file = Path(state_file)
+        self.queries_per_indexer = queries_per_indexer
+        self.budget_window_secs = budget_window_secs
+        self.batch_size = batch_size
+        self.off_peak = OffPeakWindow(off_peak) if off_peak else None
+        self.research_after_secs = research_after_secs
+        self.include_cutoff_unmet = include_cutoff_unmet
+        self.use_prowlarr_stats = use_prowlarr_stats
+        self.command_timeout_secs = command_timeout_secs
+        self.pause_secs = pause_secs
+        self.state = self._load_state()
+
+    def _load_state(self) -> SchedulerState:
+        try:
+            return SchedulerState.model_validate_json(self.state_file.read_text())
+        except FileNotFoundError:
+            return SchedulerState()
+
+    def _save_state(self) -> None:
+        atomic_write_json(self.state_file, self.state)
+
+    def _seconds_left(self) -> float:
+        if self.off_peak is None:
+            return float("inf")
+        return self.off_peak.seconds_left(datetime.now().astimezone())
+
+    def _sleep(self, secs: float) -> None:
+        time.sleep(max(0, min(secs, self._seconds_left())))
+
+    def budget_available(self) -> int:
+        """How many more items can be searched in the current window."""
+        now = time.time()
+        cutoff = now - self.budget_window_secs
+        self.state.dispatched = [(t, n) for t, n in self.state.dispatched if t > cutoff]
+        used = sum(n for _, n in self.state.dispatched)
+        if self.use_prowlarr_stats:
+            try:
+                used = max(used, prowlarr_queries_in_window(self.budget_window_secs))
+            except Exception as e:
+                logger.warning(f"Failed to get Prowlarr indexer stats: {e}")
+        return self.queries_per_indexer - used
+
+    def _budget_refill_secs(self) -> float:
+        # When the oldest of our batches leaves the window. If the budget is
+        # used up by other Prowlarr queries, check again in a minute.
+        if not self.state.dispatched:
+            return 60
+        oldest = min(t for t, _ in self.state.dispatched)
+        return max(1, oldest + self.budget_window_secs - time.time())
+
+    def pending_ids(self, service: str) -> list[int]:
+        """Wanted items of `service` not yet searched in the current cycle,
+        starting a new cycle if the previous one is complete and old enough."""
+        progress = self.state.services.setdefault(service, ServiceProgress())
+        wanted = wanted_ids(service, self.include_cutoff_unmet)
+        searched = set(progress.searched)
+        pending = [item_id for item_id in wanted if item_id not in searched]
+        now = time.time()
+        if pending and progress.cycle_started is None:
+            progress.cycle_started = now
+        if pending or not wanted:
+            return pending
+        if now - (progress.cycle_started or 0) < self.research_after_secs:
+            return []
+        logger.info(f"Starting a new search cycle for {len(wanted)} {service} items")
+        progress.cycle_started = now
+        progress.searched = []
+        return wanted
+
+    def search(self, service: str, ids: list[int]) -> None:
+        """Send one search command for `ids` and wait for it to finish."""
+        command = SEARCH_COMMANDS[service]
+        with getattr(clients, f"{service}_client")() as client:
+            batch = CommandBatch(client, command.api_prefix)
+            batch.add(command.command, **{command.ids_property: ids})
+            batch.run(timeout_secs=self.command_timeout_secs)
+
+    def run(self) -> None:
+        """Search until every service's pending items are searched, or the
+        off-peak window closes."""
+        if self._seconds_left() <= 0:
+            assert self.off_peak is not None
+            logger.info(f"Outside the off-peak window {self.off_peak.spec}; exiting")
+            return
+        pending = {service: self.pending_ids(service) for service in self.services}
+        self._save_state()
+        for service, ids in pending.items():
+            logger.info(f"{len(ids)} {service} items to search")
+
+        while any(pending.values()) and self._seconds_left() > 0:
+            for service in self.services:
+                if not pending[service] or self._seconds_left() <= 0:
+                    continue
+                available = self.budget_available()
+                if available <= 0:
+                    wait_secs = self._budget_refill_secs()
+                    logger.info(f"Query budget used up; waiting {wait_secs:.0f}s")
+                    self._sleep(wait_secs)
+                    break
+                batch = pending[service][: min(self.batch_size, available)]
+                logger.info(f"Searching {len(batch)} {service} items: {batch}")
+                self.state.dispatched.append((time.time(), len(batch)))
+                self._save_state()
+                self.search(service, batch)
+                # Recorded only once the search ran, so a batch interrupted
+                # mid-search is searched again by the next run.
+                self.state.services[service].searched += batch
+                self._save_state()
+                searched = len(batch)
+                pending[service] = pending[service][searched:]
+                self._sleep(self.pause_secs)
+
+        left = sum(len(ids) for ids in pending.values())
+        if left:
+            logger.info(f"Off-peak window closed with {left} items left to search")
+        else:
+            logger.info("All pending items searched")
@@ -0,0 +1,276 @@
+"""
+Provider-aware, resumable searching for missing subtitles in Bazarr.
+
+Bazarr's "Search All" for wanted subtitles searches every missing subtitle
+back to back, and every search queries every enabled provider, so providers
+throttle Bazarr and it then sits in back-off for hours. The scheduler here
+instead:
+
+- streams the episodes and movies with missing subtitles from Bazarr's
+  wanted lists, and searches one subtitle (item and language) at a time, in
+  batches with a pause in between,
+- keeps the number of queries per provider within a budget per time window,
+  where each search counts as one query to every provider that isn't
+  currently throttled (Bazarr skips throttled ones); budgets can differ per
+  provider, e.g. for providers with daily download limits,
+- checks provider status between batches and stops once every provider is
+  throttled,
+- skips subtitles that were searched without success recently, searching
+  never searched ones first and then the least recently searched, and
+- only runs inside an off-peak window, recording searches in a local state
+  file so the next run continues where this one stopped.
+
+Example usage:
+    >>> from nixarr_py.subtitle_scheduler import SubtitleScheduler
+    >>>
+    >>> SubtitleScheduler(
+    ...     state_file="/var/lib/nixarr-subtitle-scheduler/state.json",
+    ...     queries_per_provider=50,
+    ...     provider_budgets={"opensubtitlescom": 20},
+    ... ).run()
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import logging
+import time
+
+import pydantic
+
+from nixarr_py import clients
+from nixarr_py.bazarr import BazarrClient, BazarrError
+from nixarr_py.search_scheduler import OffPeakWindow
+from nixarr_py.utils import atomic_write_json
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WantedSubtitle:
+    """A missing subtitle of an episode or movie."""
+
+    kind: str
+    item_id: int
+    series_id: int | None
+    title: str
+    language: str
+    forced: bool
+    hi: bool
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.item_id}:{self.language}:{int(self.forced)}:{int(self.hi)}"
+
+
+class SchedulerState(pydantic.BaseModel):
+    # Subtitle key to when it was last searched, for subtitles still missing.
+    last_searched: dict[str, float] = {}
+    # (time, providers queried) of each search within the budget window.
+    dispatched: list[tuple[float, list[str]]] = []
+
+
+def wanted_subtitles(client: BazarrClient) -> list[WantedSubtitle]:
+    """Every missing subtitle of Bazarr's wanted episodes and movies."""
+    wanted = []
+    for episode in client.iter_wanted("episodes"):
+        title = f"{episode.get('seriesTitle')} {episode.get('episode_number')}"
+        for subtitle in episode.get("missing_subtitles") or []:
+            wanted.append(
+                WantedSubtitle(
+                    kind="episode",
+                    item_id=episode["sonarrEpisodeId"],
+                    series_id=episode["sonarrSeriesId"],
+                    title=title,
+                    language=subtitle["code2"],
+                    forced=bool(subtitle.get("forced")),
+                    hi=bool(subtitle.get("hi")),
+                )
+            )
+    for movie in client.iter_wanted("movies"):
+        for subtitle in movie.get("missing_subtitles") or []:
+            wanted.append(
+                WantedSubtitle(
+                    kind="movie",
+                    item_id=movie["radarrId"],
+                    series_id=None,
+                    title=str(movie.get("title")),
+                    language=subtitle["code2"],
+                    forced=bool(subtitle.get("forced")),
+                    hi=bool(subtitle.get("hi")),
+                )
+            )
+    return wanted
+
+
+def active_providers(client: BazarrClient) -> tuple[list[str], list[str]]:
+    """The enabled providers that are usable and that are throttled."""
+    active, throttled = [], []
+    for provider in client.providers():
+        status = provider.get("status") or "Good"
+        (active if status == "Good" else throttled).append(provider["name"])
+    return active, throttled
+
+
+class SubtitleScheduler:
+    """Searches for missing subtitles within provider budgets; see the module docs.
+
+    Args:
+        state_file: Where to keep progress between runs.
+        queries_per_provider: Default maximum queries per provider per budget
+            window.
+        provider_budgets: Per-provider overrides of `queries_per_provider`.
+        budget_window_secs: Length of the sliding budget window.
+        batch_size: Number of searches between pauses and provider checks.
+        pause_secs: Pause between batches.
+        retry_after_secs: Don't search a subtitle again until this long after
+            it was last searched without success.
+        off_peak: Only search inside this daily window, e.g. "01:00-06:00"
+            (local time). Searches at any time if None.
+    """
+
+    def __init__(
+        self,
+        state_file: str | Path,
+        queries_per_provider: int,
+        provider_budgets: dict[str, int] | None = None,
+        budget_window_secs: float = 3600,
+        batch_size: int = 10,
+        pause_secs: float = 60,
+        retry_after_secs: float = 3 * 24 * 3600,
+        off_peak: str | None = None,
+    ) -> None:
+        self.state_file = Path(state_file)
+        self.queries_per_provider = queries_per_provider
+        self.provider_budgets = provider_budgets or {}
+        self.budget_window_secs = budget_window_secs
+        self.batch_size = batch_size
+        self.pause_secs = pause_secs
+        self.retry_after_secs = retry_after_secs
+        self.off_peak = OffPeakWindow(off_peak) if off_peak else None
+        self.state = self._load_state()
+
+    def _load_state(self) -> SchedulerState:
+        try:
+            return SchedulerState.model_validate_json(self.state_file.read_text())
+        except FileNotFoundError:
+            return SchedulerState()
+
+    def _save_state(self) -> None:
+        atomic_write_json(self.state_file, self.state)
+
+    def _seconds_left(self) -> float:
+        if self.off_peak is None:
+            return float("inf")
+        return self.off_peak.seconds_left(datetime.now().astimezone())
+
+    def _sleep(self, secs: float) -> None:
+        time.sleep(max(0, min(secs, self._seconds_left())))
+
+    def budget_available(self, providers: list[str]) -> int:
+        """How many more searches the given providers' budgets allow right now."""
+        cutoff = time.time() - self.budget_window_secs
+        self.state.dispatched = [
+            (t, queried) for t, queried in self.state.dispatched if t > cutoff
+        ]
+        available = []
+        for provider in providers:
+            used = sum(provider in queried for _, queried in self.state.dispatched)
+            budget = self.provider_budgets.get(provider, self.queries_per_provider)
+            available.append(budget - used)
+        return min(available, default=0)
+
+    def _budget_refill_secs(self) -> float:
+        if not self.state.dispatched:
+            return 60
+        oldest = min(t for t, _ in self.state.dispatched)
+        return max(1, oldest + self.budget_window_secs - time.time())
+
+    def pending(self, wanted: list[WantedSubtitle]) -> list[WantedSubtitle]:
+        """Wanted subtitles due for a search, never searched ones first.
+
+        Also forgets subtitles that are no longer wanted.
+        """
+        keys = {subtitle.key for subtitle in wanted}
+        self.state.last_searched = {
+            key: t for key, t in self.state.last_searched.items() if key in keys
+        }
+        due = time.time() - self.retry_after_secs
+        pending = [
+            subtitle
+            for subtitle in wanted
+            if self.state.last_searched.get(subtitle.key, 0) <= due
+        ]
+        return sorted(pending, key=lambda s: self.state.last_searched.get(s.key, 0))
+
+    def search(self, client: BazarrClient, subtitle: WantedSubtitle) -> None:
+        """Search for one subtitle."""
+        if subtitle.kind == "episode":
+            assert subtitle.series_id is not None
+            client.search_episode(
+                subtitle.series_id,
+                subtitle.item_id,
+                subtitle.language,
+                subtitle.forced,
+                subtitle.hi,
+            )
+        else:
+            client.search_movie(
+                subtitle.item_id, subtitle.language, subtitle.forced, subtitle.hi
+            )
+
+    def run(self) -> None:
+        """Search until all due subtitles are searched, every provider is
+        throttled, or the off-peak window closes."""
+        if self._seconds_left() <= 0:
+            assert self.off_peak is not None
+            logger.info(f"Outside the off-peak window {self.off_peak.spec}; exiting")
+            return
+        with clients.bazarr_client() as client:
+            wanted = wanted_subtitles(client)
+            pending = self.pending(wanted)
+            self._save_state()
+            logger.info(
+                f"{len(wanted)} missing subtitles, {len(pending)} due for a search"
+            )
+            searched = 0
+            while pending and self._seconds_left() > 0:
+                providers, throttled = active_providers(client)
+                if throttled:
+                    logger.info(f"Throttled providers: {', '.join(throttled)}")
+                if not providers:
+                    logger.info("Every provider is throttled; stopping")
+                    break
+                available = self.budget_available(providers)
+                if available <= 0:
+                    wait_secs = self._budget_refill_secs()
+                    logger.info(f"Provider budget used up; waiting {wait_secs:.0f}s")
+                    self._sleep(wait_secs)
+                    continue
+                batch_len = min(self.batch_size, available)
+                batch, pending = pending[:batch_len], pending[batch_len:]
+                for i, subtitle in enumerate(batch):
+                    if self._seconds_left() <= 0:
+                        pending = batch[i:] + pending
+                        break
+                    logger.info(
+                        f"Searching {subtitle.language} subtitles for {subtitle.title}"
+                    )
+                    now = time.time()
+                    self.state.dispatched.append((now, providers))
+                    try:
+                        self.search(client, subtitle)
+                    except BazarrError as e:
+                        logger.warning(f"Search for {subtitle.title} failed: {e}")
+                    # Recorded even if it found nothing: if the subtitle is
+                    # still wanted by the next run, it waits for its retry.
+                    self.state.last_searched[subtitle.key] = now
+                    self._save_state()
+                    searched += 1
+                self._sleep(self.pause_secs)
+
+        if pending:
+            logger.info(f"Searched {searched} subtitles; {len(pending)} left")
+        else:
+            logger.info(f"Searched {searched} subtitles; none left")
@@ -0,0 +1,142 @@
+"""
+Lightweight span tracing and profiling for Nixarr scripts.
+
+Spans record where a run spends its time (readiness waits, API fetches,
+schema loads, `apply_config`, writes, sleeps). When tracing is enabled, they
+are written as Chrome trace events, which can be opened in `chrome://tracing`
+or https://ui.perfetto.dev. When tracing is disabled, `span` costs a single
+attribute check.
+
+Example usage:
+    >>> import argparse
+    >>> from nixarr_py.tracing import add_tracing_arguments, span, traced_run
+    >>>
+    >>> parser = argparse.ArgumentParser()
+    >>> add_tracing_arguments(parser)
+    >>> args = parser.parse_args()
+    >>> with traced_run(args):
+    ...     with span("fetch tags", category="fetch"):
+    ...         ...
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+import argparse
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Tracer:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: list[dict[str, Any]] = []
+
+    def record(
+        self, name: str, category: str, start_ns: int, end_ns: int, args: dict
+    ) -> None:
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start_ns / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+_tracer = _Tracer()
+
+
+def enable_tracing() -> None:
+    """Start recording spans."""
+    _tracer.enabled = True
+
+
+@contextmanager
+def span(name: str, category: str = "sync", **args: Any) -> Iterator[None]:
+    """Record the duration of the enclosed block as a span.
+
+    Args:
+        name: Span name shown in the trace viewer, e.g. "sync indexers".
+        category: Kind of work, e.g. "wait", "fetch", "write" or "sleep".
+        **args: Extra details shown with the span, e.g. the item name.
+    """
+    if not _tracer.enabled:
+        yield
+        return
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _tracer.record(name, category, start_ns, time.perf_counter_ns(), args)
+
+
+def sleep(secs: float) -> None:
+    """`time.sleep`, recorded as a span."""
+    with span("sleep", category="sleep", secs=secs):
+        time.sleep(secs)
+
+
+def write_trace(path: Path) -> None:
+    """Write the recorded spans to `path` in Chrome trace-event format."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": _tracer.events, "displayTimeUnit": "ms"}, f)
+
+
+def add_tracing_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the `--trace` and `--profile` arguments used by `traced_run`."""
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="Write a Chrome trace-event JSON file with the duration of each phase of the run.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=True,
+        default=None,
+        metavar="FILE",
+        help="Run under cProfile and print the top functions by cumulative time to stderr. If FILE is given, also save the raw profile there.",
+    )
+
+
+@contextmanager
+def traced_run(args: argparse.Namespace, name: str = "run") -> Iterator[None]:
+    """Apply the `--trace` and `--profile` arguments to the enclosed block.
+
+    The trace and profile are written even if the block raises, so failed
+    runs can be diagnosed too.
+    """
+    if args.trace is not None:
+        enable_tracing()
+    profiler = cProfile.Profile() if args.profile is not None else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with span(name, category="run"):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            if args.profile is not True:
+                profiler.dump_stats(args.profile)
+            stats = pstats.Stats(profiler, stream=sys.stderr)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(30)
+        if args.trace is not None:
+            write_trace(args.trace)
+            logger.info(f"Wrote trace to {args.trace}")
@@ -2,7 +2,19 @@
 Utilities for working with Nixarr services in Python.
 """
 
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Collection, Iterable
+import hashlib
+import json
+import logging
+import os
+import sys
+
+import pydantic
+
+
+logger = logging.getLogger(__name__)
 
 
 def expand_secret(value: Any) -> Any:
@@ -18,10 +30,41 @@ def expand_secret(value: Any) -> Any:
         return f.read().strip()
 
 
+def unexpected_properties(
+    user_src: dict[str, Any],
+    arr_dst: dict[str, Any],
+    unchecked_user_properties: list[str] = [],
+) -> list[str]:
+    """
+    Returns the properties and fields of `user_src` that don't exist in
+    `arr_dst`, as paths like `."someProperty"` or `.fields."someField"`. See
+    `apply_config` for the layout of both.
+    """
+    unexpected_items: list[str] = []
+
+    arr_field_names = [field["name"] for field in arr_dst["fields"]]
+
+    for property_name, property_value in user_src.items():
+        if property_name in unchecked_user_properties:
+            continue
+        if property_name not in arr_dst:
+            unexpected_items.append(f'."{property_name}"')
+            continue
+        if property_name != "fields":
+            continue
+        user_fields = property_value
+        for field_name in user_fields:
+            if field_name not in arr_field_names:
+                unexpected_items.append(f'.fields."{field_name}"')
+
+    return unexpected_items
+
+
 def apply_config(
     user_src: dict[str, Any],
     arr_dst: dict[str, Any],
     unchecked_user_properties: list[str] = [],
+    validate: bool = True,
 ) -> None:
     """
     Applies a Nixarr user config to the given *arr config.
@@ -105,25 +148,15 @@ def apply_config(
     If any field or property exists in `user_src` but not in `arr_dst`, and if
     that field or property is not in the `unchecked_user_properties` list, we
     throw an error. This helps catch typos in the freeform parts of the Nixarr
-    config.
+    config. Pass `validate=False` to skip this check when the config was
+    already validated against the service's schemas at build time (see
+    `nixarr_py.schema_validation`).
     """
-    unexpected_items: list[str] = []
-
-    arr_field_names = [field["name"] for field in arr_dst["fields"]]
-
-    for property_name, property_value in user_src.items():
-        if property_name in unchecked_user_properties:
-            continue
-        if property_name not in arr_dst:
-            unexpected_items.append(f'."{property_name}"')
-            continue
-        if property_name != "fields":
-            continue
-        user_fields = property_value
-        for field_name in user_fields:
-            if field_name not in arr_field_names:
-                unexpected_items.append(f'.fields."{field_name}"')
-
+    unexpected_items = (
+        unexpected_properties(user_src, arr_dst, unchecked_user_properties)
+        if validate
+        else []
+    )
     if unexpected_items:
         raise ValueError(
             f"""
@@ -147,3 +180,264 @@ def apply_config(
             field_name = arr_field["name"]
             if field_name in user_fields:
                 arr_field["value"] = expand_secret(user_fields[field_name])
+
+
+def bulk_properties(bulk_resource_type: type[pydantic.BaseModel]) -> set[str]:
+    """
+    Returns the properties that an *arr bulk endpoint can set, given its
+    request model (e.g. `prowlarr.IndexerBulkResource`).
+    """
+    return set(bulk_resource_type.model_fields) - {"ids", "apply_tags"}
+
+
+def bulk_changes(
+    current: dict[str, Any],
+    desired: dict[str, Any],
+    bulk_properties: set[str],
+) -> dict[str, Any] | None:
+    """
+    Compares an existing *arr item with its desired state, both as dicts in the
+    layout of `apply_config`'s `arr_dst`.
+
+    Returns an empty dict if nothing changed, and a dict of the changed
+    top-level properties if every change can be applied through the bulk
+    endpoint. Returns `None` if the item needs a full per-item update.
+
+    The *arrs ignore null values and empty lists in bulk requests, so changes
+    to those values always need a full update.
+    """
+    changes = {
+        name: value for name, value in desired.items() if current.get(name) != value
+    }
+    for name, value in changes.items():
+        if name not in bulk_properties or value is None or value == []:
+            return None
+    return changes
+
+
+def group_bulk_changes(
+    changes_by_id: dict[int, dict[str, Any]],
+) -> list[tuple[dict[str, Any], list[int]]]:
+    """
+    Groups item IDs that need identical changes, so that each group can be
+    applied with a single bulk request.
+    """
+    groups: dict[str, tuple[dict[str, Any], list[int]]] = {}
+    for item_id, changes in changes_by_id.items():
+        key = json.dumps(changes, sort_keys=True, default=str)
+        groups.setdefault(key, (changes, []))[1].append(item_id)
+    return list(groups.values())
+
+
+def is_bulk_unsupported(e: Exception) -> bool:
+    """
+    Returns whether an API error means the service doesn't implement the bulk
+    endpoint we called, so we should fall back to per-item requests.
+    """
+    return getattr(e, "status", None) in (404, 405)
+
+
+def run_connection_tests(
+    tests: dict[str, Callable[[], Any]], max_workers: int
+) -> dict[str, str | None]:
+    """
+    Runs *arr connection tests (e.g. `IndexerApi.test_indexer` calls)
+    concurrently, at most `max_workers` at a time.
+
+    Returns a dict mapping each test name to `None` if the test passed, or to
+    a description of the failure.
+    """
+
+    def run(test: Callable[[], Any]) -> str | None:
+        try:
+            test()
+        except Exception as e:
+            return _describe_test_failure(e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(run, test) for name, test in tests.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _describe_test_failure(e: Exception) -> str:
+    # Failed *arr tests return a list of validation failures as the body.
+    try:
+        failures = json.loads(getattr(e, "body", None) or "")
+        return "; ".join(failure["errorMessage"] for failure in failures)
+    except (TypeError, ValueError, KeyError):
+        return str(e).strip() or type(e).__name__
+
+
+def log_connection_test_report(kind: str, results: dict[str, str | None]) -> None:
+    """
+    Logs a pass/fail line per item for the results of `run_connection_tests`.
+    """
+    for name, failure in sorted(results.items()):
+        if failure is None:
+            logger.info(f"Connection test for {kind} '{name}': passed")
+        else:
+            logger.warning(f"Connection test for {kind} '{name}': FAILED: {failure}")
+    failed = sum(failure is not None for failure in results.values())
+    logger.info(
+        f"{len(results) - failed}/{len(results)} {kind} connection tests passed"
+    )
+
+
+def _secret_files(value: Any) -> list[Path]:
+    if isinstance(value, dict):
+        if "secret" in value:
+            return [Path(value["secret"])]
+        return [path for item in value.values() for path in _secret_files(item)]
+    if isinstance(value, list):
+        return [path for item in value for path in _secret_files(item)]
+    return []
+
+
+def sync_fingerprint(
+    config_file: Path, service_version: str, extra_files: Iterable[Path] = ()
+) -> str:
+    """
+    Computes a fingerprint of everything a settings-sync run depends on: the
+    sync script itself, the contents of its JSON config file, the mtimes of the
+    secret files it references (`{"secret": "/path"}` values, plus
+    `extra_files`), and the version of the service it syncs to.
+
+    If the fingerprint matches the one recorded after the last successful run,
+    syncing again would be a no-op.
+    """
+    h = hashlib.sha256()
+    h.update(os.path.realpath(sys.argv[0]).encode())
+    config_bytes = Path(config_file).read_bytes()
+    h.update(config_bytes)
+    files = _secret_files(json.loads(config_bytes)) + list(extra_files)
+    for path in sorted(set(files)):
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = -1
+        h.update(f"{path}:{mtime_ns}".encode())
+    h.update(service_version.encode())
+    return h.hexdigest()
+
+
+def fingerprint_matches(fingerprint_file: Path, fingerprint: str) -> bool:
+    """
+    Returns whether `fingerprint_file` exists and records `fingerprint`.
+    """
+    try:
+        return Path(fingerprint_file).read_text().strip() == fingerprint
+    except FileNotFoundError:
+        return False
+
+
+def write_fingerprint(fingerprint_file: Path, fingerprint: str) -> None:
+    """
+    Records `fingerprint` after a successful sync. Writes atomically, so an
+    interrupted write never leaves a partial fingerprint behind.
+    """
+    atomic_write(fingerprint_file, fingerprint + "\n")
+
+
+def api_request(client: Any, method: str, path: str, body: Any = None) -> Any:
+    """
+    Sends a raw JSON request through a generated *arr or Jellyfin API client
+    and returns the decoded JSON response (or `None` for an empty one).
+
+    Useful for endpoints whose generated models don't fit, like *arr commands
+    (which take command-specific properties) or exporting resources verbatim.
+    Authentication and error handling are the client's: non-2xx responses
+    raise the client's `ApiException`.
+    """
+    headers = {"Content-Type": "application/json"} if body is not None else None
+    method, url, headers, body, _ = client.param_serialize(
+        method=method,
+        resource_path=path,
+        header_params=headers,
+        body=body,
+        # Names of the *arr and Jellyfin API key settings; the client uses
+        # whichever it has configured.
+        auth_settings=["X-Api-Key", "CustomAuthentication"],
+    )
+    response = client.call_api(method, url, header_params=headers, body=body)
+    response.read()
+    # "bytearray" skips model deserialization but keeps the error handling.
+    raw = client.response_deserialize(response, {"2XX": "bytearray"}).data
+    return json.loads(raw) if raw else None
+
+
+def atomic_write(path: str | Path, data: str | bytes, mode: int = 0o666) -> None:
+    """
+    Writes `data` to `path` through a temporary file next to it, which then
+    replaces `path`, so readers never see a partial file. Creates the parent
+    directory if needed. `mode` (before the umask) applies to newly created
+    files.
+
+    The temporary file's name ends in `.tmp`, so collectors that glob for a
+    suffix (like the node exporter's `*.prom`) never pick it up.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(path.name + ".tmp")
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data.encode() if isinstance(data, str) else data)
+    tmp_file.replace(path)
+
+
+def atomic_write_json(path: str | Path, data: Any, indent: int | None = None) -> None:
+    """
+    Writes `data` (a pydantic model, or anything `json.dumps` accepts) as JSON
+    with `atomic_write`.
+    """
+    if isinstance(data, pydantic.BaseModel):
+        text = data.model_dump_json(indent=indent)
+    else:
+        text = json.dumps(data, indent=indent)
+    atomic_write(path, text)
+
+
+def write_prometheus(metrics: str, path: str | Path) -> None:
+    """
+    Writes metrics in the Prometheus text exposition format for the node
+    exporter's textfile collector, atomically so it never reads a partial
+    file.
+    """
+    atomic_write(path, metrics)
+
+
+def format_table(rows: list[list[str]], right: Collection[int] = ()) -> str:
+    """
+    Formats rows of cells (the first usually a header) as columns separated
+    by two spaces. Columns are left-aligned, except those whose index is in
+    `right`, e.g. numbers.
+    """
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(
+            cell.rjust(width) if i in right else cell.ljust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        ).rstrip()
+        for row in rows
+    )
+
+
+def format_size(size: int) -> str:
+    """
+    Formats a size in bytes like `du -h` does, e.g. `1.5G`.
+    """
+    value = float(size)
+    for unit in ["", "K", "M", "G", "T"]:
+        if value < 1024 or unit == "T":
+            break
+        value /= 1024
+    if unit == "":
+        return str(size)
+    return f"{value:.1f}{unit}" if value < 10 else f"{value:.0f}{unit}"
+
+
+def escape_label(value: str) -> str:
+    """
+    Escapes a Prometheus label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
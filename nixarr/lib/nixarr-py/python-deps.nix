@@ -13,6 +13,7 @@
   inherit
     (python3Packages)
     buildPythonPackage
+    numpy
     pydantic
     python-dateutil
     setuptools
@@ -212,6 +213,7 @@
 in [
   jellyfin-py
   lidarr-py
+  numpy
   prowlarr-py
   radarr-py
   readarr-py
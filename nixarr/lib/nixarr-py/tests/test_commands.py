@@ -0,0 +1,39 @@
+import pytest
+
+from nixarr_py import commands
+from nixarr_py.commands import CommandBatch, CommandResult
+
+
+class NotFound(Exception):
+    status = 404
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    responses = {
+        "/api/v3/command": [{"id": 1, "status": "started"}],
+        "/api/v3/command/2": {"id": 2, "status": "completed"},
+    }
+
+    def api_request(client, method, path, body=None):
+        if path not in responses:
+            raise NotFound(path)
+        return responses[path]
+
+    monkeypatch.setattr(commands, "api_request", api_request)
+    batch = CommandBatch(None, "/api/v3")
+    for command_id in [1, 2, 3]:
+        batch.results[command_id] = CommandResult(command_id, "RefreshSeries", "queued")
+    return batch
+
+
+def test_poll_looks_up_unlisted_commands(batch):
+    batch._poll({1, 2, 3})
+    assert batch.results[1].status == "started"
+    assert batch.results[2].status == "completed"
+
+
+def test_poll_treats_pruned_commands_as_finished(batch):
+    batch._poll({3})
+    assert batch.results[3].finished
+    assert batch.results[3].status == "unknown"
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import sqlite3
+import threading
+import time
+
+from nixarr_py import db_maintenance
+from nixarr_py.db_maintenance import ARR_PRUNE_RULES, maintain_database
+
+
+def create_database(path, dates):
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE "History" ("Id" INTEGER PRIMARY KEY, "Date" TEXT)')
+    db.executemany('INSERT INTO "History" ("Date") VALUES (?)', [(d,) for d in dates])
+    db.commit()
+    db.close()
+
+
+def test_maintain_database_prunes_old_rows(tmp_path):
+    path = tmp_path / "sonarr.db"
+    now = datetime.now()
+    create_database(
+        path,
+        [
+            (now - timedelta(days=400)).strftime("%Y-%m-%d %H:%M:%S.000"),
+            (now - timedelta(days=400)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            (now - timedelta(days=10)).strftime("%Y-%m-%d %H:%M:%S.000"),
+        ],
+    )
+    report = maintain_database(path, ARR_PRUNE_RULES, retention_days=365)
+    assert report.error is None
+    assert report.integrity == "ok"
+    assert report.pruned == {"History": 2}
+    assert report.vacuumed
+    db = sqlite3.connect(path)
+    assert db.execute('SELECT COUNT(*) FROM "History"').fetchone() == (1,)
+    db.close()
+
+
+def test_vacuums_on_one_filesystem_take_turns(tmp_path, monkeypatch):
+    paths = [tmp_path / "a.db", tmp_path / "b.db"]
+    for path in paths:
+        create_database(path, [])
+    active = []
+    overlapped = []
+
+    def disk_usage(path):
+        active.append(path)
+        overlapped.append(len(active) > 1)
+        time.sleep(0.05)
+        active.pop()
+        return SimpleNamespace(free=2**40)
+
+    monkeypatch.setattr(db_maintenance.shutil, "disk_usage", disk_usage)
+    threads = [
+        threading.Thread(target=maintain_database, args=(path, [], None))
+        for path in paths
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlapped == [False, False]
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from nixarr_py.fs_index import FsIndex, parse_size
+
+
+@pytest.fixture
+def index(tmp_path):
+    with FsIndex(tmp_path / "index.sqlite") as index:
+        yield index
+
+
+@pytest.fixture
+def tree(tmp_path):
+    media = tmp_path / "media"
+    (media / "library" / "show").mkdir(parents=True)
+    (media / "torrents").mkdir()
+    (media / "library" / "show" / "a.mkv").write_bytes(b"a" * 100)
+    (media / "torrents" / "b.mkv").write_bytes(b"b" * 10)
+    os.link(media / "library" / "show" / "a.mkv", media / "torrents" / "a.mkv")
+    return media
+
+
+def test_unlinked_lists_single_link_files(index, tree):
+    index.refresh(tree)
+    assert list(index.unlinked(tree)) == [(str(tree / "torrents" / "b.mkv"), 10)]
+
+
+def test_unlinked_notices_a_deleted_hardlink(index, tree):
+    index.refresh(tree)
+    (tree / "torrents" / "a.mkv").unlink()
+    # Only the torrents directory changed; the library's file lost its
+    # second link without its directory's mtime changing.
+    index.refresh(tree)
+    assert list(index.unlinked(tree / "library")) == [
+        (str(tree / "library" / "show" / "a.mkv"), 100)
+    ]
+
+
+def test_unlinked_notices_a_new_hardlink(index, tree):
+    index.refresh(tree)
+    os.link(tree / "torrents" / "b.mkv", tree / "b.mkv")
+    index.refresh(tree)
+    assert list(index.unlinked(tree / "torrents")) == []
+
+
+def test_refresh_only_restats_recent_files(index, tree):
+    for path in tree.rglob("*.mkv"):
+        os.utime(path, (0, 0))
+    index.refresh(tree, full=True)
+    assert index.refresh(tree).files_restated == 0
+    (tree / "torrents" / "c.mkv").write_bytes(b"c")
+    # The new file is stat'ed by the rescan, and again as a recent file.
+    assert index.refresh(tree).files_restated == 1
+
+
+def test_refresh_is_incremental(index, tree):
+    first = index.refresh(tree)
+    assert first.dirs_rescanned == first.dirs_checked == 4
+    (tree / "torrents" / "c.mkv").write_bytes(b"c")
+    second = index.refresh(tree)
+    assert (second.dirs_checked, second.dirs_rescanned) == (4, 1)
+    assert second.files_indexed == 3
+
+
+def test_refresh_removes_deleted_directories(index, tree):
+    index.refresh(tree)
+    (tree / "library" / "show" / "a.mkv").unlink()
+    (tree / "library" / "show").rmdir()
+    assert index.refresh(tree).dirs_removed == 1
+    # The library has no files left; the torrents' hardlink keeps a's size.
+    assert index.du(tree) == [(str(tree), 110), (str(tree / "torrents"), 110)]
+
+
+def test_du_counts_hardlinks_once(index, tree):
+    index.refresh(tree)
+    assert index.du(tree) == [
+        (str(tree / "torrents"), 10),
+        (str(tree / "library"), 100),
+        (str(tree), 110),
+    ]
+
+
+def test_du_notices_files_growing_in_place(index, tree):
+    index.refresh(tree)
+    with open(tree / "torrents" / "b.mkv", "ab") as f:
+        f.write(b"b" * 90)
+    index.refresh(tree)
+    assert (str(tree / "torrents"), 100) in index.du(tree)
+
+
+def test_du_counts_root_files_towards_the_total_only(index, tree):
+    (tree / "c.mkv").write_bytes(b"c" * 5)
+    index.refresh(tree)
+    assert index.du(tree) == [
+        (str(tree / "torrents"), 10),
+        (str(tree / "library"), 100),
+        (str(tree), 115),
+    ]
+
+
+def test_du_min_size(index, tree):
+    index.refresh(tree)
+    assert index.du(tree, min_size=100) == [
+        (str(tree / "library"), 100),
+        (str(tree), 110),
+    ]
+
+
+def test_subtree_bounds_exclude_siblings_with_common_prefix(index, tmp_path):
+    (tmp_path / "tv").mkdir()
+    (tmp_path / "tv-old").mkdir()
+    (tmp_path / "tv" / "a").write_bytes(b"a")
+    (tmp_path / "tv-old" / "b").write_bytes(b"b")
+    index.refresh(tmp_path / "tv")
+    index.refresh(tmp_path / "tv-old")
+    assert list(index.unlinked(tmp_path / "tv")) == [(str(tmp_path / "tv" / "a"), 1)]
+
+
+@pytest.mark.parametrize(
+    "size, parsed",
+    [("100", 100), ("2K", 2048), ("1.5G", 3 * 1024**3 // 2), ("500mb", 500 * 1024**2)],
+)
+def test_parse_size(size, parsed):
+    assert parse_size(size) == parsed
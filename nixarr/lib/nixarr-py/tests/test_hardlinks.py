@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from nixarr_py.hardlinks import (
+    LibraryFile,
+    VerifyStats,
+    directory_files,
+    find_copies,
+    relink,
+)
+
+
+@pytest.fixture
+def media(tmp_path):
+    (tmp_path / "torrents").mkdir()
+    (tmp_path / "library").mkdir()
+    return tmp_path
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_hardlinks_and_copies(media):
+    write(media / "torrents" / "a.mkv", b"a" * 100)
+    os.link(media / "torrents" / "a.mkv", media / "library" / "a.mkv")
+    write(media / "torrents" / "b.mkv", b"b" * 200)
+    library = [
+        LibraryFile("radarr", write(media / "library" / "b.mkv", b"b" * 200)),
+        LibraryFile("radarr", str(media / "library" / "a.mkv")),
+        LibraryFile("radarr", str(media / "library" / "gone.mkv")),
+    ]
+    stats = VerifyStats()
+    copies = find_copies(library, directory_files(media / "torrents"), stats=stats)
+    assert [(c.library_path, c.download_path, c.confirmed) for c in copies] == [
+        (str(media / "library" / "b.mkv"), str(media / "torrents" / "b.mkv"), True)
+    ]
+    assert (stats.hardlinked, stats.copied, stats.possibly_copied, stats.missing) == (
+        1,
+        1,
+        0,
+        1,
+    )
+
+
+def test_size_only_matches_are_possible_copies(media):
+    write(media / "torrents" / "Show.S01E01.mkv", b"x" * 100)
+    library = [
+        LibraryFile(
+            "sonarr", write(media / "library" / "Show - S01E01.mkv", b"y" * 100)
+        )
+    ]
+    stats = VerifyStats()
+    copies = find_copies(library, directory_files(media / "torrents"), stats=stats)
+    assert [c.confirmed for c in copies] == [False]
+    assert (stats.copied, stats.possibly_copied) == (0, 1)
+    # The contents differ, so it isn't relinked.
+    assert not relink(copies[0])
+    assert os.stat(media / "library" / "Show - S01E01.mkv").st_nlink == 1
+
+
+def test_relink_tries_every_candidate(media):
+    write(media / "torrents" / "other.mkv", b"o" * 100)
+    original = write(media / "torrents" / "original.mkv", b"x" * 100)
+    library = [
+        LibraryFile("sonarr", write(media / "library" / "renamed.mkv", b"x" * 100))
+    ]
+    (copy,) = find_copies(library, directory_files(media / "torrents"))
+    assert len(copy.candidates) == 2
+    assert relink(copy)
+    assert copy.download_path == original
+    assert os.path.samefile(original, media / "library" / "renamed.mkv")
@@ -0,0 +1,20 @@
+import pytest
+
+from nixarr_py.jellyfin_image_prewarm import ImagePrewarmer
+
+
+@pytest.mark.parametrize(
+    "content",
+    ['{"next_start_index": 3', "{}", "[]", '{"next_start_index": "x"}'],
+)
+def test_unreadable_state_restarts_from_the_first_item(tmp_path, content):
+    state_file = tmp_path / "state.json"
+    state_file.write_text(content)
+    assert ImagePrewarmer([], state_file)._load_offset() == 0
+
+
+def test_offset_round_trips(tmp_path):
+    prewarmer = ImagePrewarmer([], tmp_path / "state.json")
+    assert prewarmer._load_offset() == 0
+    prewarmer._save_offset(200)
+    assert prewarmer._load_offset() == 200
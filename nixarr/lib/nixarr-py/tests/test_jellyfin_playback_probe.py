@@ -0,0 +1,30 @@
+import time
+
+from nixarr_py.jellyfin_playback_probe import ProbeResult, ResultStore
+
+
+def result(timestamp):
+    return ProbeResult(
+        timestamp=timestamp,
+        item="1",
+        item_name="Big Buck Bunny",
+        profile="direct",
+        server_version="10.10.7",
+        hardware_acceleration="none",
+    )
+
+
+def test_prune_deletes_old_results(tmp_path):
+    store = ResultStore(tmp_path / "results.jsonl")
+    now = time.time()
+    for days in [100, 50, 1]:
+        store.append(result(now - days * 86400))
+    assert store.prune(60) == 1
+    assert [r.timestamp for r in store.load()] == [now - 50 * 86400, now - 86400]
+    assert store.prune(60) == 0
+
+
+def test_prune_without_results(tmp_path):
+    store = ResultStore(tmp_path / "results.jsonl")
+    assert store.prune(60) == 0
+    assert not store.path.exists()
@@ -0,0 +1,83 @@
+from dataclasses import asdict
+
+from nixarr_py.jellyfin_scan_profiler import (
+    ScanProfile,
+    ScanSample,
+    format_comparison,
+    format_profile,
+    summarize,
+)
+
+
+def profile(samples, folder=None, **kwargs):
+    return ScanProfile(
+        started=0,
+        label=None,
+        server_version="10.10.7",
+        host={},
+        folder=folder,
+        items_before=90,
+        samples=samples,
+        **kwargs,
+    )
+
+
+def test_summarize_phases():
+    p = profile(
+        [
+            ScanSample(elapsed_secs=0, progress=None, items=90),
+            ScanSample(elapsed_secs=2, progress=0.5, items=90),
+            ScanSample(elapsed_secs=4, progress=50, items=95),
+            ScanSample(elapsed_secs=8, progress=95, items=100),
+            ScanSample(elapsed_secs=10, progress=97, items=100),
+            ScanSample(elapsed_secs=12, progress=None, items=100),
+        ],
+        queued_secs=2,
+        finished=True,
+    )
+    summarize(p)
+    assert p.duration_secs == 10
+    assert p.items_after == 100
+    assert p.library_items_per_sec == 10
+    assert p.phases == {"prepare": 2, "validate": 6, "post-scan": 2}
+
+
+def test_scan_finished_before_it_was_seen_running():
+    p = profile(
+        [ScanSample(elapsed_secs=0, progress=None, items=100)],
+        duration_secs=4,
+        seen_running=False,
+        finished=True,
+    )
+    summarize(p)
+    # The duration comes from the scan task's last execution.
+    assert p.duration_secs == 4
+    assert p.library_items_per_sec == 25
+    assert p.phases == {}
+    assert "4.0s (finished before it was seen running)" in format_profile(p)
+
+
+def test_unknown_duration():
+    p = profile(
+        [
+            ScanSample(elapsed_secs=0, progress=None, items=100),
+            ScanSample(elapsed_secs=32, progress=None, items=100),
+        ],
+        folder="Movies",
+        duration_secs=None,
+        seen_running=False,
+        finished=True,
+        jellyfin_cpu_secs=1.0,
+    )
+    summarize(p)
+    assert p.duration_secs is None
+    assert p.library_items_per_sec is None
+    assert p.phases == {}
+    assert "duration:  unknown" in format_profile(p)
+    assert format_comparison([p]).splitlines()[1].split()[-5:-3] == ["-", "-"]
+
+
+def test_from_dict_reads_profiles_recorded_before_the_rename():
+    data = asdict(profile([ScanSample(elapsed_secs=0, progress=None, items=100)]))
+    data["items_per_sec"] = data.pop("library_items_per_sec")
+    assert ScanProfile.from_dict(data).library_items_per_sec == 0
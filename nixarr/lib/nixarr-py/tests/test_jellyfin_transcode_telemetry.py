@@ -0,0 +1,21 @@
+import sqlite3
+
+import pytest
+
+from nixarr_py.jellyfin_transcode_telemetry import TelemetryStore
+
+
+def test_read_only_store_reads_without_writing(tmp_path):
+    path = tmp_path / "telemetry.db"
+    TelemetryStore(path).commit()
+    store = TelemetryStore(path, read_only=True)
+    assert store.summary("client") == []
+    with pytest.raises(sqlite3.OperationalError):
+        store.prune(0)
+
+
+def test_read_only_store_does_not_create_the_database(tmp_path):
+    path = tmp_path / "missing" / "telemetry.db"
+    with pytest.raises(sqlite3.OperationalError):
+        TelemetryStore(path, read_only=True)
+    assert not path.parent.exists()
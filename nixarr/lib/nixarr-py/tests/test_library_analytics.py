@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from nixarr_py.library_analytics import FileRecord, LibraryFiles
+
+
+def record(size, runtime_secs=3600.0, quality="WEBDL-1080p", profile="HD", **kwargs):
+    return FileRecord(
+        service=kwargs.get("service", "radarr"),
+        size=size,
+        runtime_secs=runtime_secs,
+        quality=quality,
+        resolution=kwargs.get("resolution", "1080p"),
+        codec=kwargs.get("codec", "x265"),
+        profile=profile,
+    )
+
+
+@pytest.fixture
+def files():
+    return LibraryFiles.from_records(
+        [
+            # 8, 16 and 64 Mb/s.
+            record(3_600_000_000),
+            record(7_200_000_000),
+            record(28_800_000_000, quality="Remux-2160p", profile="Ultra-HD"),
+            # Unknown runtime.
+            record(1_000_000_000, runtime_secs=float("nan")),
+        ]
+    )
+
+
+def test_histogram_counts_every_file(files):
+    counts, edges = files.bitrate_histogram(bins=12)
+    assert counts.sum() == 3
+    assert edges[0] == 8
+    assert edges[-1] == 64
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_histogram_includes_the_extremes(seed):
+    rng = np.random.default_rng(seed)
+    runtime_secs = rng.uniform(600, 10_000, 500)
+    sizes = (rng.lognormal(22, 1.5, 500)).astype(np.int64) + 1
+    files = LibraryFiles.from_records(
+        record(int(size), runtime) for size, runtime in zip(sizes, runtime_secs)
+    )
+    counts, edges = files.bitrate_histogram(bins=int(rng.integers(1, 30)))
+    assert counts.sum() == len(files)
+    assert edges[0] == files.bitrate_mbps.min()
+    assert edges[-1] == files.bitrate_mbps.max()
+
+
+def test_histogram_of_a_single_bitrate():
+    files = LibraryFiles.from_records([record(3_600_000_000)] * 3)
+    counts, edges = files.bitrate_histogram(bins=4)
+    assert counts.sum() == 3
+    assert np.all(np.diff(edges) > 0)
+
+
+def test_histogram_without_runtimes():
+    files = LibraryFiles.from_records([record(1, runtime_secs=float("nan"))])
+    counts, edges = files.bitrate_histogram()
+    assert len(counts) == 0
+    assert len(edges) == 0
+
+
+def test_mask(files):
+    assert files.mask(profile=["Ultra-HD"]).tolist() == [False, False, True, False]
+    assert files.mask(quality=["WEBDL-1080p"], profile=["HD"]).sum() == 3
+    assert not files.mask(quality=["Bluray-720p"]).any()
+    with pytest.raises(ValueError):
+        files.mask(size=["1"])
+
+
+def test_group_by(files):
+    groups = files.group_by("quality")
+    assert [group.label for group in groups] == ["Remux-2160p", "WEBDL-1080p"]
+    remux, webdl = groups
+    assert remux.files == 1
+    assert webdl.files == 3
+    assert webdl.size == 11_800_000_000
+    assert webdl.runtime_hours == 2
+    assert webdl.p50_mbps == 8
+    assert webdl.p90_mbps == 16
+    assert remux.share + webdl.share == pytest.approx(1)
+
+
+def test_group_by_selected(files):
+    groups = files.group_by("profile", selected=files.mask(quality=["Remux-2160p"]))
+    assert [(group.label, group.files) for group in groups] == [("Ultra-HD", 1)]
+
+
+def test_savings_if_capped(files):
+    # Capping at 16 Mb/s only touches the 64 Mb/s file, shrinking it to a quarter.
+    assert files.savings_if_capped(16) == (1, 21_600_000_000)
+    assert files.savings_if_capped(16, selected=files.mask(profile=["HD"])) == (0, 0)
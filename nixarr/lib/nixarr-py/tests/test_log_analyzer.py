@@ -0,0 +1,163 @@
+import os
+
+import pytest
+
+from nixarr_py.log_analyzer import (
+    AnalyzerState,
+    LogAnalyzer,
+    LogAnalyzerConfig,
+    LogSource,
+    OperationStats,
+    format_prometheus,
+    format_report,
+    normalize_path,
+    normalize_sql,
+)
+
+
+def analyzer(tmp_path, log_dir, format="servarr", **kwargs):
+    config = LogAnalyzerConfig(
+        sources=[LogSource(service="sonarr", format=format, log_dir=str(log_dir))],
+        **kwargs,
+    )
+    return LogAnalyzer(config, tmp_path / "state.json")
+
+
+def stats(analyzer, kind):
+    return {
+        name: (s.count, round(s.total_secs, 3))
+        for name, s in analyzer.state.stats.get("sonarr", {}).get(kind, {}).items()
+    }
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    path = tmp_path / "logs"
+    path.mkdir()
+    return path
+
+
+def test_normalize_sql():
+    assert (
+        normalize_sql(
+            "SELECT *  FROM \"Series\"\n WHERE Id IN (1, 2, 3) AND Title = 'it''s'"
+        )
+        == 'SELECT * FROM "Series" WHERE Id IN (?) AND Title = ?'
+    )
+    assert normalize_sql("   ") == "(unknown)"
+
+
+def test_normalize_path():
+    assert normalize_path("/api/v3/series/123?includeSeasonImages=false") == (
+        "/api/v3/series/{id}"
+    )
+    assert (
+        normalize_path("http://host/Items/0123456789ABCDEF0123456789ABCDEF/Images")
+        == "/items/{id}/images"
+    )
+    assert normalize_path("http://host") == "/"
+
+
+def test_servarr_lines(tmp_path, log_dir):
+    (log_dir / "sonarr.txt").write_text(
+        "2024-01-31 12:00:00.1|Debug|Api|[GET] /api/v3/series/12: 200.OK (1234 ms)\n"
+        "2024-01-31 12:00:01.1|Debug|Api|[GET] /api/v3/series/13: 200.OK (100 ms)\n"
+        "2024-01-31 12:00:02.1|Trace|CommandExecutor|RefreshSeriesCommand <- RefreshSeriesService [00:00:12.5000000]\n"
+        "2024-01-31 12:00:03.1|Warn|Database|Slow query (2,500 ms):\n"
+        'SELECT * FROM "Episodes"\n'
+        'WHERE "SeriesId" = 42\n'
+        "2024-01-31 12:00:04.1|Info|Main|Done\n"
+    )
+    a = analyzer(tmp_path, log_dir)
+    a.run()
+    assert stats(a, "endpoint") == {"GET /api/v3/series/{id}": (1, 1.234)}
+    assert stats(a, "task") == {"RefreshSeries": (1, 12.5)}
+    assert stats(a, "query") == {
+        'SELECT * FROM "Episodes" WHERE "SeriesId" = ?': (1, 2.5)
+    }
+    assert a.state.lines == {"sonarr": 7}
+
+
+def test_jellyfin_lines(tmp_path, log_dir):
+    (log_dir / "log_20240131.log").write_text(
+        '[2024-01-31 12:00:00.123 +00:00] [WRN] [42] Jellyfin.Api: Slow HTTP Response from "http://host/Items?Limit=100" to "1.2.3.4" in 0:00:01.5 with Status Code 200\n'
+        '[2024-01-31 12:00:01.123 +00:00] [INF] [42] TaskManager: "Scan Media Library" Completed after 2 minute(s) and 3 seconds\n'
+    )
+    (log_dir / "FFmpeg.Transcode-1.log").write_text("not a server log\n")
+    a = analyzer(tmp_path, log_dir, format="jellyfin")
+    a.run()
+    assert stats(a, "endpoint") == {"/items": (1, 1.5)}
+    assert stats(a, "task") == {"Scan Media Library": (1, 123)}
+
+
+def test_only_new_and_complete_lines_are_read(tmp_path, log_dir):
+    log = log_dir / "sonarr.txt"
+    line = "2024-01-31 12:00:00.1|Debug|Api|[GET] /api/v3/queue: 200.OK (1000 ms)\n"
+    log.write_text(line + line[:20])
+    analyzer(tmp_path, log_dir).run()
+    # The partial line is completed, and another line added.
+    with log.open("a") as f:
+        f.write(line[20:] + line)
+    a = analyzer(tmp_path, log_dir)
+    a.run()
+    assert stats(a, "endpoint") == {"GET /api/v3/queue": (3, 3)}
+    assert a.state.lines == {"sonarr": 3}
+
+
+def test_rotated_files_are_finished(tmp_path, log_dir):
+    line = "2024-01-31 12:00:00.1|Debug|Api|[GET] /api/v3/queue: 200.OK (1000 ms)\n"
+    log = log_dir / "sonarr.txt"
+    log.write_text(line)
+    analyzer(tmp_path, log_dir).run()
+    with log.open("a") as f:
+        f.write(line)
+    log.rename(log_dir / "sonarr.0.txt")
+    os.utime(log_dir / "sonarr.0.txt", (0, 0))
+    (log_dir / "sonarr.txt").write_text(line)
+    a = analyzer(tmp_path, log_dir)
+    a.run()
+    assert stats(a, "endpoint") == {"GET /api/v3/queue": (3, 3)}
+
+
+def test_names_beyond_the_limit_are_other(tmp_path, log_dir):
+    (log_dir / "sonarr.txt").write_text(
+        "".join(
+            f"2024-01-31 12:00:00.1|Debug|Api|[GET] /api/v3/{name}: 200.OK (1000 ms)\n"
+            for name in ["a", "b", "c", "a"]
+        )
+    )
+    a = analyzer(tmp_path, log_dir, max_names=2)
+    a.run()
+    assert stats(a, "endpoint") == {
+        "GET /api/v3/a": (2, 2),
+        "GET /api/v3/b": (1, 1),
+        "(other)": (1, 1),
+    }
+
+
+def test_format_report_and_prometheus():
+    state = AnalyzerState(
+        stats={
+            "sonarr": {
+                "endpoint": {
+                    'GET /api/v3/"quoted"': OperationStats(
+                        count=2, total_secs=3, max_secs=2
+                    ),
+                    "GET /api/v3/queue": OperationStats(
+                        count=1, total_secs=5, max_secs=5
+                    ),
+                }
+            }
+        },
+        lines={"sonarr": 10},
+        last_run=1700000000,
+    )
+    report = format_report(state).splitlines()
+    assert report[1].split()[-1] == "/api/v3/queue"
+    assert format_report(state, kind="task") == "No slow operations found."
+    metrics = format_prometheus(state)
+    assert (
+        'nixarr_log_slow_operations_total{service="sonarr",kind="endpoint",name="GET /api/v3/\\"quoted\\""} 2'
+        in metrics
+    )
+    assert 'nixarr_log_lines_total{service="sonarr"} 10' in metrics
@@ -0,0 +1,109 @@
+import pytest
+
+from nixarr_py.schema_validation import (
+    needs_runtime_validation,
+    snapshot_schemas,
+    validate_sync_config,
+)
+
+
+@pytest.fixture
+def snapshot():
+    return snapshot_schemas(
+        "prowlarr",
+        {
+            "application": [
+                {
+                    "implementation": "Sonarr",
+                    "name": "",
+                    "syncLevel": "fullSync",
+                    "fields": [{"name": "baseUrl"}, {"name": "apiKey"}],
+                },
+            ],
+            "indexer": [
+                {
+                    "sort_name": "nyaasi",
+                    "name": "",
+                    "enable": True,
+                    "fields": [{"name": "baseUrl"}, {"name": "sortBy"}],
+                },
+                {
+                    "sort_name": "1337x",
+                    "name": "",
+                    "enable": True,
+                    "fields": [{"name": "baseUrl"}],
+                },
+            ],
+        },
+    )
+
+
+def test_snapshot_keeps_keys_properties_and_fields(snapshot):
+    assert snapshot["indexer"] == [
+        {
+            "key": "1337x",
+            "properties": ["enable", "fields", "name", "sort_name"],
+            "fields": ["baseUrl"],
+        },
+        {
+            "key": "nyaasi",
+            "properties": ["enable", "fields", "name", "sort_name"],
+            "fields": ["baseUrl", "sortBy"],
+        },
+    ]
+
+
+def test_valid_config(snapshot):
+    config = {
+        "app_configs": [
+            {"implementation": "Sonarr", "name": "Sonarr", "fields": {"apiKey": "x"}}
+        ],
+        "indexer_configs": [
+            {
+                "sort_name": "nyaasi",
+                "enable": True,
+                "fields": {"sortBy": "seeders"},
+                # Consumed by the sync script itself.
+                "app_profile_name": "Standard",
+            }
+        ],
+    }
+    assert validate_sync_config("prowlarr", config, snapshot) == []
+
+
+def test_unknown_key(snapshot):
+    config = {"indexer_configs": [{"sort_name": "nyaa", "name": "Nyaa"}]}
+    assert validate_sync_config("prowlarr", config, snapshot) == [
+        "indexer 'Nyaa': unknown sort_name 'nyaa'. Did you mean 'nyaasi'?"
+    ]
+
+
+def test_unknown_properties_and_fields(snapshot):
+    config = {
+        "app_configs": [
+            {
+                "implementation": "Sonarr",
+                "synclevel": "fullSync",
+                "fields": {"apikey": "x", "unrelated": 1},
+            }
+        ]
+    }
+    assert validate_sync_config("prowlarr", config, snapshot) == [
+        "app 'Sonarr': unknown property .\"synclevel\". Did you mean 'syncLevel'?",
+        "app 'Sonarr': unknown property .fields.\"apikey\". Did you mean 'apiKey'?",
+        "app 'Sonarr': unknown property .fields.\"unrelated\".",
+    ]
+
+
+def test_snapshot_without_the_kind(snapshot):
+    del snapshot["application"]
+    assert validate_sync_config("prowlarr", {}, snapshot) == [
+        "The schema snapshot has no 'application' schemas"
+    ]
+
+
+def test_runtime_validation_only_skipped_for_the_snapshot_version(snapshot):
+    assert needs_runtime_validation(snapshot, "1.2.3")
+    snapshot["version"] = "1.2.3"
+    assert not needs_runtime_validation(snapshot, "1.2.3")
+    assert needs_runtime_validation(snapshot, "1.3.0")
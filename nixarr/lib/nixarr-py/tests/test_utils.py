@@ -0,0 +1,67 @@
+import json
+import os
+
+import pydantic
+import pytest
+
+from nixarr_py.utils import (
+    atomic_write,
+    atomic_write_json,
+    escape_label,
+    format_size,
+    format_table,
+)
+
+
+@pytest.mark.parametrize(
+    "size, formatted",
+    [
+        (0, "0"),
+        (1023, "1023"),
+        (1536, "1.5K"),
+        (20 * 1024**2, "20M"),
+        (3 * 1024**5, "3072T"),
+    ],
+)
+def test_format_size(size, formatted):
+    assert format_size(size) == formatted
+
+
+def test_format_table_aligns_columns():
+    assert format_table([["name", "size"], ["a", "1.5G"], ["longer", "-"]]) == (
+        "name    size\na       1.5G\nlonger  -"
+    )
+
+
+def test_escape_label():
+    assert escape_label('a "b"\\c\nd') == 'a \\"b\\"\\\\c\\nd'
+
+
+def test_atomic_write_creates_parents_and_replaces(tmp_path):
+    path = tmp_path / "a" / "b.prom"
+    atomic_write(path, "one\n")
+    atomic_write(path, b"two\n")
+    assert path.read_text() == "two\n"
+    assert os.listdir(path.parent) == ["b.prom"]
+
+
+def test_atomic_write_mode(tmp_path):
+    path = tmp_path / "secret"
+    atomic_write(path, b"x", mode=0o600)
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_atomic_write_json(tmp_path):
+    class State(pydantic.BaseModel):
+        offset: int = 3
+
+    atomic_write_json(tmp_path / "model.json", State())
+    atomic_write_json(tmp_path / "dict.json", {"offset": 4})
+    assert json.loads((tmp_path / "model.json").read_text()) == {"offset": 3}
+    assert json.loads((tmp_path / "dict.json").read_text()) == {"offset": 4}
+
+
+def test_format_table_right_aligns_selected_columns():
+    assert format_table([["name", "files"], ["a", "7"], ["b", "123"]], right=[1]) == (
+        "name  files\na         7\nb       123"
+    )
@@ -22,6 +22,11 @@
     writeShellApplication
     ;
 
+  inherit
+    (pkgs.writers)
+    writePython3Bin
+    ;
+
   mkArrLocalUrl = service: let
     port = config.nixarr.${service}.port;
     urlBase = config.services.${service}.settings.server.urlBase or "";
@@ -136,6 +141,29 @@
   arrDownloadClientConfigType = service:
     types.submodule (arrDownloadClientConfigModule service);
 
+  validate-sync-config = writePython3Bin "nixarr-validate-sync-config" {
+    libraries = [config.nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./validate-sync-config/validate_sync_config.py);
+
+  # Checks a generated settings-sync config file against a schema snapshot
+  # while building, so typos fail the build instead of the sync service.
+  # Returns the config file unchanged.
+  validateSyncConfig = {
+    service,
+    configFile,
+    schemaSnapshot,
+  }:
+    pkgs.runCommand "${service}-sync-config-validated.json" {} ''
+      ${getExe validate-sync-config} \
+        --service ${service} \
+        --config-file ${configFile} \
+        --schema-snapshot ${schemaSnapshot}
+      cp ${configFile} $out
+    '';
+
   arrServiceNames = [
     "lidarr"
     "prowlarr"
@@ -153,6 +181,7 @@ in {
     mkArrLocalUrl
     secretFileType
     toKebabSentenceCase
+    validateSyncConfig
     waitForService
     waitForArrService
     ;
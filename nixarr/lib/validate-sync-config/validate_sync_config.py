@@ -0,0 +1,39 @@
+from pathlib import Path
+import argparse
+import json
+import sys
+
+from nixarr_py.schema_validation import SYNCED_KINDS, validate_sync_config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check a settings-sync config against a schema snapshot"
+    )
+    parser.add_argument(
+        "--service",
+        choices=sorted(SYNCED_KINDS),
+        required=True,
+        help="Service the config is synced to.",
+    )
+    parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to the generated settings-sync config.",
+    )
+    parser.add_argument(
+        "--schema-snapshot",
+        type=Path,
+        required=True,
+        help="Path to a schema snapshot from `nixarr show-<service>-schemas snapshot`.",
+    )
+    args = parser.parse_args()
+    errors = validate_sync_config(
+        args.service,
+        json.loads(args.config_file.read_text()),
+        json.loads(args.schema_snapshot.read_text()),
+    )
+    for error in errors:
+        print(f"error: {args.service} settings-sync: {error}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
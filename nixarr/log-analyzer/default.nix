@@ -0,0 +1,142 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    concatStringsSep
+    filter
+    getExe
+    mkIf
+    mkOption
+    optional
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writeJSON
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.logAnalyzer;
+
+  nixarr-utils = import ../lib/utils.nix {inherit config lib pkgs;};
+  inherit (nixarr-utils) arrServiceNames;
+
+  log-analyzer = writePython3Bin "nixarr-log-analyzer" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./log_analyzer.py);
+
+  sources =
+    map (service: {
+      inherit service;
+      format = "servarr";
+      log_dir = "${nixarr.${service}.stateDir}/logs";
+    })
+    (filter (service: nixarr.${service}.enable) arrServiceNames)
+    ++ optional nixarr.jellyfin.enable {
+      service = "jellyfin";
+      format = "jellyfin";
+      log_dir = "${nixarr.jellyfin.stateDir}/log";
+    };
+in {
+  options.nixarr.logAnalyzer = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to periodically extract slow operations from the logs of the
+        enabled *Arrs and Jellyfin: slow database queries, slow API requests
+        and the duration of scheduled tasks, aggregated by count and total
+        time. Only the lines written since the last run are read.
+
+        Run `nixarr log-report` as root to see the operations that took the
+        most time. With
+        [`nixarr.exporters.enable`](#nixarr.exporters.enable), the aggregates
+        are exported as Prometheus metrics too.
+
+        The *Arrs only log API requests at the debug log level, and command
+        durations at the trace log level (Settings → General → Logging).
+      '';
+    };
+
+    slowMs = mkOption {
+      type = types.ints.unsigned;
+      default = 500;
+      description = ''
+        Queries and API requests faster than this many milliseconds aren't
+        counted. Jellyfin only logs HTTP responses slower than its own
+        threshold (500ms by default).
+      '';
+    };
+
+    maxNames = mkOption {
+      type = types.ints.positive;
+      default = 50;
+      description = ''
+        Distinct queries, endpoints or tasks tracked per service; any others
+        are counted together as `(other)`.
+      '';
+    };
+
+    interval = mkOption {
+      type = types.str;
+      default = "*:0/15";
+      description = "How often to read the logs, as a systemd calendar expression.";
+    };
+  };
+
+  config = mkIf (nixarr.enable && cfg.enable) {
+    assertions = [
+      {
+        assertion = sources != [];
+        message = "nixarr.logAnalyzer.enable requires Jellyfin or an *Arr to be enabled";
+      }
+    ];
+
+    systemd.services.nixarr-log-analyzer = {
+      description = "Extract slow operations from the *Arr and Jellyfin logs";
+      serviceConfig = {
+        Type = "oneshot";
+        DynamicUser = true;
+        StateDirectory = "nixarr-log-analyzer";
+        SupplementaryGroups = optional nixarr.exporters.enable "nixarr-metrics";
+        # The state directories are only accessible to the services' users.
+        AmbientCapabilities = ["CAP_DAC_READ_SEARCH"];
+        CapabilityBoundingSet = ["CAP_DAC_READ_SEARCH"];
+        ProtectSystem = "strict";
+        ReadWritePaths = optional nixarr.exporters.enable nixarr.exporters.textfileDir;
+        ExecStart = let
+          config-file = writeJSON "log-analyzer.json" {
+            inherit sources;
+            slow_ms = cfg.slowMs;
+            max_names = cfg.maxNames;
+          };
+        in
+          concatStringsSep " " (
+            [
+              (getExe log-analyzer)
+              "--state-file /var/lib/nixarr-log-analyzer/state.json"
+              "run"
+              "--config-file ${config-file}"
+            ]
+            ++ optional nixarr.exporters.enable
+            "--metrics-file ${nixarr.exporters.textfileDir}/log-analyzer.prom"
+          );
+      };
+    };
+
+    systemd.timers.nixarr-log-analyzer = {
+      wantedBy = ["timers.target"];
+      timerConfig.OnCalendar = cfg.interval;
+    };
+  };
+}
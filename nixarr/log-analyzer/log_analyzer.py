@@ -0,0 +1,83 @@
+from pathlib import Path
+import argparse
+import logging
+import sys
+
+from nixarr_py.log_analyzer import (
+    AnalyzerState,
+    LogAnalyzer,
+    LogAnalyzerConfig,
+    format_prometheus,
+    format_report,
+)
+from nixarr_py.utils import write_prometheus
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def run(args: argparse.Namespace) -> int:
+    config = LogAnalyzerConfig.model_validate_json(args.config_file.read_text())
+    analyzer = LogAnalyzer(config, args.state_file)
+    analyzer.run()
+    if args.metrics_file is not None:
+        write_prometheus(format_prometheus(analyzer.state), args.metrics_file)
+    return 0
+
+
+def report(args: argparse.Namespace) -> int:
+    try:
+        state = AnalyzerState.model_validate_json(args.state_file.read_text())
+    except FileNotFoundError:
+        logger.info(f"No results in {args.state_file} yet")
+        return 0
+    print(format_report(state, top=args.top, service=args.service, kind=args.kind))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract slow queries, API requests and tasks from the *arr and Jellyfin logs"
+    )
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        default=Path("/var/lib/nixarr-log-analyzer/state.json"),
+        help="Path to the file recording read positions and aggregates.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Read the new log lines.")
+    run_parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to a JSON file matching the LogAnalyzerConfig schema.",
+    )
+    run_parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Write the aggregates in the Prometheus text format to this file.",
+    )
+    run_parser.set_defaults(func=run)
+
+    report_parser = subparsers.add_parser(
+        "report", help="Show the operations that took the most total time."
+    )
+    report_parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="Number of operations to show per kind.",
+    )
+    report_parser.add_argument("--service", help="Only show this service.")
+    report_parser.add_argument(
+        "--kind",
+        choices=["query", "endpoint", "task"],
+        help="Only show this kind of operation.",
+    )
+    report_parser.set_defaults(func=report)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
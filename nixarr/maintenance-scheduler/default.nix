@@ -0,0 +1,248 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    attrValues
+    getExe
+    literalExpression
+    literalMD
+    mapAttrsToList
+    mkIf
+    mkOption
+    optional
+    optionalAttrs
+    types
+    unique
+    ;
+
+  inherit
+    (pkgs.writers)
+    writeJSON
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.maintenanceScheduler;
+
+  jellyfinApi = nixarr.jellyfin.enable && nixarr.jellyfin.api.enable;
+
+  maintenance-scheduler = writePython3Bin "nixarr-maintenance-scheduler" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./maintenance_scheduler.py);
+
+  jobType = types.submodule {
+    options = {
+      service = mkOption {
+        type = types.enum ["jellyfin" "lidarr" "prowlarr" "radarr" "readarr" "sonarr"];
+        description = "The service whose scheduled task the job runs.";
+      };
+      task = mkOption {
+        type = types.str;
+        example = "RefreshLibrary";
+        description = ''
+          The Jellyfin scheduled task key (e.g. `RefreshLibrary`,
+          `RefreshTrickplayImages`) or *Arr task name (e.g. `RefreshSeries`,
+          as listed under System → Tasks).
+        '';
+      };
+      intervalHours = mkOption {
+        type = with types; nullOr ints.positive;
+        default = null;
+        description = ''
+          How often to run the job. Defaults to the *Arr's own task interval;
+          required for Jellyfin tasks.
+        '';
+      };
+      ioHeavy = mkOption {
+        type = types.bool;
+        default = true;
+        description = ''
+          Whether the job is I/O-heavy. Heavy jobs run one at a time, and not
+          while a conflicting unit is active.
+        '';
+      };
+      timeoutMins = mkOption {
+        type = types.ints.positive;
+        default = 240;
+        description = "Stop waiting for a heavy job after this long.";
+      };
+    };
+  };
+
+  defaultJobs =
+    optionalAttrs jellyfinApi {
+      jellyfin-library-scan = {
+        service = "jellyfin";
+        task = "RefreshLibrary";
+        intervalHours = 24;
+      };
+      jellyfin-trickplay = {
+        service = "jellyfin";
+        task = "RefreshTrickplayImages";
+        intervalHours = 24;
+      };
+      jellyfin-chapter-images = {
+        service = "jellyfin";
+        task = "RefreshChapterImages";
+        intervalHours = 24;
+      };
+    }
+    // optionalAttrs nixarr.sonarr.enable {
+      sonarr-refresh = {
+        service = "sonarr";
+        task = "RefreshSeries";
+      };
+    }
+    // optionalAttrs nixarr.radarr.enable {
+      radarr-refresh = {
+        service = "radarr";
+        task = "RefreshMovie";
+      };
+    }
+    // optionalAttrs nixarr.lidarr.enable {
+      lidarr-refresh = {
+        service = "lidarr";
+        task = "RefreshArtist";
+      };
+    };
+
+  # Jellyfin's API is also needed to check for active sessions.
+  apiServices = unique (
+    map (job: job.service) (attrValues cfg.jobs) ++ optional jellyfinApi "jellyfin"
+  );
+in {
+  options.nixarr.maintenanceScheduler = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to run Jellyfin's and the *Arrs' heavy scheduled tasks
+        (library scans, trickplay and chapter image extraction, metadata
+        refreshes) only inside maintenance windows, one at a time, and not
+        while Jellyfin is busy playing.
+
+        The managed Jellyfin tasks lose their own triggers while the scheduler
+        runs; it starts them instead, and gives the triggers back when it
+        stops or no longer manages the task. The *Arrs' task intervals can't
+        be changed, so their tasks are run early inside a window whenever
+        they'd otherwise come due before the next window, which moves their
+        schedule into the window for tasks running at most once per day.
+      '';
+    };
+
+    windows = mkOption {
+      type = types.listOf (types.strMatching "[0-2][0-9]:[0-5][0-9]-[0-2][0-9]:[0-5][0-9]");
+      default = ["02:00-06:00"];
+      example = ["01:00-07:00" "13:00-15:00"];
+      description = "Daily maintenance windows, in local time.";
+    };
+
+    maxActiveSessions = mkOption {
+      type = types.ints.unsigned;
+      default = 0;
+      description = ''
+        Defer jobs while more than this many Jellyfin sessions are playing
+        something. Only checked if the Jellyfin API is enabled.
+      '';
+    };
+
+    conflictingUnits = mkOption {
+      type = types.listOf types.str;
+      default =
+        optional nixarr.searchScheduler.enable "nixarr-search-scheduler.service"
+        ++ optional nixarr.bazarr.subtitleScheduler.enable "nixarr-subtitle-scheduler.service";
+      defaultText = literalExpression ''
+        optional config.nixarr.searchScheduler.enable "nixarr-search-scheduler.service"
+        ++ optional config.nixarr.bazarr.subtitleScheduler.enable "nixarr-subtitle-scheduler.service"
+      '';
+      description = ''
+        Systemd units during which no heavy job is started, e.g. other jobs
+        that walk the media library or hammer the disks.
+      '';
+    };
+
+    jobs = mkOption {
+      type = types.attrsOf jobType;
+      default = defaultJobs;
+      defaultText = literalMD ''
+        Jellyfin's library scan, trickplay and chapter image tasks (daily, if
+        the Jellyfin API is enabled), and the Sonarr, Radarr and Lidarr
+        refresh tasks of the enabled services.
+      '';
+      description = "The jobs to run inside the maintenance windows, by name.";
+    };
+  };
+
+  config = mkIf (nixarr.enable && cfg.enable) {
+    assertions =
+      mapAttrsToList (name: job: {
+        assertion =
+          if job.service == "jellyfin"
+          then jellyfinApi && job.intervalHours != null
+          else nixarr.${job.service}.enable;
+        message = "nixarr.maintenanceScheduler.jobs.${name} requires ${job.service} to be enabled${
+          if job.service == "jellyfin"
+          then " with nixarr.jellyfin.api.enable, and an intervalHours"
+          else ""
+        }";
+      })
+      cfg.jobs;
+
+    systemd.services.nixarr-maintenance-scheduler = {
+      description = "Run Jellyfin and *Arr maintenance tasks inside maintenance windows";
+      after = map (service: "${service}-api.service") apiServices;
+      wants = map (service: "${service}-api.service") apiServices;
+      wantedBy = ["multi-user.target"];
+      serviceConfig = {
+        Type = "simple";
+        DynamicUser = true;
+        StateDirectory = "nixarr-maintenance-scheduler";
+        SupplementaryGroups = map (service: "${service}-api") apiServices;
+        Restart = "on-failure";
+        RestartSec = "30s";
+        ExecStart = let
+          config-file = writeJSON "maintenance-scheduler.json" {
+            windows = cfg.windows;
+            max_active_sessions =
+              if jellyfinApi
+              then cfg.maxActiveSessions
+              else null;
+            conflicting_units = cfg.conflictingUnits;
+            jobs =
+              mapAttrsToList (name: job: {
+                inherit name;
+                inherit (job) service task;
+                interval_secs =
+                  if job.intervalHours == null
+                  then null
+                  else job.intervalHours * 3600;
+                io_heavy = job.ioHeavy;
+                timeout_secs = job.timeoutMins * 60;
+              })
+              cfg.jobs;
+          };
+        in ''
+          ${getExe maintenance-scheduler} \
+            --state-file /var/lib/nixarr-maintenance-scheduler/state.json \
+            run \
+            --config-file ${config-file}
+        '';
+        # While the scheduler isn't running, including once it's disabled,
+        # Jellyfin runs its tasks on its own schedule again.
+        ExecStopPost = ''
+          ${getExe maintenance-scheduler} \
+            --state-file /var/lib/nixarr-maintenance-scheduler/state.json \
+            restore
+        '';
+      };
+    };
+  };
+}
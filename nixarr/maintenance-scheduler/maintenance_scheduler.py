@@ -0,0 +1,69 @@
+from pathlib import Path
+import argparse
+import logging
+
+from nixarr_py.maintenance_scheduler import MaintenanceConfig, MaintenanceScheduler
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run(args: argparse.Namespace) -> None:
+    config = MaintenanceConfig.model_validate_json(args.config_file.read_text())
+    MaintenanceScheduler(config, args.state_file, poll_secs=args.poll_secs).run()
+
+
+def restore(args: argparse.Namespace) -> None:
+    if args.config_file is None:
+        config = MaintenanceConfig(jobs=[], windows=[])
+    else:
+        config = MaintenanceConfig.model_validate_json(args.config_file.read_text())
+    scheduler = MaintenanceScheduler(config, args.state_file)
+    scheduler.restore_jellyfin_triggers(
+        keep={job.task for job in config.jobs if job.service == "jellyfin"}
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run Jellyfin and *arr maintenance tasks inside maintenance windows, one heavy task at a time"
+    )
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        required=True,
+        help="Path to the file recording last runs and removed Jellyfin triggers.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="Coordinate the maintenance jobs until interrupted."
+    )
+    run_parser.add_argument(
+        "--config-file",
+        type=Path,
+        required=True,
+        help="Path to a JSON file matching the MaintenanceConfig schema.",
+    )
+    run_parser.add_argument(
+        "--poll-secs",
+        type=float,
+        default=60,
+        help="Time between checks for due jobs, in seconds.",
+    )
+    run_parser.set_defaults(func=run)
+
+    restore_parser = subparsers.add_parser(
+        "restore",
+        help="Give Jellyfin's tasks back the triggers the scheduler removed.",
+    )
+    restore_parser.add_argument(
+        "--config-file",
+        type=Path,
+        help="Only restore the triggers of the Jellyfin tasks this config doesn't manage.",
+    )
+    restore_parser.set_defaults(func=restore)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -24,6 +24,16 @@ in {
     nixarr = {
       exporters = {
         enable = mkEnableOption "Enable Prometheus exporters for all supported nixarr services";
+
+        textfileDir = mkOption {
+          type = types.path;
+          default = "/run/nixarr-metrics";
+          description = ''
+            Directory the node exporter's textfile collector reads `*.prom`
+            files from. Nixarr services that compute their own metrics write
+            them here; it is writable by the `nixarr-metrics` group.
+          '';
+        };
       };
 
       wireguard.exporter = {
@@ -195,6 +205,7 @@ in {
         node = {
           enable = true;
           enabledCollectors = ["systemd" "tcpstat" "network_route"];
+          extraFlags = ["--collector.textfile.directory=${cfg.exporters.textfileDir}"];
         };
         systemd.enable = true;
 
@@ -276,6 +287,12 @@ in {
       }
     ];
 
+    # Shared directory for the textfile collector
+    users.groups.nixarr-metrics = {};
+    systemd.tmpfiles.rules = [
+      "d ${cfg.exporters.textfileDir} 2775 root nixarr-metrics - -"
+    ];
+
     # Add port mappings for VPN-confined exporters
     vpnNamespaces.wg = mkIf cfg.vpn.enable {
       portMappings =
@@ -0,0 +1,171 @@
+from pathlib import Path
+import argparse
+import difflib
+import json
+import logging
+import sys
+import time
+
+from nixarr_py.config_backup import (
+    SERVICES,
+    SnapshotStore,
+    diff_manifests,
+    export_services,
+)
+from nixarr_py.utils import format_size
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def parse_services(value: str) -> list[str]:
+    services = [service.strip() for service in value.split(",") if service.strip()]
+    if not services:
+        raise argparse.ArgumentTypeError("no services given")
+    unknown = sorted(set(services) - set(SERVICES))
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown services: {', '.join(unknown)} (expected some of {', '.join(SERVICES)})"
+        )
+    return services
+
+
+def create(store: SnapshotStore, args: argparse.Namespace) -> int:
+    start = time.monotonic()
+    exports, errors = export_services(args.services, max_workers=args.concurrency)
+    name, stats = store.create_snapshot(exports, errors)
+    elapsed = time.monotonic() - start
+    if name is None:
+        logger.info(
+            f"Exported {stats.items} items in {elapsed:.2f}s; nothing changed since snapshot {store.resolve('latest')}"
+        )
+    else:
+        logger.info(
+            f"Created snapshot {name} in {elapsed:.2f}s: {stats.items} items, "
+            f"{stats.objects_written} new objects, {format_size(stats.bytes_written)} written"
+        )
+    return 1 if errors else 0
+
+
+def list_snapshots(store: SnapshotStore, args: argparse.Namespace) -> int:
+    for name in store.list_snapshots():
+        manifest = store.load_manifest(name)
+        items = sum(
+            len(entry["items"])
+            for resources in manifest["services"].values()
+            for entry in resources.values()
+        )
+        services = ", ".join(sorted(manifest["services"]))
+        errors = f", {len(manifest['errors'])} errors" if manifest["errors"] else ""
+        print(f"{name}\t{items} items ({services}){errors}")
+    return 0
+
+
+def diff(store: SnapshotStore, args: argparse.Namespace) -> int:
+    old_name, new_name = store.resolve(args.old), store.resolve(args.new)
+    old, new = store.load_manifest(old_name), store.load_manifest(new_name)
+    symbols = {"added": "+", "removed": "-", "changed": "~"}
+    changes = diff_manifests(old, new)
+    for change in changes:
+        label = f" '{change.label}'" if change.label else ""
+        key = f" [{change.key}]" if change.key else ""
+        print(f"{symbols[change.kind]} {change.service} {change.resource}{key}{label}")
+        if not args.details:
+            continue
+        old_lines, new_lines = [
+            json.dumps(store.get_object(obj), indent=2, sort_keys=True).splitlines()
+            if obj is not None
+            else []
+            for obj in [change.old_object, change.new_object]
+        ]
+        for line in difflib.unified_diff(
+            old_lines, new_lines, old_name, new_name, n=2, lineterm=""
+        ):
+            print(f"    {line}")
+    for key in sorted(new["errors"]):
+        print(f"! {key} could not be exported in {new_name}: {new['errors'][key]}")
+    return 0 if not changes else 3
+
+
+def show(store: SnapshotStore, args: argparse.Namespace) -> int:
+    exports = store.materialize(args.snapshot)
+    if args.service is not None:
+        exports = {args.service: exports.get(args.service, {})}
+    if args.resource is not None:
+        exports = {
+            service: {args.resource: resources[args.resource]}
+            for service, resources in exports.items()
+            if args.resource in resources
+        }
+    print(json.dumps(exports, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Back up the configuration of Nixarr services through their APIs"
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        required=True,
+        help="Directory holding the snapshot store.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser(
+        "create",
+        help="Export the configuration of all services and store a snapshot of what changed.",
+    )
+    create_parser.add_argument(
+        "--services",
+        type=parse_services,
+        default=SERVICES,
+        help=f"Comma-separated services to export (default: {','.join(SERVICES)}).",
+    )
+    create_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of API requests in flight at once.",
+    )
+    create_parser.set_defaults(func=create)
+
+    list_parser = subparsers.add_parser("list", help="List snapshots, oldest first.")
+    list_parser.set_defaults(func=list_snapshots)
+
+    diff_parser = subparsers.add_parser(
+        "diff",
+        help="Show items added, removed or changed between two snapshots. Exits with status 3 if there are any.",
+    )
+    diff_parser.add_argument(
+        "old", nargs="?", default="previous", help="Default: previous."
+    )
+    diff_parser.add_argument(
+        "new", nargs="?", default="latest", help="Default: latest."
+    )
+    diff_parser.add_argument(
+        "--details",
+        action="store_true",
+        help="Show a unified diff of each changed item.",
+    )
+    diff_parser.set_defaults(func=diff)
+
+    show_parser = subparsers.add_parser(
+        "show", help="Print the exported configuration stored in a snapshot."
+    )
+    show_parser.add_argument(
+        "snapshot", nargs="?", default="latest", help="Default: latest."
+    )
+    show_parser.add_argument("--service", help="Only show this service.")
+    show_parser.add_argument("--resource", help="Only show this resource.")
+    show_parser.set_defaults(func=show)
+
+    args = parser.parse_args()
+    store = SnapshotStore(args.store)
+    try:
+        sys.exit(args.func(store, args))
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(2)
@@ -0,0 +1,64 @@
+import argparse
+import logging
+import sys
+
+from nixarr_py.db_maintenance import DATABASE_DIRS, format_reports, maintain_services
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def parse_service(value: str) -> tuple[str, str]:
+    service, _, state_dir = value.partition("=")
+    if service not in DATABASE_DIRS or not state_dir:
+        raise argparse.ArgumentTypeError(
+            f"Expected <service>=<state dir> with a service from: {', '.join(sorted(DATABASE_DIRS))}"
+        )
+    return service, state_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stop services, then check, prune, vacuum and analyze their SQLite databases"
+    )
+    parser.add_argument(
+        "--service",
+        type=parse_service,
+        action="append",
+        default=[],
+        required=True,
+        help="A service and its state directory, as <service>=<state dir>; repeatable.",
+    )
+    parser.add_argument(
+        "--only",
+        type=lambda value: value.split(","),
+        help="Comma-separated services to maintain (default: all given ones).",
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        help="Delete history, log and activity rows older than this many days. Nothing is deleted if not given.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of services to maintain at once.",
+    )
+    args = parser.parse_args()
+    state_dirs = dict(args.service)
+    if args.only is not None:
+        unknown = set(args.only) - state_dirs.keys()
+        if unknown:
+            parser.error(
+                f"Not enabled: {', '.join(sorted(unknown))}; enabled: {', '.join(sorted(state_dirs))}"
+            )
+        state_dirs = {service: state_dirs[service] for service in args.only}
+
+    reports = maintain_services(state_dirs, args.retention_days, args.concurrency)
+    print(format_reports(reports))
+    failed = any(
+        report.error or any(db.error for db in report.databases) for report in reports
+    )
+    sys.exit(1 if failed else 0)
@@ -15,6 +15,9 @@ with lib; let
   nixarr-py = nixarr.nixarr-py.package;
   globals = config.util-nixarr.globals;
 
+  nixarr-utils = import ../lib/utils.nix {inherit config lib pkgs;};
+  inherit (nixarr-utils) arrServiceNames;
+
   show-prowlarr-schemas = writePython3Bin "show-prowlarr-schemas" {
     libraries = [nixarr-py];
     flakeIgnore = [
@@ -36,6 +39,99 @@ with lib; let
     ];
   } (builtins.readFile ./show-schemas/sonarr.py);
 
+  fs-index = writePython3Bin "nixarr-fs-index" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./fs-index/fs_index.py);
+
+  backup-config = writePython3Bin "nixarr-backup-config" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./backup-config/backup_config.py);
+
+  prewarm-jellyfin-images = writePython3Bin "prewarm-jellyfin-images" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./prewarm-jellyfin-images/prewarm_jellyfin_images.py);
+
+  transcode-report = writePython3Bin "nixarr-transcode-report" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./transcode-report/transcode_report.py);
+
+  verify-hardlinks = writePython3Bin "nixarr-verify-hardlinks" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./verify-hardlinks/verify_hardlinks.py);
+
+  library-stats = writePython3Bin "nixarr-library-stats" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./library-stats/library_stats.py);
+
+  library-stats-services = concatStringsSep "," (
+    filter (service: nixarr.${service}.enable) ["radarr" "sonarr"]
+  );
+
+  plan-transcodes = writePython3Bin "nixarr-plan-transcodes" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./plan-transcodes/plan_transcodes.py);
+
+  # The services `nixarr plan-transcodes --tag` tags the queued items in.
+  plan-transcodes-services = concatStringsSep "," (
+    filter (service: nixarr.${service}.enable) ["radarr" "sonarr"]
+  );
+
+  profile-jellyfin-scan = writePython3Bin "nixarr-profile-jellyfin-scan" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./profile-jellyfin-scan/profile_jellyfin_scan.py);
+
+  db-maintain = writePython3Bin "nixarr-db-maintain" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./db-maintain/db_maintain.py);
+
+  # The same binary the log analyzer service runs.
+  log-analyzer = writePython3Bin "nixarr-log-analyzer" {
+    libraries = [nixarr-py];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ../log-analyzer/log_analyzer.py);
+
+  db-maintain-args = concatMapStringsSep " " (service: "--service '${service}=${nixarr.${service}.stateDir}'") (
+    filter (service: nixarr.${service}.enable) (arrServiceNames ++ ["bazarr" "jellyfin"])
+  );
+
+  hardlink-services = concatStringsSep "," (
+    filter (service: nixarr.${service}.enable) ["lidarr" "radarr" "sonarr"]
+  );
+
+  backup-services = concatStringsSep "," (
+    filter (service: nixarr.${service}.enable) arrServiceNames
+    ++ optional (nixarr.jellyfin.enable && nixarr.jellyfin.api.enable) "jellyfin"
+  );
+
   nixarr-command = pkgs.writeShellApplication {
     name = "nixarr";
     runtimeInputs = with pkgs; [
@@ -46,6 +142,16 @@ with lib; let
       show-prowlarr-schemas
       show-radarr-schemas
       show-sonarr-schemas
+      fs-index
+      backup-config
+      prewarm-jellyfin-images
+      transcode-report
+      verify-hardlinks
+      library-stats
+      plan-transcodes
+      profile-jellyfin-scan
+      db-maintain
+      log-analyzer
     ];
     text = ''
       command="''${1:-}"
@@ -58,6 +164,42 @@ with lib; let
         echo "  list-api-keys         Lists API keys of supported enabled services."
         echo "  list-unlinked <path>  Lists unlinked directories and files, in the given directory."
         echo "                        Use the jdupes command to hardlink duplicates from there."
+        echo "  du [path]             Shows the size of the given directory (default: the media"
+        echo "                        directory) and its subdirectories."
+        echo "                        list-unlinked and du answer from an incrementally refreshed"
+        echo "                        index; see --help for filtering and sorting options."
+        echo "  backup-config [create|list|diff|show]"
+        echo "                        Snapshots the API-level configuration of enabled services"
+        echo "                        (indexers, download clients, profiles, tags, ...), storing"
+        echo "                        only what changed since the last snapshot. See --help."
+        echo "  prewarm-jellyfin-images"
+        echo "                        Requests every library item's images at the sizes clients"
+        echo "                        use, so Jellyfin's image cache is warm after a restore."
+        echo "                        Resumes where it stopped. Requires the Jellyfin API."
+        echo "  transcode-report      Summarizes recorded Jellyfin playbacks per client, codec and"
+        echo "                        library: how often they were transcoded and how fast."
+        echo "                        Requires nixarr.jellyfin.transcodeTelemetry. See --help."
+        echo "  verify-hardlinks      Finds Sonarr, Radarr and Lidarr imports that were copied from"
+        echo "                        the downloads instead of hardlinked, and the space they waste."
+        echo "                        Use --relink to replace identical copies with hardlinks."
+        echo "  library-stats         Reports the size and bitrates of Radarr and Sonarr files per"
+        echo "                        quality, profile, codec, ..., and what deleting or re-encoding"
+        echo "                        some of them would save. See --help."
+        echo "  plan-transcodes       Lists the Jellyfin items your clients can't direct play, most"
+        echo "                        played first, to pre-transcode or re-grab them. Can tag them"
+        echo "                        in Radarr and Sonarr. Requires the Jellyfin API and"
+        echo "                        nixarr.jellyfin.transcodePlanner.clientProfiles. See --help."
+        echo "  profile-jellyfin-scan [run|compare]"
+        echo "                        Runs a Jellyfin library scan (of all or one library) and records"
+        echo "                        its duration, phases, items/s and CPU and disk use, to compare"
+        echo "                        runs across versions and hardware. Requires the Jellyfin API."
+        echo "  db-maintain           Stops each enabled *Arr, Bazarr and Jellyfin, checks, vacuums"
+        echo "                        and analyzes its SQLite databases, and starts it again,"
+        echo "                        reporting sizes before and after. Use --retention-days to"
+        echo "                        also delete old history and log rows. See --help."
+        echo "  log-report            Shows the slow queries, API requests and tasks of the *Arrs"
+        echo "                        and Jellyfin that took the most total time, as extracted"
+        echo "                        from their logs. Requires nixarr.logAnalyzer. See --help."
         echo "  wipe-uids-gids        The update on 2025-06-03 causes issues with UID/GIDs,"
         echo "                        run this command, then rebuild and finally run"
         echo "                        nixarr fix-permissions, to fix these issues."
@@ -167,10 +309,34 @@ with lib; let
       }
 
       list-unlinked() {
-        if [ "$#" -ne 1 ]; then
-            echo "Illegal number of parameters. Usage: nixarr list-unlinked <path>"
+        if [ "$#" -lt 1 ]; then
+            echo "Illegal number of parameters. Usage: nixarr list-unlinked <path> [options]"
+            exit 1
+        fi
+        nixarr-fs-index list-unlinked "$@"
+      }
+
+      disk-usage() {
+        if [ "$#" -eq 0 ] || [[ "$1" == -* ]]; then
+          set -- "${nixarr.mediaDir}" "$@"
+        fi
+        nixarr-fs-index du "$@"
+      }
+
+      backup-config() {
+        if [ "$EUID" -ne 0 ]; then
+          echo "Please run as root"
+          exit
+        fi
+
+        if [ "$#" -eq 0 ]; then
+          set -- create
         fi
-        find "$1" -type f -links 1 -exec du -h {} + | sort -h
+        if [ "$1" == "create" ]; then
+          shift
+          set -- create --services "${backup-services}" "$@"
+        fi
+        nixarr-backup-config --store "${nixarr.stateDir}/config-backups" "$@"
       }
 
       list-api-keys() {
@@ -250,6 +416,12 @@ with lib; let
         list-unlinked)
           list-unlinked "$@"
           ;;
+        du)
+          disk-usage "$@"
+          ;;
+        backup-config)
+          backup-config "$@"
+          ;;
         list-api-keys)
           list-api-keys
           ;;
@@ -293,6 +465,150 @@ with lib; let
           echo "Please set config.nixarr.sonarr.enable = true; and rebuild your configuration to use this command."
           exit 1
         ''
+      }
+          ;;
+        prewarm-jellyfin-images)
+          ${
+        if nixarr.jellyfin.enable && nixarr.jellyfin.api.enable
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          prewarm-jellyfin-images "$@"
+        ''
+        else ''
+          echo "The Jellyfin API is not enabled in your configuration."
+          echo "Please set config.nixarr.jellyfin.api.enable = true; and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        transcode-report)
+          ${
+        if nixarr.jellyfin.enable && nixarr.jellyfin.transcodeTelemetry.enable
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-transcode-report --db ${nixarr.jellyfin.transcodeTelemetry.dbPath} "$@"
+        ''
+        else ''
+          echo "Jellyfin transcode telemetry is not enabled in your configuration."
+          echo "Please set config.nixarr.jellyfin.transcodeTelemetry.enable = true; and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        verify-hardlinks)
+          ${
+        if hardlink-services != ""
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-verify-hardlinks \
+            --services ${hardlink-services} \
+            ${strings.optionalString nixarr.transmission.enable "--transmission"} \
+            --downloads-dir "${nixarr.mediaDir}/torrents" \
+            "$@"
+        ''
+        else ''
+          echo "None of Sonarr, Radarr and Lidarr are enabled in your configuration."
+          echo "Please enable at least one of them and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        library-stats)
+          ${
+        if library-stats-services != ""
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-library-stats --services ${library-stats-services} "$@"
+        ''
+        else ''
+          echo "Neither Radarr nor Sonarr are enabled in your configuration."
+          echo "Please enable at least one of them and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        db-maintain)
+          ${
+        if db-maintain-args != ""
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-db-maintain ${db-maintain-args} "$@"
+        ''
+        else ''
+          echo "None of the *Arrs, Bazarr and Jellyfin are enabled in your configuration."
+          echo "Please enable at least one of them and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        plan-transcodes)
+          ${
+        if nixarr.jellyfin.enable && nixarr.jellyfin.api.enable && nixarr.jellyfin.transcodePlanner.clientProfiles != {}
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-plan-transcodes \
+            --profiles ${nixarr.jellyfin.transcodePlanner.profilesFile} \
+            ${strings.optionalString nixarr.jellyfin.transcodeTelemetry.enable "--telemetry-db ${nixarr.jellyfin.transcodeTelemetry.dbPath}"} \
+            --services "${plan-transcodes-services}" \
+            "$@"
+        ''
+        else ''
+          echo "The Jellyfin API or client profiles are not configured."
+          echo "Please set config.nixarr.jellyfin.api.enable = true; and config.nixarr.jellyfin.transcodePlanner.clientProfiles, and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        profile-jellyfin-scan)
+          ${
+        if nixarr.jellyfin.enable && nixarr.jellyfin.api.enable
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-profile-jellyfin-scan --store "${nixarr.stateDir}/jellyfin-scan-profiles.jsonl" "$@"
+        ''
+        else ''
+          echo "The Jellyfin API is not enabled in your configuration."
+          echo "Please set config.nixarr.jellyfin.api.enable = true; and rebuild your configuration to use this command."
+          exit 1
+        ''
+      }
+          ;;
+        log-report)
+          ${
+        if nixarr.logAnalyzer.enable
+        then ''
+          if [ "$EUID" -ne 0 ]; then
+            echo "Please run as root"
+            exit 1
+          fi
+          nixarr-log-analyzer --state-file /var/lib/nixarr-log-analyzer/state.json report "$@"
+        ''
+        else ''
+          echo "The log analyzer is not enabled in your configuration."
+          echo "Please set config.nixarr.logAnalyzer.enable = true; and rebuild your configuration to use this command."
+          exit 1
+        ''
       }
           ;;
         -h|--help)
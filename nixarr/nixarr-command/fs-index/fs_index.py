@@ -0,0 +1,105 @@
+from pathlib import Path
+import argparse
+import logging
+import os
+import sys
+import time
+
+from nixarr_py.fs_index import FsIndex, parse_size
+from nixarr_py.utils import format_size
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def default_db_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "nixarr" / "fs-index.sqlite"
+
+
+def refresh(index: FsIndex, path: str, args: argparse.Namespace) -> None:
+    if args.no_refresh:
+        return
+    start = time.monotonic()
+    stats = index.refresh(path, full=args.full)
+    logger.info(
+        f"Refreshed index of {path} in {time.monotonic() - start:.2f}s: "
+        f"{stats.dirs_rescanned}/{stats.dirs_checked} directories rescanned, "
+        f"{stats.files_indexed} files indexed, {stats.files_restated} re-stat'ed, "
+        f"{stats.dirs_removed} directories removed"
+    )
+
+
+def print_sizes(rows: list[tuple[str, int]], args: argparse.Namespace) -> None:
+    if args.sort == "path":
+        rows = sorted(rows)
+    if args.reverse:
+        rows = list(reversed(rows))
+    for path, size in rows:
+        print(f"{format_size(size)}\t{path}")
+
+
+def main(args: argparse.Namespace) -> None:
+    with FsIndex(args.db) as index:
+        refresh(index, args.path, args)
+        if args.command == "list-unlinked":
+            rows = list(index.unlinked(args.path, min_size=args.min_size))
+        else:
+            rows = index.du(args.path, min_size=args.min_size)
+    print_sizes(rows, args)
+
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--db",
+        type=Path,
+        default=default_db_path(),
+        help="Path of the index database (default: %(default)s).",
+    )
+    common.add_argument(
+        "--min-size",
+        type=parse_size,
+        default=0,
+        help="Only show entries at least this large, e.g. 500M or 2G.",
+    )
+    common.add_argument(
+        "--sort",
+        choices=["size", "path"],
+        default="size",
+        help="Sort order of the output (default: %(default)s).",
+    )
+    common.add_argument(
+        "--reverse",
+        action="store_true",
+        help="Reverse the sort order.",
+    )
+    common.add_argument(
+        "--no-refresh",
+        action="store_true",
+        help="Answer from the index as it is, without checking for changes.",
+    )
+    common.add_argument(
+        "--full",
+        action="store_true",
+        help="Rescan every directory, not just those whose mtime changed.",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Query a persistent, incrementally refreshed file index"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_unlinked = subparsers.add_parser(
+        "list-unlinked",
+        parents=[common],
+        help="List files with a single link (i.e. not hardlinked).",
+    )
+    list_unlinked.add_argument("path", help="Directory to search.")
+    du = subparsers.add_parser(
+        "du",
+        parents=[common],
+        help="Show the apparent size of a directory and its subdirectories.",
+    )
+    du.add_argument("path", help="Directory to summarize.")
+    main(parser.parse_args())
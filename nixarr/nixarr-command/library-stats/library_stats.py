@@ -0,0 +1,118 @@
+import argparse
+import logging
+import sys
+import time
+
+from nixarr_py.library_analytics import (
+    CATEGORICAL_COLUMNS,
+    SERVICES,
+    fetch_library_files,
+    format_groups,
+    format_histogram,
+)
+from nixarr_py.utils import format_size
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def parse_criteria(values: list[str]) -> dict[str, list[str]]:
+    """Parse `column=label[,label...]` arguments into mask criteria."""
+    criteria: dict[str, list[str]] = {}
+    for value in values:
+        column, sep, labels = value.partition("=")
+        if not sep or column not in CATEGORICAL_COLUMNS:
+            raise argparse.ArgumentTypeError(
+                f"Expected <column>=<label>[,<label>...] with column one of {', '.join(CATEGORICAL_COLUMNS)}, got '{value}'"
+            )
+        criteria.setdefault(column, []).extend(labels.split(","))
+    return criteria
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report storage use and bitrates of the Radarr and Sonarr libraries, and what-if savings"
+    )
+    parser.add_argument(
+        "--services",
+        type=lambda value: value.split(","),
+        default=SERVICES,
+        help=f"Comma-separated services whose files to analyze (default: {','.join(SERVICES)}).",
+    )
+    parser.add_argument(
+        "--group-by",
+        action="append",
+        choices=CATEGORICAL_COLUMNS,
+        help="Column to report per-label statistics for; repeatable (default: quality and profile).",
+    )
+    parser.add_argument(
+        "--where",
+        action="append",
+        default=[],
+        metavar="COLUMN=LABEL[,LABEL...]",
+        help="Only analyze files matching this; repeatable, combined with 'and'.",
+    )
+    parser.add_argument(
+        "--drop",
+        action="append",
+        default=[],
+        metavar="COLUMN=LABEL[,LABEL...]",
+        help="Report the space deleting the matching files would free; repeatable, combined with 'and'.",
+    )
+    parser.add_argument(
+        "--cap-mbps",
+        type=float,
+        action="append",
+        default=[],
+        help="Report the space re-encoding files above this bitrate (in Mb/s) down to it would save; repeatable.",
+    )
+    parser.add_argument(
+        "--histogram-bins",
+        type=int,
+        default=12,
+        help="Number of bitrate histogram bins; 0 to skip the histogram.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of API requests in flight at once.",
+    )
+    args = parser.parse_args()
+    try:
+        where = parse_criteria(args.where)
+        drop = parse_criteria(args.drop)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    files = fetch_library_files(args.services, max_workers=args.concurrency)
+    start = time.monotonic()
+    selected = files.mask(**where)
+    total = int(files.size[selected].sum())
+    print(f"{int(selected.sum())} files, {format_size(total)}")
+    for column in args.group_by or ["quality", "profile"]:
+        print()
+        print(format_groups(column, files.group_by(column, selected)))
+    if args.histogram_bins > 0:
+        print()
+        counts, edges = files.bitrate_histogram(args.histogram_bins, selected)
+        print(format_histogram(counts, edges))
+    if drop:
+        dropped = selected & files.mask(**drop)
+        size = int(files.size[dropped].sum())
+        share = size / total if total else 0
+        print()
+        print(
+            f"Dropping {int(dropped.sum())} files would free {format_size(size)} ({share:.1%})"
+        )
+    if args.cap_mbps and not drop:
+        print()
+    for max_mbps in args.cap_mbps:
+        count, saved = files.savings_if_capped(max_mbps, selected)
+        share = saved / total if total else 0
+        print(
+            f"Re-encoding {count} files to at most {max_mbps:g} Mb/s would save {format_size(saved)} ({share:.1%})"
+        )
+    elapsed = time.monotonic() - start
+    logger.info(f"Analyzed {len(files)} files in {elapsed * 1000:.0f}ms")
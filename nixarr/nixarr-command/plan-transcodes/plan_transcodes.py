@@ -0,0 +1,93 @@
+from pathlib import Path
+import argparse
+import json
+import logging
+import sys
+
+from nixarr_py.jellyfin_transcode_planner import (
+    ClientProfile,
+    fetch_media,
+    format_plan,
+    plan,
+    plan_to_json,
+    read_play_counts,
+    tag_planned,
+)
+from nixarr_py.utils import atomic_write_json
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Predict which Jellyfin items will be transcoded for which clients, most played first"
+    )
+    parser.add_argument(
+        "--profiles",
+        type=Path,
+        required=True,
+        help="JSON file with a list of client profiles: what groups of clients can direct play.",
+    )
+    parser.add_argument(
+        "--telemetry-db",
+        type=Path,
+        help="Transcode telemetry database to rank items by their plays on affected clients.",
+    )
+    parser.add_argument(
+        "--since-days",
+        type=float,
+        default=90,
+        help="Only count plays from the last this many days.",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=100,
+        help="Number of items in the queue.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write the queue as JSON to this file, e.g. for a pre-transcoding tool.",
+    )
+    parser.add_argument(
+        "--tag",
+        help="Make this Radarr and Sonarr tag mark exactly the queued movies and series.",
+    )
+    parser.add_argument(
+        "--services",
+        type=lambda value: value.split(","),
+        default=["radarr", "sonarr"],
+        help="Comma-separated services to tag in.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only log how tags would change.",
+    )
+    args = parser.parse_args()
+
+    profiles = [
+        ClientProfile(**profile) for profile in json.loads(args.profiles.read_text())
+    ]
+    plays = None
+    if args.telemetry_db is not None and args.telemetry_db.exists():
+        plays = read_play_counts(args.telemetry_db, args.since_days)
+    elif args.telemetry_db is not None:
+        logger.warning(
+            f"No telemetry database at {args.telemetry_db}; not ranking by plays"
+        )
+
+    media, series_provider_ids = fetch_media()
+    planned = plan(media, profiles, plays)
+    logger.info(
+        f"{len(planned)} of {len(media)} items can't be direct played by every profile"
+    )
+    queue = planned[: args.limit]
+    print(format_plan(queue))
+    if args.output is not None:
+        atomic_write_json(args.output, plan_to_json(queue), indent=2)
+    if args.tag:
+        tag_planned(queue, series_provider_ids, args.services, args.tag, args.dry_run)
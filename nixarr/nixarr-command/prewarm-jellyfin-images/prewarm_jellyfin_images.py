@@ -0,0 +1,76 @@
+from pathlib import Path
+import argparse
+import logging
+import os
+import sys
+
+from nixarr_py.jellyfin_image_prewarm import (
+    DEFAULT_ITEM_TYPES,
+    DEFAULT_SIZES,
+    ImagePrewarmer,
+    parse_image_size,
+)
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def default_state_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "nixarr" / "jellyfin-image-prewarm.json"
+
+
+if __name__ == "__main__":
+    default_sizes = [
+        f"{size.image_type}:{size.fill_width}x{size.fill_height}"
+        for size in DEFAULT_SIZES
+    ]
+    parser = argparse.ArgumentParser(
+        description="Warm Jellyfin's image cache by requesting every library item's images at the sizes clients use"
+    )
+    parser.add_argument(
+        "--size",
+        dest="sizes",
+        action="append",
+        type=parse_image_size,
+        help=f"Image type and size to request, e.g. Primary:300x450. Can be repeated (default: {' '.join(default_sizes)}).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of image requests in flight at once (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--max-load",
+        type=float,
+        help="Pause while the 1-minute load average is above this value.",
+    )
+    parser.add_argument(
+        "--item-types",
+        type=lambda value: value.split(","),
+        default=DEFAULT_ITEM_TYPES,
+        help=f"Comma-separated Jellyfin item types to warm (default: {','.join(DEFAULT_ITEM_TYPES)}).",
+    )
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        default=default_state_path(),
+        help="Path of the file recording progress, for resuming (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start from the first item instead of resuming.",
+    )
+    args = parser.parse_args()
+    if args.restart:
+        args.state_file.unlink(missing_ok=True)
+    ImagePrewarmer(
+        sizes=args.sizes or DEFAULT_SIZES,
+        state_file=args.state_file,
+        concurrency=args.concurrency,
+        max_load=args.max_load,
+        item_types=args.item_types,
+    ).run()
@@ -0,0 +1,95 @@
+from pathlib import Path
+import argparse
+import logging
+import sys
+
+from nixarr_py.jellyfin_scan_profiler import (
+    ProfileStore,
+    ScanProfiler,
+    format_comparison,
+    format_profile,
+)
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+def run(store: ProfileStore, args: argparse.Namespace) -> int:
+    profiler = ScanProfiler(
+        folder=args.library,
+        interval_secs=args.interval_secs,
+        timeout_secs=args.timeout_secs,
+    )
+    try:
+        profile = profiler.run(label=args.label)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    store.append(profile)
+    print(format_profile(profile))
+    return 0 if profile.finished else 1
+
+
+def compare(store: ProfileStore, args: argparse.Namespace) -> int:
+    profiles = store.load()
+    if args.library is not None:
+        profiles = [p for p in profiles if p.folder == args.library]
+    first = max(len(profiles) - args.last, 0)
+    profiles = profiles[first:]
+    if not profiles:
+        logger.info(f"No scan profiles in {store.path}")
+        return 0
+    print(format_comparison(profiles))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Profile Jellyfin library scans, and compare runs across versions and hardware"
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        required=True,
+        help="JSON lines file to record scan profiles in.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Trigger a scan and profile it.")
+    run_parser.add_argument(
+        "--library",
+        help="Only scan this library (by name), e.g. for quick A/B tests.",
+    )
+    run_parser.add_argument(
+        "--label",
+        help="A label to tell this run apart in comparisons, e.g. the change being tested.",
+    )
+    run_parser.add_argument(
+        "--interval-secs",
+        type=float,
+        default=2,
+        help="Time between samples.",
+    )
+    run_parser.add_argument(
+        "--timeout-secs",
+        type=float,
+        help="Stop following the scan after this long; the run is recorded as unfinished.",
+    )
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare recorded runs.")
+    compare_parser.add_argument(
+        "--library",
+        help="Only compare scans of this library.",
+    )
+    compare_parser.add_argument(
+        "--last",
+        type=int,
+        default=20,
+        help="Number of most recent runs to compare.",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(ProfileStore(args.store), args))
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Any, Union
 from nixarr_py.clients import prowlarr_client
+from nixarr_py.schema_validation import snapshot_schemas
 import prowlarr
 import json
 import argparse
@@ -43,6 +44,23 @@ def main(client: prowlarr.ApiClient, kind: str) -> None:
             schema.model_dump()
             for schema in prowlarr.NotificationApi(client).list_notification_schema()
         ]
+    elif kind == "snapshot":
+        schema = snapshot_schemas(
+            "prowlarr",
+            {
+                "application": [
+                    schema.model_dump()
+                    for schema in prowlarr.ApplicationApi(
+                        client
+                    ).list_applications_schema()
+                ],
+                "indexer": [
+                    schema.model_dump()
+                    for schema in prowlarr.IndexerApi(client).list_indexer_schema()
+                ],
+            },
+            prowlarr.SystemApi(client).get_system_status().version,
+        )
     else:
         raise ValueError(f"Unknown schema kind: {kind}")
 
@@ -62,8 +80,9 @@ if __name__ == "__main__":
             "indexer",
             "indexer_proxy",
             "notification",
+            "snapshot",
         ],
-        help="Kind of schema to fetch",
+        help="Kind of schema to fetch. `snapshot` prints the schemas settings-sync uses, reduced to what build-time validation needs.",
     )
     args = parser.parse_args()
     with prowlarr_client() as client:
@@ -1,5 +1,6 @@
 from typing import Any, Union
 from nixarr_py.clients import radarr_client
+from nixarr_py.schema_validation import snapshot_schemas
 import radarr
 import json
 import argparse
@@ -12,6 +13,19 @@ def main(client: radarr.ApiClient, kind: str) -> None:
             schema.model_dump()
             for schema in radarr.DownloadClientApi(client).list_download_client_schema()
         ]
+    elif kind == "snapshot":
+        schema = snapshot_schemas(
+            "radarr",
+            {
+                "download_client": [
+                    schema.model_dump()
+                    for schema in radarr.DownloadClientApi(
+                        client
+                    ).list_download_client_schema()
+                ],
+            },
+            radarr.SystemApi(client).get_system_status().version,
+        )
     else:
         raise ValueError(f"Unknown schema kind: {kind}")
     print(json.dumps(schema, sort_keys=True))
@@ -25,8 +39,9 @@ if __name__ == "__main__":
         "kind",
         choices=[
             "download_client",
+            "snapshot",
         ],
-        help="Kind of schema to fetch",
+        help="Kind of schema to fetch. `snapshot` prints the schemas settings-sync uses, reduced to what build-time validation needs.",
     )
     args = parser.parse_args()
     with radarr_client() as client:
@@ -0,0 +1,44 @@
+from pathlib import Path
+import argparse
+import sys
+
+from nixarr_py.jellyfin_transcode_telemetry import (
+    GROUP_COLUMNS,
+    TelemetryStore,
+    format_summary,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Summarize recorded Jellyfin playbacks: how often they were transcoded, and how fast"
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        required=True,
+        help="Path to the transcode telemetry database.",
+    )
+    parser.add_argument(
+        "--by",
+        choices=[*GROUP_COLUMNS, "reason"],
+        action="append",
+        help="Group playbacks by this; repeatable (default: client, codec and library).",
+    )
+    parser.add_argument(
+        "--since-days",
+        type=float,
+        default=30,
+        help="Only include playbacks started in the last this many days.",
+    )
+    args = parser.parse_args()
+    if not args.db.exists():
+        print(f"No telemetry recorded yet at {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    store = TelemetryStore(args.db, read_only=True)
+    tables = [
+        format_summary(store.summary(group_by, since_days=args.since_days), group_by)
+        for group_by in args.by or ["client", "codec", "library"]
+    ]
+    print("\n\n".join(tables))
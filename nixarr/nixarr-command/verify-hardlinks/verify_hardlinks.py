@@ -0,0 +1,93 @@
+import argparse
+import logging
+import sys
+
+from nixarr_py.hardlinks import (
+    SERVICES,
+    VerifyStats,
+    directory_files,
+    find_copies,
+    library_files,
+    relink,
+    torrent_files,
+)
+from nixarr_py.utils import format_size
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find *arr imports that were copied instead of hardlinked from their downloads"
+    )
+    parser.add_argument(
+        "--services",
+        type=lambda value: value.split(","),
+        default=SERVICES,
+        help=f"Comma-separated services whose library files to check (default: {','.join(SERVICES)}).",
+    )
+    parser.add_argument(
+        "--transmission",
+        action="store_true",
+        help="Take the download files from Transmission's torrents.",
+    )
+    parser.add_argument(
+        "--downloads-dir",
+        action="append",
+        default=[],
+        help="Take the download files from this directory; repeatable.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Maximum number of stat calls and API requests in flight at once.",
+    )
+    parser.add_argument(
+        "--relink",
+        action="store_true",
+        help="Replace copies with hardlinks to their downloads, if their contents are identical.",
+    )
+    args = parser.parse_args()
+    if not args.transmission and not args.downloads_dir:
+        parser.error("Give --transmission and/or --downloads-dir")
+
+    downloads = torrent_files() if args.transmission else []
+    for path in args.downloads_dir:
+        downloads += directory_files(path)
+    library = library_files(args.services, max_workers=min(args.concurrency, 8))
+
+    stats = VerifyStats()
+    copies = find_copies(library, downloads, max_workers=args.concurrency, stats=stats)
+    for copy in copies:
+        notes = []
+        if not copy.confirmed:
+            notes.append("possible copy, same size only")
+        if not copy.same_device:
+            notes.append("different filesystem")
+        note = f" ({', '.join(notes)})" if notes else ""
+        print(
+            f"{copy.service}\t{format_size(copy.size)}\t{copy.library_path}\t{copy.download_path}{note}"
+        )
+    logger.info(
+        f"{stats.library_files} library files, {stats.download_files} download files: "
+        f"{stats.hardlinked} hardlinked, {stats.copied} copied ({format_size(stats.copied_bytes)}), "
+        f"{stats.possibly_copied} possibly copied ({format_size(stats.possibly_copied_bytes)}), "
+        f"{stats.missing} missing on disk"
+    )
+
+    # Only copies confirmed by their file name, or by their contents when
+    # relinking, fail the run; a download of the same size may be unrelated.
+    if args.relink:
+        relinked = [copy for copy in copies if relink(copy)]
+        saved = sum(copy.size for copy in relinked)
+        logger.info(f"Relinked {len(relinked)} files, freeing {format_size(saved)}")
+        not_relinked = sum(copy.confirmed for copy in copies) - sum(
+            copy.confirmed for copy in relinked
+        )
+        if not_relinked:
+            logger.warning(f"{not_relinked} copies were not relinked")
+        sys.exit(1 if not_relinked else 0)
+    sys.exit(1 if stats.copied else 0)
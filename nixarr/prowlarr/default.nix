@@ -10,7 +10,7 @@ with lib; let
   nixarr = config.nixarr;
   port = 9696;
 in {
-  imports = [./settings-sync];
+  imports = [./settings-sync ./indexer-health];
 
   options.nixarr.prowlarr = {
     enable = mkOption {
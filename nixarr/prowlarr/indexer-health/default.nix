@@ -0,0 +1,159 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    concatStringsSep
+    getExe
+    mkIf
+    mkOption
+    optional
+    optionals
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.prowlarr.indexer-health;
+
+  indexer-health = writePython3Bin "nixarr-prowlarr-indexer-health" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./indexer_health.py);
+in {
+  options.nixarr.prowlarr.indexer-health = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to periodically compute per-indexer p50/p95 response times,
+        failure rates and grab yield from Prowlarr's history and statistics.
+
+        If [`nixarr.exporters.enable`](#nixarr.exporters.enable) is set, the
+        results are exported as `nixarr_prowlarr_indexer_*` metrics through
+        the node exporter. Run `nixarr-prowlarr-indexer-health --report` for
+        a table.
+      '';
+    };
+
+    interval = mkOption {
+      type = types.str;
+      default = "*:0/15";
+      description = "How often to collect statistics, as a systemd calendar expression.";
+    };
+
+    windows = mkOption {
+      type = with types; nonEmptyListOf ints.positive;
+      default = [3600 86400];
+      description = ''
+        Sliding windows to compute statistics over, in seconds. The first one
+        is used for gating.
+      '';
+    };
+
+    gate = {
+      mode = mkOption {
+        type = types.enum ["off" "deprioritize" "disable"];
+        default = "off";
+        description = ''
+          What to do with indexers that stay slow or failing: nothing, lower
+          their priority to 50 (restored once they recover), or disable them
+          (re-enabled after
+          [`disableCooldownSecs`](#nixarr.prowlarr.indexer-health.gate.disableCooldownSecs)
+          to measure them again).
+        '';
+      };
+
+      slowP95Ms = mkOption {
+        type = types.ints.positive;
+        default = 10000;
+        description = "An indexer is slow if its p95 response time is above this.";
+      };
+
+      recoverP95Ms = mkOption {
+        type = types.ints.positive;
+        default = 5000;
+        description = ''
+          A gated indexer has recovered if its p95 response time is below
+          this. Keep it well below `slowP95Ms`, so indexers near the threshold
+          don't flap.
+        '';
+      };
+
+      maxFailureRate = mkOption {
+        type = types.numbers.between 0 1;
+        default = 0.2;
+        description = "An indexer is slow if more than this fraction of its queries failed.";
+      };
+
+      slowRuns = mkOption {
+        type = types.ints.positive;
+        default = 3;
+        description = "Consecutive slow runs before an indexer is gated.";
+      };
+
+      recoverRuns = mkOption {
+        type = types.ints.positive;
+        default = 3;
+        description = "Consecutive recovered runs before a deprioritized indexer is restored.";
+      };
+
+      disableCooldownSecs = mkOption {
+        type = types.ints.positive;
+        default = 6 * 3600;
+        description = "How long disabled indexers stay disabled before they are tried again.";
+      };
+    };
+  };
+
+  config = mkIf (nixarr.enable && nixarr.prowlarr.enable && cfg.enable) {
+    environment.systemPackages = [indexer-health];
+
+    systemd.services.nixarr-prowlarr-indexer-health = {
+      description = "Collect Prowlarr indexer health statistics";
+      after = ["prowlarr-api.service"];
+      wants = ["prowlarr-api.service"];
+      serviceConfig = {
+        Type = "oneshot";
+        DynamicUser = true;
+        StateDirectory = "nixarr-prowlarr-indexer-health";
+        SupplementaryGroups =
+          ["prowlarr-api"]
+          ++ optional nixarr.exporters.enable "nixarr-metrics";
+        ExecStart = concatStringsSep " " (
+          [
+            (getExe indexer-health)
+            "--windows-secs ${concatStringsSep "," (map toString cfg.windows)}"
+          ]
+          ++ optional nixarr.exporters.enable
+          "--metrics-file ${nixarr.exporters.textfileDir}/prowlarr-indexers.prom"
+          ++ optionals (cfg.gate.mode != "off") [
+            "--gate ${cfg.gate.mode}"
+            "--state-file /var/lib/nixarr-prowlarr-indexer-health/gate.json"
+            "--slow-p95-ms ${toString cfg.gate.slowP95Ms}"
+            "--recover-p95-ms ${toString cfg.gate.recoverP95Ms}"
+            "--max-failure-rate ${toString cfg.gate.maxFailureRate}"
+            "--slow-runs ${toString cfg.gate.slowRuns}"
+            "--recover-runs ${toString cfg.gate.recoverRuns}"
+            "--disable-cooldown-secs ${toString cfg.gate.disableCooldownSecs}"
+          ]
+        );
+      };
+    };
+
+    systemd.timers.nixarr-prowlarr-indexer-health = {
+      wantedBy = ["timers.target"];
+      timerConfig.OnCalendar = cfg.interval;
+    };
+  };
+}
@@ -0,0 +1,120 @@
+from pathlib import Path
+import argparse
+import logging
+import sys
+
+from nixarr_py.prowlarr_indexer_health import (
+    GatePolicy,
+    IndexerGate,
+    collect_indexer_health,
+    format_prometheus,
+    format_report,
+)
+from nixarr_py.utils import write_prometheus
+
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report Prowlarr indexer response times, failure rates and grab yield, and optionally gate slow indexers"
+    )
+    parser.add_argument(
+        "--windows-secs",
+        type=lambda value: [int(secs) for secs in value.split(",")],
+        default=[3600, 86400],
+        help="Comma-separated sliding windows to compute statistics over, in seconds (default: 3600,86400). The first one is used for gating.",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Print a report table to stdout.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Write Prometheus metrics to this file, e.g. for the node exporter's textfile collector.",
+    )
+    parser.add_argument(
+        "--gate",
+        choices=["deprioritize", "disable"],
+        help="Gate indexers that stay slow by lowering their priority or disabling them.",
+    )
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        help="Path to the file keeping gating counters between runs. Required with --gate.",
+    )
+    parser.add_argument(
+        "--slow-p95-ms",
+        type=float,
+        default=10000,
+        help="An indexer is slow if its p95 response time is above this.",
+    )
+    parser.add_argument(
+        "--recover-p95-ms",
+        type=float,
+        default=5000,
+        help="A gated indexer has recovered if its p95 response time is below this.",
+    )
+    parser.add_argument(
+        "--max-failure-rate",
+        type=float,
+        default=0.2,
+        help="An indexer is slow if more than this fraction of its queries failed.",
+    )
+    parser.add_argument(
+        "--slow-runs",
+        type=int,
+        default=3,
+        help="Consecutive slow runs before an indexer is gated.",
+    )
+    parser.add_argument(
+        "--recover-runs",
+        type=int,
+        default=3,
+        help="Consecutive recovered runs before a deprioritized indexer is restored.",
+    )
+    parser.add_argument(
+        "--min-samples",
+        type=int,
+        default=10,
+        help="Minimum number of uncached queries in the window for a run to count.",
+    )
+    parser.add_argument(
+        "--disable-cooldown-secs",
+        type=float,
+        default=6 * 3600,
+        help="How long disabled indexers stay disabled before they are tried again.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Log what would be gated or ungated without changing anything.",
+    )
+    args = parser.parse_args()
+    if args.gate and args.state_file is None:
+        parser.error("--gate requires --state-file")
+
+    health = collect_indexer_health(args.windows_secs)
+    if args.report:
+        print(format_report(health))
+    if args.metrics_file is not None:
+        write_prometheus(format_prometheus(health), args.metrics_file)
+    if args.gate:
+        policy = GatePolicy(
+            mode=args.gate,
+            slow_p95_ms=args.slow_p95_ms,
+            max_failure_rate=args.max_failure_rate,
+            recover_p95_ms=args.recover_p95_ms,
+            slow_runs=args.slow_runs,
+            recover_runs=args.recover_runs,
+            min_samples=args.min_samples,
+            disable_cooldown_secs=args.disable_cooldown_secs,
+        )
+        gate = IndexerGate(policy, args.state_file, dry_run=args.dry_run)
+        actions = gate.apply(health, window_secs=args.windows_secs[0])
+        if not actions:
+            logger.info("No indexers gated or ungated")
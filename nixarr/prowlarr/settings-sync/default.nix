@@ -13,6 +13,7 @@
     mkDefault
     mkIf
     mkOption
+    optionalString
     toSentenceCase
     types
     ;
@@ -34,6 +35,7 @@
     arrServiceNames
     mkArrLocalUrl
     toKebabSentenceCase
+    validateSyncConfig
     ;
 
   nixarr-py = nixarr.nixarr-py.package;
@@ -259,7 +261,6 @@ in {
     nixarr.prowlarr.settings-sync = {
       # TODO: add sync interval?
       # TODO: allow configuring whether to overwrite existing items?
-      # TODO: allow *deleting* items not in the config?
 
       enable-nixarr-apps = mkOption {
         type = types.bool;
@@ -293,6 +294,40 @@ in {
         '';
       };
 
+      delete-unmanaged-apps = mkOption {
+        type = types.bool;
+        default = false;
+        description = ''
+          Whether to delete applications in Prowlarr that aren't configured
+          here (including Nixarr-managed applications whose sync is disabled).
+        '';
+      };
+
+      delete-unmanaged-indexers = mkOption {
+        type = types.bool;
+        default = false;
+        description = ''
+          Whether to delete indexers in Prowlarr that aren't configured in
+          `indexers`.
+        '';
+      };
+
+      schema-snapshot = mkOption {
+        type = with types; nullOr path;
+        default = null;
+        example = literalExpression "./prowlarr-schemas.json";
+        description = ''
+          A snapshot of Prowlarr's application and indexer schemas, from
+          `nixarr show-prowlarr-schemas snapshot > prowlarr-schemas.json` (run
+          as root). If set, the sync config is checked against it while
+          building, so unknown implementations or `sort_name`s and mistyped
+          properties or `fields` fail the build instead of the sync service.
+          The sync service only checks the config again if Prowlarr's version
+          differs from the snapshot's, so update the snapshot when upgrading
+          Prowlarr.
+        '';
+      };
+
       indexers = mkOption {
         type = with types; listOf indexerConfigType;
         default = [];
@@ -337,13 +372,26 @@ in {
         Group = "prowlarr";
         RemainAfterExit = true;
         ExecStart = let
-          config-file = writeJSON "prowlarr-sync-config.json" {
+          config-json = writeJSON "prowlarr-sync-config.json" {
             tag_labels = cfg.tags;
             app_configs = cfg.apps ++ nixarrAppConfigs;
             indexer_configs = cfg.indexers;
+            delete_unmanaged_apps = cfg.delete-unmanaged-apps;
+            delete_unmanaged_indexers = cfg.delete-unmanaged-indexers;
           };
+          config-file =
+            if cfg.schema-snapshot == null
+            then config-json
+            else
+              validateSyncConfig {
+                service = "prowlarr";
+                configFile = config-json;
+                schemaSnapshot = cfg.schema-snapshot;
+              };
         in ''
-          ${getExe sync-settings} --config-file ${config-file}
+          ${getExe sync-settings} \
+            --config-file ${config-file} \
+            --fingerprint-file '${nixarr.prowlarr.stateDir}/settings-sync.fingerprint' ${optionalString (cfg.schema-snapshot != null) "--schema-snapshot ${cfg.schema-snapshot}"}
         '';
       };
     };
@@ -1,11 +1,27 @@
+from functools import partial
 from typing import Any, Optional
 import argparse
 import prowlarr
 import pydantic
 import pathlib
+import json
 import logging
 from nixarr_py.clients import prowlarr_client
-from nixarr_py.utils import apply_config
+from nixarr_py.schema_validation import needs_runtime_validation
+from nixarr_py.commands import CommandBatch
+from nixarr_py.tracing import add_tracing_arguments, span, traced_run
+from nixarr_py.utils import (
+    apply_config,
+    bulk_changes,
+    bulk_properties,
+    fingerprint_matches,
+    group_bulk_changes,
+    is_bulk_unsupported,
+    log_connection_test_report,
+    run_connection_tests,
+    sync_fingerprint,
+    write_fingerprint,
+)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -41,30 +57,44 @@ class SettingsSyncConfig(pydantic.BaseModel):
     tag_labels: list[str] = []
     app_configs: list[App] = []
     indexer_configs: list[Indexer] = []
+    delete_unmanaged_apps: bool = False
+    delete_unmanaged_indexers: bool = False
 
     model_config = pydantic.ConfigDict(extra="forbid")
 
 
 def sync_tags(tag_labels: list[str], api_client: prowlarr.ApiClient) -> None:
     tag_api = prowlarr.TagApi(api_client)
-    existing_tags = tag_api.list_tag()
+    with span("fetch tags", category="fetch"):
+        existing_tags = tag_api.list_tag()
     existing_tag_labels = {tag.label for tag in existing_tags}
 
     for label in tag_labels:
         if label in existing_tag_labels:
             continue
         logger.info(f"Creating tag '{label}'")
-        tag_api.create_tag(prowlarr.TagResource(label=label))
+        with span("create tag", category="write", label=label):
+            tag_api.create_tag(prowlarr.TagResource(label=label))
 
 
-def sync_apps(app_configs: list[App], api_client: prowlarr.ApiClient) -> None:
+def sync_apps(
+    app_configs: list[App],
+    delete_unmanaged: bool,
+    api_client: prowlarr.ApiClient,
+    validate: bool = True,
+) -> None:
     tag_api = prowlarr.TagApi(api_client)
     app_api = prowlarr.ApplicationApi(api_client)
-    tags_by_label = {tag.label: tag for tag in tag_api.list_tag()}
-    apps_by_name = {app.name: app for app in app_api.list_applications()}
-    schemas_by_implementation = {
-        schema.implementation: schema for schema in app_api.list_applications_schema()
-    }
+    with span("fetch tags", category="fetch"):
+        tags_by_label = {tag.label: tag for tag in tag_api.list_tag()}
+    with span("fetch apps", category="fetch"):
+        apps_by_name = {app.name: app for app in app_api.list_applications()}
+    with span("load app schemas", category="schema"):
+        schemas = app_api.list_applications_schema()
+    schemas_by_implementation = {schema.implementation: schema for schema in schemas}
+    app_bulk_properties = bulk_properties(prowlarr.ApplicationBulkResource)
+    managed_ids: set[int] = set()
+    bulk_updates: dict[int, dict[str, Any]] = {}
     for user_cfg in app_configs:
         logger.info(f"Syncing app '{user_cfg.name}'")
         if user_cfg.name in apps_by_name:
@@ -79,28 +109,93 @@ def sync_apps(app_configs: list[App], api_client: prowlarr.ApiClient) -> None:
         user_dict = user_cfg.model_dump(exclude={"tags"})
         user_dict["tags"] = [tags_by_label[label].id for label in user_cfg.tags]
         arr_dict = app.model_dump()
-        apply_config(user_src=user_dict, arr_dst=arr_dict)
-        app = prowlarr.ApplicationResource.model_validate(arr_dict)
+        with span("apply_config", category="apply", app=user_cfg.name):
+            apply_config(user_src=user_dict, arr_dst=arr_dict, validate=validate)
         if insert_or_update == "insert":
-            app_api.create_applications(application_resource=app)
-        else:
-            app_api.update_applications(id=str(app.id), application_resource=app)
+            app = prowlarr.ApplicationResource.model_validate(arr_dict)
+            with span("create app", category="write", app=user_cfg.name):
+                app_api.create_applications(force_save=True, application_resource=app)
+            continue
+        managed_ids.add(app.id)
+        changes = bulk_changes(
+            current=app.model_dump(),
+            desired=arr_dict,
+            bulk_properties=app_bulk_properties,
+        )
+        if changes is None:
+            app = prowlarr.ApplicationResource.model_validate(arr_dict)
+            with span("update app", category="write", app=user_cfg.name):
+                app_api.update_applications(
+                    id=str(app.id), force_save=True, application_resource=app
+                )
+        elif changes:
+            bulk_updates[app.id] = changes
+
+    apps_by_id = {app.id: app for app in apps_by_name.values()}
+    for changes, ids in group_bulk_changes(bulk_updates):
+        logger.info(f"Bulk-updating {len(ids)} app(s): {', '.join(sorted(changes))}")
+        bulk = prowlarr.ApplicationBulkResource.model_validate(
+            {"ids": ids, "apply_tags": prowlarr.ApplyTags.REPLACE, **changes}
+        )
+        try:
+            with span("bulk-update apps", category="write", count=len(ids)):
+                app_api.put_applications_bulk(application_bulk_resource=bulk)
+        except prowlarr.ApiException as e:
+            if not is_bulk_unsupported(e):
+                raise
+            for item_id in ids:
+                app = apps_by_id[item_id].model_copy(update=changes)
+                with span("update app", category="write", app=app.name):
+                    app_api.update_applications(
+                        id=str(item_id), force_save=True, application_resource=app
+                    )
+
+    if not delete_unmanaged:
+        return
+    unmanaged = [app for app in apps_by_id.values() if app.id not in managed_ids]
+    if not unmanaged:
+        return
+    logger.info(
+        f"Deleting unmanaged apps: {', '.join(repr(app.name) for app in unmanaged)}"
+    )
+    try:
+        with span("bulk-delete apps", category="write", count=len(unmanaged)):
+            app_api.delete_applications_bulk(
+                application_bulk_resource=prowlarr.ApplicationBulkResource(
+                    ids=[app.id for app in unmanaged]
+                )
+            )
+    except prowlarr.ApiException as e:
+        if not is_bulk_unsupported(e):
+            raise
+        for app in unmanaged:
+            with span("delete app", category="write", app=app.name):
+                app_api.delete_applications(id=app.id)
 
 
 def sync_indexers(
-    indexer_configs: list[Indexer], api_client: prowlarr.ApiClient
+    indexer_configs: list[Indexer],
+    delete_unmanaged: bool,
+    api_client: prowlarr.ApiClient,
+    validate: bool = True,
 ) -> None:
     tag_api = prowlarr.TagApi(api_client)
     indexer_api = prowlarr.IndexerApi(api_client)
     profiles_api = prowlarr.AppProfileApi(api_client)
-    tags_by_label = {tag.label: tag for tag in tag_api.list_tag()}
-    indexers_by_name = {indexer.name: indexer for indexer in indexer_api.list_indexer()}
-    schemas_by_sort_name = {
-        schema.sort_name: schema for schema in indexer_api.list_indexer_schema()
-    }
-    app_profiles_by_name = {
-        profile.name: profile.id for profile in profiles_api.list_app_profile()
-    }
+    with span("fetch tags", category="fetch"):
+        tags_by_label = {tag.label: tag for tag in tag_api.list_tag()}
+    with span("fetch indexers", category="fetch"):
+        indexers = indexer_api.list_indexer()
+    indexers_by_name = {indexer.name: indexer for indexer in indexers}
+    with span("load indexer schemas", category="schema"):
+        schemas = indexer_api.list_indexer_schema()
+    schemas_by_sort_name = {schema.sort_name: schema for schema in schemas}
+    with span("fetch app profiles", category="fetch"):
+        app_profiles = profiles_api.list_app_profile()
+    app_profiles_by_name = {profile.name: profile.id for profile in app_profiles}
+    indexer_bulk_properties = bulk_properties(prowlarr.IndexerBulkResource)
+    managed_ids: set[int] = set()
+    bulk_updates: dict[int, dict[str, Any]] = {}
     for user_cfg in indexer_configs:
         schema = schemas_by_sort_name[user_cfg.sort_name]
         if user_cfg.name is None:
@@ -119,18 +214,153 @@ def sync_indexers(
         user_dict["tags"] = [tags_by_label[label].id for label in user_cfg.tags]
         user_dict["app_profile_id"] = app_profiles_by_name[user_cfg.app_profile_name]
         arr_dict = indexer.model_dump()
-        apply_config(user_src=user_dict, arr_dst=arr_dict)
-        indexer = prowlarr.IndexerResource.model_validate(arr_dict)
+        with span("apply_config", category="apply", indexer=user_cfg.name):
+            apply_config(user_src=user_dict, arr_dst=arr_dict, validate=validate)
         if insert_or_update == "insert":
-            indexer_api.create_indexer(indexer_resource=indexer)
-        else:
-            indexer_api.update_indexer(id=str(indexer.id), indexer_resource=indexer)
+            indexer = prowlarr.IndexerResource.model_validate(arr_dict)
+            with span("create indexer", category="write", indexer=user_cfg.name):
+                indexer_api.create_indexer(force_save=True, indexer_resource=indexer)
+            continue
+        managed_ids.add(indexer.id)
+        changes = bulk_changes(
+            current=indexer.model_dump(),
+            desired=arr_dict,
+            bulk_properties=indexer_bulk_properties,
+        )
+        if changes is None:
+            indexer = prowlarr.IndexerResource.model_validate(arr_dict)
+            with span("update indexer", category="write", indexer=user_cfg.name):
+                indexer_api.update_indexer(
+                    id=str(indexer.id), force_save=True, indexer_resource=indexer
+                )
+        elif changes:
+            bulk_updates[indexer.id] = changes
 
+    indexers_by_id = {indexer.id: indexer for indexer in indexers_by_name.values()}
+    for changes, ids in group_bulk_changes(bulk_updates):
+        logger.info(
+            f"Bulk-updating {len(ids)} indexer(s): {', '.join(sorted(changes))}"
+        )
+        bulk = prowlarr.IndexerBulkResource.model_validate(
+            {"ids": ids, "apply_tags": prowlarr.ApplyTags.REPLACE, **changes}
+        )
+        try:
+            with span("bulk-update indexers", category="write", count=len(ids)):
+                indexer_api.put_indexer_bulk(indexer_bulk_resource=bulk)
+        except prowlarr.ApiException as e:
+            if not is_bulk_unsupported(e):
+                raise
+            for item_id in ids:
+                indexer = indexers_by_id[item_id].model_copy(update=changes)
+                with span("update indexer", category="write", indexer=indexer.name):
+                    indexer_api.update_indexer(
+                        id=str(item_id), force_save=True, indexer_resource=indexer
+                    )
+
+    if not delete_unmanaged:
+        return
+    unmanaged = [
+        indexer for indexer in indexers_by_id.values() if indexer.id not in managed_ids
+    ]
+    if not unmanaged:
+        return
+    logger.info(
+        f"Deleting unmanaged indexers: {', '.join(repr(indexer.name) for indexer in unmanaged)}"
+    )
+    try:
+        with span("bulk-delete indexers", category="write", count=len(unmanaged)):
+            indexer_api.delete_indexer_bulk(
+                indexer_bulk_resource=prowlarr.IndexerBulkResource(
+                    ids=[indexer.id for indexer in unmanaged]
+                )
+            )
+    except prowlarr.ApiException as e:
+        if not is_bulk_unsupported(e):
+            raise
+        for indexer in unmanaged:
+            with span("delete indexer", category="write", indexer=indexer.name):
+                indexer_api.delete_indexer(id=indexer.id)
 
-def main(config: SettingsSyncConfig, api_client: prowlarr.ApiClient) -> None:
-    sync_tags(config.tag_labels, api_client)
-    sync_apps(config.app_configs, api_client)
-    sync_indexers(config.indexer_configs, api_client)
+
+def sync_app_indexers(api_client: prowlarr.ApiClient, timeout: float) -> None:
+    # Push the synced indexers to all applications now and wait for it, so
+    # the connection tests and the apps see the final state.
+    batch = CommandBatch(api_client, "/api/v1")
+    batch.add("ApplicationIndexerSync")
+    batch.run(timeout_secs=timeout)
+
+
+def test_apps(
+    names: set[str], api_client: prowlarr.ApiClient, max_workers: int, timeout: float
+) -> None:
+    app_api = prowlarr.ApplicationApi(api_client)
+    with span("fetch apps", category="fetch"):
+        apps = app_api.list_applications()
+    tests = {
+        app.name: partial(
+            app_api.test_applications,
+            application_resource=app,
+            _request_timeout=timeout,
+        )
+        for app in apps
+        if app.name in names
+    }
+    with span("test apps", category="test", count=len(tests)):
+        results = run_connection_tests(tests, max_workers)
+    log_connection_test_report("app", results)
+
+
+def test_indexers(
+    names: set[str], api_client: prowlarr.ApiClient, max_workers: int, timeout: float
+) -> None:
+    indexer_api = prowlarr.IndexerApi(api_client)
+    with span("fetch indexers", category="fetch"):
+        indexers = indexer_api.list_indexer()
+    tests = {
+        indexer.name: partial(
+            indexer_api.test_indexer,
+            indexer_resource=indexer,
+            _request_timeout=timeout,
+        )
+        for indexer in indexers
+        if indexer.name in names and indexer.enable
+    }
+    with span("test indexers", category="test", count=len(tests)):
+        results = run_connection_tests(tests, max_workers)
+    log_connection_test_report("indexer", results)
+
+
+def main(
+    config: SettingsSyncConfig,
+    api_client: prowlarr.ApiClient,
+    test_concurrency: int,
+    test_timeout: float,
+    validate: bool = True,
+) -> None:
+    # Items are saved with forceSave, which skips the connection test Prowlarr
+    # otherwise runs inside each save request. We test them all afterwards.
+    with span("sync tags"):
+        sync_tags(config.tag_labels, api_client)
+    with span("sync apps"):
+        sync_apps(
+            config.app_configs, config.delete_unmanaged_apps, api_client, validate
+        )
+    with span("sync indexers"):
+        sync_indexers(
+            config.indexer_configs,
+            config.delete_unmanaged_indexers,
+            api_client,
+            validate,
+        )
+    if config.app_configs or config.indexer_configs:
+        with span("sync app indexers", category="command"):
+            sync_app_indexers(api_client, timeout=300)
+
+    app_names = {app.name for app in config.app_configs}
+    # sync_indexers fills in default names for indexers without one.
+    indexer_names = {indexer.name for indexer in config.indexer_configs}
+    test_apps(app_names, api_client, test_concurrency, test_timeout)
+    test_indexers(indexer_names, api_client, test_concurrency, test_timeout)
 
 
 if __name__ == "__main__":
@@ -143,9 +373,61 @@ if __name__ == "__main__":
         required=True,
         help="Path to a config file containing the settings to sync. Must be a JSON file matching the SettingsSyncConfig schema.",
     )
+    parser.add_argument(
+        "--test-concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of connection tests to run at once after syncing.",
+    )
+    parser.add_argument(
+        "--test-timeout",
+        type=float,
+        default=30,
+        help="Timeout in seconds for each connection test.",
+    )
+    parser.add_argument(
+        "--fingerprint-file",
+        type=pathlib.Path,
+        help="Path to a file recording the fingerprint of the last successful sync. If the config, referenced secrets and Prowlarr version are unchanged since then, skip syncing.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Sync even if the fingerprint is unchanged since the last successful sync.",
+    )
+    parser.add_argument(
+        "--schema-snapshot",
+        type=pathlib.Path,
+        help="Path to the schema snapshot the config was validated against at build time. If it was taken from the running Prowlarr version, don't check the config for unknown properties and fields again.",
+    )
+    add_tracing_arguments(parser)
     args = parser.parse_args()
-    with open(args.config_file) as f:
-        config_json = f.read()
-    config = SettingsSyncConfig.model_validate_json(config_json)
-    with prowlarr_client() as client:
-        main(config, client)
+    with traced_run(args, name="prowlarr settings sync"), prowlarr_client() as client:
+        with span("load config", category="config"):
+            with open(args.config_file) as f:
+                config_json = f.read()
+            config = SettingsSyncConfig.model_validate_json(config_json)
+        with span("fetch system status", category="fetch"):
+            version = prowlarr.SystemApi(client).get_system_status().version
+        fingerprint = sync_fingerprint(args.config_file, version or "")
+        unchanged = args.fingerprint_file is not None and fingerprint_matches(
+            args.fingerprint_file, fingerprint
+        )
+        if unchanged and not args.force:
+            logger.info(
+                "Config, secrets and Prowlarr version unchanged since the last successful sync; skipping. Use --force to sync anyway."
+            )
+        else:
+            main(
+                config,
+                client,
+                args.test_concurrency,
+                args.test_timeout,
+                validate=args.schema_snapshot is None
+                or needs_runtime_validation(
+                    json.loads(args.schema_snapshot.read_text()), version
+                ),
+            )
+            if args.fingerprint_file is not None:
+                with span("write fingerprint", category="write"):
+                    write_fingerprint(args.fingerprint_file, fingerprint)
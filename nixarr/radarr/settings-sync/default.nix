@@ -10,6 +10,7 @@
     mkOption
     getExe
     mkIf
+    optionalString
     ;
 
   inherit
@@ -23,7 +24,7 @@
   cfg = nixarr.radarr.settings-sync;
 
   nixarr-utils = import ../../lib/utils.nix {inherit pkgs lib config;};
-  inherit (nixarr-utils) arrDownloadClientConfigType arrDownloadClientConfigModule;
+  inherit (nixarr-utils) arrDownloadClientConfigType arrDownloadClientConfigModule validateSyncConfig;
 
   sync-settings = writePython3Bin "nixarr-sync-radarr-settings" {
     libraries = [nixarr.nixarr-py.package];
@@ -48,6 +49,30 @@ in {
         '';
       };
 
+      deleteUnmanagedDownloadClients = mkOption {
+        type = types.bool;
+        default = false;
+        description = ''
+          Whether to delete download clients in Radarr that aren't configured in
+          `downloadClients`.
+        '';
+      };
+
+      schemaSnapshot = mkOption {
+        type = with types; nullOr path;
+        default = null;
+        example = lib.literalExpression "./radarr-schemas.json";
+        description = ''
+          A snapshot of Radarr's settings schemas, from `nixarr
+          show-radarr-schemas snapshot > radarr-schemas.json` (run as root). If
+          set, the sync config is checked against it while building, so
+          unknown implementations and mistyped properties or `fields` fail the
+          build instead of the sync service. The sync service only checks the
+          config again if Radarr's version differs from the snapshot's, so
+          update the snapshot when upgrading Radarr.
+        '';
+      };
+
       transmission = {
         enable = mkOption {
           type = types.bool;
@@ -124,11 +149,23 @@ in {
         Group = globals.radarr.group;
         RemainAfterExit = true;
         ExecStart = let
-          config-file = writeJSON "radarr-sync-config.json" {
+          config-json = writeJSON "radarr-sync-config.json" {
             download_clients = cfg.downloadClients;
+            delete_unmanaged_download_clients = cfg.deleteUnmanagedDownloadClients;
           };
+          config-file =
+            if cfg.schemaSnapshot == null
+            then config-json
+            else
+              validateSyncConfig {
+                service = "radarr";
+                configFile = config-json;
+                inherit (cfg) schemaSnapshot;
+              };
         in ''
-          ${getExe sync-settings} --config-file ${config-file}
+          ${getExe sync-settings} \
+            --config-file ${config-file} \
+            --fingerprint-file '${nixarr.radarr.stateDir}/settings-sync.fingerprint' ${optionalString (cfg.schemaSnapshot != null) "--schema-snapshot ${cfg.schemaSnapshot}"}
         '';
       };
     };
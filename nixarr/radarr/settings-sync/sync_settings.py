@@ -1,11 +1,25 @@
+from functools import partial
 from typing import Any
 import argparse
 import radarr
 import pydantic
 import pathlib
+import json
 import logging
 from nixarr_py.clients import radarr_client
-from nixarr_py.utils import apply_config
+from nixarr_py.schema_validation import needs_runtime_validation
+from nixarr_py.utils import (
+    apply_config,
+    bulk_changes,
+    bulk_properties,
+    fingerprint_matches,
+    group_bulk_changes,
+    is_bulk_unsupported,
+    log_connection_test_report,
+    run_connection_tests,
+    sync_fingerprint,
+    write_fingerprint,
+)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -26,18 +40,25 @@ class DownloadClient(pydantic.BaseModel):
 
 class SettingsSyncConfig(pydantic.BaseModel):
     download_clients: list[DownloadClient] = []
+    delete_unmanaged_download_clients: bool = False
 
     model_config = pydantic.ConfigDict(extra="forbid")
 
 
 def sync_download_clients(
-    download_client_configs: list[DownloadClient], api_client: radarr.ApiClient
+    download_client_configs: list[DownloadClient],
+    delete_unmanaged: bool,
+    api_client: radarr.ApiClient,
+    validate: bool = True,
 ) -> None:
     dc_api = radarr.DownloadClientApi(api_client)
     download_clients_by_name = {dc.name: dc for dc in dc_api.list_download_client()}
     schemas_by_implementation = {
         schema.implementation: schema for schema in dc_api.list_download_client_schema()
     }
+    dc_bulk_properties = bulk_properties(radarr.DownloadClientBulkResource)
+    managed_ids: set[int] = set()
+    bulk_updates: dict[int, dict[str, Any]] = {}
 
     for user_cfg in download_client_configs:
         logger.info(f"Syncing download client '{user_cfg.name}'")
@@ -53,17 +74,108 @@ def sync_download_clients(
 
         user_dict = user_cfg.model_dump()
         arr_dict = dc.model_dump()
-        apply_config(user_src=user_dict, arr_dst=arr_dict)
-        dc = radarr.DownloadClientResource.model_validate(arr_dict)
+        apply_config(user_src=user_dict, arr_dst=arr_dict, validate=validate)
 
         if insert_or_update == "insert":
-            dc_api.create_download_client(download_client_resource=dc)
-        else:
-            dc_api.update_download_client(id=dc.id, download_client_resource=dc)
+            dc = radarr.DownloadClientResource.model_validate(arr_dict)
+            dc_api.create_download_client(force_save=True, download_client_resource=dc)
+            continue
+        managed_ids.add(dc.id)
+        changes = bulk_changes(
+            current=dc.model_dump(),
+            desired=arr_dict,
+            bulk_properties=dc_bulk_properties,
+        )
+        if changes is None:
+            dc = radarr.DownloadClientResource.model_validate(arr_dict)
+            dc_api.update_download_client(
+                id=dc.id, force_save=True, download_client_resource=dc
+            )
+        elif changes:
+            bulk_updates[dc.id] = changes
+
+    download_clients_by_id = {dc.id: dc for dc in download_clients_by_name.values()}
+    for changes, ids in group_bulk_changes(bulk_updates):
+        logger.info(
+            f"Bulk-updating {len(ids)} download client(s): {', '.join(sorted(changes))}"
+        )
+        bulk = radarr.DownloadClientBulkResource.model_validate(
+            {"ids": ids, "apply_tags": radarr.ApplyTags.REPLACE, **changes}
+        )
+        try:
+            dc_api.put_download_client_bulk(download_client_bulk_resource=bulk)
+        except radarr.ApiException as e:
+            if not is_bulk_unsupported(e):
+                raise
+            for item_id in ids:
+                dc = download_clients_by_id[item_id].model_copy(update=changes)
+                dc_api.update_download_client(
+                    id=item_id, force_save=True, download_client_resource=dc
+                )
+
+    if not delete_unmanaged:
+        return
+    unmanaged = [
+        dc for dc in download_clients_by_id.values() if dc.id not in managed_ids
+    ]
+    if not unmanaged:
+        return
+    logger.info(
+        f"Deleting unmanaged download clients: {', '.join(repr(dc.name) for dc in unmanaged)}"
+    )
+    try:
+        dc_api.delete_download_client_bulk(
+            download_client_bulk_resource=radarr.DownloadClientBulkResource(
+                ids=[dc.id for dc in unmanaged]
+            )
+        )
+    except radarr.ApiException as e:
+        if not is_bulk_unsupported(e):
+            raise
+        for dc in unmanaged:
+            dc_api.delete_download_client(id=dc.id)
+
+
+def test_download_clients(
+    names: set[str], api_client: radarr.ApiClient, max_workers: int, timeout: float
+) -> None:
+    dc_api = radarr.DownloadClientApi(api_client)
+    tests = {
+        dc.name: partial(
+            dc_api.test_download_client,
+            download_client_resource=dc,
+            _request_timeout=timeout,
+        )
+        for dc in dc_api.list_download_client()
+        if dc.name in names and dc.enable
+    }
+    log_connection_test_report(
+        "download client", run_connection_tests(tests, max_workers)
+    )
 
 
-def main(config: SettingsSyncConfig, api_client: radarr.ApiClient) -> None:
-    sync_download_clients(config.download_clients, api_client)
+def main(
+    config: SettingsSyncConfig,
+    api_client: radarr.ApiClient,
+    test_concurrency: int,
+    test_timeout: float,
+    validate: bool = True,
+) -> None:
+    # Download clients are saved with forceSave, which skips the connection
+    # test Radarr otherwise runs inside each save request. We test them all
+    # afterwards.
+    sync_download_clients(
+        config.download_clients,
+        config.delete_unmanaged_download_clients,
+        api_client,
+        validate,
+    )
+    test_download_clients(
+        {dc.name for dc in config.download_clients},
+        api_client,
+        test_concurrency,
+        test_timeout,
+    )
 
 
 if __name__ == "__main__":
@@ -76,9 +188,57 @@ if __name__ == "__main__":
         required=True,
         help="Path to a config file containing the settings to sync. Must be a JSON file matching the SettingsSyncConfig schema.",
     )
+    parser.add_argument(
+        "--test-concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of connection tests to run at once after syncing.",
+    )
+    parser.add_argument(
+        "--test-timeout",
+        type=float,
+        default=30,
+        help="Timeout in seconds for each connection test.",
+    )
+    parser.add_argument(
+        "--fingerprint-file",
+        type=pathlib.Path,
+        help="Path to a file recording the fingerprint of the last successful sync. If the config, referenced secrets and Radarr version are unchanged since then, skip syncing.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Sync even if the fingerprint is unchanged since the last successful sync.",
+    )
+    parser.add_argument(
+        "--schema-snapshot",
+        type=pathlib.Path,
+        help="Path to the schema snapshot the config was validated against at build time. If it was taken from the running Radarr version, don't check the config for unknown properties and fields again.",
+    )
     args = parser.parse_args()
     with open(args.config_file) as f:
         config_json = f.read()
     config = SettingsSyncConfig.model_validate_json(config_json)
     with radarr_client() as client:
-        main(config, client)
+        version = radarr.SystemApi(client).get_system_status().version
+        fingerprint = sync_fingerprint(args.config_file, version or "")
+        unchanged = args.fingerprint_file is not None and fingerprint_matches(
+            args.fingerprint_file, fingerprint
+        )
+        if unchanged and not args.force:
+            logger.info(
+                "Config, secrets and Radarr version unchanged since the last successful sync; skipping. Use --force to sync anyway."
+            )
+        else:
+            main(
+                config,
+                client,
+                args.test_concurrency,
+                args.test_timeout,
+                validate=args.schema_snapshot is None
+                or needs_runtime_validation(
+                    json.loads(args.schema_snapshot.read_text()), version
+                ),
+            )
+            if args.fingerprint_file is not None:
+                write_fingerprint(args.fingerprint_file, fingerprint)
@@ -0,0 +1,161 @@
+{
+  config,
+  lib,
+  pkgs,
+  ...
+}: let
+  inherit
+    (lib)
+    concatStringsSep
+    filter
+    getExe
+    literalExpression
+    mkIf
+    mkOption
+    optional
+    types
+    ;
+
+  inherit
+    (pkgs.writers)
+    writePython3Bin
+    ;
+
+  nixarr = config.nixarr;
+  cfg = nixarr.searchScheduler;
+
+  supportedServices = ["lidarr" "radarr" "sonarr"];
+
+  search-scheduler = writePython3Bin "nixarr-search-scheduler" {
+    libraries = [nixarr.nixarr-py.package];
+    flakeIgnore = [
+      "E501" # Line too long
+    ];
+  } (builtins.readFile ./search_scheduler.py);
+
+  apiServices = cfg.services ++ optional nixarr.prowlarr.enable "prowlarr";
+in {
+  options.nixarr.searchScheduler = {
+    enable = mkOption {
+      type = types.bool;
+      default = false;
+      example = true;
+      description = ''
+        Whether to search for wanted (missing) items in small batches during
+        an off-peak window every night, instead of with "Search All Missing".
+
+        Items are searched with one multi-item search command per batch, and
+        the number of queries per indexer stays within
+        [`queriesPerIndexer`](#nixarr.searchScheduler.queriesPerIndexer) per
+        [`budgetWindowSecs`](#nixarr.searchScheduler.budgetWindowSecs). If
+        Prowlarr is enabled, queries Prowlarr made for other reasons (RSS,
+        interactive searches) count against the budget too. Progress is kept
+        between runs, so a large backlog is worked through over several
+        nights.
+      '';
+    };
+
+    services = mkOption {
+      type = types.listOf (types.enum supportedServices);
+      default = filter (service: nixarr.${service}.enable) supportedServices;
+      defaultText = literalExpression ''
+        filter (service: config.nixarr.''${service}.enable) ["lidarr" "radarr" "sonarr"]
+      '';
+      description = "Services to search for wanted items.";
+    };
+
+    queriesPerIndexer = mkOption {
+      type = types.ints.positive;
+      default = 100;
+      description = ''
+        Maximum number of queries per indexer per budget window. Each searched
+        item counts as one query to every indexer.
+      '';
+    };
+
+    budgetWindowSecs = mkOption {
+      type = types.ints.positive;
+      default = 3600;
+      description = "Length of the sliding query budget window, in seconds.";
+    };
+
+    batchSize = mkOption {
+      type = types.ints.positive;
+      default = 10;
+      description = "Maximum number of items per search command.";
+    };
+
+    offPeakStart = mkOption {
+      type = types.strMatching "[0-2][0-9]:[0-5][0-9]";
+      default = "01:00";
+      description = "Local time at which the nightly search run starts.";
+    };
+
+    offPeakEnd = mkOption {
+      type = types.strMatching "[0-2][0-9]:[0-5][0-9]";
+      default = "06:00";
+      description = ''
+        Local time at which the nightly search run stops, leaving the rest
+        for the next night.
+      '';
+    };
+
+    researchAfterDays = mkOption {
+      type = types.ints.positive;
+      default = 7;
+      description = ''
+        Once every wanted item of a service was searched, search them again
+        after this many days.
+      '';
+    };
+
+    includeCutoffUnmet = mkOption {
+      type = types.bool;
+      default = false;
+      description = ''
+        Whether to also search for upgrades of items whose quality cutoff
+        isn't met.
+      '';
+    };
+  };
+
+  config = mkIf (nixarr.enable && cfg.enable) {
+    assertions = [
+      {
+        assertion = cfg.services != [];
+        message = "nixarr.searchScheduler.enable requires at least one of Lidarr, Radarr or Sonarr to be enabled";
+      }
+    ];
+
+    systemd.services.nixarr-search-scheduler = {
+      description = "Search for wanted *Arr items within an indexer query budget";
+      after = map (service: "${service}-api.service") apiServices;
+      wants = map (service: "${service}-api.service") apiServices;
+      serviceConfig = {
+        Type = "oneshot";
+        DynamicUser = true;
+        StateDirectory = "nixarr-search-scheduler";
+        SupplementaryGroups = map (service: "${service}-api") apiServices;
+        ExecStart = concatStringsSep " " (
+          [
+            (getExe search-scheduler)
+            "--services ${concatStringsSep "," cfg.services}"
+            "--state-file /var/lib/nixarr-search-scheduler/state.json"
+            "--queries-per-indexer ${toString cfg.queriesPerIndexer}"
+            "--budget-window-secs ${toString cfg.budgetWindowSecs}"
+            "--batch-size ${toString cfg.batchSize}"
+            "--off-peak ${cfg.offPeakStart}-${cfg.offPeakEnd}"
+            "--research-after-secs ${toString (cfg.researchAfterDays * 24 * 3600)}"
+          ]
+          ++ optional cfg.includeCutoffUnmet "--include-cutoff-unmet"
+          ++ optional nixarr.prowlarr.enable "--use-prowlarr-stats"
+        );
+      };
+    };
+
+    systemd.timers.nixarr-search-scheduler = {
+      wantedBy = ["timers.target"];
+      timerConfig.OnCalendar = "*-*-* ${cfg.offPeakStart}:00";
+    };
+  };
+}
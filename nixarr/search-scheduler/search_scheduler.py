@@ -0,0 +1,80 @@
+from pathlib import Path
+import argparse
+import logging
+
+from nixarr_py.search_scheduler import SEARCH_COMMANDS, SearchScheduler
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Search for wanted *arr items in small batches, within a per-indexer query budget"
+    )
+    parser.add_argument(
+        "--services",
+        type=lambda value: value.split(","),
+        required=True,
+        help=f"Comma-separated services to search, from: {','.join(sorted(SEARCH_COMMANDS))}.",
+    )
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        required=True,
+        help="Path to the file recording search progress between runs.",
+    )
+    parser.add_argument(
+        "--queries-per-indexer",
+        type=int,
+        required=True,
+        help="Maximum number of queries per indexer per budget window.",
+    )
+    parser.add_argument(
+        "--budget-window-secs",
+        type=float,
+        default=3600,
+        help="Length of the sliding budget window, in seconds.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10,
+        help="Maximum number of items per search command.",
+    )
+    parser.add_argument(
+        "--off-peak",
+        help='Only search inside this daily window (local time), e.g. "01:00-06:00".',
+    )
+    parser.add_argument(
+        "--research-after-secs",
+        type=float,
+        default=7 * 24 * 3600,
+        help="Search items again this long after all of them were searched.",
+    )
+    parser.add_argument(
+        "--include-cutoff-unmet",
+        action="store_true",
+        help="Also search items whose quality cutoff isn't met.",
+    )
+    parser.add_argument(
+        "--use-prowlarr-stats",
+        action="store_true",
+        help="Count all queries Prowlarr made in the budget window against the budget.",
+    )
+    args = parser.parse_args()
+    unknown = set(args.services) - SEARCH_COMMANDS.keys()
+    if unknown:
+        parser.error(f"Unsupported services: {', '.join(sorted(unknown))}")
+    SearchScheduler(
+        services=args.services,
+        state_file=args.state_file,
+        queries_per_indexer=args.queries_per_indexer,
+        budget_window_secs=args.budget_window_secs,
+        batch_size=args.batch_size,
+        off_peak=args.off_peak,
+        research_after_secs=args.research_after_secs,
+        include_cutoff_unmet=args.include_cutoff_unmet,
+        use_prowlarr_stats=args.use_prowlarr_stats,
+    ).run()
@@ -10,6 +10,7 @@
     mkOption
     getExe
     mkIf
+    optionalString
     ;
 
   inherit
@@ -23,7 +24,7 @@
   cfg = nixarr.sonarr.settings-sync;
 
   nixarr-utils = import ../../lib/utils.nix {inherit pkgs lib config;};
-  inherit (nixarr-utils) arrDownloadClientConfigType arrDownloadClientConfigModule;
+  inherit (nixarr-utils) arrDownloadClientConfigType arrDownloadClientConfigModule validateSyncConfig;
 
   sync-settings = writePython3Bin "nixarr-sync-sonarr-settings" {
     libraries = [nixarr.nixarr-py.package];
@@ -47,6 +48,30 @@ in {
         '';
       };
 
+      deleteUnmanagedDownloadClients = mkOption {
+        type = types.bool;
+        default = false;
+        description = ''
+          Whether to delete download clients in Sonarr that aren't configured in
+          `downloadClients`.
+        '';
+      };
+
+      schemaSnapshot = mkOption {
+        type = with types; nullOr path;
+        default = null;
+        example = lib.literalExpression "./sonarr-schemas.json";
+        description = ''
+          A snapshot of Sonarr's settings schemas, from `nixarr
+          show-sonarr-schemas snapshot > sonarr-schemas.json` (run as root). If
+          set, the sync config is checked against it while building, so
+          unknown implementations and mistyped properties or `fields` fail the
+          build instead of the sync service. The sync service only checks the
+          config again if Sonarr's version differs from the snapshot's, so
+          update the snapshot when upgrading Sonarr.
+        '';
+      };
+
       transmission = {
         enable = mkOption {
           type = types.bool;
@@ -123,11 +148,23 @@ in {
         Group = globals.sonarr.group;
         RemainAfterExit = true;
         ExecStart = let
-          config-file = writeJSON "sonarr-sync-config.json" {
+          config-json = writeJSON "sonarr-sync-config.json" {
             download_clients = cfg.downloadClients;
+            delete_unmanaged_download_clients = cfg.deleteUnmanagedDownloadClients;
           };
+          config-file =
+            if cfg.schemaSnapshot == null
+            then config-json
+            else
+              validateSyncConfig {
+                service = "sonarr";
+                configFile = config-json;
+                inherit (cfg) schemaSnapshot;
+              };
         in ''
-          ${getExe sync-settings} --config-file ${config-file}
+          ${getExe sync-settings} \
+            --config-file ${config-file} \
+            --fingerprint-file '${nixarr.sonarr.stateDir}/settings-sync.fingerprint' ${optionalString (cfg.schemaSnapshot != null) "--schema-snapshot ${cfg.schemaSnapshot}"}
         '';
       };
     };